@@ -14,7 +14,22 @@ echo "🚀 Deploy di ${SERVICE_NAME} su Cloud Run..."
 echo "📦 Building Docker image..."
 gcloud builds submit --tag ${IMAGE_NAME} --project ${PROJECT_ID}
 
-# 2. Deploy su Cloud Run
+# 2. Shard degli id processati: niente indice sull'array `ids` (un'email = una voce di
+# indice, limite 40.000 per documento) e TTL su `expireAt`. Operazioni idempotenti.
+echo "🗂️  Configurazione Firestore (processedMessageShards)..."
+gcloud firestore indexes fields update ids \
+  --collection-group=processedMessageShards \
+  --disable-indexes \
+  --project ${PROJECT_ID} \
+  --async
+gcloud firestore fields ttls update expireAt \
+  --collection-group=processedMessageShards \
+  --enable-ttl \
+  --project ${PROJECT_ID} \
+  --async
+
+# 3. Deploy su Cloud Run. I job di backfill girano in thread dopo la risposta 202: CPU
+# sempre allocata e un'istanza minima, altrimenti vengono strozzati e il lease scade.
 echo "☁️  Deploying to Cloud Run..."
 gcloud run deploy ${SERVICE_NAME} \
   --image ${IMAGE_NAME} \
@@ -25,6 +40,8 @@ gcloud run deploy ${SERVICE_NAME} \
   --port 8080 \
   --memory 512Mi \
   --cpu 1 \
+  --no-cpu-throttling \
+  --min-instances 1 \
   --timeout 300 \
   --max-instances 10 \
   --set-env-vars "APP_ENV=production,FIREBASE_PROJECT_ID=${PROJECT_ID},GMAIL_PUBSUB_TOPIC=projects/${PROJECT_ID}/topics/gmail-notifications-giovi-ai" \
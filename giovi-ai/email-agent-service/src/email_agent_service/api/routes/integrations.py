@@ -4,12 +4,13 @@ from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, R
 from firebase_admin import firestore
 
 from ...dependencies.firebase import get_firestore_client
+from ...dependencies.parse_cache import get_parse_cache
 from ...models import (
     GmailCallbackRequest,
     GmailCallbackResponse,
     GmailIntegrationStartRequest,
     GmailIntegrationStartResponse,
-    GmailBackfillResponse,
+    GmailBackfillJobResponse,
     GmailBackfillPreviewResponse,
     GmailWatchRequest,
     GmailWatchResponse,
@@ -34,6 +35,7 @@ from ...parsers import (
     EmailParsingEngine,
 )
 from ...repositories import (
+    BackfillJobsRepository,
     HostEmailIntegrationRepository,
     OAuthStateRepository,
     ScidooIntegrationsRepository,
@@ -49,9 +51,12 @@ from ...services import (
     OAuthTokenExchangeError,
 )
 from ...repositories.processed_messages import ProcessedMessageRepository
+from ...services.backfill_jobs import BackfillJobRunner
 from ...services.backfill_service import GmailBackfillService
+from ...services.gmail_ingest_filters import GmailIngestFilterProvisioner
 from ...services.gmail_service import GmailService
 from ...services.gmail_watch_service import GmailWatchService
+from ...services.watch_coalescer import WATCH_NOTIFICATIONS
 from ...services.persistence_service import PersistenceService
 from ...services.integrations.scidoo_reservation_client import (
     ScidooReservationClient,
@@ -67,6 +72,21 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def build_email_parsers() -> list:
+    """Parser email di backfill e watch, nell'ordine di priorità."""
+    return [
+        # IMPORTANTE: ScidooCancellationParser e ScidooConfirmationParser devono essere PRIMA
+        # perché BookingConfirmationParser matcha anche @scidoo.com
+        ScidooCancellationParser(),
+        ScidooConfirmationParser(),
+        AirbnbCancellationParser(),  # Prima di AirbnbConfirmationParser per matchare cancellazioni
+        AirbnbConfirmationParser(),
+        BookingConfirmationParser(),
+        BookingMessageParser(),
+        AirbnbMessageParser(),
+    ]
+
+
 def get_oauth_service(
     firestore_client=Depends(get_firestore_client),
 ) -> GmailOAuthService:
@@ -83,17 +103,10 @@ def get_backfill_service(
     gmail_service = GmailService(integration_repo)
     persistence_service = PersistenceService(firestore_client)
     engine = EmailParsingEngine(
-        [
-            # IMPORTANTE: ScidooCancellationParser e ScidooConfirmationParser devono essere PRIMA
-            # perché BookingConfirmationParser matcha anche @scidoo.com
-            ScidooCancellationParser(),
-            ScidooConfirmationParser(),
-            AirbnbCancellationParser(),  # Prima di AirbnbConfirmationParser per matchare cancellazioni
-            AirbnbConfirmationParser(),
-            BookingConfirmationParser(),
-            BookingMessageParser(),
-            AirbnbMessageParser(),
-        ]
+        build_email_parsers(),
+        max_workers=get_settings().parser_max_workers,
+        html_backend=get_settings().parser_html_backend,
+        parse_cache=get_parse_cache(),
     )
     return GmailBackfillService(
         gmail_service=gmail_service,
@@ -104,6 +117,17 @@ def get_backfill_service(
     )
 
 
+def get_backfill_job_runner(
+    firestore_client=Depends(get_firestore_client),
+) -> BackfillJobRunner:
+    return BackfillJobRunner(
+        BackfillJobsRepository(firestore_client),
+        # Ogni job costruisce il proprio service: vive oltre la richiesta che lo avvia
+        service_factory=lambda: get_backfill_service(firestore_client),
+        firestore_client=firestore_client,
+    )
+
+
 @router.post(
     "/gmail/start",
     response_model=GmailIntegrationStartResponse,
@@ -169,26 +193,49 @@ def handle_gmail_callback(
 
 @router.post(
     "/gmail/{email}/backfill",
-    response_model=GmailBackfillResponse,
-    status_code=status.HTTP_200_OK,
+    response_model=GmailBackfillJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
 )
 def trigger_backfill(
     email: str,
     host_id: str,
     force: bool = False,
-    service: GmailBackfillService = Depends(get_backfill_service),
-    firestore_client=Depends(get_firestore_client),
-) -> GmailBackfillResponse:
+    runner: BackfillJobRunner = Depends(get_backfill_job_runner),
+) -> GmailBackfillJobResponse:
     """
-    Esegue il backfill delle email.
+    Avvia il backfill delle email come job in background.
+    
+    Il job salva un checkpoint dopo ogni pagina e riprende da lì dopo un riavvio;
+    lo stato si legge da GET /gmail/{email}/backfill/jobs/{job_id}. Se la casella ha già
+    un job attivo viene restituito quello.
     
     Args:
         email: Email dell'integrazione Gmail
         host_id: ID dell'host
         force: Se True, riprocessa anche le email già processate (default: False)
     """
-    parsed_results = service.run_backfill(host_id=host_id, email=email, force=force, firestore_client=firestore_client)
-    return GmailBackfillResponse(processed=len(parsed_results), items=parsed_results)
+    job = runner.start(host_id=host_id, email=email, force=force)
+    return runner.describe(job)
+
+
+@router.get(
+    "/gmail/{email}/backfill/jobs/{job_id}",
+    response_model=GmailBackfillJobResponse,
+    status_code=status.HTTP_200_OK,
+)
+def get_backfill_job(
+    email: str,
+    job_id: str,
+    runner: BackfillJobRunner = Depends(get_backfill_job_runner),
+) -> GmailBackfillJobResponse:
+    """Stato di un job di backfill: contatori, throughput ed ETA stimata."""
+    job_status = runner.get_status(job_id)
+    if job_status is None or job_status.email != email:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job di backfill {job_id} non trovato per {email}",
+        )
+    return job_status
 
 
 @router.post(
@@ -224,15 +271,9 @@ def get_watch_service(
     gmail_service = GmailService(integration_repo)
     persistence_service = PersistenceService(firestore_client)
     engine = EmailParsingEngine(
-        [
-            ScidooCancellationParser(),
-            ScidooConfirmationParser(),
-            AirbnbCancellationParser(),  # Prima di AirbnbConfirmationParser per matchare cancellazioni
-            AirbnbConfirmationParser(),
-            BookingConfirmationParser(),
-            BookingMessageParser(),
-            AirbnbMessageParser(),
-        ]
+        build_email_parsers(),
+        html_backend=get_settings().parser_html_backend,
+        parse_cache=get_parse_cache(),
     )
     return GmailWatchService(
         gmail_service=gmail_service,
@@ -252,14 +293,19 @@ def get_watch_service(
 def setup_gmail_watch(
     email: str,
     payload: GmailWatchRequest,
+    rebuild_filters: bool = Query(False, alias="rebuildFilters", description="Ricrea tutti i filtri Gmail OTA"),
     firestore_client: firestore.Client = Depends(get_firestore_client),
 ) -> GmailWatchResponse:
     """
     Configura Gmail Watch per ricevere notifiche real-time di nuove email.
+
+    Prima allinea label e filtri Gmail ai domini mittente dei parser e osserva solo
+    quella label; se la casella non lo consente osserva la INBOX.
     
     Args:
         email: Email dell'integrazione Gmail
         payload: Payload con topic_name opzionale
+        rebuild_filters: Ricrea i filtri anche se già allineati
     """
     settings = get_settings()
     integration_repo = HostEmailIntegrationRepository(firestore_client)
@@ -280,7 +326,13 @@ def setup_gmail_watch(
 
     gmail_service = GmailService(integration_repo)
     try:
-        watch_result = gmail_service.setup_watch(integration, topic_name)
+        provisioner = GmailIngestFilterProvisioner(gmail_service, integration_repo)
+        label_id = provisioner.ensure(
+            integration,
+            EmailParsingEngine(build_email_parsers()).dispatch_index.sender_domains,
+            rebuild=rebuild_filters,
+        )
+        watch_result = gmail_service.setup_watch(integration, topic_name, [label_id] if label_id else None)
         history_id = watch_result["historyId"]
         expiration_ms = watch_result["expiration"]
         
@@ -301,6 +353,7 @@ def setup_gmail_watch(
             historyId=history_id,
             expiration=expiration_ms,
             status="active",
+            labelId=label_id,
         )
     except Exception as e:
         raise HTTPException(
@@ -433,6 +486,7 @@ def handle_gmail_notifications(
         logger.warning("Notifica Pub/Sub con formato non valido")
         return Response(status_code=status.HTTP_204_NO_CONTENT)
 
+    email_address = None
     try:
         # Decodifica payload base64
         message_data = request_body["message"]["data"]
@@ -446,21 +500,21 @@ def handle_gmail_notifications(
             logger.warning(f"Notifica Pub/Sub senza emailAddress o historyId: {notification_payload}")
             return Response(status_code=status.HTTP_204_NO_CONTENT)
 
+        # Single-flight per casella: se un'elaborazione è in corso la notifica alza solo
+        # l'historyId obiettivo del passaggio successivo
+        if not WATCH_NOTIFICATIONS.submit(email_address, history_id):
+            logger.info(f"[WATCH] Notifica per {email_address} (historyId {history_id}) accodata all'elaborazione in corso")
+            return Response(status_code=status.HTTP_204_NO_CONTENT)
+
         # Crea watch service e processa in background
         integration_repo = HostEmailIntegrationRepository(firestore_client)
         processed_repo = ProcessedMessageRepository(firestore_client)
         gmail_service = GmailService(integration_repo)
         persistence_service = PersistenceService(firestore_client)
         engine = EmailParsingEngine(
-            [
-                ScidooCancellationParser(),
-                ScidooConfirmationParser(),
-                AirbnbCancellationParser(),  # Prima di AirbnbConfirmationParser per matchare cancellazioni
-                AirbnbConfirmationParser(),
-                BookingConfirmationParser(),
-                BookingMessageParser(),
-                AirbnbMessageParser(),
-            ]
+            build_email_parsers(),
+            html_backend=get_settings().parser_html_backend,
+            parse_cache=get_parse_cache(),
         )
         watch_service = GmailWatchService(
             gmail_service=gmail_service,
@@ -472,10 +526,13 @@ def handle_gmail_notifications(
         )
 
         # Processa in background (non bloccare la risposta)
-        background_tasks.add_task(watch_service.process_new_emails, email_address, history_id)
+        background_tasks.add_task(WATCH_NOTIFICATIONS.drain, email_address, watch_service.process_new_emails)
 
     except Exception as e:
         logger.error(f"Errore processamento notifica Gmail: {e}", exc_info=True)
+        if email_address and not background_tasks.tasks:
+            # Elaborazione registrata ma mai avviata: non lasciare la casella bloccata
+            WATCH_NOTIFICATIONS.release(email_address)
 
     # Rispondi immediatamente con 204 No Content (ack a Pub/Sub)
     # BackgroundTasks viene eseguito dopo la risposta
@@ -5,6 +5,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from .api import get_api_router
+from .api.routes.integrations import get_backfill_job_runner
 from .config.settings import get_settings
 from .dependencies.firebase import get_firestore_client
 from .services import ScidooReservationPollingService, PersistenceService
@@ -42,6 +43,14 @@ def create_app() -> FastAPI:
         except Exception as e:
             logging.error(f"[APP] Errore avvio ScidooReservationPollingService: {e}", exc_info=True)
         
+        # Riprendi i job di backfill interrotti (riavvio/deploy) dall'ultimo checkpoint
+        try:
+            resumed_jobs = get_backfill_job_runner(firestore_client).resume_pending()
+            if resumed_jobs:
+                logging.info(f"[APP] Ripresi {len(resumed_jobs)} job di backfill: {resumed_jobs}")
+        except Exception as e:
+            logging.error(f"[APP] Errore ripresa job di backfill: {e}", exc_info=True)
+        
         # Salva istanze nell'app state per accesso dagli endpoint
         # NOTA: Smoobu ora usa webhooks invece di polling
         app.state.scidoo_polling_service = scidoo_polling_service
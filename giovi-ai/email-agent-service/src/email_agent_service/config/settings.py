@@ -41,6 +41,8 @@ class AppSettings(BaseSettings):
             "https://www.googleapis.com/auth/gmail.modify",
             "https://www.googleapis.com/auth/gmail.send",
             "https://www.googleapis.com/auth/gmail.readonly",
+            # Label e filtri che instradano le email OTA verso la label osservata dal watch
+            "https://www.googleapis.com/auth/gmail.settings.basic",
         ],
         validation_alias="GOOGLE_OAUTH_SCOPES",
     )
@@ -54,6 +56,56 @@ class AppSettings(BaseSettings):
         validation_alias="GEMINI_API_KEY",
         description="Chiave API per Google Gemini",
     )
+    parser_max_workers: int = Field(
+        default=1,
+        validation_alias="PARSER_MAX_WORKERS",
+        description="Processi usati per il parsing batch delle email nel backfill (1 = seriale)",
+    )
+    parser_html_backend: str = Field(
+        default="auto",
+        validation_alias="PARSER_HTML_BACKEND",
+        description="Tree builder HTML dei parser: auto, lxml o html.parser (auto = lxml se installato)",
+    )
+    parse_cache_backend: str = Field(
+        default="memory",
+        validation_alias="PARSE_CACHE_BACKEND",
+        description="Cache dei risultati di parsing: memory, disk o none",
+    )
+    parse_cache_max_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        validation_alias="PARSE_CACHE_MAX_BYTES",
+        description="Dimensione massima della cache di parsing in byte (eviction LRU)",
+    )
+    parse_cache_dir: Optional[str] = Field(
+        default=None,
+        validation_alias="PARSE_CACHE_DIR",
+        description="Cartella della cache di parsing su disco (default: tmp di sistema)",
+    )
+    gmail_quota_units_per_second: int = Field(
+        default=250,
+        validation_alias="GMAIL_QUOTA_UNITS_PER_SECOND",
+        description="Budget di quota unit Gmail al secondo per casella, condiviso da backfill e watch",
+    )
+    gmail_fetch_workers: int = Field(
+        default=4,
+        validation_alias="GMAIL_FETCH_WORKERS",
+        description="Richieste batch Gmail eseguite in parallelo per scaricare i messaggi",
+    )
+    gmail_history_fallback_days: int = Field(
+        default=7,
+        validation_alias="GMAIL_HISTORY_FALLBACK_DAYS",
+        description="Finestra in giorni della ricerca in INBOX quando la history Gmail è scaduta",
+    )
+    processed_ids_retention_days: int = Field(
+        default=190,
+        validation_alias="PROCESSED_IDS_RETENTION_DAYS",
+        description="Giorni di conservazione degli id processati (almeno la finestra di lookback del backfill)",
+    )
+    processed_ids_legacy_lookup: bool = Field(
+        default=True,
+        validation_alias="PROCESSED_IDS_LEGACY_LOOKUP",
+        description="Cerca anche nei vecchi documenti per messaggio, per PROCESSED_IDS_RETENTION_DAYS dalla creazione degli shard di ogni casella",
+    )
     # Booking.com API Settings
     booking_api_username: Optional[str] = Field(
         default=None,
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Optional
+
+from ..config.settings import get_settings
+from ..parsers.cache import ParseCache, build_parse_cache
+
+
+@lru_cache
+def get_parse_cache() -> Optional[ParseCache]:
+    """Cache dei risultati di parsing condivisa da backfill, preview e watch (None se disattivata)."""
+    settings = get_settings()
+    return build_parse_cache(
+        settings.parse_cache_backend,
+        max_bytes=settings.parse_cache_max_bytes,
+        directory=settings.parse_cache_dir,
+    )
@@ -36,6 +36,7 @@ from .scidoo_reservation import (
     ScidooGuest,
 )
 from .parsing import (
+    GmailBackfillJobResponse,
     GmailBackfillPreviewResponse,
     GmailBackfillResponse,
     GuestMessageInfo,
@@ -69,6 +70,7 @@ __all__ = [
     "GuestMessageInfo",
     "GmailBackfillResponse",
     "GmailBackfillPreviewResponse",
+    "GmailBackfillJobResponse",
     "PropertyPreview",
     "ReservationPreview",
     # Booking.com models
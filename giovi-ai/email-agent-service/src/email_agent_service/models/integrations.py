@@ -39,6 +39,8 @@ class GmailWatchResponse(BaseModel):
     history_id: str = Field(..., alias="historyId")
     expiration: int  # Millisecondi da epoch
     status: str = "active"
+    # Label osservata (filtri OTA); None se il watch è sulla INBOX
+    label_id: Optional[str] = Field(default=None, alias="labelId")
 
 
 class GmailNotificationPayload(BaseModel):
@@ -66,6 +66,28 @@ class GmailBackfillResponse(BaseModel):
     items: list[ParsedEmail]
 
 
+class GmailBackfillJobResponse(BaseModel):
+    """Stato di un job di backfill in background, con throughput ed ETA stimati."""
+
+    job_id: str = Field(..., alias="jobId")
+    status: str
+    host_id: str = Field(..., alias="hostId")
+    email: str
+    pages: int = 0
+    processed: int = 0
+    confirmations: int = 0
+    cancellations: int = 0
+    skipped: int = 0
+    failed: int = 0
+    estimated_total: Optional[int] = Field(default=None, alias="estimatedTotal")
+    messages_per_second: Optional[float] = Field(default=None, alias="messagesPerSecond")
+    eta_seconds: Optional[int] = Field(default=None, alias="etaSeconds")
+    attempts: int = 0
+    error: Optional[str] = None
+    created_at: Optional[datetime] = Field(default=None, alias="createdAt")
+    completed_at: Optional[datetime] = Field(default=None, alias="completedAt")
+
+
 class PropertyPreview(BaseModel):
     name: str
     occurrences: int
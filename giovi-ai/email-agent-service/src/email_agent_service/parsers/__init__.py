@@ -5,7 +5,7 @@ from .airbnb_cancellation import AirbnbCancellationParser
 from .airbnb_message import AirbnbMessageParser
 from .scidoo_confirm import ScidooConfirmationParser
 from .scidoo_cancellation import ScidooCancellationParser
-from .engine import EmailParsingEngine
+from .engine import EmailParsingEngine, RawEmail
 
 __all__ = [
     "BookingConfirmationParser",
@@ -16,5 +16,6 @@ __all__ = [
     "ScidooConfirmationParser",
     "ScidooCancellationParser",
     "EmailParsingEngine",
+    "RawEmail",
 ]
 
@@ -6,14 +6,19 @@ from typing import Optional
 from bs4 import BeautifulSoup
 
 from ..models import ParsedEmail, ParsedEmailMetadata, ReservationInfo
-from .base import EmailContent, EmailParser, is_airbnb_sender
+from .base import AIRBNB_SENDER_DOMAINS, EmailContent, EmailParser, is_airbnb_sender
+from .dates import parse_date_header
 
 
 class AirbnbCancellationParser(EmailParser):
     """Parser per email di cancellazione Airbnb dirette da automated@airbnb.com."""
-    
+
+    KIND = "airbnb_cancellation"
+    SENDER_DOMAINS = AIRBNB_SENDER_DOMAINS
     THREAD_ID_REGEX = re.compile(r"/hosting/thread/(\d+)", re.IGNORECASE)
     CONFIRM_CODE_REGEX = re.compile(r"CODICE DI CONFERMA\s*([A-Z0-9]+)", re.IGNORECASE)
+    CONFIRM_LABEL_REGEX = re.compile(r"CODICE DI CONFERMA", re.IGNORECASE)
+    CODE_REGEX = re.compile(r"([A-Z0-9]{5,})")
 
     def matches(self, content: EmailContent) -> bool:
         sender = content.message.get("From")
@@ -28,8 +33,7 @@ class AirbnbCancellationParser(EmailParser):
         received = parse_date_header(content.message.get("Date"))
 
         text = content.text or ""
-        html = content.html or ""
-        soup = BeautifulSoup(html, "html.parser") if html else None
+        soup = content.soup
 
         # Estrai reservation ID (codice di conferma) e thread ID
         reservation_id = self._extract_reservation_id(text, soup)
@@ -44,7 +48,7 @@ class AirbnbCancellationParser(EmailParser):
         )
 
         return ParsedEmail(
-            kind="airbnb_cancellation",
+            kind=self.KIND,
             reservation=reservation,
             metadata=ParsedEmailMetadata(
                 subject=subject,
@@ -69,10 +73,10 @@ class AirbnbCancellationParser(EmailParser):
         
         # Cerca nell'HTML
         if soup:
-            tag = soup.find(string=re.compile(r"CODICE DI CONFERMA", re.IGNORECASE))
+            tag = soup.find(string=self.CONFIRM_LABEL_REGEX)
             if tag:
                 # Cerca pattern alfanumerico dopo "CODICE DI CONFERMA"
-                match = re.search(r"([A-Z0-9]{5,})", tag)
+                match = self.CODE_REGEX.search(tag)
                 if match:
                     return match.group(1)
         
@@ -94,16 +98,3 @@ class AirbnbCancellationParser(EmailParser):
         if match:
             return match.group(1)
         return None
-
-
-def parse_date_header(value: Optional[str]) -> Optional[datetime]:
-    from datetime import datetime
-    from dateutil import parser as date_parser
-    
-    if not value:
-        return None
-    try:
-        return date_parser.parse(value)
-    except (ValueError, OverflowError):
-        return None
-
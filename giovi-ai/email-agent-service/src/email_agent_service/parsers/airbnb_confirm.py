@@ -2,16 +2,22 @@ from __future__ import annotations
 
 import re
 from datetime import datetime
+from itertools import chain
 from typing import Optional
 
 from bs4 import BeautifulSoup
-from dateutil import parser as date_parser
 
 from ..models import ParsedEmail, ParsedEmailMetadata, ReservationInfo, GuestMessageInfo
-from .base import EmailContent, EmailParser, is_airbnb_sender
+from .base import AIRBNB_SENDER_DOMAINS, EmailContent, EmailParser, is_airbnb_sender
+from .dates import parse_date, parse_date_header
+from .field_index import FieldIndex
+from .patterns import DIGITS_REGEX, WHITESPACE_REGEX, MultiReplace, compile_any
+from .templates import Strategy, run_strategies
 
 
 class AirbnbConfirmationParser(EmailParser):
+    KIND = "airbnb_confirmation"
+    SENDER_DOMAINS = AIRBNB_SENDER_DOMAINS
     THREAD_REGEX = re.compile(r"/hosting/reservations/details/([A-Z0-9]+)", re.IGNORECASE)
     THREAD_ID_REGEX = re.compile(r"/hosting/thread/(\d+)", re.IGNORECASE)
     CONFIRM_CODE_REGEX = re.compile(r"CODICE DI CONFERMA\s*([A-Z0-9]+)", re.IGNORECASE)
@@ -31,23 +37,24 @@ class AirbnbConfirmationParser(EmailParser):
         recipients = content.message.get_all("To")
         received = parse_date_header(content.message.get("Date"))
 
-        text = normalize_airbnb_text(content.text or "")
-        html = content.html or ""
-        soup = BeautifulSoup(html, "html.parser") if html else None
+        text = content.normalized(normalize_airbnb_text)
+        soup = content.soup
+        # Label, righe e link dell'HTML indicizzati una volta sola per tutti gli estrattori
+        fields = content.field_index
 
-        reservation_id = self._extract_reservation_id(subject, text, soup)
-        thread_id = self._extract_thread_id(text, soup)
+        reservation_id = self._extract_reservation_id(subject, text, fields)
+        thread_id = self._extract_thread_id(text, fields)
         property_name = extract_property_name(text, soup)
-        guest_name = extract_guest_name(text, soup, subject=subject)
-        check_in = extract_date(text, soup, ["Check-in", "Arrivo"])
-        check_out = extract_date(text, soup, ["Check-out", "Partenza"])
+        guest_name = extract_guest_name(text, fields, subject=subject)
+        check_in = extract_date(text, fields, ["Check-in", "Arrivo"])
+        check_out = extract_date(text, fields, ["Check-out", "Partenza"])
 
         if not check_in or not check_out:
-            calendar_check_in, calendar_check_out = extract_calendar_dates(text, soup)
+            calendar_check_in, calendar_check_out = extract_calendar_dates(text, fields)
             check_in = check_in or calendar_check_in
             check_out = check_out or calendar_check_out
-        adults = extract_guests(text, soup)
-        total_amount, currency = extract_amount(text, soup)
+        adults = extract_guests(text, fields)
+        total_amount, currency = extract_amount(text, fields)
         
         # Estrai anche messaggio del guest se presente
         guest_message = extract_guest_message_from_confirmation(text, soup, guest_name)
@@ -81,7 +88,7 @@ class AirbnbConfirmationParser(EmailParser):
             )
 
         return ParsedEmail(
-            kind="airbnb_confirmation",
+            kind=self.KIND,
             reservation=reservation,
             guestMessage=guest_message_info,
             metadata=ParsedEmailMetadata(
@@ -98,15 +105,15 @@ class AirbnbConfirmationParser(EmailParser):
         self,
         subject: Optional[str],
         text: str,
-        soup: Optional[BeautifulSoup],
+        fields: Optional[FieldIndex],
     ) -> Optional[str]:
         if subject:
             match = self.CONFIRM_CODE_REGEX.search(subject)
             if match:
                 return match.group(1)
-        if soup:
-            for link in soup.find_all("a", href=True):
-                match = self.THREAD_REGEX.search(link["href"])
+        if fields:
+            for href in fields.hrefs:
+                match = self.THREAD_REGEX.search(href)
                 if match:
                     return match.group(1)
         match = self.CONFIRM_CODE_REGEX.search(text)
@@ -117,12 +124,12 @@ class AirbnbConfirmationParser(EmailParser):
     def _extract_thread_id(
         self,
         text: str,
-        soup: Optional[BeautifulSoup],
+        fields: Optional[FieldIndex],
     ) -> Optional[str]:
         """Estrae il thread ID dal link /hosting/thread/..."""
-        if soup:
-            for link in soup.find_all("a", href=True):
-                match = self.THREAD_ID_REGEX.search(link["href"])
+        if fields:
+            for href in fields.hrefs:
+                match = self.THREAD_ID_REGEX.search(href)
                 if match:
                     return match.group(1)
         # Fallback: cerca nel testo
@@ -132,229 +139,279 @@ class AirbnbConfirmationParser(EmailParser):
         return None
 
 
+# Frasi da escludere come nome property: "arriverà", "confermata", "nuova prenotazione", messaggi del guest
+PROPERTY_EXCLUDE_PATTERNS = [
+    r"arriverà",
+    r"confermata",
+    r"nuova prenotazione",
+    r"prenotazione confermata",
+    r"ciao\s+\w+",  # Esclude messaggi che iniziano con "Ciao"
+    r"tradotto automaticamente",  # Esclude sezioni di traduzione
+    r"hallo\s+\w+",  # Esclude messaggi in tedesco
+    r"^siamo\s+",  # Esclude messaggi che iniziano con "Siamo"
+    r"^desideriamo\s+",  # Esclude messaggi che iniziano con "Desideriamo"
+    r"^viaggiamo\s+",  # Esclude messaggi che iniziano con "Viaggiamo"
+    r"^non\s+vediamo\s+l'ora",  # Esclude "Non vediamo l'ora"
+    r"mi\s+sposo",  # Esclude messaggi tipo "Mi sposo la prossima settimana"
+    r"viaggio\s+di\s+nozze",  # Esclude "viaggio di nozze"
+    r"casa\s+è\s+bellissima",  # Esclude "casa è bellissima"
+]
+
+# "MAGGIORE SUITE - DUOMO DI PERUGIA" (tutto maiuscolo con trattino)
+UPPERCASE_PROPERTY_PATTERN = r"([A-Z][A-Z\s\-]+(?:SUITE|CASA|APPARTAMENTO|ROOM)\s*-\s*[A-Z\s\-]+)"
+
+# Tutte le frasi da escludere in un'unica scansione della riga
+PROPERTY_EXCLUDE_REGEX = compile_any(PROPERTY_EXCLUDE_PATTERNS, re.IGNORECASE)
+PROPERTY_KEYWORD_REGEX = re.compile(r"(?:SUITE|CASA|APPARTAMENTO|ROOM)", re.IGNORECASE)
+UPPERCASE_PROPERTY_REGEX = re.compile(UPPERCASE_PROPERTY_PATTERN)
+UPPERCASE_PROPERTY_LINE_REGEX = re.compile(r"^[A-Z][A-Z\s\-]+(?:SUITE|CASA|APPARTAMENTO|ROOM)\s*-\s*[A-Z\s\-]+")
+PROPERTY_MENTION_REGEX = re.compile(r"([A-Z][A-Za-z\s\-]+(?:SUITE|CASA|APPARTAMENTO|ROOM)[A-Za-z\s\-]*)")
+PROPERTY_AFTER_TRANSLATION_REGEX = re.compile(
+    rf"Tradotto automaticamente.*?(https://www\.airbnb\.it/rooms/[^\s]+).*?{UPPERCASE_PROPERTY_PATTERN}",
+    re.IGNORECASE | re.DOTALL,
+)
+TRANSLATION_SECTION_REGEX = re.compile(r"Tradotto automaticamente.*?(?=Check-in|$)", re.IGNORECASE | re.DOTALL)
+BEFORE_CHECK_IN_REGEX = re.compile(r"^(.*?)Check-in", re.IGNORECASE | re.DOTALL)
+CHECK_IN_REGEX = re.compile(r"Check-in", re.IGNORECASE)
+ROOM_LINK_REGEX = re.compile(r"https://www\.airbnb\.it/rooms/[^\s]+", re.IGNORECASE)
+
+
+def should_exclude_property(text_line: str) -> bool:
+    """Verifica se una riga di testo dovrebbe essere esclusa come nome property."""
+    text_lower = text_line.lower()
+    # Escludi testi molto lunghi (>100 caratteri) che non contengono SUITE/CASA/APPARTAMENTO
+    if len(text_line) > 100 and not PROPERTY_KEYWORD_REGEX.search(text_line):
+        return True
+    # Escludi testi che contengono più di 3 parole e non contengono SUITE/CASA/APPARTAMENTO
+    words = text_line.split()
+    if len(words) > 3 and not PROPERTY_KEYWORD_REGEX.search(text_line):
+        return True
+    return PROPERTY_EXCLUDE_REGEX.search(text_lower) is not None
+
+
 def extract_property_name(text: str, soup: Optional[BeautifulSoup]) -> Optional[str]:
     """Estrae il nome della property dall'email Airbnb."""
-    # Pattern per escludere frasi che contengono "arriverà", "confermata", "nuova prenotazione"
-    exclude_patterns = [
-        r"arriverà",
-        r"confermata",
-        r"nuova prenotazione",
-        r"prenotazione confermata",
-        r"ciao\s+\w+",  # Esclude messaggi che iniziano con "Ciao"
-        r"tradotto automaticamente",  # Esclude sezioni di traduzione
-        r"hallo\s+\w+",  # Esclude messaggi in tedesco
-        r"^siamo\s+",  # Esclude messaggi che iniziano con "Siamo"
-        r"^desideriamo\s+",  # Esclude messaggi che iniziano con "Desideriamo"
-        r"^viaggiamo\s+",  # Esclude messaggi che iniziano con "Viaggiamo"
-        r"^non\s+vediamo\s+l'ora",  # Esclude "Non vediamo l'ora"
-        r"mi\s+sposo",  # Esclude messaggi tipo "Mi sposo la prossima settimana"
-        r"viaggio\s+di\s+nozze",  # Esclude "viaggio di nozze"
-        r"casa\s+è\s+bellissima",  # Esclude "casa è bellissima"
-    ]
-    
-    def should_exclude(text_line: str) -> bool:
-        """Verifica se una riga di testo dovrebbe essere esclusa."""
-        text_lower = text_line.lower()
-        # Escludi testi molto lunghi (>100 caratteri) che non contengono SUITE/CASA/APPARTAMENTO
-        if len(text_line) > 100 and not re.search(r"(?:SUITE|CASA|APPARTAMENTO|ROOM)", text_line, re.IGNORECASE):
-            return True
-        # Escludi testi che contengono più di 3 parole e non contengono SUITE/CASA/APPARTAMENTO
-        words = text_line.split()
-        if len(words) > 3 and not re.search(r"(?:SUITE|CASA|APPARTAMENTO|ROOM)", text_line, re.IGNORECASE):
-            return True
-        return any(re.search(pattern, text_lower, re.IGNORECASE) for pattern in exclude_patterns)
-    
-    if soup:
-        # Cerca header h1 o h2 (ma escludi quelli con "arriverà" o "confermata")
+    return run_strategies(property_name_strategies(text, soup))
+
+
+def property_name_strategies(text: str, soup: Optional[BeautifulSoup]) -> list[Strategy[str]]:
+    def html_header() -> Optional[str]:
+        # Header h1 o h2 (ma escludi quelli con "arriverà" o "confermata")
         header = soup.find("h1") or soup.find("h2")
         if header:
             header_text = header.text.strip()
-            if header_text and not should_exclude(header_text):
+            if header_text and not should_exclude_property(header_text):
                 return header_text
-        
-        # Cerca strong tag (ma escludi quelli con "arriverà" o "confermata")
+        return None
+
+    def html_strong() -> Optional[str]:
+        # Strong tag (ma escludi quelli con "arriverà" o "confermata")
         strong = soup.find("strong")
         if strong:
             strong_text = strong.text.strip()
-            if strong_text and not should_exclude(strong_text):
+            if strong_text and not should_exclude_property(strong_text):
                 return strong_text
-        
-        # Cerca pattern specifico: testo tutto maiuscolo con "SUITE/CASA/APPARTAMENTO" seguito da trattino
-        # Pattern: "MAGGIORE SUITE - DUOMO DI PERUGIA" o "IMPERIAL SUITE - PALAZZO DELLA STAFFA"
-        # IMPORTANTE: cerca DOPO eventuali messaggi del guest
-        # OTTIMIZZAZIONE: limita il numero di tag da controllare per evitare timeout
+        return None
+
+    def html_strings() -> Optional[str]:
+        # Testo tutto maiuscolo con "SUITE/CASA/APPARTAMENTO" seguito da trattino, es.
+        # "MAGGIORE SUITE - DUOMO DI PERUGIA" o "IMPERIAL SUITE - PALAZZO DELLA STAFFA".
+        # Si controllano solo gli ultimi 100 nodi di testo (dopo eventuali messaggi del guest)
+        # per evitare timeout su email molto lunghe
         tags_to_check = soup.find_all(string=True)
-        # Limita a max 100 tag per evitare timeout su email molto lunghe
         if len(tags_to_check) > 100:
-            # Prendi solo gli ultimi 100 tag (dove probabilmente c'è il property name)
             tags_to_check = tags_to_check[-100:]
-        
+
         for tag in tags_to_check:
             text_line = tag.strip()
             # Escludi righe troppo corte o che contengono parole da escludere
-            if len(text_line) < 10 or should_exclude(text_line):
+            if len(text_line) < 10 or should_exclude_property(text_line):
                 continue
-            # Cerca pattern: tutto maiuscolo, contiene SUITE/CASA/APPARTAMENTO, seguito da trattino
-            if re.search(r"^[A-Z][A-Z\s\-]+(?:SUITE|CASA|APPARTAMENTO|ROOM)\s*-\s*[A-Z\s\-]+", text_line):
+            if UPPERCASE_PROPERTY_LINE_REGEX.search(text_line):
                 return text_line
             # Pattern alternativo: contiene SUITE/CASA/APPARTAMENTO e non contiene "arriverà"
-            if re.search(r"(?:SUITE|CASA|APPARTAMENTO|ROOM)", text_line, re.IGNORECASE):
-                if not should_exclude(text_line):
-                    return text_line
-    
-    # Fallback: cerca nel testo plain con pattern più specifico
-    # IMPORTANTE: cerca DOPO eventuali messaggi del guest (dopo "Tradotto automaticamente" o prima di "Check-in")
-    # Pattern 1: "MAGGIORE SUITE - DUOMO DI PERUGIA" (tutto maiuscolo con trattino)
-    # Cerca dopo eventuali sezioni di messaggio
-    text_after_message = text
-    # Se c'è "Tradotto automaticamente", cerca dopo quella sezione
-    if "Tradotto automaticamente" in text or "tradotto automaticamente" in text.lower():
-        # Cerca il property name dopo "Tradotto automaticamente" e prima di "Check-in"
-        match = re.search(r"Tradotto automaticamente.*?(https://www\.airbnb\.it/rooms/[^\s]+).*?([A-Z][A-Z\s\-]+(?:SUITE|CASA|APPARTAMENTO|ROOM)\s*-\s*[A-Z\s\-]+)", text, re.IGNORECASE | re.DOTALL)
+            if PROPERTY_KEYWORD_REGEX.search(text_line):
+                return text_line
+        return None
+
+    def after_translation() -> Optional[str]:
+        # Property name dopo "Tradotto automaticamente" e il link alla room
+        if "tradotto automaticamente" not in text.lower():
+            return None
+        match = PROPERTY_AFTER_TRANSLATION_REGEX.search(text)
         if match:
             result = match.group(2).strip()
-            if not should_exclude(result):
+            if not should_exclude_property(result):
                 return result
-    
-    # IMPORTANTE: Cerca il property name DOPO eventuali messaggi del guest
-    # I messaggi del guest di solito vengono prima del link alla room
-    # Pattern: cerca dopo il link "https://www.airbnb.it/rooms/..." che viene DOPO il messaggio
-    # E PRIMA di "Check-in" per evitare di prendere nomi da altre parti
-    room_link_match = re.search(r"https://www\.airbnb\.it/rooms/[^\s]+", text, re.IGNORECASE)
-    if room_link_match:
-        # Cerca il property name dopo il link alla room
+        return None
+
+    def after_room_link() -> Optional[str]:
+        # I messaggi del guest di solito vengono prima del link "https://www.airbnb.it/rooms/...":
+        # si cerca DOPO il link e PRIMA di "Check-in" per evitare nomi da altre parti
+        room_link_match = ROOM_LINK_REGEX.search(text)
+        if not room_link_match:
+            return None
         text_after_room_link = text[room_link_match.end():]
-        # Trova dove inizia "Check-in" per limitare la ricerca
-        check_in_match = re.search(r"Check-in", text_after_room_link, re.IGNORECASE)
+        check_in_match = CHECK_IN_REGEX.search(text_after_room_link)
         if check_in_match:
-            # Cerca solo tra il link e "Check-in"
             search_text = text_after_room_link[:check_in_match.start()]
         else:
             # Se non c'è "Check-in", limita comunque a 500 caratteri
             search_text = text_after_room_link[:500]
-        
-        # Cerca pattern property name (tutto maiuscolo con SUITE/CASA/APPARTAMENTO seguito da trattino)
-        match = re.search(r"([A-Z][A-Z\s\-]+(?:SUITE|CASA|APPARTAMENTO|ROOM)\s*-\s*[A-Z\s\-]+)", search_text)
+
+        match = UPPERCASE_PROPERTY_REGEX.search(search_text)
         if match:
             result = match.group(1).strip()
-            if not should_exclude(result):
+            if not should_exclude_property(result):
                 return result
-    
-    # Pattern 1: "MAGGIORE SUITE - DUOMO DI PERUGIA" (tutto maiuscolo con trattino)
-    match = re.search(r"([A-Z][A-Z\s\-]+(?:SUITE|CASA|APPARTAMENTO|ROOM)\s*-\s*[A-Z\s\-]+)", text)
-    if match:
-        result = match.group(1).strip()
-        if not should_exclude(result):
-            return result
-    
-    # Pattern 2: testo con SUITE/CASA/APPARTAMENTO ma senza "arriverà" o "confermata"
-    # OTTIMIZZAZIONE: cerca solo dopo "Tradotto automaticamente" o prima di "Check-in" per evitare timeout
-    # Limita la ricerca a una porzione del testo per migliorare le performance
-    search_text = text
-    if "Tradotto automaticamente" in text or "tradotto automaticamente" in text.lower():
-        # Cerca dopo "Tradotto automaticamente" e prima di "Check-in"
-        match_section = re.search(r"Tradotto automaticamente.*?(?=Check-in|$)", text, re.IGNORECASE | re.DOTALL)
-        if match_section:
-            search_text = match_section.group(0)
-    elif "Check-in" in text:
-        # Cerca prima di "Check-in"
-        match_section = re.search(r"^(.*?)Check-in", text, re.IGNORECASE | re.DOTALL)
-        if match_section:
-            search_text = match_section.group(1)
-    
-    # Limita la lunghezza del testo da cercare (max 5000 caratteri) per evitare timeout
-    if len(search_text) > 5000:
-        # Prendi gli ultimi 5000 caratteri (dove probabilmente c'è il property name)
-        search_text = search_text[-5000:]
-    
-    # Cerca solo l'ultimo match valido (più in basso nel testo, dopo eventuali messaggi)
-    # NON creare una lista di tutti i match, cerca direttamente l'ultimo
-    last_match = None
-    for match in re.finditer(r"([A-Z][A-Za-z\s\-]+(?:SUITE|CASA|APPARTAMENTO|ROOM)[A-Za-z\s\-]*)", search_text):
-        result = match.group(1).strip()
-        if not should_exclude(result) and len(result) > 10 and len(result) < 100:
-            last_match = result
-    
-    if last_match:
+        return None
+
+    def uppercase_text() -> Optional[str]:
+        match = UPPERCASE_PROPERTY_REGEX.search(text)
+        if match:
+            result = match.group(1).strip()
+            if not should_exclude_property(result):
+                return result
+        return None
+
+    def last_mention() -> Optional[str]:
+        # Testo con SUITE/CASA/APPARTAMENTO ma senza "arriverà" o "confermata": si cerca solo
+        # dopo "Tradotto automaticamente" o prima di "Check-in" per evitare timeout
+        search_text = text
+        if "Tradotto automaticamente" in text or "tradotto automaticamente" in text.lower():
+            match_section = TRANSLATION_SECTION_REGEX.search(text)
+            if match_section:
+                search_text = match_section.group(0)
+        elif "Check-in" in text:
+            match_section = BEFORE_CHECK_IN_REGEX.search(text)
+            if match_section:
+                search_text = match_section.group(1)
+
+        # Max 5000 caratteri, gli ultimi (dove probabilmente c'è il property name)
+        if len(search_text) > 5000:
+            search_text = search_text[-5000:]
+
+        # L'ultimo match valido (più in basso nel testo, dopo eventuali messaggi)
+        last_match = None
+        for match in PROPERTY_MENTION_REGEX.finditer(search_text):
+            result = match.group(1).strip()
+            if not should_exclude_property(result) and len(result) > 10 and len(result) < 100:
+                last_match = result
         return last_match
-    
-    return None
+
+    strategies: list[Strategy[str]] = []
+    if soup:
+        strategies += [html_header, html_strong, html_strings]
+    strategies += [
+        after_translation,
+        after_room_link,
+        uppercase_text,
+        last_mention,
+    ]
+    return strategies
+
+
+# Nome ospite: "Prenotazione confermata - Francesco Brufani arriverà il 19 ott"
+GUEST_CONFIRMED_PREFIX_REGEX = re.compile(r"confermata\s*-\s*([A-Z][A-Za-zÀ-ÿ\s\-]+?)\s+arriver", re.IGNORECASE)
+GUEST_BEFORE_ARRIVAL_REGEX = re.compile(r"([A-Za-zÀ-ÿ][A-Za-zÀ-ÿ\s\-']{2,}?)\s+arriverà", re.IGNORECASE)
+GUEST_BANNER_REGEX = re.compile(r"NUOVA PRENOTAZIONE CONFERMATA!\s*([A-Z][A-Z\s\-]+?)\s+ARRIVER", re.IGNORECASE)
+GUEST_SUBJECT_REGEXES = [
+    re.compile(r"prenotazione\s+confermata\s*-\s*([A-Za-zÀ-ÿ][A-Za-zÀ-ÿ\s\-']+?)\s+(?:arriverà|arriver|arriva)", re.IGNORECASE),
+    re.compile(r"nuova\s+prenotazione\s+confermata!\s*([A-Za-zÀ-ÿ][A-Za-zÀ-ÿ\s\-']+?)\s+(?:arriverà|arriver|arriva)", re.IGNORECASE),
+]
+CONFIRMED_PREFIX_REGEX = re.compile(r"^.*?confermata\s*!?\s*", re.IGNORECASE)
+CONFIRMED_DASH_PREFIX_REGEX = re.compile(r"^.*?confermata\s*-\s*", re.IGNORECASE)
+CONFIRMED_BANG_DASH_PREFIX_REGEX = re.compile(r"^.*?confermata\s*!?\s*-\s*", re.IGNORECASE)
+BANNER_PREFIX_REGEX = re.compile(r"^.*?NUOVA PRENOTAZIONE CONFERMATA!\s*", re.IGNORECASE)
+DASH_PREFIX_REGEX = re.compile(r"^.*?-\s*")
 
 
 def extract_guest_name(
     text: str,
-    soup: Optional[BeautifulSoup],
+    fields: Optional[FieldIndex],
     subject: Optional[str] = None,
 ) -> Optional[str]:
     """Estrae il nome dell'ospite dall'email Airbnb."""
-    name = extract_guest_name_from_subject(subject)
-    if name:
-        return name
-    # Pattern 1: Cerca nel subject completo: "Prenotazione confermata - Marie-Thérèse Weber-Gobet arriverà il 12 ott"
-    # Cattura tutto il nome fino a "arriverà", gestendo anche nomi con trattini e spazi
-    match = re.search(r"confermata\s*-\s*([A-Z][A-Za-zÀ-ÿ\s\-]+?)\s+arriver", text, re.IGNORECASE)
-    if match:
-        name = match.group(1).strip()
-        # Rimuovi eventuali prefissi come "NUOVA PRENOTAZIONE CONFERMATA!"
-        name = re.sub(r"^.*?confermata\s*!?\s*", "", name, flags=re.IGNORECASE).strip()
-        if name and len(name) > 2:
-            return name
-    
-    # Pattern 2: Cerca "FRANCESCO" o "Francesco Brufani" prima di "arriverà" (pattern più generico)
-    # Cattura nomi con spazi, trattini, apostrofi - supporta sia maiuscolo che minuscolo
-    match = re.search(r"([A-Za-zÀ-ÿ][A-Za-zÀ-ÿ\s\-']{2,}?)\s+arriverà", text, re.IGNORECASE)
-    if match:
-        name = match.group(1).strip()
-        # Rimuovi prefissi
-        name = re.sub(r"^.*?confermata\s*!?\s*", "", name, flags=re.IGNORECASE).strip()
-        name = re.sub(r"^.*?-\s*", "", name, flags=re.IGNORECASE).strip()
-        # Escludi parole comuni che potrebbero essere catturate per errore
-        exclude_words = ["NUOVA", "PRENOTAZIONE", "CONFERMATA", "Prenotazione", "Confermata"]
-        if name and len(name) > 2 and name.upper() not in exclude_words:
-            return normalize_guest_name(name)
-    
-    # Pattern 3: Cerca "NUOVA PRENOTAZIONE CONFERMATA! MARIE-THÉRÈSE ARRIVERÀ"
-    match = re.search(r"NUOVA PRENOTAZIONE CONFERMATA!\s*([A-Z][A-Z\s\-]+?)\s+ARRIVER", text, re.IGNORECASE)
-    if match:
-        name = match.group(1).strip()
-        if name and len(name) > 2:
-            # Converti tutto maiuscolo in formato title case se possibile
-            return name
-    
-    if soup:
-        # Cerca tag che contengono "arriverà"
-        tags = soup.find_all(string=re.compile(r"arriverà", re.IGNORECASE))
-        for tag in tags:
-            # Estrai il nome prima di "arriverà"
-            parts = tag.split("arriver")
+    return run_strategies(guest_name_strategies(text, fields, subject))
+
+
+def guest_name_strategies(
+    text: str,
+    fields: Optional[FieldIndex],
+    subject: Optional[str],
+) -> list[Strategy[str]]:
+    def confirmed_prefix() -> Optional[str]:
+        # "Prenotazione confermata - Marie-Thérèse Weber-Gobet arriverà il 12 ott": tutto il
+        # nome fino a "arriverà", gestendo anche nomi con trattini e spazi
+        match = GUEST_CONFIRMED_PREFIX_REGEX.search(text)
+        if match:
+            name = match.group(1).strip()
+            # Rimuovi eventuali prefissi come "NUOVA PRENOTAZIONE CONFERMATA!"
+            name = CONFIRMED_PREFIX_REGEX.sub("", name).strip()
+            if name and len(name) > 2:
+                return name
+        return None
+
+    def before_arrival() -> Optional[str]:
+        # "FRANCESCO" o "Francesco Brufani" prima di "arriverà" (pattern più generico):
+        # nomi con spazi, trattini, apostrofi, sia maiuscoli che minuscoli
+        match = GUEST_BEFORE_ARRIVAL_REGEX.search(text)
+        if match:
+            name = match.group(1).strip()
+            # Rimuovi prefissi
+            name = CONFIRMED_PREFIX_REGEX.sub("", name).strip()
+            name = DASH_PREFIX_REGEX.sub("", name).strip()
+            # Escludi parole comuni che potrebbero essere catturate per errore
+            exclude_words = ["NUOVA", "PRENOTAZIONE", "CONFERMATA", "Prenotazione", "Confermata"]
+            if name and len(name) > 2 and name.upper() not in exclude_words:
+                return normalize_guest_name(name)
+        return None
+
+    def new_booking_banner() -> Optional[str]:
+        # "NUOVA PRENOTAZIONE CONFERMATA! MARIE-THÉRÈSE ARRIVERÀ"
+        match = GUEST_BANNER_REGEX.search(text)
+        if match:
+            name = match.group(1).strip()
+            if name and len(name) > 2:
+                return name
+        return None
+
+    def html_lines() -> Optional[str]:
+        # Righe dell'HTML che contengono "arriverà": il nome è la parte prima
+        for line in fields.lines_with("arriverà"):
+            parts = line.split("arriver")
             if parts and parts[0].strip():
                 name = parts[0].strip()
                 # Rimuovi "Prenotazione confermata - " se presente
-                name = re.sub(r"^.*?confermata\s*-\s*", "", name, flags=re.IGNORECASE).strip()
-                name = re.sub(r"^.*?NUOVA PRENOTAZIONE CONFERMATA!\s*", "", name, flags=re.IGNORECASE).strip()
+                name = CONFIRMED_DASH_PREFIX_REGEX.sub("", name).strip()
+                name = BANNER_PREFIX_REGEX.sub("", name).strip()
                 if name and len(name) > 2:
                     return name
-    
-    return None
+        return None
+
+    strategies: list[Strategy[str]] = [
+        lambda: extract_guest_name_from_subject(subject),
+        confirmed_prefix,
+        before_arrival,
+        new_booking_banner,
+    ]
+    if fields:
+        strategies.append(html_lines)
+    return strategies
 
 
 def extract_guest_name_from_subject(subject: Optional[str]) -> Optional[str]:
     """Estrae il nome completo dell'ospite dal subject dell'email."""
     if not subject:
         return None
-    # Pattern per "Prenotazione confermata - Francesco Brufani arriverà il 19 ott"
-    # Cattura tutto il nome fino a "arriverà" (con accento), "arriver" o "arriva"
-    # Usa [A-Za-zÀ-ÿ\s\-'] per catturare nomi con spazi, trattini, apostrofi e accenti
-    patterns = [
-        r"prenotazione\s+confermata\s*-\s*([A-Za-zÀ-ÿ][A-Za-zÀ-ÿ\s\-']+?)\s+(?:arriverà|arriver|arriva)",
-        r"nuova\s+prenotazione\s+confermata!\s*([A-Za-zÀ-ÿ][A-Za-zÀ-ÿ\s\-']+?)\s+(?:arriverà|arriver|arriva)",
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, subject, re.IGNORECASE)
+    # Cattura tutto il nome fino a "arriverà" (con accento), "arriver" o "arriva", con
+    # spazi, trattini, apostrofi e accenti
+    for regex in GUEST_SUBJECT_REGEXES:
+        match = regex.search(subject)
         if match:
             extracted_name = match.group(1).strip()
             # Pulisci eventuali prefissi o suffissi
-            extracted_name = re.sub(r"^.*?confermata\s*!?\s*-\s*", "", extracted_name, flags=re.IGNORECASE).strip()
+            extracted_name = CONFIRMED_BANG_DASH_PREFIX_REGEX.sub("", extracted_name).strip()
             if extracted_name and len(extracted_name) > 1:
                 # Normalizza: se tutto maiuscolo, converti in title case
                 return normalize_guest_name(extracted_name)
@@ -367,273 +424,109 @@ def normalize_guest_name(value: str) -> str:
         return value.title()
     return value
 
-def extract_date(text: str, soup: Optional[BeautifulSoup], labels: list[str]) -> Optional[datetime]:
+WEEKDAY_NAMES = r"(?:LUNED[ÌI]|MARTED[ÌI]|MERCOLED[ÌI]|GIOVED[ÌI]|VENERD[ÌI]|SABATO|DOMENICA)"
+
+
+def extract_date(text: str, fields: Optional[FieldIndex], labels: list[str]) -> Optional[datetime]:
     """Estrae una data dall'email Airbnb (check-in o check-out)."""
-    from datetime import datetime as dt
-    
-    # Pattern per "gio 3 set 2026" o "3 settembre 2026" o "19 ottobre 2026" o "dom 12 ott" (senza anno)
+    return run_strategies(date_strategies(text, fields, labels))
+
+
+def date_strategies(text: str, fields: Optional[FieldIndex], labels: list[str]) -> list[Strategy[datetime]]:
+    """Cascata di strategie per una data, nell'ordine in cui vengono provate.
+
+    Formati gestiti: "gio 3 set 2026", "3 settembre 2026", "19 ottobre 2026",
+    "dom 12 ott" (senza anno), su una riga o con le date sotto le label.
+    """
+    strategies: list[Strategy[datetime]] = []
     for label in labels:
-        # Pattern 1: "Check-in gio 3 set 2026" (stessa riga, CON anno, formato abbreviato)
-        pattern1 = re.compile(rf"{label}.*?([a-z]{{2,3}}\s+\d{{1,2}}\s+[a-z]{{3}}\s+\d{{4}})", re.IGNORECASE | re.DOTALL)
-        match = pattern1.search(text)
-        if match:
-            try:
-                return date_parser.parse(match.group(1), dayfirst=True, fuzzy=True)
-            except (ValueError, OverflowError):
-                pass
-        
-        # Pattern 2: "Check-in 3 settembre 2026" o "19 ottobre 2026" (CON anno, formato completo)
-        # Cerca date complete anche su righe diverse, con più flessibilità
-        # Cerca nelle prime 1000 caratteri dopo il label per evitare match errati
-        label_pos = text.upper().find(label.upper())
-        if label_pos != -1:
-            search_text = text[label_pos:label_pos + 1000]
-            pattern2 = re.compile(rf"{label}.*?(\d{{1,2}}\s+[a-z]{{3,}}\s+\d{{4}})", re.IGNORECASE | re.DOTALL | re.MULTILINE)
-            match = pattern2.search(search_text)
-            if match:
-                try:
-                    date_str = match.group(1).strip()
-                    # Pulisci eventuali caratteri strani rimasti (quoted-printable)
-                    date_str = date_str.replace("=C3=8C", "ì").replace("=C3=AC", "ì")
-                    return date_parser.parse(date_str, dayfirst=True, fuzzy=True)
-                except (ValueError, OverflowError):
-                    pass
-        
-        # Pattern 2b: "LUNEDÌ...19 ottobre 2026" (giorno settimana separato, formato completo)
-        # Cerca pattern come "LUNEDÌ            MERCOLEDÌ\n19 ottobre 2026   21 ottobre 2026"
-        pattern2b = re.compile(rf"{label}.*?(?:LUNED[ÌI]|MARTED[ÌI]|MERCOLED[ÌI]|GIOVED[ÌI]|VENERD[ÌI]|SABATO|DOMENICA).*?\n.*?(\d{{1,2}}\s+[a-z]+\s+\d{{4}})", re.IGNORECASE | re.MULTILINE | re.DOTALL)
-        match = pattern2b.search(text)
-        if match:
-            try:
-                return date_parser.parse(match.group(1), dayfirst=True, fuzzy=True)
-            except (ValueError, OverflowError):
-                pass
-        
-        # Pattern 3: "Check-in" su una riga, data sulla riga successiva (multiline, CON anno)
-        pattern3 = re.compile(rf"{label}.*?\n.*?([a-z]{{2,3}}\s+\d{{1,2}}\s+[a-z]{{3}}\s+\d{{4}})", re.IGNORECASE | re.MULTILINE)
-        match = pattern3.search(text)
-        if match:
-            try:
-                return date_parser.parse(match.group(1), dayfirst=True, fuzzy=True)
-            except (ValueError, OverflowError):
-                pass
-        
-        # Pattern 4: Gestisce il caso "Check-in         Check-out\ngio 3 set 2026   sab 5 set 2026" o "19 ottobre 2026   21 ottobre 2026" (CON anno)
-        # Cerca tutte le date dopo "Check-in" e "Check-out", poi prendi la prima per check-in, la seconda per check-out
-        if label.lower() == "check-in":
-            # Pattern 4a: "Check-in" seguito da "Check-out" e poi due date abbreviate sulla stessa riga
-            pattern4a = re.compile(r"Check-in\s+Check-out.*?\n\s*([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3}\s+\d{4})\s+([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3}\s+\d{4})", re.IGNORECASE | re.MULTILINE | re.DOTALL)
-            match = pattern4a.search(text)
-            if match:
-                try:
-                    # Prendi la prima data (check-in)
-                    return date_parser.parse(match.group(1), dayfirst=True, fuzzy=True)
-                except (ValueError, OverflowError):
-                    pass
-            
-            # Pattern 4b: "Check-in" seguito da "Check-out" e poi due date complete sulla stessa riga (es. "19 ottobre 2026   21 ottobre 2026")
-            # Gestisce anche il caso con giorni settimana prima: "LUNEDÌ MERCOLEDÌ\n19 ottobre 2026   21 ottobre 2026"
-            pattern4b = re.compile(r"Check-in.*?Check-out.*?(?:.*?(?:LUNED[ÌI]|MARTED[ÌI]|MERCOLED[ÌI]|GIOVED[ÌI]|VENERD[ÌI]|SABATO|DOMENICA).*?)?\n.*?(\d{1,2}\s+[a-z]{3,}\s+\d{4})\s+(\d{1,2}\s+[a-z]{3,}\s+\d{4})", re.IGNORECASE | re.MULTILINE | re.DOTALL)
-            match = pattern4b.search(text)
-            if match:
-                try:
-                    # Prendi la prima data (check-in)
-                    date_str = match.group(1).strip()
-                    return date_parser.parse(date_str, dayfirst=True, fuzzy=True)
-                except (ValueError, OverflowError):
-                    pass
-            
-            # Pattern 4c: "Check-in" seguito da "Check-out" e poi due date separate da righe (es. "LUNEDÌ...MERCOLEDÌ\n19 ottobre 2026   21 ottobre 2026")
-            pattern4c = re.compile(r"Check-in.*?Check-out.*?(?:LUNED[ÌI]|MARTED[ÌI]|MERCOLED[ÌI]|GIOVED[ÌI]|VENERD[ÌI]|SABATO|DOMENICA).*?(?:LUNED[ÌI]|MARTED[ÌI]|MERCOLED[ÌI]|GIOVED[ÌI]|VENERD[ÌI]|SABATO|DOMENICA).*?\n.*?(\d{1,2}\s+[a-z]+\s+\d{4})\s+(\d{1,2}\s+[a-z]+\s+\d{4})", re.IGNORECASE | re.MULTILINE | re.DOTALL)
-            match = pattern4c.search(text)
-            if match:
-                try:
-                    # Prendi la prima data (check-in)
-                    return date_parser.parse(match.group(1), dayfirst=True, fuzzy=True)
-                except (ValueError, OverflowError):
-                    pass
-            # Pattern alternativo: "Check-in" e "Check-out" su righe separate
-            pattern4_alt = re.compile(r"Check-in.*?Check-out.*?\n.*?([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3}\s+\d{4})\s+([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3}\s+\d{4})", re.IGNORECASE | re.MULTILINE | re.DOTALL)
-            match = pattern4_alt.search(text)
-            if match:
-                try:
-                    return date_parser.parse(match.group(1), dayfirst=True, fuzzy=True)
-                except (ValueError, OverflowError):
-                    pass
-            # Fallback: cerca "Check-in" e poi la prima data che segue (anche su righe diverse, CON anno)
-            pattern4_fallback = re.compile(r"Check-in.*?([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3}\s+\d{4})", re.IGNORECASE | re.DOTALL)
-            match = pattern4_fallback.search(text)
-            if match:
-                try:
-                    return date_parser.parse(match.group(1), dayfirst=True, fuzzy=True)
-                except (ValueError, OverflowError):
-                    pass
-        elif label.lower() == "check-out":
-            # Pattern 4a: "Check-in" seguito da "Check-out" e poi due date abbreviate sulla stessa riga
-            pattern4a = re.compile(r"Check-in\s+Check-out.*?\n\s*([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3}\s+\d{4})\s+([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3}\s+\d{4})", re.IGNORECASE | re.MULTILINE | re.DOTALL)
-            match = pattern4a.search(text)
-            if match:
-                try:
-                    # Prendi la seconda data (check-out)
-                    return date_parser.parse(match.group(2), dayfirst=True, fuzzy=True)
-                except (ValueError, OverflowError):
-                    pass
-            
-            # Pattern 4b: "Check-in" seguito da "Check-out" e poi due date complete sulla stessa riga
-            # Gestisce anche il caso con giorni settimana prima: "LUNEDÌ MERCOLEDÌ\n19 ottobre 2026   21 ottobre 2026"
-            pattern4b = re.compile(r"Check-in.*?Check-out.*?(?:.*?(?:LUNED[ÌI]|MARTED[ÌI]|MERCOLED[ÌI]|GIOVED[ÌI]|VENERD[ÌI]|SABATO|DOMENICA).*?)?\n.*?(\d{1,2}\s+[a-z]{3,}\s+\d{4})\s+(\d{1,2}\s+[a-z]{3,}\s+\d{4})", re.IGNORECASE | re.MULTILINE | re.DOTALL)
-            match = pattern4b.search(text)
-            if match:
-                try:
-                    # Prendi la seconda data (check-out)
-                    date_str = match.group(2).strip()
-                    return date_parser.parse(date_str, dayfirst=True, fuzzy=True)
-                except (ValueError, OverflowError):
-                    pass
-            
-            # Pattern 4c: "Check-in" seguito da "Check-out" e poi due date separate da righe con giorni settimana
-            pattern4c = re.compile(r"Check-in.*?Check-out.*?(?:LUNED[ÌI]|MARTED[ÌI]|MERCOLED[ÌI]|GIOVED[ÌI]|VENERD[ÌI]|SABATO|DOMENICA).*?(?:LUNED[ÌI]|MARTED[ÌI]|MERCOLED[ÌI]|GIOVED[ÌI]|VENERD[ÌI]|SABATO|DOMENICA).*?\n.*?(\d{1,2}\s+[a-z]+\s+\d{4})\s+(\d{1,2}\s+[a-z]+\s+\d{4})", re.IGNORECASE | re.MULTILINE | re.DOTALL)
-            match = pattern4c.search(text)
-            if match:
-                try:
-                    # Prendi la seconda data (check-out)
-                    return date_parser.parse(match.group(2), dayfirst=True, fuzzy=True)
-                except (ValueError, OverflowError):
-                    pass
-            # Pattern alternativo: "Check-in" e "Check-out" su righe separate
-            pattern4_alt = re.compile(r"Check-in.*?Check-out.*?\n.*?([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3}\s+\d{4})\s+([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3}\s+\d{4})", re.IGNORECASE | re.MULTILINE | re.DOTALL)
-            match = pattern4_alt.search(text)
-            if match:
-                try:
-                    return date_parser.parse(match.group(2), dayfirst=True, fuzzy=True)
-                except (ValueError, OverflowError):
-                    pass
-            # Fallback: cerca "Check-out" e poi la prima data che segue (anche su righe diverse, CON anno)
-            pattern4_fallback = re.compile(r"Check-out.*?([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3}\s+\d{4})", re.IGNORECASE | re.DOTALL)
-            match = pattern4_fallback.search(text)
-            if match:
-                try:
-                    return date_parser.parse(match.group(1), dayfirst=True, fuzzy=True)
-                except (ValueError, OverflowError):
-                    pass
-        
-        # Pattern 5: Gestisce date SENZA anno (es. "dom 12 ott")
-        # Se la data è senza anno, assumiamo l'anno corrente o prossimo se la data è passata
-        if label.lower() == "check-in":
-            # Cerca "Check-in" seguito da "Check-out" e poi due date SENZA anno
-            pattern5 = re.compile(r"Check-in.*?Check-out.*?\n.*?([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3})\s+([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3})", re.IGNORECASE | re.MULTILINE | re.DOTALL)
-            match = pattern5.search(text)
-            if match:
-                try:
-                    date_str = match.group(1)
-                    # Aggiungi l'anno corrente o prossimo
-                    current_year = dt.now().year
-                    # Prova con anno corrente
-                    try:
-                        parsed = date_parser.parse(f"{date_str} {current_year}", dayfirst=True, fuzzy=True)
-                        # Se la data è passata, usa l'anno prossimo
-                        if parsed < dt.now():
-                            parsed = date_parser.parse(f"{date_str} {current_year + 1}", dayfirst=True, fuzzy=True)
-                        return parsed
-                    except (ValueError, OverflowError):
-                        pass
-                except (ValueError, OverflowError):
-                    pass
-            # Fallback: cerca "Check-in" e poi la prima data SENZA anno
-            pattern5_fallback = re.compile(r"Check-in.*?([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3})(?:\s+\d{4})?", re.IGNORECASE | re.DOTALL)
-            match = pattern5_fallback.search(text)
-            if match:
-                try:
-                    date_str = match.group(1)
-                    current_year = dt.now().year
-                    try:
-                        parsed = date_parser.parse(f"{date_str} {current_year}", dayfirst=True, fuzzy=True)
-                        if parsed < dt.now():
-                            parsed = date_parser.parse(f"{date_str} {current_year + 1}", dayfirst=True, fuzzy=True)
-                        return parsed
-                    except (ValueError, OverflowError):
-                        pass
-                except (ValueError, OverflowError):
-                    pass
-        elif label.lower() == "check-out":
-            # Cerca "Check-in" seguito da "Check-out" e poi due date SENZA anno
-            pattern5 = re.compile(r"Check-in.*?Check-out.*?\n.*?([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3})\s+([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3})", re.IGNORECASE | re.MULTILINE | re.DOTALL)
-            match = pattern5.search(text)
-            if match:
-                try:
-                    date_str = match.group(2)  # Seconda data per check-out
-                    current_year = dt.now().year
-                    try:
-                        parsed = date_parser.parse(f"{date_str} {current_year}", dayfirst=True, fuzzy=True)
-                        if parsed < dt.now():
-                            parsed = date_parser.parse(f"{date_str} {current_year + 1}", dayfirst=True, fuzzy=True)
-                        return parsed
-                    except (ValueError, OverflowError):
-                        pass
-                except (ValueError, OverflowError):
-                    pass
-            # Fallback: cerca "Check-out" e poi la prima data SENZA anno
-            pattern5_fallback = re.compile(r"Check-out.*?([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3})(?:\s+\d{4})?", re.IGNORECASE | re.DOTALL)
-            match = pattern5_fallback.search(text)
-            if match:
-                try:
-                    date_str = match.group(1)
-                    current_year = dt.now().year
-                    try:
-                        parsed = date_parser.parse(f"{date_str} {current_year}", dayfirst=True, fuzzy=True)
-                        if parsed < dt.now():
-                            parsed = date_parser.parse(f"{date_str} {current_year + 1}", dayfirst=True, fuzzy=True)
-                        return parsed
-                    except (ValueError, OverflowError):
-                        pass
-                except (ValueError, OverflowError):
-                    pass
-    
-    if soup:
-        # Cerca nelle celle della tabella o span
-        for tag in soup.find_all(["td", "span", "div", "p"]):
-            text_content = tag.get_text()
-            if any(label.lower() in text_content.lower() for label in labels):
-                # Cerca data nel testo
-                match = re.search(r"([a-z]{{2,3}}\s+\d{{1,2}}\s+[a-z]{{3}}\s+\d{{4}}|\d{{1,2}}\s+[a-z]+\s+\d{{4}})", text_content, re.IGNORECASE)
+        strategies.extend(_label_date_strategies(text, label))
+
+    if fields:
+        def html_fields() -> Optional[datetime]:
+            # Valori delle label (celle th/td, elementi adiacenti come <div>Check-in</div><div>gio 3 set 2026</div>)
+            # e righe dell'HTML che contengono la label insieme alla data
+            for candidate in chain(fields.find_all(*labels), fields.lines_with(*labels)):
+                match = HTML_DATE_REGEX.search(candidate)
                 if match:
-                    try:
-                        return date_parser.parse(match.group(1), dayfirst=True, fuzzy=True)
-                    except (ValueError, OverflowError):
-                        continue
-        
-        # Cerca pattern "Check-in" e "Check-out" seguiti da date in elementi HTML separati
-        # Esempio: <div>Check-in</div><div>gio 3 set 2026</div>
-        check_in_elements = soup.find_all(string=re.compile(r"Check-in", re.IGNORECASE))
-        check_out_elements = soup.find_all(string=re.compile(r"Check-out", re.IGNORECASE))
-        
-        for label, elements in [("Check-in", check_in_elements), ("Check-out", check_out_elements)]:
-            if label.lower() not in [l.lower() for l in labels]:
-                continue
-            for elem in elements:
-                # Cerca nel parent o nei sibling
-                parent = elem.parent
-                if parent:
-                    # Cerca nel testo del parent
-                    parent_text = parent.get_text()
-                    match = re.search(r"([a-z]{{2,3}}\s+\d{{1,2}}\s+[a-z]{{3}}\s+\d{{4}}|\d{{1,2}}\s+[a-z]+\s+\d{{4}})", parent_text, re.IGNORECASE)
-                    if match:
-                        try:
-                            return date_parser.parse(match.group(1), dayfirst=True, fuzzy=True)
-                        except (ValueError, OverflowError):
-                            continue
-                    # Cerca nei sibling successivi
-                    next_sibling = parent.find_next_sibling()
-                    if next_sibling:
-                        sibling_text = next_sibling.get_text()
-                        match = re.search(r"([a-z]{{2,3}}\s+\d{{1,2}}\s+[a-z]{{3}}\s+\d{{4}}|\d{{1,2}}\s+[a-z]+\s+\d{{4}})", sibling_text, re.IGNORECASE)
-                        if match:
-                            try:
-                                return date_parser.parse(match.group(1), dayfirst=True, fuzzy=True)
-                            except (ValueError, OverflowError):
-                                continue
-    
-    return None
+                    parsed = _safe_parse_date(match.group(1))
+                    if parsed:
+                        return parsed
+            return None
+
+        strategies.append(html_fields)
+    return strategies
+
+
+def _label_date_strategies(text: str, label: str) -> list[Strategy[datetime]]:
+    def search(pattern: str, flags: int, group: int = 1) -> Optional[datetime]:
+        match = re.search(pattern, text, flags)
+        return _safe_parse_date(match.group(group).strip()) if match else None
+
+    def without_year(pattern: str, flags: int, group: int) -> Optional[datetime]:
+        # Data senza anno: anno corrente, o prossimo se la data è già passata
+        match = re.search(pattern, text, flags)
+        if not match:
+            return None
+        date_str = match.group(group)
+        current_year = datetime.now().year
+        parsed = _safe_parse_date(f"{date_str} {current_year}")
+        if parsed and parsed < datetime.now():
+            parsed = _safe_parse_date(f"{date_str} {current_year + 1}")
+        return parsed
+
+    def full_date_near_label() -> Optional[datetime]:
+        # "Check-in 3 settembre 2026" anche su righe diverse, nei primi 1000 caratteri dopo la label
+        label_pos = text.upper().find(label.upper())
+        if label_pos == -1:
+            return None
+        match = re.search(
+            rf"{label}.*?(\d{{1,2}}\s+[a-z]{{3,}}\s+\d{{4}})",
+            text[label_pos:label_pos + 1000],
+            re.IGNORECASE | re.DOTALL | re.MULTILINE,
+        )
+        if not match:
+            return None
+        # Pulisci eventuali caratteri strani rimasti (quoted-printable)
+        date_str = match.group(1).strip().replace("=C3=8C", "ì").replace("=C3=AC", "ì")
+        return _safe_parse_date(date_str)
+
+    key = label.lower()
+    strategies: list[Strategy[datetime]] = []
+    if key in ("check-in", "check-out"):
+        # "Check-in         Check-out\ngio 3 set 2026   sab 5 set 2026": prima data per il
+        # check-in, seconda per il check-out. Vanno provate prima delle strategie a label
+        # singola: "Check-out.*?data" prenderebbe la prima data dopo le label, il check-in
+        group = 1 if key == "check-in" else 2
+        strategies += [
+            lambda: search(r"Check-in\s+Check-out.*?\n\s*([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3}\s+\d{4})\s+([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3}\s+\d{4})", re.IGNORECASE | re.MULTILINE | re.DOTALL, group),
+            # "19 ottobre 2026   21 ottobre 2026", eventualmente sotto "LUNEDÌ MERCOLEDÌ"
+            lambda: search(rf"Check-in.*?Check-out.*?(?:.*?{WEEKDAY_NAMES}.*?)?\n.*?(\d{{1,2}}\s+[a-z]{{3,}}\s+\d{{4}})\s+(\d{{1,2}}\s+[a-z]{{3,}}\s+\d{{4}})", re.IGNORECASE | re.MULTILINE | re.DOTALL, group),
+            lambda: search(rf"Check-in.*?Check-out.*?{WEEKDAY_NAMES}.*?{WEEKDAY_NAMES}.*?\n.*?(\d{{1,2}}\s+[a-z]+\s+\d{{4}})\s+(\d{{1,2}}\s+[a-z]+\s+\d{{4}})", re.IGNORECASE | re.MULTILINE | re.DOTALL, group),
+            lambda: search(r"Check-in.*?Check-out.*?\n.*?([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3}\s+\d{4})\s+([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3}\s+\d{4})", re.IGNORECASE | re.MULTILINE | re.DOTALL, group),
+        ]
+    strategies += [
+        # "Check-in gio 3 set 2026" (stessa riga, CON anno, formato abbreviato)
+        lambda: search(rf"{label}.*?([a-z]{{2,3}}\s+\d{{1,2}}\s+[a-z]{{3}}\s+\d{{4}})", re.IGNORECASE | re.DOTALL),
+        full_date_near_label,
+        # "LUNEDÌ...19 ottobre 2026" (giorno settimana separato, formato completo)
+        lambda: search(rf"{label}.*?{WEEKDAY_NAMES}.*?\n.*?(\d{{1,2}}\s+[a-z]+\s+\d{{4}})", re.IGNORECASE | re.MULTILINE | re.DOTALL),
+        # "Check-in" su una riga, data sulla riga successiva
+        lambda: search(rf"{label}.*?\n.*?([a-z]{{2,3}}\s+\d{{1,2}}\s+[a-z]{{3}}\s+\d{{4}})", re.IGNORECASE | re.MULTILINE),
+    ]
+
+    if key in ("check-in", "check-out"):
+        strategies += [
+            # Date SENZA anno (es. "dom 12 ott")
+            lambda: without_year(r"Check-in.*?Check-out.*?\n.*?([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3})\s+([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3})", re.IGNORECASE | re.MULTILINE | re.DOTALL, group),
+            lambda: without_year(rf"{label}.*?([a-z]{{2,3}}\s+\d{{1,2}}\s+[a-z]{{3}})(?:\s+\d{{4}})?", re.IGNORECASE | re.DOTALL, 1),
+        ]
+    return strategies
+
+HTML_DATE_REGEX = re.compile(
+    r"([a-z]{2,3}\s+\d{1,2}\s+[a-z]{3}\s+\d{4}|\d{1,2}\s+[a-z]+\s+\d{4})",
+    re.IGNORECASE,
+)
 
 CALENDAR_PAIR_REGEX = re.compile(
     r"((?:lun|mar|mer|gio|ven|sab|dom)\s+\d{1,2}\s+[a-z\u00e0]{3,9}\s+\d{4}).{0,120}?((?:lun|mar|mer|gio|ven|sab|dom)\s+\d{1,2}\s+[a-z\u00e0]{3,9}\s+\d{4})",
@@ -641,11 +534,11 @@ CALENDAR_PAIR_REGEX = re.compile(
 )
 
 
-def extract_calendar_dates(text: str, soup: Optional[BeautifulSoup]) -> tuple[Optional[datetime], Optional[datetime]]:
+def extract_calendar_dates(text: str, fields: Optional[FieldIndex]) -> tuple[Optional[datetime], Optional[datetime]]:
     """Estrae coppia di date consecutive (check-in/check-out) anche senza label."""
     sources = [text]
-    if soup:
-        sources.append(soup.get_text(" "))
+    if fields:
+        sources.append(fields.text)
 
     for source in sources:
         if not source:
@@ -663,59 +556,88 @@ def extract_calendar_dates(text: str, soup: Optional[BeautifulSoup]) -> tuple[Op
 
 def _safe_parse_date(value: str) -> Optional[datetime]:
     try:
-        return date_parser.parse(value, dayfirst=True, fuzzy=True)
+        return parse_date(value, dayfirst=True, fuzzy=True)
     except (ValueError, OverflowError):
         return None
 
 
 
-def extract_guests(text: str, soup: Optional[BeautifulSoup]) -> Optional[int]:
-    match = re.search(r"(\d+)\s+adulti", text, re.IGNORECASE)
+ADULTS_REGEX = re.compile(r"(\d+)\s+adulti", re.IGNORECASE)
+
+# Importi: "TOTALE (EUR) 318,00 €" o "TOTALE 318,00 €"
+TOTAL_EUR_REGEX = re.compile(r"TOTALE.*?\(?EUR\)?\s*([0-9\.,]+)\s*€", re.IGNORECASE)
+TOTAL_REGEX = re.compile(r"TOTALE.*?([0-9\.,]+)\s*€", re.IGNORECASE)
+EUR_AMOUNT_REGEX = re.compile(r"\(?EUR\)?\s*([0-9\.,]+)\s*€", re.IGNORECASE)
+AMOUNT_REGEX = re.compile(r"([0-9\.,]+)\s*€")
+
+
+def extract_guests(text: str, fields: Optional[FieldIndex]) -> Optional[int]:
+    match = ADULTS_REGEX.search(text)
     if match:
         return int(match.group(1))
-    if soup:
-        tag = soup.find(string=re.compile(r"ospiti", re.IGNORECASE))
-        if tag:
-            match = re.search(r"(\d+)", tag)
+    if fields:
+        # Valore della label "Ospiti" (celle/elementi separati) o riga "N ospiti"
+        value = fields.find("ospiti") or next(fields.lines_with("ospiti"), None)
+        if value:
+            match = DIGITS_REGEX.search(value)
             if match:
-                return int(match.group(1))
+                return int(match.group(0))
     return None
 
 
-def extract_amount(text: str, soup: Optional[BeautifulSoup]) -> tuple[Optional[float], Optional[str]]:
+def extract_amount(
+    text: str,
+    fields: Optional[FieldIndex],
+) -> tuple[Optional[float], Optional[str]]:
     """Estrae l'importo totale dall'email Airbnb."""
-    # Pattern per "TOTALE (EUR) 318,00 €" o "TOTALE 318,00 €"
-    match = re.search(r"TOTALE.*?\(?EUR\)?\s*([0-9\.,]+)\s*€", text, re.IGNORECASE)
-    if match:
-        value = match.group(1).replace(".", "").replace(",", ".")
-        try:
-            return float(value), "EUR"
-        except ValueError:
-            pass
-    
-    # Pattern alternativo senza EUR
-    match = re.search(r"TOTALE.*?([0-9\.,]+)\s*€", text, re.IGNORECASE)
-    if match:
-        value = match.group(1).replace(".", "").replace(",", ".")
-        try:
-            return float(value), "EUR"
-        except ValueError:
-            pass
-    
-    if soup:
-        # Cerca nel testo HTML
-        tag = soup.find(string=re.compile(r"TOTALE", re.IGNORECASE))
-        if tag:
-            match = re.search(r"\(?EUR\)?\s*([0-9\.,]+)\s*€", tag, re.IGNORECASE)
-            if not match:
-                match = re.search(r"([0-9\.,]+)\s*€", tag)
-            if match:
-                value = match.group(1).replace(".", "").replace(",", ".")
-                try:
-                    return float(value), "EUR"
-                except ValueError:
-                    pass
-    return None, None
+    amount = run_strategies(amount_strategies(text, fields))
+    return (amount, "EUR") if amount is not None else (None, None)
+
+
+def amount_strategies(text: str, fields: Optional[FieldIndex]) -> list[Strategy[float]]:
+    def search(pattern: re.Pattern[str], source: str) -> Optional[float]:
+        match = pattern.search(source)
+        if match:
+            value = match.group(1).replace(".", "").replace(",", ".")
+            try:
+                return float(value)
+            except ValueError:
+                pass
+        return None
+
+    def html_total() -> Optional[float]:
+        # Riga "TOTALE (EUR) 318,00 €" o valore della label "Totale"
+        tag = next(fields.lines_with("TOTALE"), None)
+        value = fields.find("totale")
+        if tag and value and not DIGITS_REGEX.search(tag):
+            tag = value
+        if not tag:
+            return None
+        return search(EUR_AMOUNT_REGEX, tag) or search(AMOUNT_REGEX, tag)
+
+    strategies: list[Strategy[float]] = [
+        # "TOTALE (EUR) 318,00 €" o "TOTALE 318,00 €"
+        lambda: search(TOTAL_EUR_REGEX, text),
+        # Pattern alternativo senza EUR
+        lambda: search(TOTAL_REGEX, text),
+    ]
+    if fields:
+        strategies.append(html_total)
+    return strategies
+
+
+# Messaggio del guest prima del link alla room: inizia con "Ciao", "Hallo" o frasi tipiche
+_MESSAGE_END = r"(?=Tradotto automaticamente|Invia un Messaggio|https://|Check-in|$)"
+GUEST_MESSAGE_REGEXES = [
+    re.compile(rf"(Ciao\s+[^\n]+(?:\n[^\n]+)*?){_MESSAGE_END}", re.IGNORECASE | re.DOTALL),
+    re.compile(rf"(Hallo\s+[^\n]+(?:\n[^\n]+)*?){_MESSAGE_END}", re.IGNORECASE | re.DOTALL),
+    re.compile(rf"((?:Siamo|Desideriamo|Viaggiamo|Non vediamo l'ora)[^\n]+(?:\n[^\n]+)*?){_MESSAGE_END}", re.IGNORECASE | re.DOTALL),
+]
+MESSAGE_BEFORE_TRANSLATION_REGEX = re.compile(r"^(.+?)(?=Tradotto automaticamente)", re.IGNORECASE | re.DOTALL)
+GREETING_PREFIX_REGEX = re.compile(r"^(Ciao|Hallo)\s+", re.IGNORECASE)
+CLOSING_SUFFIX_REGEX = re.compile(r"\s+(Non vediamo l\'ora|Vi salutiamo|Cordiali saluti).*$", re.IGNORECASE)
+MESSAGE_HEADER_REGEX = re.compile(r"^(NUOVA PRENOTAZIONE CONFERMATA!|Invia un messaggio).*?\n", re.IGNORECASE)
+URL_REGEX = re.compile(r"https?://[^\s]+")
 
 
 def extract_guest_message_from_confirmation(text: str, soup: Optional[BeautifulSoup], guest_name: Optional[str]) -> Optional[str]:
@@ -724,7 +646,7 @@ def extract_guest_message_from_confirmation(text: str, soup: Optional[BeautifulS
     # Pattern: cerca testo tra il nome guest e il link "https://www.airbnb.it/rooms/..."
     
     # Cerca il link alla room
-    room_link_match = re.search(r"https://www\.airbnb\.it/rooms/[^\s]+", text, re.IGNORECASE)
+    room_link_match = ROOM_LINK_REGEX.search(text)
     if not room_link_match:
         return None
     
@@ -733,75 +655,62 @@ def extract_guest_message_from_confirmation(text: str, soup: Optional[BeautifulS
     
     # Cerca pattern di messaggio del guest
     # Pattern 1: Messaggio che inizia con "Ciao" o simile
-    message_patterns = [
-        r"(Ciao\s+[^\n]+(?:\n[^\n]+)*?)(?=Tradotto automaticamente|Invia un Messaggio|https://|Check-in|$)",
-        r"(Hallo\s+[^\n]+(?:\n[^\n]+)*?)(?=Tradotto automaticamente|Invia un Messaggio|https://|Check-in|$)",
-        r"((?:Siamo|Desideriamo|Viaggiamo|Non vediamo l'ora)[^\n]+(?:\n[^\n]+)*?)(?=Tradotto automaticamente|Invia un Messaggio|https://|Check-in|$)",
-    ]
-    
-    for pattern in message_patterns:
-        match = re.search(pattern, text_before_room_link, re.IGNORECASE | re.DOTALL)
+    for regex in GUEST_MESSAGE_REGEXES:
+        match = regex.search(text_before_room_link)
         if match:
             message = match.group(1).strip()
             # Pulisci il messaggio: rimuovi spazi multipli e caratteri speciali
-            message = re.sub(r'\s+', ' ', message)
+            message = WHITESPACE_REGEX.sub(' ', message)
             # Rimuovi prefissi comuni
-            message = re.sub(r'^(Ciao|Hallo)\s+', '', message, flags=re.IGNORECASE)
+            message = GREETING_PREFIX_REGEX.sub('', message)
             # Rimuovi suffissi comuni
-            message = re.sub(r'\s+(Non vediamo l\'ora|Vi salutiamo|Cordiali saluti).*$', '', message, flags=re.IGNORECASE)
+            message = CLOSING_SUFFIX_REGEX.sub('', message)
             if len(message) > 20:  # Solo se il messaggio è abbastanza lungo
                 return message
     
     # Pattern 2: Se c'è "Tradotto automaticamente", il messaggio è prima
     if "Tradotto automaticamente" in text_before_room_link:
         # Cerca il testo tra l'inizio e "Tradotto automaticamente"
-        match = re.search(r"^(.+?)(?=Tradotto automaticamente)", text_before_room_link, re.IGNORECASE | re.DOTALL)
+        match = MESSAGE_BEFORE_TRANSLATION_REGEX.search(text_before_room_link)
         if match:
             message = match.group(1).strip()
             # Rimuovi header comuni
-            message = re.sub(r'^(NUOVA PRENOTAZIONE CONFERMATA!|Invia un messaggio).*?\n', '', message, flags=re.IGNORECASE)
+            message = MESSAGE_HEADER_REGEX.sub('', message)
             # Rimuovi link e URL
-            message = re.sub(r'https?://[^\s]+', '', message)
-            message = re.sub(r'\s+', ' ', message).strip()
+            message = URL_REGEX.sub('', message)
+            message = WHITESPACE_REGEX.sub(' ', message).strip()
             if len(message) > 20:
                 return message
     
     return None
 
 
+# Artefatti quoted-printable sostituiti in un solo passaggio sul testo
+QP_ARTIFACTS = MultiReplace({
+    # Caratteri accentati comuni (UTF-8 quoted-printable): LUNED=C3=8C -> LUNEDÌ
+    "=C3=8C": "Ì",  # I maiuscola con accento grave
+    "=C3=AC": "ì",  # i minuscola con accento grave
+    "=C3=A0": "à",  # a minuscola con accento grave
+    "=C3=A8": "è",  # e minuscola con accento grave
+    "=C3=B9": "ù",  # u minuscola con accento grave
+    "=C3=B2": "ò",  # o minuscola con accento grave
+    "=C3=A9": "é",  # e minuscola con accento acuto
+    # Spazi speciali (=20, =C2=A0, spazio stretto) -> spazio normale
+    "=20": " ",
+    "=C2=A0": " ",
+    "=E2=80=AF": " ",
+})
+MULTIPLE_SPACES_REGEX = re.compile(r"[ \t]{2,}")
+
+
 def normalize_airbnb_text(value: str) -> str:
     """Rimuove artefatti quoted-printable e normalizza spazi per i testi Airbnb."""
     if not value:
         return value
-    # Rimuovi soft break di quoted-printable
+    # Rimuovi soft break di quoted-printable (prima delle sostituzioni: possono spezzare un artefatto)
     cleaned = value.replace("=\n", "")
-    # Decodifica caratteri accentati comuni (UTF-8 quoted-printable)
-    # LUNED=C3=8C -> LUNEDÌ, MERCOLED=C3=8C -> MERCOLEDÌ, etc.
-    accent_mappings = {
-        "=C3=8C": "Ì",  # I maiuscola con accento grave
-        "=C3=AC": "ì",  # i minuscola con accento grave
-        "=C3=A0": "à",  # a minuscola con accento grave
-        "=C3=A8": "è",  # e minuscola con accento grave
-        "=C3=B9": "ù",  # u minuscola con accento grave
-        "=C3=B2": "ò",  # o minuscola con accento grave
-        "=C3=A9": "é",  # e minuscola con accento acuto
-    }
-    for encoded, decoded in accent_mappings.items():
-        cleaned = cleaned.replace(encoded, decoded)
-    # Sostituisci caratteri speciali comuni (=20, =C2=A0) con spazi normali
-    artifacts = ["=20", "=C2=A0", "=E2=80=AF"]
-    for artifact in artifacts:
-        cleaned = cleaned.replace(artifact, " ")
+    if "=" in cleaned:
+        cleaned = QP_ARTIFACTS(cleaned)
     # Normalizza sequenze multiple di spazi lasciando le newline intatte
-    cleaned = re.sub(r"[ \t]{2,}", " ", cleaned)
+    cleaned = MULTIPLE_SPACES_REGEX.sub(" ", cleaned)
     return cleaned
-
-
-def parse_date_header(value: Optional[str]) -> Optional[datetime]:
-    if not value:
-        return None
-    try:
-        return date_parser.parse(value)
-    except (ValueError, OverflowError):
-        return None
-
@@ -1,17 +1,18 @@
 from __future__ import annotations
 
 import re
-from datetime import datetime
 from typing import Optional
 
 from bs4 import BeautifulSoup
-from dateutil import parser as date_parser
 
 from ..models import GuestMessageInfo, ParsedEmail, ParsedEmailMetadata
-from .base import EmailContent, EmailParser, is_airbnb_sender
+from .base import AIRBNB_SENDER_DOMAINS, EmailContent, EmailParser, is_airbnb_sender
+from .dates import parse_date_header
 
 
 class AirbnbMessageParser(EmailParser):
+    KIND = "airbnb_message"
+    SENDER_DOMAINS = AIRBNB_SENDER_DOMAINS
     THREAD_REGEX = re.compile(r"/hosting/thread/(\d+)", re.IGNORECASE)
 
     def matches(self, content: EmailContent) -> bool:
@@ -31,8 +32,7 @@ class AirbnbMessageParser(EmailParser):
         received = parse_date_header(content.message.get("Date"))
 
         text = content.text or ""
-        html = content.html or ""
-        soup = BeautifulSoup(html, "html.parser") if html else None
+        soup = content.soup
 
         reservation_id = extract_reservation_id(text, soup)
         message = extract_message_body(text, soup)
@@ -49,7 +49,7 @@ class AirbnbMessageParser(EmailParser):
         )
 
         return ParsedEmail(
-            kind="airbnb_message",
+            kind=self.KIND,
             guestMessage=guest_message,
             metadata=ParsedEmailMetadata(
                 subject=subject,
@@ -62,21 +62,29 @@ class AirbnbMessageParser(EmailParser):
         )
 
 
+RESERVATION_ID_REGEX = re.compile(r"Prenotazione.*?([A-Z0-9]{5,})")
+RESERVATION_LABEL_REGEX = re.compile(r"Prenotazione", re.IGNORECASE)
+CODE_REGEX = re.compile(r"([A-Z0-9]{5,})")
+MESSAGE_BODY_REGEX = re.compile(r"Gentile.+?Grazie\.", re.IGNORECASE)
+SENDER_NAME_REGEX = re.compile(r"Da:\s*([A-Za-z\s]+)")
+GREETING_REGEX = re.compile(r"Gentile", re.IGNORECASE)
+
+
 def extract_reservation_id(text: str, soup: Optional[BeautifulSoup]) -> Optional[str]:
-    match = re.search(r"Prenotazione.*?([A-Z0-9]{5,})", text)
+    match = RESERVATION_ID_REGEX.search(text)
     if match:
         return match.group(1)
     if soup:
-        tag = soup.find(string=re.compile(r"Prenotazione", re.IGNORECASE))
+        tag = soup.find(string=RESERVATION_LABEL_REGEX)
         if tag:
-            match = re.search(r"([A-Z0-9]{5,})", tag)
+            match = CODE_REGEX.search(tag)
             if match:
                 return match.group(1)
     return None
 
 
 def extract_message_body(text: str, soup: Optional[BeautifulSoup]) -> Optional[str]:
-    match = re.search(r"Gentile.+?Grazie\.", text, re.IGNORECASE)
+    match = MESSAGE_BODY_REGEX.search(text)
     if match:
         return match.group(0).strip()
     if soup:
@@ -88,11 +96,11 @@ def extract_message_body(text: str, soup: Optional[BeautifulSoup]) -> Optional[s
 
 
 def extract_guest_name(text: str, soup: Optional[BeautifulSoup]) -> Optional[str]:
-    match = re.search(r"Da:\s*([A-Za-z\s]+)", text)
+    match = SENDER_NAME_REGEX.search(text)
     if match:
         return match.group(1).strip()
     if soup:
-        tag = soup.find(string=re.compile(r"Gentile", re.IGNORECASE))
+        tag = soup.find(string=GREETING_REGEX)
         if tag:
             return tag.split(",")[0].replace("Gentile", "").strip()
     return None
@@ -105,13 +113,3 @@ def extract_thread_id(text: str, soup: Optional[BeautifulSoup]) -> Optional[str]
             if match:
                 return match.group(1)
     return None
-
-
-def parse_date_header(value: Optional[str]) -> Optional[datetime]:
-    if not value:
-        return None
-    try:
-        return date_parser.parse(value)
-    except (ValueError, OverflowError):
-        return None
-
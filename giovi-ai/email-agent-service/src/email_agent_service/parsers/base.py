@@ -1,22 +1,106 @@
 from __future__ import annotations
 
-import re
-from dataclasses import dataclass
-from email.message import EmailMessage
+from email.message import Message
 from email.utils import parseaddr
-from typing import Optional
+from functools import cached_property
+from typing import Callable, Optional
+
+from bs4 import BeautifulSoup
 
 from ..models import ParsedEmail
+from .field_index import FieldIndex
+from .html_backend import AUTO_BACKEND, build_soup
+from .mime import DEFAULT_MAX_PART_BYTES, MessageBodies, extract_bodies
+from .patterns import WHITESPACE_REGEX
+
+AIRBNB_SENDER_DOMAINS: tuple[str, ...] = (
+    "airbnb.com",
+    "reply.airbnb.com",
+)
+BOOKING_SENDER_DOMAINS: tuple[str, ...] = (
+    "mchat.booking.com",
+    "guest.booking.com",  # Nuovo formato email Booking
+    "reply.booking.com",
+    "scidoo.com",
+)
+SCIDOO_SENDER_DOMAINS: tuple[str, ...] = ("scidoo.com",)
+
+
+_LAZY = object()
 
 
-@dataclass
 class EmailContent:
-    message: EmailMessage
-    text: Optional[str]
-    html: Optional[str]
+    """Contenuto di un'email condiviso da matches() e dagli estrattori.
+
+    Testo, HTML, testo normalizzato e DOM vengono calcolati solo al primo accesso e poi
+    memorizzati, così ogni messaggio paga al massimo una decodifica MIME per parte e una
+    sola costruzione del BeautifulSoup. `text` e `html` possono essere passati già decodificati;
+    `html_backend` sceglie il tree builder del DOM (vedi `html_backend.py`).
+    """
+
+    def __init__(
+        self,
+        message: Message,
+        text: Optional[str] = _LAZY,
+        html: Optional[str] = _LAZY,
+        *,
+        max_part_bytes: int = DEFAULT_MAX_PART_BYTES,
+        html_backend: Optional[str] = AUTO_BACKEND,
+    ):
+        self.message = message
+        self._max_part_bytes = max_part_bytes
+        self._html_backend = html_backend
+        # cached_property non definisce __set__: i valori espliciti prendono il posto del calcolo lazy
+        if text is not _LAZY:
+            self.text = text
+        if html is not _LAZY:
+            self.html = html
+        self._normalized: dict[Callable[[str], str], str] = {}
+
+    @cached_property
+    def _bodies(self) -> MessageBodies:
+        # Una sola visita dell'albero MIME per text/plain e text/html
+        return extract_bodies(self.message, self._max_part_bytes)
+
+    @cached_property
+    def text(self) -> Optional[str]:
+        return self._bodies.text
+
+    @cached_property
+    def html(self) -> Optional[str]:
+        return self._bodies.html
+
+    @cached_property
+    def normalized_text(self) -> str:
+        """Testo (o HTML se manca il testo) ripulito dagli artefatti quoted-printable comuni."""
+        return normalize_text(self.text or self.html or "")
+
+    @cached_property
+    def soup(self) -> Optional[BeautifulSoup]:
+        """DOM dell'HTML, costruito una volta sola e condiviso fra gli estrattori."""
+        return build_soup(self.html, self._html_backend) if self.html else None
+
+    @cached_property
+    def field_index(self) -> Optional[FieldIndex]:
+        """Indice label → valori dell'HTML, costruito con una sola visita del DOM."""
+        return FieldIndex.from_soup(self.soup) if self.soup is not None else None
+
+    def normalized(self, normalizer: Callable[[str], str]) -> str:
+        """Applica al testo una normalizzazione specifica del parser, memorizzandone il risultato."""
+        if normalizer not in self._normalized:
+            self._normalized[normalizer] = normalizer(self.text or "")
+        return self._normalized[normalizer]
 
 
 class EmailParser:
+    # Domini mittente e prefissi subject gestiti dal parser: l'engine li usa per costruire
+    # l'indice di dispatch sugli header. SENDER_DOMAINS vuoto = il parser viene provato
+    # su qualsiasi mittente; SUBJECT_PREFIXES vuoto = nessun filtro sul subject.
+    SENDER_DOMAINS: tuple[str, ...] = ()
+    SUBJECT_PREFIXES: tuple[str, ...] = ()
+    # `kind` dei ParsedEmail prodotti: permette all'engine di classificare senza estrarre
+    KIND: str = ""
+
     def matches(self, content: EmailContent) -> bool:  # pragma: no cover - interface
         raise NotImplementedError
 
@@ -27,7 +111,24 @@ class EmailParser:
     def _clean_text(text: Optional[str]) -> Optional[str]:
         if text is None:
             return None
-        return re.sub(r"\s+", " ", text).strip()
+        return WHITESPACE_REGEX.sub(" ", text).strip()
+
+
+def normalize_text(text: str) -> str:
+    text = text.replace("=09", " ").replace("=20", " ")
+    text = text.replace("\r\n", "\n")
+    return text
+
+
+def sender_domain(address: Optional[str]) -> Optional[str]:
+    """Restituisce il dominio (lowercase) dell'indirizzo mittente, se presente."""
+    if not address:
+        return None
+    _, email_address = parseaddr(address)
+    email_address = email_address or address
+    if "@" not in email_address:
+        return None
+    return email_address.rsplit("@", 1)[1].strip().strip(">").lower() or None
 
 
 def is_booking_sender(address: Optional[str]) -> bool:
@@ -35,15 +136,7 @@ def is_booking_sender(address: Optional[str]) -> bool:
         return False
     _, email_address = parseaddr(address)
     address = email_address or address
-    return any(
-        domain in address.lower()
-        for domain in [
-            "@mchat.booking.com",
-            "@guest.booking.com",  # Nuovo formato email Booking
-            "@reply.booking.com",
-            "@scidoo.com",
-        ]
-    )
+    return any(f"@{domain}" in address.lower() for domain in BOOKING_SENDER_DOMAINS)
 
 
 def is_airbnb_sender(address: Optional[str]) -> bool:
@@ -51,11 +144,5 @@ def is_airbnb_sender(address: Optional[str]) -> bool:
         return False
     _, email_address = parseaddr(address)
     address = email_address or address
-    return any(
-        address.lower().endswith(domain)
-        for domain in [
-            "@airbnb.com",
-            "@reply.airbnb.com",
-        ]
-    )
+    return any(address.lower().endswith(f"@{domain}") for domain in AIRBNB_SENDER_DOMAINS)
 
@@ -4,16 +4,32 @@ import re
 from datetime import datetime
 from typing import Optional
 
-from dateutil import parser as date_parser
-
 from ..models import ParsedEmail, ParsedEmailMetadata, ReservationInfo
-from .base import EmailContent, EmailParser, is_booking_sender
+from .base import BOOKING_SENDER_DOMAINS, EmailContent, EmailParser, is_booking_sender, normalize_text  # noqa: F401
+from .dates import parse_date, parse_date_header
+from .patterns import EMAIL_REGEX, NON_PHONE_CHARS_REGEX, PHONE_REGEX, LabelPattern
 
 BOOKING_CONFIRM_SUBJECT_RE = re.compile(r"prenotazione id\s*(\d+)", re.IGNORECASE)
 BOOKING_ID_BODY_RE = re.compile(r"(?:ID\s+Voucher|Numero di conferma)\s*[:=]\s*(\d+)", re.IGNORECASE)
 
+# Formati dei valori dopo "Label:" / "Label="
+FIELD_VALUE = r"([^\n\r]+)"
+DATE_VALUE = r"([0-9]{1,2}/[0-9]{1,2}/[0-9]{2,4})"
+INT_VALUE = r"([0-9]+)"
+AMOUNT_VALUE = r"([0-9\.,]+)\s*([A-Z€]*)"
+
+PROPERTY_NAME_LABELS = LabelPattern(["Struttura Richiesta", "Nome struttura"], FIELD_VALUE)
+GUEST_NAME_LABELS = LabelPattern(["Nome Ospite", "Ospite"], FIELD_VALUE)
+CHECK_IN_LABELS = LabelPattern(["Data di Check-in", "Check-in"], DATE_VALUE)
+CHECK_OUT_LABELS = LabelPattern(["Data di Check-out", "Check-out"], DATE_VALUE)
+ADULTS_LABELS = LabelPattern(["Ospiti", "Adulti"], INT_VALUE)
+TOTAL_LABELS = LabelPattern(["Totale Prenotazione", "Totale (EUR)", "TU GUADAGNI"], AMOUNT_VALUE)
+
 
 class BookingConfirmationParser(EmailParser):
+    KIND = "booking_confirmation"
+    SENDER_DOMAINS = BOOKING_SENDER_DOMAINS
+
     def matches(self, content: EmailContent) -> bool:
         sender = content.message.get("From")
         subject = content.message.get("Subject", "")
@@ -25,16 +41,16 @@ class BookingConfirmationParser(EmailParser):
         recipients = content.message.get_all("To")
         received = parse_date_header(content.message.get("Date"))
 
-        text = normalize_text(content.text or content.html or "")
+        text = content.normalized_text
         reservation_id = extract_reservation_id(subject, text)
-        property_name = extract_field(text, ["Struttura Richiesta", "Nome struttura"])
-        guest_name = extract_field(text, ["Nome Ospite", "Ospite"])
+        property_name = extract_field(text, PROPERTY_NAME_LABELS)
+        guest_name = extract_field(text, GUEST_NAME_LABELS)
         guest_email = extract_email(text)
         guest_phone = extract_phone(text)
-        check_in = extract_date(text, ["Data di Check-in", "Check-in"])
-        check_out = extract_date(text, ["Data di Check-out", "Check-out"])
-        adults = extract_int(text, ["Ospiti", "Adulti"])
-        total_amount, currency = extract_amount(text, ["Totale Prenotazione", "Totale (EUR)", "TU GUADAGNI"])
+        check_in = extract_date(text, CHECK_IN_LABELS)
+        check_out = extract_date(text, CHECK_OUT_LABELS)
+        adults = extract_int(text, ADULTS_LABELS)
+        total_amount, currency = extract_amount(text, TOTAL_LABELS)
 
         reservation = ReservationInfo(
             reservationId=reservation_id or "unknown",
@@ -51,7 +67,7 @@ class BookingConfirmationParser(EmailParser):
         )
 
         return ParsedEmail(
-            kind="booking_confirmation",
+            kind=self.KIND,
             reservation=reservation,
             metadata=ParsedEmailMetadata(
                 subject=subject,
@@ -64,12 +80,6 @@ class BookingConfirmationParser(EmailParser):
         )
 
 
-def normalize_text(text: str) -> str:
-    text = text.replace("=09", " ").replace("=20", " ")
-    text = text.replace("\r\n", "\n")
-    return text
-
-
 def extract_reservation_id(subject: Optional[str], text: str) -> Optional[str]:
     if subject:
         match = BOOKING_CONFIRM_SUBJECT_RE.search(subject)
@@ -81,74 +91,52 @@ def extract_reservation_id(subject: Optional[str], text: str) -> Optional[str]:
     return None
 
 
-def extract_field(text: str, labels: list[str]) -> Optional[str]:
-    for label in labels:
-        pattern = re.compile(rf"{re.escape(label)}\s*[:=]\s*([^\n\r]+)", re.IGNORECASE)
-        match = pattern.search(text)
-        if match:
-            value = match.group(1).strip()
-            if value:
-                return value.split("\n")[0].strip()
+def extract_field(text: str, labels: LabelPattern) -> Optional[str]:
+    for match in labels.matches(text):
+        value = match.group(1).strip()
+        if value:
+            return value.split("\n")[0].strip()
     return None
 
 
 def extract_email(text: str) -> Optional[str]:
-    match = re.search(r"[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}", text, re.IGNORECASE)
+    match = EMAIL_REGEX.search(text)
     if match:
         return match.group(0).lower()
     return None
 
 
 def extract_phone(text: str) -> Optional[str]:
-    match = re.search(r"\+?\d[\d\s\-]{6,}", text)
+    match = PHONE_REGEX.search(text)
     if match:
-        return re.sub(r"[^\d+]", "", match.group(0))
+        return NON_PHONE_CHARS_REGEX.sub("", match.group(0))
     return None
 
 
-def extract_date(text: str, labels: list[str]) -> Optional[datetime]:
-    for label in labels:
-        pattern = re.compile(rf"{re.escape(label)}\s*[:=]\s*([0-9]{1,2}/[0-9]{1,2}/[0-9]{2,4})", re.IGNORECASE)
-        match = pattern.search(text)
-        if match:
-            try:
-                return date_parser.parse(match.group(1), dayfirst=True)
-            except (ValueError, OverflowError):
-                continue
+def extract_date(text: str, labels: LabelPattern) -> Optional[datetime]:
+    for match in labels.matches(text):
+        try:
+            return parse_date(match.group(1), dayfirst=True)
+        except (ValueError, OverflowError):
+            continue
     return None
 
 
-def extract_int(text: str, labels: list[str]) -> Optional[int]:
-    for label in labels:
-        pattern = re.compile(rf"{re.escape(label)}\s*[:=]\s*([0-9]+)", re.IGNORECASE)
-        match = pattern.search(text)
-        if match:
-            try:
-                return int(match.group(1))
-            except ValueError:  # pragma: no cover - defensive
-                continue
+def extract_int(text: str, labels: LabelPattern) -> Optional[int]:
+    for match in labels.matches(text):
+        try:
+            return int(match.group(1))
+        except ValueError:  # pragma: no cover - defensive
+            continue
     return None
 
 
-def extract_amount(text: str, labels: list[str]) -> tuple[Optional[float], Optional[str]]:
-    for label in labels:
-        pattern = re.compile(rf"{re.escape(label)}\s*[:=]\s*([0-9\.,]+)\s*([A-Z€]*)", re.IGNORECASE)
-        match = pattern.search(text)
-        if match:
-            raw_amount = match.group(1).replace(".", "").replace(",", ".")
-            currency = match.group(2) or "EUR"
-            try:
-                return float(raw_amount), currency.replace("€", "EUR")
-            except ValueError:
-                continue
+def extract_amount(text: str, labels: LabelPattern) -> tuple[Optional[float], Optional[str]]:
+    for match in labels.matches(text):
+        raw_amount = match.group(1).replace(".", "").replace(",", ".")
+        currency = match.group(2) or "EUR"
+        try:
+            return float(raw_amount), currency.replace("€", "EUR")
+        except ValueError:
+            continue
     return None, None
-
-
-def parse_date_header(value: Optional[str]) -> Optional[datetime]:
-    if not value:
-        return None
-    try:
-        return date_parser.parse(value)
-    except (ValueError, OverflowError):
-        return None
-
@@ -1,18 +1,20 @@
 from __future__ import annotations
 
 import re
-from datetime import datetime
 from email.header import decode_header
 from typing import Optional
 
-from dateutil import parser as date_parser
-
 from ..models import GuestMessageInfo, ParsedEmail, ParsedEmailMetadata
-from .base import EmailContent, EmailParser, is_booking_sender
+from .base import BOOKING_SENDER_DOMAINS, EmailContent, EmailParser, is_booking_sender, normalize_text  # noqa: F401
+from .dates import parse_date_header
 
 
 class BookingMessageParser(EmailParser):
+    KIND = "booking_message"
+    SENDER_DOMAINS = BOOKING_SENDER_DOMAINS
     MESSAGE_ID_REGEX = re.compile(r"Numero di conferma\s*[:=]\s*(\d+)", re.IGNORECASE)
+    SENDER_ID_REGEX = re.compile(r"(\d{6,})-")
+    SUBJECT_ID_REGEX = re.compile(r"(\d{6,})")
 
     def matches(self, content: EmailContent) -> bool:
         sender = content.message.get("From")
@@ -28,7 +30,7 @@ class BookingMessageParser(EmailParser):
         recipients = content.message.get_all("To")
         received = parse_date_header(content.message.get("Date"))
 
-        text = normalize_text(content.text or content.html or "")
+        text = content.normalized_text
         reservation_id = self._extract_reservation_id(content, text)
         message = extract_message_body(text)
         reply_to = content.message.get("Reply-To") or sender
@@ -42,7 +44,7 @@ class BookingMessageParser(EmailParser):
         )
 
         return ParsedEmail(
-            kind="booking_message",
+            kind=self.KIND,
             guestMessage=guest_message,
             metadata=ParsedEmailMetadata(
                 subject=subject,
@@ -59,12 +61,12 @@ class BookingMessageParser(EmailParser):
         if match:
             return match.group(1)
         sender = content.message.get("From") or ""
-        match = re.search(r"(\d{6,})-", sender)
+        match = self.SENDER_ID_REGEX.search(sender)
         if match:
             return match.group(1)
         subject_raw = content.message.get("Subject", "")
         subject = self._decode_header(subject_raw)
-        match = re.search(r"(\d{6,})", subject)
+        match = self.SUBJECT_ID_REGEX.search(subject)
         if match:
             return match.group(1)
         return None
@@ -88,14 +90,12 @@ class BookingMessageParser(EmailParser):
             return header_value
 
 
-def normalize_text(text: str) -> str:
-    text = text.replace("=09", " ").replace("=20", " ")
-    text = text.replace("\r\n", "\n")
-    return text
+MESSAGE_BODY_REGEX = re.compile(r"#- .* -#\s*(.*)")
+THREAD_DOMAIN_REGEX = re.compile(r"@([A-Z0-9]+\.[A-Z0-9]+)$", re.IGNORECASE)
 
 
 def extract_message_body(text: str) -> Optional[str]:
-    match = re.search(r"#- .* -#\s*(.*)", text)
+    match = MESSAGE_BODY_REGEX.search(text)
     if match:
         return match.group(1).strip()
     return text.strip()
@@ -104,17 +104,7 @@ def extract_message_body(text: str) -> Optional[str]:
 def extract_thread_id(sender: Optional[str]) -> Optional[str]:
     if not sender:
         return None
-    match = re.search(r"@([A-Z0-9]+\.[A-Z0-9]+)$", sender, re.IGNORECASE)
+    match = THREAD_DOMAIN_REGEX.search(sender)
     if match:
         return match.group(1).lower()
     return None
-
-
-def parse_date_header(value: Optional[str]) -> Optional[datetime]:
-    if not value:
-        return None
-    try:
-        return date_parser.parse(value)
-    except (ValueError, OverflowError):
-        return None
-
@@ -5,7 +5,7 @@ from __future__ import annotations
 import logging
 from datetime import datetime
 from decimal import Decimal
-from typing import List, Optional
+from typing import Iterator, List, Optional, Tuple
 from xml.etree import ElementTree as ET
 
 from ..models.booking_reservation import (
@@ -13,12 +13,16 @@ from ..models.booking_reservation import (
     BookingPaymentInfo,
     BookingReservation,
 )
+from .dates import parse_date
 
 logger = logging.getLogger(__name__)
 
 # Namespace OTA XML
 OTA_NS = "{http://www.opentravel.org/OTA/2003/05}"
 
+# Dimensione dei blocchi passati al parser incrementale (caratteri)
+STREAM_CHUNK_SIZE = 64 * 1024
+
 
 class BookingReservationParserError(Exception):
     """Eccezione per errori nel parsing XML OTA."""
@@ -81,9 +85,8 @@ def _parse_datetime(datetime_str: str) -> Optional[datetime]:
                 return datetime.strptime(datetime_str, fmt)
             except ValueError:
                 continue
-        # Fallback a dateutil se disponibile
-        from dateutil import parser as date_parser
-        return date_parser.parse(datetime_str)
+        # Fallback sul parser date condiviso (memoizzato, dateutil per le forme sconosciute)
+        return parse_date(datetime_str, dayfirst=False)
     except Exception as e:
         logger.warning(f"Impossibile parsare datetime '{datetime_str}': {e}")
         return None
@@ -354,11 +357,7 @@ def parse_ota_modify_xml(xml_string: str) -> List[BookingReservation]:
     Raises:
         BookingReservationParserError: Se XML è invalido o mancano dati essenziali
     """
-    # Il formato XML è identico a OTA_HotelResNotif, solo root element diverso
-    # Sostituiamo HotelResModifies → HotelReservations per riutilizzare parsing
-    xml_string_fixed = xml_string.replace("HotelResModifies", "HotelReservations")
-    xml_string_fixed = xml_string_fixed.replace("HotelResModify", "HotelReservation")
-    return parse_ota_xml(xml_string_fixed)
+    return list(iter_ota_modify_xml(xml_string))
 
 
 def parse_ota_xml(xml_string: str) -> List[BookingReservation]:
@@ -374,115 +373,180 @@ def parse_ota_xml(xml_string: str) -> List[BookingReservation]:
     Raises:
         BookingReservationParserError: Se XML è invalido o mancano dati essenziali
     """
+    return list(iter_ota_xml(xml_string))
+
+
+def iter_ota_modify_xml(xml_string: str) -> Iterator[BookingReservation]:
+    """
+    Versione streaming di parse_ota_modify_xml.
+    
+    Il formato XML è identico a OTA_HotelResNotif, cambiano solo i nomi dei contenitori
+    (HotelResModifies/HotelResModify): si riconoscono direttamente, senza riscrivere la stringa.
+    """
+    return _iter_reservations(
+        xml_string,
+        container_tags=(f"{OTA_NS}HotelResModifies", f"{OTA_NS}HotelReservations"),
+        reservation_tags=(f"{OTA_NS}HotelResModify", f"{OTA_NS}HotelReservation"),
+    )
+
+
+def iter_ota_xml(xml_string: str) -> Iterator[BookingReservation]:
+    """
+    Versione streaming di parse_ota_xml: restituisce le prenotazioni una alla volta.
+    
+    L'XML viene letto a blocchi con un parser incrementale; ogni HotelReservation viene
+    convertita appena chiusa e poi rimossa dall'albero, quindi la memoria resta limitata
+    alla prenotazione corrente anche con risposte molto grandi (es. dopo un disservizio).
+    
+    Raises:
+        BookingReservationParserError: Se XML è invalido. L'errore arriva durante
+            l'iterazione: le prenotazioni precedenti al punto invalido sono già state restituite.
+    """
+    return _iter_reservations(
+        xml_string,
+        container_tags=(f"{OTA_NS}HotelReservations",),
+        reservation_tags=(f"{OTA_NS}HotelReservation",),
+    )
+
+
+def _iter_reservations(
+    xml_string: str,
+    container_tags: Tuple[str, ...],
+    reservation_tags: Tuple[str, ...],
+) -> Iterator[BookingReservation]:
+    parser = ET.XMLPullParser(events=("start", "end"))
+    containers: List[ET.Element] = []
+    found_container = False
+    yielded = 0
+    
+    for offset in range(0, len(xml_string), STREAM_CHUNK_SIZE):
+        try:
+            parser.feed(xml_string[offset:offset + STREAM_CHUNK_SIZE])
+            events = list(parser.read_events())
+        except ET.ParseError as e:
+            raise BookingReservationParserError(f"Errore parsing XML: {e}") from e
+        
+        for event, element in events:
+            if element.tag in container_tags:
+                if event == "start":
+                    containers.append(element)
+                    found_container = True
+                else:
+                    containers.pop()
+                continue
+            if event != "end" or element.tag not in reservation_tags or not containers:
+                continue
+            
+            for reservation in _build_reservations(element):
+                yielded += 1
+                yield reservation
+            
+            # Prenotazione processata: la togliamo dall'albero per non accumulare memoria
+            element.clear()
+            containers[-1].remove(element)
+    
     try:
-        root = ET.fromstring(xml_string)
+        parser.close()
     except ET.ParseError as e:
         raise BookingReservationParserError(f"Errore parsing XML: {e}") from e
     
-    # Trova HotelReservations
-    hotel_reservations = root.find(f".//{OTA_NS}HotelReservations")
-    if hotel_reservations is None:
+    if not found_container:
         logger.warning("Nessuna HotelReservation trovata nell'XML")
-        return []
+    elif not yielded:
+        logger.warning("Nessuna prenotazione valida estratta dall'XML")
+
+
+def _build_reservations(hotel_reservation: ET.Element) -> Iterator[BookingReservation]:
+    """Converte un elemento HotelReservation in BookingReservation (una per RoomStay)."""
+    try:
+        res_global_info = hotel_reservation.find(f"{OTA_NS}ResGlobalInfo")
+        if res_global_info is None:
+            logger.warning("ResGlobalInfo non trovato, salto prenotazione")
+            return
+        
+        # Estrai dati comuni
+        reservation_id = _extract_reservation_id(res_global_info)
+        reservation_date = _extract_reservation_date(res_global_info)
+        guest_info = _extract_guest_info(res_global_info)
+        total_amount, currency = _extract_totals(res_global_info)
+        payment_info = _extract_payment_info(res_global_info)
+        
+        # Processa ogni RoomStay (una prenotazione può avere più stanze)
+        room_stays = hotel_reservation.find(f"{OTA_NS}RoomStays")
+        if room_stays is None:
+            logger.warning(f"Nessun RoomStay trovato per prenotazione {reservation_id}")
+            return
     
-    reservations = []
+    except Exception as e:
+        logger.error(f"Errore processando HotelReservation: {e}", exc_info=True)
+        return
     
-    for hotel_reservation in hotel_reservations.findall(f"{OTA_NS}HotelReservation"):
+    for room_stay in room_stays.findall(f"{OTA_NS}RoomStay"):
         try:
-            res_global_info = hotel_reservation.find(f"{OTA_NS}ResGlobalInfo")
-            if res_global_info is None:
-                logger.warning("ResGlobalInfo non trovato, salto prenotazione")
-                continue
+            property_id = _extract_property_id(room_stay)
+            check_in, check_out = _extract_dates(room_stay)
+            adults, children = _extract_guest_counts(room_stay)
+            commission_amount = _extract_commission(room_stay)
+            special_requests = _extract_special_requests(room_stay)
             
-            # Estrai dati comuni
-            reservation_id = _extract_reservation_id(res_global_info)
-            reservation_date = _extract_reservation_date(res_global_info)
-            guest_info = _extract_guest_info(res_global_info)
-            total_amount, currency = _extract_totals(res_global_info)
-            payment_info = _extract_payment_info(res_global_info)
+            # Estrai room type info (opzionale)
+            room_type = room_stay.find(f".//{OTA_NS}RoomType")
+            room_type_code = room_type.get("RoomTypeCode") if room_type is not None else None
+            room_type_name = None
+            if room_type is not None:
+                room_desc = room_type.find(f"{OTA_NS}RoomDescription")
+                if room_desc is not None:
+                    room_type_name = room_desc.get("Name")
             
-            # Processa ogni RoomStay (una prenotazione può avere più stanze)
-            room_stays = hotel_reservation.find(f"{OTA_NS}RoomStays")
-            if room_stays is None:
-                logger.warning(f"Nessun RoomStay trovato per prenotazione {reservation_id}")
+            # Estrai rate plan (opzionale)
+            room_rate = room_stay.find(f".//{OTA_NS}RoomRate")
+            rate_plan_code = room_rate.get("RatePlanCode") if room_rate is not None else None
+            
+            # Estrai meal plan (opzionale)
+            meal_plan = None
+            if room_type is not None:
+                room_desc = room_type.find(f"{OTA_NS}RoomDescription")
+                if room_desc is not None:
+                    meal_plan_elem = room_desc.find(f"{OTA_NS}MealPlan")
+                    meal_plan = _get_element_text(meal_plan_elem)
+            
+            # Estrai comments (opzionale)
+            comments = None
+            comments_elem = res_global_info.find(f".//{OTA_NS}Comments")
+            if comments_elem is not None:
+                comment_elem = comments_elem.find(f"{OTA_NS}Comment")
+                if comment_elem is not None:
+                    comments = _get_element_text(comment_elem.find(f"{OTA_NS}Text"))
+            
+            if not check_in or not check_out:
+                logger.warning(
+                    f"Date non valide per prenotazione {reservation_id}: check_in={check_in}, check_out={check_out}"
+                )
                 continue
             
-            for room_stay in room_stays.findall(f"{OTA_NS}RoomStay"):
-                try:
-                    property_id = _extract_property_id(room_stay)
-                    check_in, check_out = _extract_dates(room_stay)
-                    adults, children = _extract_guest_counts(room_stay)
-                    commission_amount = _extract_commission(room_stay)
-                    special_requests = _extract_special_requests(room_stay)
-                    
-                    # Estrai room type info (opzionale)
-                    room_type = room_stay.find(f".//{OTA_NS}RoomType")
-                    room_type_code = room_type.get("RoomTypeCode") if room_type is not None else None
-                    room_type_name = None
-                    if room_type is not None:
-                        room_desc = room_type.find(f"{OTA_NS}RoomDescription")
-                        if room_desc is not None:
-                            room_type_name = room_desc.get("Name")
-                    
-                    # Estrai rate plan (opzionale)
-                    room_rate = room_stay.find(f".//{OTA_NS}RoomRate")
-                    rate_plan_code = room_rate.get("RatePlanCode") if room_rate is not None else None
-                    
-                    # Estrai meal plan (opzionale)
-                    meal_plan = None
-                    if room_type is not None:
-                        room_desc = room_type.find(f"{OTA_NS}RoomDescription")
-                        if room_desc is not None:
-                            meal_plan_elem = room_desc.find(f"{OTA_NS}MealPlan")
-                            meal_plan = _get_element_text(meal_plan_elem)
-                    
-                    # Estrai comments (opzionale)
-                    comments = None
-                    comments_elem = res_global_info.find(f".//{OTA_NS}Comments")
-                    if comments_elem is not None:
-                        comment_elem = comments_elem.find(f"{OTA_NS}Comment")
-                        if comment_elem is not None:
-                            comments = _get_element_text(comment_elem.find(f"{OTA_NS}Text"))
-                    
-                    if not check_in or not check_out:
-                        logger.warning(
-                            f"Date non valide per prenotazione {reservation_id}: check_in={check_in}, check_out={check_out}"
-                        )
-                        continue
-                    
-                    reservation = BookingReservation(
-                        reservation_id=reservation_id,
-                        property_id=property_id,
-                        check_in=check_in,
-                        check_out=check_out,
-                        guest_info=guest_info,
-                        adults=adults,
-                        children=children,
-                        total_amount=total_amount,
-                        currency=currency,
-                        room_type_code=room_type_code,
-                        room_type_name=room_type_name,
-                        rate_plan_code=rate_plan_code,
-                        meal_plan=meal_plan,
-                        commission_amount=commission_amount,
-                        payment_info=payment_info,
-                        special_requests=special_requests,
-                        comments=comments,
-                        reservation_date=reservation_date,
-                    )
-                    
-                    reservations.append(reservation)
-                    
-                except Exception as e:
-                    logger.error(f"Errore processando RoomStay per prenotazione {reservation_id}: {e}", exc_info=True)
-                    continue
-        
+            reservation = BookingReservation(
+                reservation_id=reservation_id,
+                property_id=property_id,
+                check_in=check_in,
+                check_out=check_out,
+                guest_info=guest_info,
+                adults=adults,
+                children=children,
+                total_amount=total_amount,
+                currency=currency,
+                room_type_code=room_type_code,
+                room_type_name=room_type_name,
+                rate_plan_code=rate_plan_code,
+                meal_plan=meal_plan,
+                commission_amount=commission_amount,
+                payment_info=payment_info,
+                special_requests=special_requests,
+                comments=comments,
+                reservation_date=reservation_date,
+            )
+            
         except Exception as e:
-            logger.error(f"Errore processando HotelReservation: {e}", exc_info=True)
+            logger.error(f"Errore processando RoomStay per prenotazione {reservation_id}: {e}", exc_info=True)
             continue
-    
-    if not reservations:
-        logger.warning("Nessuna prenotazione valida estratta dall'XML")
-    
-    return reservations
-
+        
+        yield reservation
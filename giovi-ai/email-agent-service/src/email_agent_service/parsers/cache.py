@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from pydantic import ValidationError
+
+from ..models import ParsedEmail
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_PARSERS_DIR = Path(__file__).resolve().parent
+_MODELS_FILE = _PARSERS_DIR.parent / "models" / "parsing.py"
+
+
+@lru_cache(maxsize=None)
+def parser_version() -> str:
+    """Hash dei sorgenti dei parser e del modello ParsedEmail.
+
+    Qualsiasi modifica a un modulo del package `parsers` (o al modello dei risultati)
+    cambia la versione e quindi tutte le chiavi di cache: i risultati prodotti dal codice
+    precedente non vengono più letti.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(_PARSERS_DIR.glob("*.py")) + [_MODELS_FILE]:
+        if path.is_file():
+            digest.update(path.name.encode("utf-8"))
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def make_cache_key(message_id: str, raw_payload: bytes, version: Optional[str] = None) -> str:
+    """Chiave content-addressed: message id + hash del payload raw + versione dei parser."""
+    payload_hash = hashlib.sha256(raw_payload).hexdigest()
+    return hashlib.sha256(
+        f"{version or parser_version()}:{message_id}:{payload_hash}".encode("utf-8")
+    ).hexdigest()
+
+
+class ParseCache:
+    """Cache dei ParsedEmail serializzati, con eviction LRU per dimensione totale in byte."""
+
+    def get(self, key: str) -> Optional[ParsedEmail]:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def put(self, key: str, parsed: ParsedEmail) -> None:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    @staticmethod
+    def _dump(parsed: ParsedEmail) -> bytes:
+        return parsed.model_dump_json(by_alias=True).encode("utf-8")
+
+    @staticmethod
+    def _load(data: bytes) -> Optional[ParsedEmail]:
+        try:
+            return ParsedEmail.model_validate_json(data)
+        except ValidationError:
+            return None
+
+
+class InMemoryParseCache(ParseCache):
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[ParsedEmail]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                return None
+            self._entries.move_to_end(key)
+        return self._load(data)
+
+    def put(self, key: str, parsed: ParsedEmail) -> None:
+        data = self._dump(parsed)
+        if len(data) > self._max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self._max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class DiskParseCache(ParseCache):
+    """Cache su disco: un file JSON per chiave in una sottocartella per versione dei parser.
+
+    L'ordine LRU è dato dall'mtime dei file (aggiornato a ogni hit), così sopravvive ai
+    riavvii del processo; le cartelle delle versioni precedenti vengono rimosse all'avvio.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        version: Optional[str] = None,
+    ):
+        self._root = Path(directory)
+        self._version = version or parser_version()
+        self._directory = self._root / self._version
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._purge_stale_versions()
+
+        entries = []
+        for path in self._directory.glob("*.json"):
+            stat = path.stat()
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        self._entries: OrderedDict[str, int] = OrderedDict(
+            (key, size) for _, key, size in sorted(entries)
+        )
+        self._size = sum(self._entries.values())
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[ParsedEmail]:
+        path = self._path(key)
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            self._forget(key)
+            return None
+        parsed = self._load(data)
+        if parsed is None:
+            self._forget(key)
+        return parsed
+
+    def put(self, key: str, parsed: ParsedEmail) -> None:
+        data = self._dump(parsed)
+        if len(data) > self._max_bytes:
+            return
+        try:
+            # Scrittura atomica: file temporaneo nella stessa cartella + rename
+            fd, tmp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"[PARSE_CACHE] ⚠️ Scrittura cache fallita per {key[:12]}: {e}")
+            return
+
+        evicted: list[str] = []
+        with self._lock:
+            self._size -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._size += len(data)
+            while self._size > self._max_bytes:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._size -= old_size
+                evicted.append(old_key)
+        for old_key in evicted:
+            self._path(old_key).unlink(missing_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self._directory / f"{key}.json"
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._size -= self._entries.pop(key, 0)
+        self._path(key).unlink(missing_ok=True)
+
+    def _purge_stale_versions(self) -> None:
+        for child in self._root.iterdir():
+            if child.is_dir() and child.name != self._version:
+                logger.info(f"[PARSE_CACHE] Rimozione cache versione parser obsoleta: {child.name}")
+                shutil.rmtree(child, ignore_errors=True)
+
+
+def build_parse_cache(
+    backend: Optional[str],
+    *,
+    max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+    directory: Optional[str] = None,
+) -> Optional[ParseCache]:
+    """Crea il backend configurato: "memory", "disk" o "none" (cache disattivata)."""
+    name = (backend or "none").strip().lower()
+    if name in ("none", "off", ""):
+        return None
+    if name == "memory":
+        return InMemoryParseCache(max_bytes=max_bytes)
+    if name == "disk":
+        directory = directory or os.path.join(tempfile.gettempdir(), "email-agent-parse-cache")
+        return DiskParseCache(directory, max_bytes=max_bytes)
+    raise ValueError(f"Backend cache parsing non supportato: {backend!r} (memory, disk, none)")
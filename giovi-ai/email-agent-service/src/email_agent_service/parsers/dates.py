@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import re
+from datetime import date, datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Optional
+
+from dateutil import parser as date_parser
+
+# Stringhe di data recenti memorizzate: check-in/check-out e header si ripetono spesso
+DATE_CACHE_SIZE = 4096
+
+MONTHS: dict[str, int] = {
+    # Italiano
+    "gen": 1, "gennaio": 1,
+    "feb": 2, "febbraio": 2,
+    "mar": 3, "marzo": 3,
+    "apr": 4, "aprile": 4,
+    "mag": 5, "maggio": 5,
+    "giu": 6, "giugno": 6,
+    "lug": 7, "luglio": 7,
+    "ago": 8, "agosto": 8,
+    "set": 9, "sett": 9, "settembre": 9,
+    "ott": 10, "ottobre": 10,
+    "nov": 11, "novembre": 11,
+    "dic": 12, "dicembre": 12,
+    # Inglese
+    "jan": 1, "january": 1,
+    "february": 2,
+    "march": 3,
+    "april": 4,
+    "may": 5,
+    "jun": 6, "june": 6,
+    "jul": 7, "july": 7,
+    "aug": 8, "august": 8,
+    "sep": 9, "sept": 9, "september": 9,
+    "oct": 10, "october": 10,
+    "november": 11,
+    "dec": 12, "december": 12,
+}
+
+WEEKDAYS = frozenset({
+    "lun", "mar", "mer", "gio", "ven", "sab", "dom",
+    "lunedì", "martedì", "mercoledì", "giovedì", "venerdì", "sabato", "domenica",
+    "lunedi", "martedi", "mercoledi", "giovedi", "venerdi",
+    "mon", "tue", "wed", "thu", "fri", "sat", "sun",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+})
+
+# "15/01/2026", "15.01.26", "15-01-2026"
+NUMERIC_DATE_REGEX = re.compile(r"(\d{1,2})[/.\-](\d{1,2})[/.\-](\d{4}|\d{2})")
+# "15 gen 2026", "gio 3 set 2026", "lun 15 gennaio", "Tuesday, 3 September 2026"
+DAY_MONTH_REGEX = re.compile(r"(?:([^\W\d_]+)\.?,?\s+)?(\d{1,2})\s+([^\W\d_]+)\.?,?(?:\s+(\d{4}))?")
+# "September 3, 2026", "Tue, Sep 3 2026"
+MONTH_DAY_REGEX = re.compile(r"(?:([^\W\d_]+)\.?,?\s+)?([^\W\d_]+)\.?\s+(\d{1,2}),?\s+(\d{4})")
+ISO_PREFIX_REGEX = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def parse_date(value: str, *, dayfirst: bool = True, fuzzy: bool = False) -> datetime:
+    """Parsing di una data di prenotazione, con la stessa interfaccia di `dateutil.parser.parse`.
+
+    I formati noti (numerici, ISO, giorno/mese con nomi italiani o inglesi) vengono
+    riconosciuti con regex precompilate; dateutil resta il fallback per le forme
+    sconosciute. I risultati sono memorizzati in una LRU limitata. Solleva ValueError
+    se la data non è riconosciuta.
+    """
+    # La data odierna entra nella chiave: i campi mancanti (es. l'anno) vengono da oggi
+    parsed = _parse_date_cached(value.strip(), dayfirst, fuzzy, date.today())
+    if parsed is None:
+        raise ValueError(f"Data non riconosciuta: {value!r}")
+    return parsed
+
+
+def parse_date_header(value: Optional[str]) -> Optional[datetime]:
+    """Header `Date` RFC 2822 (parser della stdlib), con fallback su `parse_date`."""
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+        # "-0000" = UTC senza fuso di origine: stesso risultato di dateutil
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError, IndexError):
+        pass
+    try:
+        return parse_date(value, dayfirst=False)
+    except (ValueError, OverflowError):
+        return None
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_date_cached(value: str, dayfirst: bool, fuzzy: bool, today: date) -> Optional[datetime]:
+    parsed = _parse_known_format(value, dayfirst, today)
+    if parsed is not None:
+        return parsed
+    try:
+        default = datetime(today.year, today.month, today.day)
+        return date_parser.parse(value, dayfirst=dayfirst, fuzzy=fuzzy, default=default)
+    except (ValueError, OverflowError):
+        return None
+
+
+def _parse_known_format(value: str, dayfirst: bool, today: date) -> Optional[datetime]:
+    if ISO_PREFIX_REGEX.match(value):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+
+    match = NUMERIC_DATE_REGEX.fullmatch(value)
+    if match:
+        first, second, year = match.groups()
+        day, month = (first, second) if dayfirst else (second, first)
+        return _build(year, month, day)
+
+    match = DAY_MONTH_REGEX.fullmatch(value)
+    if match:
+        weekday, day, month_name, year = match.groups()
+        if weekday and weekday.casefold() not in WEEKDAYS:
+            return None
+        month = MONTHS.get(month_name.casefold())
+        if month is None:
+            return None
+        return _build(year or today.year, month, day)
+
+    match = MONTH_DAY_REGEX.fullmatch(value)
+    if match:
+        weekday, month_name, day, year = match.groups()
+        if weekday and weekday.casefold() not in WEEKDAYS:
+            return None
+        month = MONTHS.get(month_name.casefold())
+        if month is None:
+            return None
+        return _build(year, month, day)
+    return None
+
+
+def _build(year: int | str, month: int | str, day: int | str) -> Optional[datetime]:
+    year = int(year)
+    if year < 100:
+        # Stessa finestra di strptime("%y"): 00-68 → 2000-2068, 69-99 → 1969-1999
+        year += 2000 if year < 69 else 1900
+    try:
+        return datetime(year, int(month), int(day))
+    except ValueError:
+        return None
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import logging
+from email.message import Message
+from typing import Iterable, List, Optional
+
+from .base import EmailContent, EmailParser, sender_domain
+
+logger = logging.getLogger(__name__)
+
+
+class ParserDispatchIndex:
+    """Indice mittente → parser costruito dai SENDER_DOMAINS dichiarati dai parser.
+
+    Permette di classificare un'email dai soli header: il dominio del mittente seleziona
+    con un'unica lookup i parser candidati (nell'ordine di registrazione), i
+    SUBJECT_PREFIXES scartano quelli incompatibili e solo sui rimanenti viene chiamato
+    `matches()`. I parser senza SENDER_DOMAINS sono candidati per qualsiasi mittente.
+    """
+
+    def __init__(self, parsers: Iterable[EmailParser]):
+        self._parsers: List[EmailParser] = list(parsers)
+        self._fallback: List[EmailParser] = [
+            parser for parser in self._parsers if not parser.SENDER_DOMAINS
+        ]
+
+        domains = {domain.lower() for parser in self._parsers for domain in parser.SENDER_DOMAINS}
+        self._by_domain: dict[str, List[EmailParser]] = {
+            domain: [
+                parser
+                for parser in self._parsers
+                if not parser.SENDER_DOMAINS
+                or domain in (d.lower() for d in parser.SENDER_DOMAINS)
+            ]
+            for domain in domains
+        }
+
+    @property
+    def sender_domains(self) -> list[str]:
+        """Domini mittente gestiti da almeno un parser (ordinati)."""
+        return sorted(self._by_domain)
+
+    def candidates(self, sender: Optional[str]) -> List[EmailParser]:
+        domain = sender_domain(sender)
+        if domain is None:
+            return self._fallback
+        return self._by_domain.get(domain, self._fallback)
+
+    def match(self, message: Message) -> Optional[EmailParser]:
+        """Restituisce il primo parser che gestisce il messaggio, usando solo gli header."""
+        candidates = self.candidates(message.get("From"))
+        if not candidates:
+            return None
+
+        subject = message.get("Subject", "") or ""
+        content = EmailContent(message=message, text=None, html=None)
+        for parser in candidates:
+            if parser.SUBJECT_PREFIXES and not subject.startswith(parser.SUBJECT_PREFIXES):
+                continue
+            if parser.matches(content):
+                return parser
+        return None
@@ -2,19 +2,67 @@ from __future__ import annotations
 
 import logging
 import base64
-from email import message_from_bytes
-from email.message import EmailMessage
-from typing import Iterable, List, Optional
+import multiprocessing
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from email.message import Message
+from email.parser import BytesHeaderParser
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
 
 from ..models import ParsedEmail, ParsedEmailMetadata
 from .base import EmailContent, EmailParser
+from .cache import ParseCache, make_cache_key, parser_version
+from .dispatch import ParserDispatchIndex
+from .html_backend import AUTO_BACKEND, resolve_html_backend
+from .mime import DEFAULT_MAX_ATTACHMENT_BYTES, DEFAULT_MAX_PART_BYTES, parse_message_lean
+from .mime import extract_part  # noqa: F401 - re-export per compatibilità
 
 logger = logging.getLogger(__name__)
 
+# Pool di processi condivisi fra le istanze dell'engine (uno per numero di worker).
+# Si usa "forkserver" perché il fork di un processo con thread attivi (gRPC Firestore,
+# thread pool di FastAPI) non è sicuro.
+_POOLS: dict[int, ProcessPoolExecutor] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+class RawEmail(NamedTuple):
+    message_id: str
+    raw_payload: bytes
+    snippet: Optional[str] = None
+
 
 class EmailParsingEngine:
-    def __init__(self, parsers: Iterable[EmailParser]):
+    def __init__(
+        self,
+        parsers: Iterable[EmailParser],
+        *,
+        max_part_bytes: int = DEFAULT_MAX_PART_BYTES,
+        max_attachment_bytes: int = DEFAULT_MAX_ATTACHMENT_BYTES,
+        max_workers: int = 1,
+        html_backend: Optional[str] = AUTO_BACKEND,
+        parse_cache: Optional[ParseCache] = None,
+    ):
         self._parsers: List[EmailParser] = list(parsers)
+        self._max_part_bytes = max_part_bytes
+        self._max_attachment_bytes = max_attachment_bytes
+        self._max_workers = max(1, max_workers)
+        self._html_backend = resolve_html_backend(html_backend)
+        self._index = ParserDispatchIndex(self._parsers)
+        self._parse_cache = parse_cache
+        self._parser_version = parser_version() if parse_cache is not None else None
+
+    def __getstate__(self) -> dict:
+        # La cache resta nel processo principale: i worker del pool parsano solo i miss
+        state = self.__dict__.copy()
+        state["_parse_cache"] = None
+        return state
+
+    @property
+    def dispatch_index(self) -> ParserDispatchIndex:
+        return self._index
 
     def parse(
         self,
@@ -23,63 +71,191 @@ class EmailParsingEngine:
         raw_payload: bytes,
         snippet: Optional[str] = None,
     ) -> ParsedEmail:
-        email_message = message_from_bytes(raw_payload)
-        text = extract_part(email_message, preferred_type="text/plain")
-        html = extract_part(email_message, preferred_type="text/html")
-
-        content = EmailContent(message=email_message, text=text, html=html)
-        
-        subject = email_message.get("Subject", "")
-        sender = email_message.get("From", "")
-        logger.debug(f"[PARSER_ENGINE] Tentativo parsing email: sender={sender[:50]}, subject={subject[:50]}")
+        if self._parse_cache is None:
+            return self._parse_uncached(message_id, raw_payload, snippet)
+
+        # Hit: nessuna decodifica MIME né estrazione
+        key = make_cache_key(message_id, raw_payload, self._parser_version)
+        cached = self._parse_cache.get(key)
+        if cached is not None:
+            logger.debug(f"[PARSER_ENGINE] Cache hit per messaggio {message_id}")
+            if snippet:
+                cached.metadata.snippet = snippet
+            return cached
+
+        parsed = self._parse_uncached(message_id, raw_payload, snippet)
+        self._parse_cache.put(key, parsed)
+        return parsed
+
+    def classify(
+        self,
+        *,
+        message_id: str,
+        raw_payload: bytes,
+        snippet: Optional[str] = None,
+    ) -> ParsedEmail:
+        """Solo tipo dell'email e metadata dagli header, senza decodificare il body.
 
-        for parser in self._parsers:
-            if parser.matches(content):
-                parser_name = parser.__class__.__name__
-                logger.info(f"[PARSER_ENGINE] ✅ Parser matchato: {parser_name} per email subject={subject[:50]}")
-                parsed = parser.parse(content)
-                parsed.metadata.gmail_message_id = message_id
-                if snippet:
-                    parsed.metadata.snippet = snippet
-                return parsed
-        
-        logger.warning(f"[PARSER_ENGINE] ⚠️ Nessun parser matchato per email: sender={sender[:50]}, subject={subject[:50]}")
+        Serve ai filtri di rilevanza (es. airbnbOnly) per decidere se vale la pena
+        chiamare `parse`. Un parser che non dichiara KIND richiede il parsing completo.
+        """
+        headers = BytesHeaderParser().parsebytes(raw_payload)
+        parser = self._index.match(headers)
+        if parser is not None and not parser.KIND:
+            return self.parse(message_id=message_id, raw_payload=raw_payload, snippet=snippet)
+        return ParsedEmail(
+            kind=parser.KIND if parser is not None else "unhandled",
+            metadata=_header_metadata(headers, message_id, snippet),
+        )
 
+    def classify_headers(
+        self,
+        *,
+        message_id: str,
+        headers: Iterable[Tuple[str, str]],
+        snippet: Optional[str] = None,
+    ) -> Optional[ParsedEmail]:
+        """Come `classify`, ma dagli header di un download senza body (es. Gmail `format=metadata`).
+
+        Restituisce None se l'email è gestita da un parser che non dichiara KIND: in quel
+        caso serve il messaggio completo.
+        """
+        message = Message()
+        for name, value in headers:
+            message[name] = value
+        parser = self._index.match(message)
+        if parser is not None and not parser.KIND:
+            return None
         return ParsedEmail(
-            kind="unhandled",
-            metadata=ParsedEmailMetadata(
-                subject=email_message.get("Subject"),
-                sender=email_message.get("From"),
-                recipients=email_message.get_all("To"),
-                snippet=snippet,
-                gmailMessageId=message_id,
-            ),
-            rawText=text,
-            rawHtml=html,
+            kind=parser.KIND if parser is not None else "unhandled",
+            metadata=_header_metadata(message, message_id, snippet),
         )
 
+    def _parse_uncached(
+        self,
+        message_id: str,
+        raw_payload: bytes,
+        snippet: Optional[str],
+    ) -> ParsedEmail:
+        # Classificazione dai soli header: il body MIME viene decodificato solo
+        # se esiste un parser che lo gestisce.
+        headers = BytesHeaderParser().parsebytes(raw_payload)
+
+        subject = headers.get("Subject", "")
+        sender = headers.get("From", "")
+        logger.debug(f"[PARSER_ENGINE] Tentativo parsing email: sender={sender[:50]}, subject={subject[:50]}")
+
+        parser = self._index.match(headers)
+        if parser is None:
+            logger.warning(f"[PARSER_ENGINE] ⚠️ Nessun parser matchato per email: sender={sender[:50]}, subject={subject[:50]}")
+            return ParsedEmail(
+                kind="unhandled",
+                metadata=_header_metadata(headers, message_id, snippet),
+            )
+
+        # Solo ora il body viene parsato, scartando allegati e immagini oltre soglia
+        content = EmailContent(
+            message=parse_message_lean(raw_payload, self._max_attachment_bytes),
+            max_part_bytes=self._max_part_bytes,
+            html_backend=self._html_backend,
+        )
+
+        parser_name = parser.__class__.__name__
+        logger.info(f"[PARSER_ENGINE] ✅ Parser matchato: {parser_name} per email subject={subject[:50]}")
+        parsed = parser.parse(content)
+        parsed.metadata.gmail_message_id = message_id
+        if snippet:
+            parsed.metadata.snippet = snippet
+        return parsed
+
+
+    def parse_many(
+        self,
+        items: Iterable[RawEmail],
+        *,
+        max_workers: Optional[int] = None,
+        chunk_size: int = 8,
+    ) -> List[ParsedEmail]:
+        """Parsa un batch di email restituendo i risultati nello stesso ordine.
+
+        Con più di un worker i payload vengono distribuiti su un pool di processi (il
+        parsing è CPU-bound e nel singolo processo resta legato al GIL); con un solo
+        worker, batch piccoli o pool non disponibile si ricade sul parsing seriale.
+        """
+        batch = [RawEmail(*item) for item in items]
+        if self._parse_cache is None:
+            return self._parse_batch(batch, max_workers, chunk_size)
+
+        # Lookup in cache nel processo principale; solo i miss vanno al pool
+        keys = [make_cache_key(item.message_id, item.raw_payload, self._parser_version) for item in batch]
+        results: List[Optional[ParsedEmail]] = [self._parse_cache.get(key) for key in keys]
+        misses = [i for i, parsed in enumerate(results) if parsed is None]
+        for i, parsed in enumerate(results):
+            if parsed is not None and batch[i].snippet:
+                parsed.metadata.snippet = batch[i].snippet
+        if misses:
+            logger.info(f"[PARSER_ENGINE] Cache parsing: {len(batch) - len(misses)} hit, {len(misses)} miss")
+            parsed_misses = self._parse_batch([batch[i] for i in misses], max_workers, chunk_size)
+            for i, parsed in zip(misses, parsed_misses):
+                results[i] = parsed
+                self._parse_cache.put(keys[i], parsed)
+        return results  # type: ignore[return-value]
+
+    def _parse_batch(
+        self,
+        batch: List[RawEmail],
+        max_workers: Optional[int],
+        chunk_size: int,
+    ) -> List[ParsedEmail]:
+        workers = min(max_workers or self._max_workers, len(batch))
+        if workers <= 1 or len(batch) <= chunk_size:
+            return self._parse_serial(batch)
+
+        chunks = [batch[i : i + chunk_size] for i in range(0, len(batch), chunk_size)]
+        try:
+            pool = _get_pool(workers)
+            results: List[ParsedEmail] = []
+            for chunk_result in pool.map(_parse_chunk, [self] * len(chunks), chunks):
+                results.extend(chunk_result)
+            return results
+        except (BrokenProcessPool, OSError, ValueError, pickle.PicklingError) as e:
+            _discard_pool(workers)
+            logger.warning(f"[PARSER_ENGINE] ⚠️ Pool di processi non disponibile ({e}), parsing seriale")
+            return self._parse_serial(batch)
+
+    def _parse_serial(self, batch: Sequence[RawEmail]) -> List[ParsedEmail]:
+        return [self._parse_uncached(item.message_id, item.raw_payload, item.snippet) for item in batch]
+
+
+def _header_metadata(headers: Message, message_id: str, snippet: Optional[str]) -> ParsedEmailMetadata:
+    return ParsedEmailMetadata(
+        subject=headers.get("Subject"),
+        sender=headers.get("From"),
+        recipients=headers.get_all("To"),
+        snippet=snippet,
+        gmailMessageId=message_id,
+    )
+
+
+def _parse_chunk(engine: EmailParsingEngine, chunk: Sequence[RawEmail]) -> List[ParsedEmail]:
+    return engine._parse_serial(chunk)
+
+
+def _get_pool(max_workers: int) -> ProcessPoolExecutor:
+    with _POOLS_LOCK:
+        pool = _POOLS.get(max_workers)
+        if pool is None:
+            context = multiprocessing.get_context("forkserver")
+            pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+            _POOLS[max_workers] = pool
+        return pool
+
 
-def extract_part(message: EmailMessage, preferred_type: str) -> Optional[str]:
-    if message.get_content_maintype() == "multipart":
-        for part in message.walk():
-            if part.get_content_type() == preferred_type:
-                payload = part.get_payload(decode=True)
-                if isinstance(payload, bytes):
-                    charset = part.get_content_charset() or "utf-8"
-                    try:
-                        return payload.decode(charset, errors="replace")
-                    except LookupError:  # pragma: no cover - rare encoding
-                        return payload.decode("utf-8", errors="replace")
-    else:
-        if message.get_content_type() == preferred_type:
-            payload = message.get_payload(decode=True)
-            if isinstance(payload, bytes):
-                charset = message.get_content_charset() or "utf-8"
-                try:
-                    return payload.decode(charset, errors="replace")
-                except LookupError:  # pragma: no cover
-                    return payload.decode("utf-8", errors="replace")
-    return None
+def _discard_pool(max_workers: int) -> None:
+    with _POOLS_LOCK:
+        pool = _POOLS.pop(max_workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
 
 
 def decode_gmail_raw(raw_string: str) -> bytes:
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import re
+from typing import Iterator, List, Optional
+
+from bs4 import BeautifulSoup, Tag
+
+# Un'etichetta più lunga di così è testo libero, non una label di campo
+MAX_LABEL_LENGTH = 60
+
+# "Label: valore" / "Label=valore" su una singola riga
+LINE_PAIR_REGEX = re.compile(r"^\s*([^\n:=]{2,60}?)\s*[:=]\s*(\S[^\n]*?)\s*$", re.MULTILINE)
+
+# Tag inline che non rendono un elemento "non foglia" ai fini delle coppie label/valore
+_INLINE_TAGS = frozenset({"br", "b", "strong", "i", "em", "span", "font", "u", "small"})
+
+
+def normalize_label(label: str) -> str:
+    """Label in forma canonica: minuscola, spazi compattati, senza ':' / '=' finali."""
+    return " ".join(label.split()).strip(" :=").casefold()
+
+
+class FieldIndex:
+    """Indice label → valori costruito con un'unica visita del DOM di un'email.
+
+    Raccoglie, in ordine di documento, le coppie th/td (o td/td) delle tabelle, le coppie
+    di elementi adiacenti label/valore (es. `<div>Check-in</div><div>gio 3 set</div>`) e
+    le righe "Label: valore" / "Label=valore" del testo; conserva inoltre le righe del
+    testo e gli href dei link. Gli estrattori interrogano l'indice invece di riscansionare
+    il documento per ogni campo.
+    """
+
+    def __init__(self, pairs: List[tuple[str, str]], lines: List[str], hrefs: List[str]):
+        self.pairs = pairs
+        self.lines = lines
+        self.hrefs = hrefs
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    @classmethod
+    def from_soup(cls, soup: BeautifulSoup) -> FieldIndex:
+        pairs: List[tuple[str, str]] = []
+        hrefs: List[str] = []
+
+        for element in soup.find_all(True):
+            name = element.name
+            if name == "a" and element.get("href"):
+                hrefs.append(element["href"])
+            if name == "tr":
+                header = element.find("th", recursive=False)
+                cells = element.find_all("td", recursive=False)
+                if header is not None and cells:
+                    _add_pair(pairs, header.get_text(), cells[0].get_text())
+                continue
+            if name == "th" or not _is_leaf(element):
+                continue
+            label = element.get_text()
+            # Un elemento "Label: valore" ha già il suo valore: lo raccolgono le coppie di riga
+            if not label.strip() or len(label) > MAX_LABEL_LENGTH or LINE_PAIR_REGEX.match(label):
+                continue
+            sibling = element.find_next_sibling()
+            if sibling is not None and _is_leaf(sibling):
+                _add_pair(pairs, label, sibling.get_text())
+
+        lines = [line.strip() for line in soup.get_text("\n").splitlines() if line.strip()]
+        pairs.extend(_line_pairs("\n".join(lines)))
+        return cls(pairs, lines, hrefs)
+
+    @classmethod
+    def from_text(cls, text: str) -> FieldIndex:
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        return cls(list(_line_pairs(text)), lines, [])
+
+    def find(self, *labels: str) -> Optional[str]:
+        """Primo valore la cui label contiene una delle label richieste (in ordine di priorità)."""
+        for value in self.find_all(*labels):
+            return value
+        return None
+
+    def find_all(self, *labels: str) -> Iterator[str]:
+        for label in labels:
+            wanted = normalize_label(label)
+            for key, value in self.pairs:
+                if wanted in key:
+                    yield value
+
+    def lines_with(self, *fragments: str) -> Iterator[str]:
+        """Righe del testo che contengono uno dei frammenti (case-insensitive)."""
+        wanted = [fragment.casefold() for fragment in fragments]
+        for line in self.lines:
+            folded = line.casefold()
+            if any(fragment in folded for fragment in wanted):
+                yield line
+
+
+def _is_leaf(element: Tag) -> bool:
+    # Solo i figli diretti: un controllo ricorsivo renderebbe la visita quadratica
+    return all(child.name in _INLINE_TAGS for child in element.children if isinstance(child, Tag))
+
+
+def _add_pair(pairs: List[tuple[str, str]], label: str, value: str) -> None:
+    key = normalize_label(label)
+    value = value.strip()
+    if key and value and len(key) <= MAX_LABEL_LENGTH:
+        pairs.append((key, value))
+
+
+def _line_pairs(text: str) -> Iterator[tuple[str, str]]:
+    for match in LINE_PAIR_REGEX.finditer(text):
+        key = normalize_label(match.group(1))
+        if key:
+            yield key, match.group(2)
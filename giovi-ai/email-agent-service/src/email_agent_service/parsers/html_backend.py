@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import importlib.util
+import logging
+from functools import lru_cache
+from typing import Optional
+
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+# Tree builder di BeautifulSoup usati dai parser HTML. "lxml" è in C ed è molto più
+# veloce di "html.parser" (puro Python) sui DOM grandi delle email Airbnb; richiede
+# l'extra opzionale `lxml`. "auto" sceglie lxml se installato.
+HTML_PARSER_BACKEND = "html.parser"
+LXML_BACKEND = "lxml"
+AUTO_BACKEND = "auto"
+
+SUPPORTED_HTML_BACKENDS: tuple[str, ...] = (LXML_BACKEND, HTML_PARSER_BACKEND)
+
+
+def is_backend_available(backend: str) -> bool:
+    if backend == HTML_PARSER_BACKEND:
+        return True
+    if backend == LXML_BACKEND:
+        return importlib.util.find_spec("lxml") is not None
+    return False
+
+
+@lru_cache(maxsize=None)
+def resolve_html_backend(backend: Optional[str] = AUTO_BACKEND) -> str:
+    """Normalizza il nome del backend HTML configurato.
+
+    "auto" (o None) seleziona lxml se disponibile, altrimenti html.parser. Un backend
+    richiesto esplicitamente ma non installato ricade su html.parser con un warning;
+    un nome sconosciuto è un errore di configurazione.
+    """
+    name = (backend or AUTO_BACKEND).strip().lower()
+    if name == AUTO_BACKEND:
+        return LXML_BACKEND if is_backend_available(LXML_BACKEND) else HTML_PARSER_BACKEND
+    if name not in SUPPORTED_HTML_BACKENDS:
+        raise ValueError(
+            f"Backend HTML non supportato: {backend!r} (valori ammessi: "
+            f"{', '.join((AUTO_BACKEND,) + SUPPORTED_HTML_BACKENDS)})"
+        )
+    if not is_backend_available(name):
+        logger.warning(f"[HTML_BACKEND] ⚠️ Backend {name} non installato, uso {HTML_PARSER_BACKEND}")
+        return HTML_PARSER_BACKEND
+    return name
+
+
+def build_soup(html: str, backend: Optional[str] = AUTO_BACKEND) -> BeautifulSoup:
+    return BeautifulSoup(html, resolve_html_backend(backend))
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import binascii
+import quopri
+import re
+from dataclasses import dataclass
+from email.message import Message
+from email.parser import BytesParser
+from email.policy import compat32
+from functools import partial
+from typing import Optional
+
+# Limite di byte decodificati per singola parte testuale: i body utili delle email OTA
+# stanno ampiamente sotto, il resto (es. HTML con immagini inline in base64) viene troncato.
+DEFAULT_MAX_PART_BYTES = 2 * 1024 * 1024
+
+# Le parti non testuali oltre questa soglia (allegati, immagini inline) vengono scartate
+# durante il parsing: nessun parser le legge.
+DEFAULT_MAX_ATTACHMENT_BYTES = 64 * 1024
+
+_BASE64_NOISE_RE = re.compile(r"[^A-Za-z0-9+/=]")
+
+
+@dataclass(frozen=True)
+class MessageBodies:
+    text: Optional[str]
+    html: Optional[str]
+
+
+class LeanMessage(Message):
+    """Message che non conserva i payload delle parti non testuali troppo grandi.
+
+    Il FeedParser imposta gli header di ogni parte prima di chiamarne `set_payload`,
+    quindi il Content-Type è già noto quando arriva il body: allegati e immagini oltre
+    `max_attachment_bytes` vengono sostituiti da un payload vuoto e non restano
+    nell'albero del messaggio.
+    """
+
+    def __init__(self, policy=compat32, max_attachment_bytes: int = DEFAULT_MAX_ATTACHMENT_BYTES):
+        super().__init__(policy)
+        self.max_attachment_bytes = max_attachment_bytes
+        self.dropped_bytes = 0
+
+    def set_payload(self, payload, charset=None):
+        if (
+            isinstance(payload, str)
+            and len(payload) > self.max_attachment_bytes
+            and self.get_content_maintype() not in ("text", "multipart", "message")
+        ):
+            self.dropped_bytes = len(payload)
+            payload = ""
+        super().set_payload(payload, charset)
+
+
+def parse_message_lean(
+    raw_payload: bytes,
+    max_attachment_bytes: int = DEFAULT_MAX_ATTACHMENT_BYTES,
+) -> Message:
+    """Parsa il messaggio completo scartando le parti non testuali oltre la soglia."""
+    factory = partial(LeanMessage, max_attachment_bytes=max_attachment_bytes)
+    return BytesParser(_class=factory).parsebytes(raw_payload)
+
+
+def extract_bodies(message: Message, max_part_bytes: int = DEFAULT_MAX_PART_BYTES) -> MessageBodies:
+    """Estrae il primo text/plain e il primo text/html con un'unica visita dell'albero MIME.
+
+    Le parti allegate e quelle non testuali (immagini inline, PDF, ...) vengono saltate
+    senza decodificarne il payload; ogni parte testuale è decodificata al massimo per
+    `max_part_bytes` byte.
+    """
+    text: Optional[str] = None
+    html: Optional[str] = None
+
+    for part in message.walk():
+        if part.is_multipart() or part.get_content_maintype() != "text":
+            continue
+        if part.get_content_disposition() == "attachment":
+            continue
+
+        content_type = part.get_content_type()
+        if content_type == "text/plain" and text is None:
+            text = decode_part(part, max_part_bytes)
+        elif content_type == "text/html" and html is None:
+            html = decode_part(part, max_part_bytes)
+
+        if text is not None and html is not None:
+            break
+
+    return MessageBodies(text=text, html=html)
+
+
+def decode_part(part: Message, max_bytes: int = DEFAULT_MAX_PART_BYTES) -> Optional[str]:
+    payload = _decode_payload(part, max_bytes)
+    if payload is None:
+        return None
+    charset = part.get_content_charset() or "utf-8"
+    try:
+        return payload.decode(charset, errors="replace")
+    except LookupError:  # pragma: no cover - rare encoding
+        return payload.decode("utf-8", errors="replace")
+
+
+def _decode_payload(part: Message, max_bytes: int) -> Optional[bytes]:
+    raw = part.get_payload()
+    if not isinstance(raw, str):
+        return None
+    # Payload entro il limite: decodifica standard della libreria email.
+    if len(raw) <= max_bytes:
+        payload = part.get_payload(decode=True)
+        return payload if isinstance(payload, bytes) else None
+
+    encoding = str(part.get("Content-Transfer-Encoding", "")).strip().lower()
+    if encoding == "base64":
+        # Tronca il testo codificato a un multiplo di 4 caratteri validi prima di decodificare
+        cleaned = _BASE64_NOISE_RE.sub("", raw[: (max_bytes // 3 + 1) * 4 + max_bytes // 38])
+        cleaned = cleaned[: len(cleaned) // 4 * 4]
+        try:
+            return binascii.a2b_base64(cleaned)[:max_bytes]
+        except binascii.Error:
+            return None
+    if encoding == "quoted-printable":
+        # Nel caso peggiore ogni byte occupa 3 caratteri ("=XX")
+        truncated = raw[: max_bytes * 3]
+        return quopri.decodestring(truncated.encode("ascii", errors="replace"))[:max_bytes]
+
+    payload = part.get_payload(decode=True)
+    return payload[:max_bytes] if isinstance(payload, bytes) else None
+
+
+def extract_part(message: Message, preferred_type: str) -> Optional[str]:
+    bodies = extract_bodies(message)
+    if preferred_type == "text/plain":
+        return bodies.text
+    if preferred_type == "text/html":
+        return bodies.html
+    for part in message.walk():
+        if part.get_content_type() == preferred_type:
+            return decode_part(part)
+    return None
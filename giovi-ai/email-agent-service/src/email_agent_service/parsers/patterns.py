@@ -0,0 +1,81 @@
+"""Registro delle regex condivise dai parser, compilate una volta all'import.
+
+Oltre alle regex comuni (email, telefono, spazi) espone tre forme composte:
+
+- `LabelPattern`: più label alternative con lo stesso formato di valore
+  ("Data di Check-in" / "Check-in"), una regex precompilata per label;
+- `compile_any`: un elenco di pattern fusi in un'unica alternanza, una sola scansione
+  del testo invece di una per pattern;
+- `MultiReplace`: sostituzioni letterali multiple in un solo passaggio.
+
+Le label restano regex separate perché con IGNORECASE il motore `re` cerca una label
+letterale molto più velocemente di un'alternanza di label (che perde la ricerca per
+prefisso): vedi `tests/benchmarks/pattern_bench.py`.
+"""
+from __future__ import annotations
+
+import re
+from typing import Iterable, Iterator, Mapping, Optional, Sequence
+
+# "Label: valore" / "Label=valore"
+LABEL_SEPARATOR = r"\s*[:=]\s*"
+
+EMAIL_REGEX = re.compile(r"[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}", re.IGNORECASE)
+PHONE_REGEX = re.compile(r"\+?\d[\d\s\-]{6,}")
+NON_PHONE_CHARS_REGEX = re.compile(r"[^\d+]")
+WHITESPACE_REGEX = re.compile(r"\s+")
+DIGITS_REGEX = re.compile(r"\d+")
+# Codici prenotazione alfanumerici (Airbnb HM..., voucher Booking)
+ALPHANUMERIC_CODE_REGEX = re.compile(r"[A-Z0-9]+", re.IGNORECASE)
+
+
+class LabelPattern:
+    """Label alternative (in ordine di priorità) seguite dallo stesso formato di valore.
+
+    Il valore è un frammento di regex con i propri gruppi; `matches` restituisce, label
+    per label, la prima occorrenza nel testo, così il chiamante può passare alla label
+    successiva se il valore trovato non è valido.
+    """
+
+    def __init__(
+        self,
+        labels: Sequence[str],
+        value: str,
+        separator: str = LABEL_SEPARATOR,
+        flags: int = re.IGNORECASE,
+    ):
+        self.labels = tuple(labels)
+        self._regexes = [re.compile(rf"{re.escape(label)}{separator}{value}", flags) for label in self.labels]
+
+    def matches(self, text: str) -> Iterator[re.Match[str]]:
+        for regex in self._regexes:
+            match = regex.search(text)
+            if match:
+                yield match
+
+    def search(self, text: str) -> Optional[re.Match[str]]:
+        """Prima occorrenza della label con priorità più alta presente nel testo."""
+        return next(self.matches(text), None)
+
+
+def compile_any(patterns: Iterable[str], flags: int = 0) -> re.Pattern[str]:
+    """Un'unica regex che trova il primo di più pattern con una sola scansione del testo."""
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), flags)
+
+
+class MultiReplace:
+    """Sostituzioni letterali multiple con un solo passaggio sul testo.
+
+    Le chiavi non devono sovrapporsi (nessuna è prefisso di un'altra): a parità di
+    posizione vince la prima chiave dell'elenco.
+    """
+
+    def __init__(self, replacements: Mapping[str, str]):
+        self._replacements = dict(replacements)
+        self._regex = re.compile("|".join(re.escape(key) for key in self._replacements))
+
+    def __call__(self, text: str) -> str:
+        return self._regex.sub(self._replace, text)
+
+    def _replace(self, match: re.Match[str]) -> str:
+        return self._replacements[match.group(0)]
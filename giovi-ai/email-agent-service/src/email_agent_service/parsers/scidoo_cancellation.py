@@ -4,11 +4,8 @@ import logging
 import re
 from typing import Optional
 
-from bs4 import BeautifulSoup
-from dateutil import parser as date_parser
-
 from ..models import ParsedEmail, ParsedEmailMetadata, ReservationInfo
-from .base import EmailContent, EmailParser
+from .base import SCIDOO_SENDER_DOMAINS, EmailContent, EmailParser
 from .scidoo_confirm import (
     extract_reservation_id,
     normalize_text,
@@ -24,11 +21,15 @@ class ScidooCancellationParser(EmailParser):
     Matcha email da reservation@scidoo.com con oggetto che inizia con "Cancellata - Prenotazione"
     """
 
+    KIND = "scidoo_cancellation"
+    SENDER_DOMAINS = SCIDOO_SENDER_DOMAINS
+    SUBJECT_PREFIXES = ("Cancellata - Prenotazione",)
+
     def matches(self, content: EmailContent) -> bool:
         sender = content.message.get("From", "")
         subject = content.message.get("Subject", "")
         matches_sender = "reservation@scidoo.com" in sender.lower()
-        matches_subject = subject.startswith("Cancellata - Prenotazione")
+        matches_subject = subject.startswith(self.SUBJECT_PREFIXES)
         
         if matches_sender:
             logger.debug(f"[SCIDOO_CANCELLATION_PARSER] Email da reservation@scidoo.com: subject={subject[:50]}..., matches_subject={matches_subject}")
@@ -41,12 +42,11 @@ class ScidooCancellationParser(EmailParser):
         recipients = content.message.get_all("To")
         received = parse_date_header(content.message.get("Date"))
 
-        text = normalize_text(content.text or "")
-        html = content.html or ""
-        soup = BeautifulSoup(html, "html.parser") if html else None
+        text = content.normalized(normalize_text)
+        fields = content.field_index
 
         # Estrai ID Voucher dalla email (stesso metodo della conferma)
-        reservation_id = extract_reservation_id(text, soup, subject=subject)
+        reservation_id = extract_reservation_id(text, fields, subject=subject)
         voucher_id = reservation_id  # Per Scidoo, l'ID Voucher è lo stesso del reservation_id
 
         # Per le cancellazioni, creiamo un ReservationInfo minimale con solo voucherId
@@ -57,7 +57,7 @@ class ScidooCancellationParser(EmailParser):
         )
 
         return ParsedEmail(
-            kind="scidoo_cancellation",
+            kind=self.KIND,
             reservation=reservation,
             metadata=ParsedEmailMetadata(
                 subject=subject,
@@ -68,4 +68,3 @@ class ScidooCancellationParser(EmailParser):
             rawText=content.text,
             rawHtml=content.html,
         )
-
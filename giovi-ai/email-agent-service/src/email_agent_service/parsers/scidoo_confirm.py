@@ -5,14 +5,33 @@ import re
 from datetime import datetime
 from typing import Optional
 
-from bs4 import BeautifulSoup
-from dateutil import parser as date_parser
-
 from ..models import ParsedEmail, ParsedEmailMetadata, ReservationInfo
-from .base import EmailContent, EmailParser
+from .base import SCIDOO_SENDER_DOMAINS, EmailContent, EmailParser
+from .base import normalize_text as base_normalize_text
+from .dates import parse_date, parse_date_header
+from .field_index import FieldIndex
+from .patterns import ALPHANUMERIC_CODE_REGEX, EMAIL_REGEX, NON_PHONE_CHARS_REGEX, LabelPattern
+from .templates import run_strategies
 
 logger = logging.getLogger(__name__)
 
+# Campi "Label=09valore" del testo Scidoo (il prefisso "09" è un artefatto quoted-printable)
+VOUCHER_TEXT_REGEX = re.compile(r"ID\s+Voucher\s*=\s*0*([A-Z0-9]+)", re.IGNORECASE)
+SUBJECT_ID_REGEX = re.compile(r"Confermata\s+-\s+Prenotazione\s+ID\s+([A-Z0-9]+)", re.IGNORECASE)
+PROPERTY_TEXT_REGEX = re.compile(r"Camera/Alloggio\s*=\s*0*([^\n\r]+)", re.IGNORECASE)
+GUEST_NAME_TEXT_REGEX = re.compile(r"Nome\s+Ospite\s*=\s*0*([^\n\r]+)", re.IGNORECASE)
+GUEST_EMAIL_TEXT_REGEX = re.compile(rf"Email\s*:\s*({EMAIL_REGEX.pattern})", re.IGNORECASE)
+PHONE_LABELS = LabelPattern(["Cellulare", "Telefono"], r"(\+?\d[\d\s\-]{6,})", separator=r"\s*:\s*")
+DATE_TEXT_REGEXES = {
+    label: re.compile(rf"Data\s+di\s+{label}\s*=\s*0*(\d{{1,2}}/\d{{1,2}}/\d{{2,4}})", re.IGNORECASE)
+    for label in ("Check-in", "Check-out")
+}
+ADULTS_TEXT_REGEX = re.compile(r"Ospiti\s*=\s*0*(\d+)\s+Adulti", re.IGNORECASE)
+ADULTS_REGEX = re.compile(r"(\d+)\s+Adulti", re.IGNORECASE)
+TOTAL_TEXT_REGEX = re.compile(r"Totale\s+Prenotazione\s*:\s*([0-9\.,]+)\s*€?", re.IGNORECASE)
+PRICE_TEXT_REGEX = re.compile(r"Prezzo\s*=\s*0*([0-9\.,]+)", re.IGNORECASE)
+AMOUNT_REGEX = re.compile(r"([0-9\.,]+)\s*€?")
+
 
 class ScidooConfirmationParser(EmailParser):
     """Parser per email di conferma prenotazione Scidoo.
@@ -20,11 +39,15 @@ class ScidooConfirmationParser(EmailParser):
     Matcha email da reservation@scidoo.com con oggetto che inizia con "Confermata - Prenotazione"
     """
 
+    KIND = "scidoo_confirmation"
+    SENDER_DOMAINS = SCIDOO_SENDER_DOMAINS
+    SUBJECT_PREFIXES = ("Confermata - Prenotazione",)
+
     def matches(self, content: EmailContent) -> bool:
         sender = content.message.get("From", "")
         subject = content.message.get("Subject", "")
         matches_sender = "reservation@scidoo.com" in sender.lower()
-        matches_subject = subject.startswith("Confermata - Prenotazione")
+        matches_subject = subject.startswith(self.SUBJECT_PREFIXES)
         
         if matches_sender:
             logger.debug(f"[SCIDOO_PARSER] Email da reservation@scidoo.com: subject={subject[:50]}..., matches_subject={matches_subject}")
@@ -37,22 +60,21 @@ class ScidooConfirmationParser(EmailParser):
         recipients = content.message.get_all("To")
         received = parse_date_header(content.message.get("Date"))
 
-        text = normalize_text(content.text or "")
-        html = content.html or ""
-        soup = BeautifulSoup(html, "html.parser") if html else None
+        text = content.normalized(normalize_text)
+        fields = content.field_index
 
         # Estrai dati dalla email
-        reservation_id = extract_reservation_id(text, soup, subject=subject)
+        reservation_id = extract_reservation_id(text, fields, subject=subject)
         voucher_id = reservation_id  # Per Scidoo, l'ID Voucher è lo stesso del reservation_id
         source_channel = extract_source_channel(subject)  # Estrai Booking o Airbnb dal subject
-        property_name = extract_property_name(text, soup)
-        guest_name = extract_guest_name(text, soup)
-        guest_email = extract_guest_email(text, soup)
-        guest_phone = extract_guest_phone(text, soup)
-        check_in = extract_check_in_date(text, soup)
-        check_out = extract_check_out_date(text, soup)
-        adults = extract_adults(text, soup)
-        total_amount, currency = extract_total_amount(text, soup)
+        property_name = extract_property_name(text, fields)
+        guest_name = extract_guest_name(text, fields)
+        guest_email = extract_guest_email(text, fields)
+        guest_phone = extract_guest_phone(text, fields)
+        check_in = extract_check_in_date(text, fields)
+        check_out = extract_check_out_date(text, fields)
+        adults = extract_adults(text, fields)
+        total_amount, currency = extract_total_amount(text, fields)
 
         reservation = ReservationInfo(
             reservationId=reservation_id or "unknown",
@@ -71,7 +93,7 @@ class ScidooConfirmationParser(EmailParser):
         )
 
         return ParsedEmail(
-            kind="scidoo_confirmation",
+            kind=self.KIND,
             reservation=reservation,
             metadata=ParsedEmailMetadata(
                 subject=subject,
@@ -86,13 +108,16 @@ class ScidooConfirmationParser(EmailParser):
 
 def normalize_text(text: str) -> str:
     """Normalizza il testo rimuovendo caratteri speciali quoted-printable."""
-    text = text.replace("=09", " ").replace("=20", " ")
-    text = text.replace("\r\n", "\n")
+    text = base_normalize_text(text)
     text = text.replace("=E2=82=AC", "€")  # Euro symbol
     return text
 
 
-def extract_reservation_id(text: str, soup: Optional[BeautifulSoup], subject: Optional[str] = None) -> Optional[str]:
+def extract_reservation_id(
+    text: str,
+    fields: Optional[FieldIndex],
+    subject: Optional[str] = None,
+) -> Optional[str]:
     """Estrae ID Voucher / ID Prenotazione.
     
     Supporta sia ID numerici (Booking) che alfanumerici (Airbnb).
@@ -100,32 +125,23 @@ def extract_reservation_id(text: str, soup: Optional[BeautifulSoup], subject: Op
     - Booking: "ID Voucher=095150895143" -> "5150895143"
     - Airbnb: "ID Voucher=09HMMFYTC5TJ" -> "HMMFYTC5TJ"
     """
-    # Pattern: "ID Voucher=09..." seguito da alfanumerici (lettere e numeri)
-    # Supporta sia numerici che alfanumerici (es: HMMFYTC5TJ, 5150895143)
-    match = re.search(r"ID\s+Voucher\s*=\s*0*([A-Z0-9]+)", text, re.IGNORECASE)
-    if match:
-        return match.group(1)
-    
-    if soup:
+    def html_voucher() -> Optional[str]:
         # Cerca nella tabella HTML
-        for row in soup.find_all("tr"):
-            th = row.find("th")
-            td = row.find("td")
-            if th and td and "ID Voucher" in th.get_text():
-                voucher_text = td.get_text().strip()
-                # Supporta alfanumerici (lettere e numeri)
-                match = re.search(r"([A-Z0-9]+)", voucher_text, re.IGNORECASE)
-                if match:
-                    return match.group(1)
-    
-    # Fallback: estrai dal subject se disponibile
-    # Subject: "Confermata - Prenotazione ID HMMFYTC5TJ - Airbnb"
-    if subject:
-        match = re.search(r"Confermata\s+-\s+Prenotazione\s+ID\s+([A-Z0-9]+)", subject, re.IGNORECASE)
-        if match:
-            return match.group(1)
-    
-    return None
+        voucher_text = fields.find("ID Voucher") if fields else None
+        if voucher_text:
+            # Supporta alfanumerici (lettere e numeri)
+            match = ALPHANUMERIC_CODE_REGEX.search(voucher_text)
+            if match:
+                return match.group(0)
+        return None
+
+    return run_strategies([
+        # Pattern: "ID Voucher=09..." seguito da alfanumerici (es: HMMFYTC5TJ, 5150895143)
+        lambda: _search(VOUCHER_TEXT_REGEX, text),
+        html_voucher,
+        # Fallback dal subject: "Confermata - Prenotazione ID HMMFYTC5TJ - Airbnb"
+        lambda: _search(SUBJECT_ID_REGEX, subject or ""),
+    ])
 
 
 def extract_source_channel(subject: Optional[str]) -> Optional[str]:
@@ -149,195 +165,139 @@ def extract_source_channel(subject: Optional[str]) -> Optional[str]:
     return None
 
 
-def extract_property_name(text: str, soup: Optional[BeautifulSoup]) -> Optional[str]:
+def extract_property_name(text: str, fields: Optional[FieldIndex]) -> Optional[str]:
     """Estrae 'Camera/Alloggio' (nome property).
     
     NOTA: Usa "Camera/Alloggio" come nome property, non "Struttura Richiesta".
     Esempio: "1 Suite Scacco" -> "1 Suite Scacco"
     """
-    # Pattern: "Camera/Alloggio=091 Suite Scacco"
-    match = re.search(r"Camera/Alloggio\s*=\s*0*([^\n\r]+)", text, re.IGNORECASE)
-    if match:
-        return match.group(1).strip()
-    
-    if soup:
-        # Cerca nella tabella HTML per "Camera/Alloggio"
-        for row in soup.find_all("tr"):
-            th = row.find("th")
-            td = row.find("td")
-            if th and td and "Camera/Alloggio" in th.get_text():
-                return td.get_text().strip()
-    
-    return None
+    return run_strategies([
+        # Pattern: "Camera/Alloggio=091 Suite Scacco"
+        lambda: _search(PROPERTY_TEXT_REGEX, text),
+        # Tabella HTML
+        lambda: fields.find("Camera/Alloggio") if fields else None,
+    ])
 
 
-def extract_guest_name(text: str, soup: Optional[BeautifulSoup]) -> Optional[str]:
+def extract_guest_name(text: str, fields: Optional[FieldIndex]) -> Optional[str]:
     """Estrae nome ospite."""
-    match = re.search(r"Nome\s+Ospite\s*=\s*0*([^\n\r]+)", text, re.IGNORECASE)
-    if match:
-        return match.group(1).strip()
-    
-    if soup:
-        for row in soup.find_all("tr"):
-            th = row.find("th")
-            td = row.find("td")
-            if th and td and "Nome Ospite" in th.get_text():
-                return td.get_text().strip()
-    
-    return None
+    return run_strategies([
+        lambda: _search(GUEST_NAME_TEXT_REGEX, text),
+        lambda: fields.find("Nome Ospite") if fields else None,
+    ])
 
 
-def extract_guest_email(text: str, soup: Optional[BeautifulSoup]) -> Optional[str]:
+def extract_guest_email(text: str, fields: Optional[FieldIndex]) -> Optional[str]:
     """Estrae email ospite."""
-    # Pattern: "Email:ttorte.471243@guest.booking.com"
-    match = re.search(r"Email\s*:\s*([A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,})", text, re.IGNORECASE)
-    if match:
-        return match.group(1).lower()
-    
-    if soup:
+    def html_email() -> Optional[str]:
         # Cerca "Dati Ospite" section
-        for tag in soup.find_all(string=re.compile(r"Email:", re.IGNORECASE)):
-            parent = tag.parent
-            if parent:
-                email_text = parent.get_text()
-                match = re.search(r"Email\s*:\s*([A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,})", email_text, re.IGNORECASE)
-                if match:
-                    return match.group(1).lower()
-    
-    return None
+        for email_text in fields.find_all("Email") if fields else ():
+            match = EMAIL_REGEX.search(email_text)
+            if match:
+                return match.group(0).lower()
+        return None
 
+    return run_strategies([
+        # Pattern: "Email:ttorte.471243@guest.booking.com"
+        lambda: _lower(_search(GUEST_EMAIL_TEXT_REGEX, text)),
+        html_email,
+    ])
 
-def extract_guest_phone(text: str, soup: Optional[BeautifulSoup]) -> Optional[str]:
+
+def extract_guest_phone(text: str, fields: Optional[FieldIndex]) -> Optional[str]:
     """Estrae telefono/cellulare ospite."""
-    # Pattern: "Cellulare:+393392452297"
-    match = re.search(r"Cellulare\s*:\s*(\+?\d[\d\s\-]{6,})", text, re.IGNORECASE)
-    if match:
-        phone = match.group(1)
-        return re.sub(r"[^\d+]", "", phone)
-    
-    # Fallback su "Telefono:"
-    match = re.search(r"Telefono\s*:\s*(\+?\d[\d\s\-]{6,})", text, re.IGNORECASE)
+    # Pattern: "Cellulare:+393392452297", fallback su "Telefono:"
+    match = PHONE_LABELS.search(text)
     if match:
-        phone = match.group(1)
-        return re.sub(r"[^\d+]", "", phone)
-    
+        return NON_PHONE_CHARS_REGEX.sub("", match.group(1))
     return None
 
 
-def extract_check_in_date(text: str, soup: Optional[BeautifulSoup]) -> Optional[datetime]:
+def extract_check_in_date(text: str, fields: Optional[FieldIndex]) -> Optional[datetime]:
     """Estrae data check-in."""
-    match = re.search(r"Data\s+di\s+Check-in\s*=\s*0*(\d{1,2}/\d{1,2}/\d{2,4})", text, re.IGNORECASE)
-    if match:
-        try:
-            return date_parser.parse(match.group(1), dayfirst=True)
-        except (ValueError, OverflowError):
-            pass
-    
-    if soup:
-        for row in soup.find_all("tr"):
-            th = row.find("th")
-            td = row.find("td")
-            if th and td and "Data di Check-in" in th.get_text():
-                date_str = td.get_text().strip()
-                try:
-                    return date_parser.parse(date_str, dayfirst=True)
-                except (ValueError, OverflowError):
-                    pass
-    
-    return None
+    return _extract_date(text, fields, "Check-in")
 
 
-def extract_check_out_date(text: str, soup: Optional[BeautifulSoup]) -> Optional[datetime]:
+def extract_check_out_date(text: str, fields: Optional[FieldIndex]) -> Optional[datetime]:
     """Estrae data check-out."""
-    match = re.search(r"Data\s+di\s+Check-out\s*=\s*0*(\d{1,2}/\d{1,2}/\d{2,4})", text, re.IGNORECASE)
-    if match:
-        try:
-            return date_parser.parse(match.group(1), dayfirst=True)
-        except (ValueError, OverflowError):
-            pass
-    
-    if soup:
-        for row in soup.find_all("tr"):
-            th = row.find("th")
-            td = row.find("td")
-            if th and td and "Data di Check-out" in th.get_text():
-                date_str = td.get_text().strip()
-                try:
-                    return date_parser.parse(date_str, dayfirst=True)
-                except (ValueError, OverflowError):
-                    pass
-    
-    return None
+    return _extract_date(text, fields, "Check-out")
+
+
+def _extract_date(text: str, fields: Optional[FieldIndex], label: str) -> Optional[datetime]:
+    return run_strategies([
+        # Pattern: "Data di Check-in=0915/01/2026"
+        lambda: _parse_day_first(_search(DATE_TEXT_REGEXES[label], text)),
+        lambda: _parse_day_first(fields.find(f"Data di {label}") if fields else None),
+    ])
 
 
-def extract_adults(text: str, soup: Optional[BeautifulSoup]) -> Optional[int]:
+def extract_adults(text: str, fields: Optional[FieldIndex]) -> Optional[int]:
     """Estrae numero adulti."""
-    match = re.search(r"Ospiti\s*=\s*0*(\d+)\s+Adulti", text, re.IGNORECASE)
-    if match:
-        try:
-            return int(match.group(1))
-        except ValueError:
-            pass
-    
-    if soup:
-        for row in soup.find_all("tr"):
-            th = row.find("th")
-            td = row.find("td")
-            if th and td and "Ospiti" in th.get_text():
-                guests_text = td.get_text()
-                match = re.search(r"(\d+)\s+Adulti", guests_text, re.IGNORECASE)
-                if match:
-                    try:
-                        return int(match.group(1))
-                    except ValueError:
-                        pass
-    
-    return None
+    def html_adults() -> Optional[int]:
+        for guests_text in fields.find_all("Ospiti") if fields else ():
+            match = ADULTS_REGEX.search(guests_text)
+            if match:
+                return int(match.group(1))
+        return None
+
+    return run_strategies([
+        lambda: _int(_search(ADULTS_TEXT_REGEX, text)),
+        html_adults,
+    ])
 
 
-def extract_total_amount(text: str, soup: Optional[BeautifulSoup]) -> tuple[Optional[float], Optional[str]]:
+def extract_total_amount(
+    text: str,
+    fields: Optional[FieldIndex],
+) -> tuple[Optional[float], Optional[str]]:
     """Estrae totale prenotazione e valuta."""
-    # Pattern: "Totale Prenotazione: 979,76 €" o "Prezzo=09979,76"
-    match = re.search(r"Totale\s+Prenotazione\s*:\s*([0-9\.,]+)\s*€?", text, re.IGNORECASE)
-    if match:
-        amount_str = match.group(1).replace(".", "").replace(",", ".")
-        try:
-            return float(amount_str), "EUR"
-        except ValueError:
-            pass
-    
-    # Fallback su "Prezzo="
-    match = re.search(r"Prezzo\s*=\s*0*([0-9\.,]+)", text, re.IGNORECASE)
-    if match:
-        amount_str = match.group(1).replace(".", "").replace(",", ".")
-        try:
-            return float(amount_str), "EUR"
-        except ValueError:
-            pass
-    
-    if soup:
+    def html_total() -> Optional[float]:
         # Cerca nella tabella o nel testo
-        for tag in soup.find_all(string=re.compile(r"Totale Prenotazione", re.IGNORECASE)):
-            parent = tag.parent
-            if parent:
-                total_text = parent.get_text()
-                match = re.search(r"([0-9\.,]+)\s*€?", total_text)
-                if match:
-                    amount_str = match.group(1).replace(".", "").replace(",", ".")
-                    try:
-                        return float(amount_str), "EUR"
-                    except ValueError:
-                        pass
-    
-    return None, None
+        for total_text in fields.find_all("Totale Prenotazione") if fields else ():
+            amount = _amount(_search(AMOUNT_REGEX, total_text))
+            if amount is not None:
+                return amount
+        return None
 
+    amount = run_strategies([
+        # Pattern: "Totale Prenotazione: 979,76 €"
+        lambda: _amount(_search(TOTAL_TEXT_REGEX, text)),
+        # Fallback su "Prezzo=09979,76"
+        lambda: _amount(_search(PRICE_TEXT_REGEX, text)),
+        html_total,
+    ])
+    return (amount, "EUR") if amount is not None else (None, None)
 
-def parse_date_header(value: Optional[str]) -> Optional[datetime]:
-    """Parsa header Date email."""
+
+def _search(pattern: re.Pattern[str], source: str) -> Optional[str]:
+    match = pattern.search(source)
+    return match.group(1).strip() if match else None
+
+
+def _lower(value: Optional[str]) -> Optional[str]:
+    return value.lower() if value else None
+
+
+def _int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def _amount(value: Optional[str]) -> Optional[float]:
     if not value:
         return None
     try:
-        return date_parser.parse(value)
-    except (ValueError, OverflowError):
+        return float(value.replace(".", "").replace(",", "."))
+    except ValueError:
         return None
 
+
+def _parse_day_first(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return parse_date(value, dayfirst=True)
+    except (ValueError, OverflowError):
+        return None
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from typing import Callable, Iterable, Optional, TypeVar
+
+T = TypeVar("T")
+
+Strategy = Callable[[], Optional[T]]
+
+
+def run_strategies(strategies: Iterable[Strategy[T]]) -> Optional[T]:
+    """Esegue le strategie di estrazione di un campo, in ordine di priorità, fino al primo valore trovato.
+
+    L'ordine è sempre lo stesso: il risultato dipende solo dall'email, non da quelle
+    analizzate prima dal processo. Le strategie sono lazy, quindi quelle successive
+    alla prima riuscita non vengono eseguite.
+    """
+    for strategy in strategies:
+        value = strategy()
+        if value is not None:
+            return value
+    return None
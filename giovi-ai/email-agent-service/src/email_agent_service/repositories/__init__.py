@@ -1,3 +1,4 @@
+from .backfill_jobs import BackfillJobRecord, BackfillJobsRepository
 from .booking_property_mappings import (
     BookingPropertyMapping,
     BookingPropertyMappingsRepository,
@@ -23,6 +24,8 @@ __all__ = [
     "OAuthStateRepository",
     "HostEmailIntegrationRepository",
     "ProcessedMessageRepository",
+    "BackfillJobsRepository",
+    "BackfillJobRecord",
     "PropertiesRepository",
     "ClientsRepository",
     "ReservationsRepository",
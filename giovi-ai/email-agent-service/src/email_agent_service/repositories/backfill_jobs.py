@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from firebase_admin import firestore
+
+
+@dataclass
+class BackfillJobRecord:
+    job_id: str
+    host_id: str
+    email: str
+    force: bool = False
+    status: str = "queued"  # queued | running | completed | failed
+    checkpoint: dict = field(default_factory=dict)
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: Optional[datetime] = None
+    # Inizio dell'esecuzione corrente (dopo un riavvio il job riparte da qui) ed email
+    # già esaminate a quel momento: base per il calcolo del throughput
+    run_started_at: Optional[datetime] = None
+    run_started_seen: int = 0
+    heartbeat_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    # Runner che esegue il job e scadenza del suo lease (rinnovato a intervalli regolari)
+    lease_owner: Optional[str] = None
+    lease_until: Optional[datetime] = None
+
+
+class BackfillJobsRepository:
+    COLLECTION = "backfillJobs"
+    # Un documento per casella con l'ultimo job creato: serializza gli avvii concorrenti
+    MAILBOX_LOCKS_COLLECTION = "backfillMailboxLocks"
+    ACTIVE_STATUSES = ["queued", "running"]
+
+    def __init__(self, client: firestore.Client):
+        self._client = client
+        self._collection = client.collection(self.COLLECTION)
+
+    def create_or_get_active(self, host_id: str, email: str, force: bool = False) -> Tuple[BackfillJobRecord, bool]:
+        """Job attivo della casella oppure uno nuovo, in una transazione. Il bool indica se è stato creato.
+
+        La transazione legge il lock della casella: due avvii concorrenti vengono
+        serializzati da Firestore e il secondo trova il job creato dal primo.
+        """
+        lock_ref = self._client.collection(self.MAILBOX_LOCKS_COLLECTION).document(email)
+
+        @firestore.transactional
+        def create(transaction) -> Tuple[BackfillJobRecord, bool]:
+            lock = lock_ref.get(transaction=transaction)
+            job_id = (lock.to_dict() or {}).get("jobId") if lock.exists else None
+            if job_id:
+                current = self._collection.document(job_id).get(transaction=transaction)
+                data = (current.to_dict() or {}) if current.exists else {}
+                if data.get("status") in self.ACTIVE_STATUSES:
+                    return self._to_record(current.id, data), False
+
+            doc_ref = self._collection.document()
+            now = datetime.now(timezone.utc)
+            transaction.set(doc_ref, self._new_job_data(host_id, email, force, now))
+            transaction.set(lock_ref, {"jobId": doc_ref.id, "updatedAt": firestore.SERVER_TIMESTAMP})
+            record = BackfillJobRecord(
+                job_id=doc_ref.id,
+                host_id=host_id,
+                email=email,
+                force=force,
+                created_at=now,
+                heartbeat_at=now,
+            )
+            return record, True
+
+        return create(self._client.transaction())
+
+    def get_job(self, job_id: str) -> Optional[BackfillJobRecord]:
+        doc = self._collection.document(job_id).get()
+        if not doc.exists:
+            return None
+        return self._to_record(doc.id, doc.to_dict() or {})
+
+    def list_active(self, email: Optional[str] = None) -> List[BackfillJobRecord]:
+        """Job non ancora terminati (eventualmente di una sola casella)."""
+        query = self._collection.where("status", "in", self.ACTIVE_STATUSES)
+        if email:
+            query = query.where("email", "==", email)
+        return [self._to_record(doc.id, doc.to_dict() or {}) for doc in query.get()]
+
+    def mark_running(
+        self,
+        job_id: str,
+        owner: str,
+        lease_seconds: float,
+        run_started_seen: int,
+    ) -> Optional[BackfillJobRecord]:
+        """Reclama il job per `owner` in una transazione.
+
+        Riesce solo se il job è ancora attivo e il lease è libero, scaduto o già di
+        `owner`. Restituisce il job aggiornato (checkpoint compreso), None se un altro
+        runner lo sta eseguendo o se il job è terminato.
+        """
+        doc_ref = self._collection.document(job_id)
+
+        @firestore.transactional
+        def claim(transaction) -> Optional[BackfillJobRecord]:
+            snapshot = doc_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None
+            record = self._to_record(snapshot.id, snapshot.to_dict() or {})
+            now = datetime.now(timezone.utc)
+            if record.status not in self.ACTIVE_STATUSES:
+                return None
+            if record.lease_owner not in (None, owner) and record.lease_until is not None and record.lease_until > now:
+                return None
+
+            lease_until = now + timedelta(seconds=lease_seconds)
+            transaction.update(
+                doc_ref,
+                {
+                    "status": "running",
+                    "leaseOwner": owner,
+                    "leaseUntil": lease_until,
+                    "runStartedAt": now,
+                    "runStartedSeen": run_started_seen,
+                    "heartbeatAt": now,
+                    "attempts": firestore.Increment(1),
+                    "updatedAt": firestore.SERVER_TIMESTAMP,
+                },
+            )
+            record.status = "running"
+            record.lease_owner, record.lease_until = owner, lease_until
+            record.run_started_at, record.run_started_seen, record.heartbeat_at = now, run_started_seen, now
+            record.attempts += 1
+            return record
+
+        return claim(self._client.transaction())
+
+    def renew_lease(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """Proroga il lease di `owner`. False se il job è passato a un altro runner o è terminato."""
+        doc_ref = self._collection.document(job_id)
+
+        @firestore.transactional
+        def renew(transaction) -> bool:
+            snapshot = doc_ref.get(transaction=transaction)
+            data = (snapshot.to_dict() or {}) if snapshot.exists else {}
+            if data.get("leaseOwner") != owner or data.get("status") not in self.ACTIVE_STATUSES:
+                return False
+            now = datetime.now(timezone.utc)
+            transaction.update(
+                doc_ref,
+                {
+                    "leaseUntil": now + timedelta(seconds=lease_seconds),
+                    "heartbeatAt": now,
+                    "updatedAt": firestore.SERVER_TIMESTAMP,
+                },
+            )
+            return True
+
+        return renew(self._client.transaction())
+
+    def save_checkpoint(self, job_id: str, checkpoint: dict) -> None:
+        self._collection.document(job_id).update(
+            {
+                "checkpoint": checkpoint,
+                "heartbeatAt": datetime.now(timezone.utc),
+                "updatedAt": firestore.SERVER_TIMESTAMP,
+            }
+        )
+
+    def mark_completed(self, job_id: str, checkpoint: dict) -> None:
+        now = datetime.now(timezone.utc)
+        self._collection.document(job_id).update(
+            {
+                "status": "completed",
+                "checkpoint": checkpoint,
+                "heartbeatAt": now,
+                "completedAt": now,
+                "leaseUntil": None,
+                "updatedAt": firestore.SERVER_TIMESTAMP,
+            }
+        )
+
+    def mark_failed(self, job_id: str, error: str) -> None:
+        now = datetime.now(timezone.utc)
+        self._collection.document(job_id).update(
+            {
+                "status": "failed",
+                "error": error,
+                "heartbeatAt": now,
+                "completedAt": now,
+                "leaseUntil": None,
+                "updatedAt": firestore.SERVER_TIMESTAMP,
+            }
+        )
+
+    @staticmethod
+    def _new_job_data(host_id: str, email: str, force: bool, now: datetime) -> dict:
+        # heartbeatAt già alla creazione: un job in coda non sembra orfano alle altre istanze
+        return {
+            "hostId": host_id,
+            "email": email,
+            "force": force,
+            "status": "queued",
+            "checkpoint": {},
+            "attempts": 0,
+            "heartbeatAt": now,
+            "createdAt": firestore.SERVER_TIMESTAMP,
+            "updatedAt": firestore.SERVER_TIMESTAMP,
+        }
+
+    @staticmethod
+    def _to_record(job_id: str, data: dict) -> BackfillJobRecord:
+        def as_utc(value) -> Optional[datetime]:
+            return value.astimezone(timezone.utc) if isinstance(value, datetime) else None
+
+        return BackfillJobRecord(
+            job_id=job_id,
+            host_id=data.get("hostId", ""),
+            email=data.get("email", ""),
+            force=bool(data.get("force", False)),
+            status=data.get("status", "queued"),
+            checkpoint=data.get("checkpoint") or {},
+            error=data.get("error"),
+            attempts=int(data.get("attempts", 0)),
+            created_at=as_utc(data.get("createdAt")),
+            run_started_at=as_utc(data.get("runStartedAt")),
+            run_started_seen=int(data.get("runStartedSeen", 0)),
+            heartbeat_at=as_utc(data.get("heartbeatAt")),
+            completed_at=as_utc(data.get("completedAt")),
+            lease_owner=data.get("leaseOwner"),
+            lease_until=as_utc(data.get("leaseUntil")),
+        )
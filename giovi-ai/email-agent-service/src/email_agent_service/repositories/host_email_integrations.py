@@ -19,6 +19,8 @@ class HostEmailIntegrationRecord:
     status: str = "connected"
     last_history_id_processed: Optional[str] = None
     watch_subscription: Optional[dict] = None
+    # Label e filtri Gmail che instradano le email OTA (vedi GmailIngestFilterProvisioner)
+    ingest_filter: Optional[dict] = None
 
 
 class HostEmailIntegrationRepository:
@@ -96,6 +98,16 @@ class HostEmailIntegrationRepository:
             }
         )
 
+    def update_ingest_filter(self, email: str, ingest_filter: Optional[dict]) -> None:
+        """Salva (o rimuove, con None) lo stato di label e filtri OTA della casella."""
+        doc_ref = self._collection.document(email)
+        doc_ref.update(
+            {
+                "ingestFilter": ingest_filter if ingest_filter is not None else firestore.DELETE_FIELD,
+                "updatedAt": firestore.SERVER_TIMESTAMP,
+            }
+        )
+
     def get_by_email(self, email: str) -> Optional[HostEmailIntegrationRecord]:
         snapshot = self._collection.document(email).get()
         if not snapshot.exists:
@@ -139,6 +151,7 @@ class HostEmailIntegrationRepository:
             status=data.get("status", "connected"),
             last_history_id_processed=data.get("lastHistoryIdProcessed"),
             watch_subscription=watch_subscription,
+            ingest_filter=data.get("ingestFilter"),
         )
     
     def delete_integration(self, email: str) -> None:
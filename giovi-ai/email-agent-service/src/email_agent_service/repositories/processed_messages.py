@@ -1,15 +1,345 @@
 from __future__ import annotations
 
-from typing import Optional
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
 
 from firebase_admin import firestore
 
+from ..config.settings import get_settings
+
+# Id già processati ricordati dal processo, per casella: la stessa email rivista dal
+# watch (passaggi successivi, history e ricerca di ripiego) o dal backfill non costa
+# un'altra lettura Firestore. Si memorizzano solo esiti positivi, che non cambiano più.
+PROCESSED_CACHE_PER_MAILBOX = 5000
+
+
+class ProcessedIdCache:
+    """LRU degli id processati, una per ambito (casella Gmail o host/sorgente API)."""
+
+    def __init__(self, per_mailbox: int = PROCESSED_CACHE_PER_MAILBOX):
+        self._per_mailbox = per_mailbox
+        self._mailboxes: dict[str, OrderedDict[str, None]] = {}
+        self._lock = threading.Lock()
+
+    def contains(self, integration_email: str, message_id: str) -> bool:
+        with self._lock:
+            seen = self._mailboxes.get(integration_email)
+            if seen is None or message_id not in seen:
+                return False
+            seen.move_to_end(message_id)
+            return True
+
+    def add_many(self, integration_email: str, message_ids: Iterable[str]) -> None:
+        with self._lock:
+            seen = self._mailboxes.setdefault(integration_email, OrderedDict())
+            for message_id in message_ids:
+                seen[message_id] = None
+                seen.move_to_end(message_id)
+            while len(seen) > self._per_mailbox:
+                seen.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mailboxes.clear()
+
+
+# Condivisa dal processo: i repository vengono istanziati a ogni richiesta
+PROCESSED_IDS = ProcessedIdCache()
+
+# Id per sotto-shard: ben sotto il limite di 40.000 voci di indice per documento di
+# Firestore (anche senza l'esenzione dell'indice su `ids`) e di 1 MiB per documento.
+# Un sotto-shard pieno non viene più scritto e può restare in cache: a ogni lettura si
+# rilegge solo quello corrente.
+SHARD_MAX_IDS = 5000
+# Documento indice dello shard set: sotto-shard vivi e quello corrente
+SHARD_INDEX_DOCUMENT = "index"
+# Id dei sotto-shard pieni tenuti in memoria dal processo, fra tutte le caselle
+SHARD_CACHE_MAX_IDS = 200_000
+# Ambiti (caselle o host/sorgente API) di cui si ricorda la struttura degli shard
+SHARD_CACHE_MAX_SCOPES = 1000
+
+
+class ShardLayout(NamedTuple):
+    """Contenuto del documento indice: sotto-shard vivi (numero -> ultimo giorno scritto)."""
+
+    current: int
+    parts: Dict[int, str]
+    created_day: str
+
+
+class ShardCache:
+    """Struttura degli shard e id dei sotto-shard pieni, con limiti LRU come ProcessedIdCache.
+
+    I sotto-shard pieni non cambiano più: restano in cache finché il totale degli id non
+    supera `max_ids`. Della struttura (documento indice) si ricordano al massimo
+    `max_scopes` ambiti.
+    """
+
+    def __init__(self, max_ids: int = SHARD_CACHE_MAX_IDS, max_scopes: int = SHARD_CACHE_MAX_SCOPES):
+        self._max_ids = max_ids
+        self._max_scopes = max_scopes
+        self._layouts: OrderedDict[str, ShardLayout] = OrderedDict()
+        self._parts: OrderedDict[Tuple[str, int], frozenset] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def layout(self, scope: str) -> Optional[ShardLayout]:
+        with self._lock:
+            layout = self._layouts.get(scope)
+            if layout is not None:
+                self._layouts.move_to_end(scope)
+            return layout
+
+    def put_layout(self, scope: str, layout: ShardLayout) -> None:
+        with self._lock:
+            self._layouts[scope] = layout
+            self._layouts.move_to_end(scope)
+            while len(self._layouts) > self._max_scopes:
+                self._layouts.popitem(last=False)
+
+    def part(self, scope: str, part: int) -> Optional[frozenset]:
+        with self._lock:
+            message_ids = self._parts.get((scope, part))
+            if message_ids is not None:
+                self._parts.move_to_end((scope, part))
+            return message_ids
+
+    def put_part(self, scope: str, part: int, message_ids: frozenset) -> None:
+        with self._lock:
+            previous = self._parts.pop((scope, part), None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._parts[(scope, part)] = message_ids
+            self._size += len(message_ids)
+            while self._size > self._max_ids and self._parts:
+                _, evicted = self._parts.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._layouts.clear()
+            self._parts.clear()
+            self._size = 0
+
+
+SHARD_CACHE = ShardCache()
+
+
+class ProcessedIdShards:
+    """Id processati compattati in sotto-shard `{collection}/part-{n}`, elencati da `{collection}/index`.
+
+    Gli id si accodano al sotto-shard corrente (array `ids`) finché non ne contiene
+    SHARD_MAX_IDS, poi se ne apre uno nuovo: una casella con poca posta sta in un solo
+    documento per tutta la finestra di conservazione. L'indice elenca i sotto-shard con
+    l'ultimo giorno (UTC) in cui sono stati scritti; quelli più vecchi di `retention_days`
+    escono dall'indice e vengono eliminati dalla TTL policy su `expireAt`, mentre `ids` va
+    esentato dall'indicizzazione (vedi README). Si usano insiemi esatti e non bloom
+    filter: un falso positivo farebbe scartare un'email mai processata.
+    """
+
+    def __init__(
+        self,
+        client: firestore.Client,
+        collection,
+        scope: str,
+        *,
+        retention_days: int,
+        clock: Callable[[], datetime],
+        cache: ShardCache,
+    ):
+        self._client = client
+        self._collection = collection
+        self._scope = scope
+        self._retention_days = retention_days
+        self._clock = clock
+        self._cache = cache
+
+    def _today(self) -> date:
+        return self._clock().astimezone(timezone.utc).date()
+
+    def _oldest_day(self) -> str:
+        return (self._today() - timedelta(days=self._retention_days)).isoformat()
+
+    def _part_ref(self, part: int):
+        return self._collection.document(f"part-{part}")
+
+    def find(self, message_ids: Iterable[str]) -> Set[str]:
+        """Gli id già presenti negli shard.
+
+        Con la struttura in cache basta un `get_all` sul sotto-shard corrente (più i pieni
+        usciti dalla cache); altrimenti, o se nel frattempo il corrente si è riempito,
+        prima si rilegge il documento indice. Il costo non dipende dai giorni di
+        conservazione né dal volume della casella.
+        """
+        wanted = set(message_ids)
+        if not wanted:
+            return set()
+        layout = self._cache.layout(self._scope)
+        if layout is None:
+            layout = self._load_layout()
+            if layout is None:
+                return set()
+        found, rolled_over = self._read_parts(layout, wanted)
+        if rolled_over:
+            layout = self._load_layout()
+            if layout is not None:
+                found |= self._read_parts(layout, wanted)[0]
+        return found
+
+    def legacy_window_open(self) -> bool:
+        """Se i vecchi documenti per messaggio possono ancora contenere id nella finestra.
+
+        Dopo `retention_days` dalla creazione degli shard tutto ciò che era stato scritto
+        nei documenti per messaggio è più vecchio della finestra: la lookup non serve più.
+        """
+        layout = self._cache.layout(self._scope)
+        return layout is None or layout.created_day >= self._oldest_day()
+
+    def _load_layout(self) -> Optional[ShardLayout]:
+        snapshot = self._collection.document(SHARD_INDEX_DOCUMENT).get()
+        if not snapshot.exists:
+            return None
+        layout = _layout_from(snapshot.to_dict() or {})
+        self._cache.put_layout(self._scope, layout)
+        return layout
+
+    def _read_parts(self, layout: ShardLayout, wanted: Set[str]) -> Tuple[Set[str], bool]:
+        """Id trovati nei sotto-shard vivi e se il corrente risulta pieno (indice da rileggere)."""
+        oldest_day = self._oldest_day()
+        found: Set[str] = set()
+        reads: List[int] = []
+        for part, last_day in layout.parts.items():
+            if part == layout.current:
+                reads.append(part)
+                continue
+            if last_day < oldest_day:
+                continue
+            cached = self._cache.part(self._scope, part)
+            if cached is None:
+                reads.append(part)
+            else:
+                found |= cached & wanted
+
+        rolled_over = False
+        for snapshot in self._client.get_all([self._part_ref(part) for part in reads]):
+            if not snapshot.exists:
+                continue
+            data = snapshot.to_dict() or {}
+            if data.get("lastDay", "") < oldest_day:
+                continue
+            stored = frozenset(data.get("ids", []))
+            part = int(snapshot.id.rsplit("-", 1)[-1])
+            if data.get("full"):
+                self._cache.put_part(self._scope, part, stored)
+                rolled_over = rolled_over or part == layout.current
+            found |= stored & wanted
+        return found, rolled_over
+
+    def add(self, message_ids: Iterable[str]) -> None:
+        """Aggiunge gli id al sotto-shard corrente in una transazione sul documento indice.
+
+        La transazione serializza le scritture concorrenti della stessa casella: ogni id
+        finisce nel sotto-shard corrente finché non raggiunge SHARD_MAX_IDS: la scrittura
+        che lo riempie lo segna `full` e l'indice passa al successivo. Il conteggio include eventuali
+        duplicati (ArrayUnion li scarta), quindi un sotto-shard può chiudersi con qualche
+        id in meno del massimo.
+        """
+        message_ids = list(dict.fromkeys(message_ids))
+        if not message_ids:
+            return
+        today = self._today()
+        day = today.isoformat()
+        oldest_day = self._oldest_day()
+        expire_at = _expire_at(today, self._retention_days)
+        index_ref = self._collection.document(SHARD_INDEX_DOCUMENT)
+        written: List[ShardLayout] = []
+
+        @firestore.transactional
+        def append(transaction) -> None:
+            snapshot = index_ref.get(transaction=transaction)
+            data = (snapshot.to_dict() or {}) if snapshot.exists else {}
+            layout = _layout_from(data) if snapshot.exists else ShardLayout(0, {}, day)
+            current, parts = layout.current, {part: last_day for part, last_day in layout.parts.items() if last_day}
+            count = int(data.get("currentCount", 0))
+            remaining = message_ids
+            while remaining:
+                chunk, remaining = remaining[:SHARD_MAX_IDS - count], remaining[SHARD_MAX_IDS - count:]
+                count += len(chunk)
+                # Una sola scrittura per sotto-shard; quella che lo riempie lo segna `full`
+                transaction.set(
+                    self._part_ref(current),
+                    {
+                        "ids": firestore.ArrayUnion(chunk),
+                        "full": count >= SHARD_MAX_IDS,
+                        "lastDay": day,
+                        "expireAt": expire_at,
+                        "updatedAt": firestore.SERVER_TIMESTAMP,
+                    },
+                    merge=True,
+                )
+                parts[current] = day
+                if count >= SHARD_MAX_IDS:
+                    current, count = current + 1, 0
+            index = {
+                "current": current,
+                "currentCount": count,
+                "parts": {str(part): last_day for part, last_day in parts.items() if last_day >= oldest_day},
+                "createdDay": layout.created_day,
+                "expireAt": expire_at,
+                "updatedAt": firestore.SERVER_TIMESTAMP,
+            }
+            # Senza merge: i sotto-shard scaduti escono dalla mappa `parts`
+            transaction.set(index_ref, index)
+            written[:] = [_layout_from(index)]
+
+        append(self._client.transaction())
+        self._cache.put_layout(self._scope, written[0])
+
+
+def _layout_from(data: dict) -> ShardLayout:
+    parts = {int(part): last_day for part, last_day in (data.get("parts") or {}).items()}
+    current = int(data.get("current", 0))
+    parts.setdefault(current, "")
+    return ShardLayout(current, parts, data.get("createdDay", ""))
+
+
+def _expire_at(day: date, retention_days: int) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc) + timedelta(days=retention_days + 1)
+
 
 class ProcessedMessageRepository:
+    """Deduplicazione dei messaggi già processati (email Gmail e messaggi delle API OTA).
+
+    Gli id stanno nei sotto-shard `processedMessageShards` (vedi ProcessedIdShards); con
+    `legacy_lookup`, nei primi `retention_days` dalla creazione degli shard, gli id non
+    trovati vengono cercati anche nei vecchi documenti per messaggio (`processedMessageIds`,
+    `processedBookingMessages/{host}/{source}`), che non vengono più scritti.
+    """
+
     SUBCOLLECTION = "processedMessageIds"
+    SHARD_SUBCOLLECTION = "processedMessageShards"
+    API_COLLECTION = "processedBookingMessages"
+    API_SOURCES_SUBCOLLECTION = "sources"
 
-    def __init__(self, client: firestore.Client):
+    def __init__(
+        self,
+        client: firestore.Client,
+        cache: Optional[ProcessedIdCache] = None,
+        *,
+        retention_days: Optional[int] = None,
+        legacy_lookup: Optional[bool] = None,
+        clock: Callable[[], datetime] = lambda: datetime.now(timezone.utc),
+        shard_cache: Optional[ShardCache] = None,
+    ):
+        settings = get_settings() if retention_days is None or legacy_lookup is None else None
         self._client = client
+        self._cache = cache if cache is not None else PROCESSED_IDS
+        self._retention_days = retention_days if retention_days is not None else settings.processed_ids_retention_days
+        self._legacy_lookup = legacy_lookup if legacy_lookup is not None else settings.processed_ids_legacy_lookup
+        self._clock = clock
+        self._shard_cache = shard_cache if shard_cache is not None else SHARD_CACHE
 
     def _collection(self, integration_email: str):
         return (
@@ -18,9 +348,62 @@ class ProcessedMessageRepository:
             .collection(self.SUBCOLLECTION)
         )
 
+    def _shards(self, integration_email: str) -> ProcessedIdShards:
+        collection = (
+            self._client.collection("hostEmailIntegrations")
+            .document(integration_email)
+            .collection(self.SHARD_SUBCOLLECTION)
+        )
+        return self._build_shards(collection, integration_email)
+
+    def _api_collection(self, host_id: str, source: str):
+        return self._client.collection(self.API_COLLECTION).document(host_id).collection(source)
+
+    def _api_shards(self, host_id: str, source: str) -> ProcessedIdShards:
+        # Stesso nome di collection degli shard Gmail: un solo collection group per TTL ed
+        # esenzione dell'indice
+        collection = (
+            self._client.collection(self.API_COLLECTION)
+            .document(host_id)
+            .collection(self.API_SOURCES_SUBCOLLECTION)
+            .document(source)
+            .collection(self.SHARD_SUBCOLLECTION)
+        )
+        return self._build_shards(collection, f"{self.API_COLLECTION}/{host_id}/{source}")
+
+    def _build_shards(self, collection, scope: str) -> ProcessedIdShards:
+        return ProcessedIdShards(
+            self._client,
+            collection,
+            scope,
+            retention_days=self._retention_days,
+            clock=self._clock,
+            cache=self._shard_cache,
+        )
+
     def was_processed(self, integration_email: str, message_id: str) -> bool:
-        doc = self._collection(integration_email).document(message_id).get()
-        return doc.exists
+        return not self.filter_unprocessed(integration_email, [message_id])
+
+    def filter_unprocessed(self, integration_email: str, message_ids: Iterable[str]) -> List[str]:
+        """Id non ancora processati, nell'ordine ricevuto e senza duplicati.
+
+        Gli id non in cache vengono cercati negli shard (vedi `ProcessedIdShards.find`) e,
+        se `legacy_lookup` e la finestra dei vecchi documenti è ancora aperta, con un altro
+        `get_all` sui vecchi documenti per messaggio.
+        """
+        unknown = [
+            message_id
+            for message_id in dict.fromkeys(message_ids)
+            if not self._cache.contains(integration_email, message_id)
+        ]
+        if not unknown:
+            return []
+        shards = self._shards(integration_email)
+        processed = shards.find(unknown)
+        if self._legacy_lookup and shards.legacy_window_open():
+            processed |= self._find_legacy(self._collection(integration_email), unknown, processed)
+        self._cache.add_many(integration_email, processed)
+        return [message_id for message_id in unknown if message_id not in processed]
 
     def mark_processed(
         self,
@@ -29,13 +412,29 @@ class ProcessedMessageRepository:
         *,
         history_id: Optional[str] = None,
     ) -> None:
-        self._collection(integration_email).document(message_id).set(
-            {
-                "historyId": history_id,
-                "processedAt": firestore.SERVER_TIMESTAMP,
-            },
-            merge=True,
-        )
+        self.mark_processed_many(integration_email, [(message_id, history_id)])
+
+    def mark_processed_many(
+        self,
+        integration_email: str,
+        entries: Iterable[Tuple[str, Optional[str]]],
+    ) -> None:
+        """Marca più messaggi `(message_id, history_id)` nel sotto-shard corrente con un solo commit.
+
+        L'historyId non viene conservato per messaggio: l'avanzamento della history è in
+        `lastHistoryIdProcessed` dell'integrazione.
+        """
+        message_ids = [message_id for message_id, _ in entries]
+        self._shards(integration_email).add(message_ids)
+        self._cache.add_many(integration_email, message_ids)
+
+    def _find_legacy(self, collection, message_ids: List[str], already_found: Set[str]) -> Set[str]:
+        """Id presenti nei vecchi documenti per messaggio (un solo `get_all`)."""
+        missing = [message_id for message_id in message_ids if message_id not in already_found]
+        if not missing:
+            return set()
+        snapshots = self._client.get_all([collection.document(message_id) for message_id in missing])
+        return {snapshot.id for snapshot in snapshots if snapshot.exists}
     
     def is_processed(
         self,
@@ -54,15 +453,24 @@ class ProcessedMessageRepository:
         Returns:
             True se già processato, False altrimenti
         """
-        # Usa collection dedicata per messages processati via API
-        collection_ref = (
-            self._client
-            .collection("processedBookingMessages")
-            .document(host_id)
-            .collection(source)
-        )
-        doc = collection_ref.document(message_id).get()
-        return doc.exists
+        return not self.filter_unprocessed_api([message_id], host_id, source)
+
+    def filter_unprocessed_api(self, message_ids: Iterable[str], host_id: str, source: str) -> List[str]:
+        """Come `filter_unprocessed`, per i messaggi ricevuti via API (Booking.com, ...)."""
+        scope = f"{self.API_COLLECTION}/{host_id}/{source}"
+        unknown = [
+            message_id
+            for message_id in dict.fromkeys(message_ids)
+            if not self._cache.contains(scope, message_id)
+        ]
+        if not unknown:
+            return []
+        shards = self._api_shards(host_id, source)
+        processed = shards.find(unknown)
+        if self._legacy_lookup and shards.legacy_window_open():
+            processed |= self._find_legacy(self._api_collection(host_id, source), unknown, processed)
+        self._cache.add_many(scope, processed)
+        return [message_id for message_id in unknown if message_id not in processed]
     
     def mark_processed_api(
         self,
@@ -78,16 +486,5 @@ class ProcessedMessageRepository:
             host_id: Host ID
             source: Source identifier ("booking_api", "airbnb_api", etc.)
         """
-        collection_ref = (
-            self._client
-            .collection("processedBookingMessages")
-            .document(host_id)
-            .collection(source)
-        )
-        collection_ref.document(message_id).set(
-            {
-                "processedAt": firestore.SERVER_TIMESTAMP,
-            },
-            merge=True,
-        )
-
+        self._api_shards(host_id, source).add([message_id])
+        self._cache.add_many(f"{self.API_COLLECTION}/{host_id}/{source}", [message_id])
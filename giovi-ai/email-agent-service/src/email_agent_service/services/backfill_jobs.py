@@ -0,0 +1,254 @@
+"""Job di backfill Gmail in background, ripristinabili da checkpoint su Firestore.
+
+Un job esegue `GmailBackfillService.run_backfill` in un thread del processo e, dopo ogni
+pagina salvata, scrive in `backfillJobs/{jobId}` il checkpoint (nextPageToken, contatori,
+cancellazioni in sospeso). All'avvio del servizio i job rimasti attivi con lease scaduto
+(istanza terminata o riavviata) ripartono dall'ultimo checkpoint.
+
+Prima di eseguire un job il runner ne reclama il lease con una transazione Firestore
+(`mark_running`) e lo rinnova da un timer: un job ha al più un runner attivo anche con
+più istanze che ripartono insieme, e il runner che perde il lease si ferma alla pagina
+successiva senza sovrascrivere il checkpoint.
+
+I thread continuano dopo la risposta 202: su Cloud Run il servizio va deployato con CPU
+sempre allocata e almeno un'istanza (`--no-cpu-throttling --min-instances 1`, vedi
+deploy.sh), altrimenti il job e il rinnovo del lease avanzano solo durante le richieste.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from ..models import GmailBackfillJobResponse
+from ..repositories.backfill_jobs import BackfillJobRecord, BackfillJobsRepository
+from .backfill_service import BackfillCheckpoint, GmailBackfillService
+
+logger = logging.getLogger(__name__)
+
+# Un job in coda senza heartbeat da più di così è considerato orfano e può essere ripreso
+STALE_JOB_SECONDS = 10 * 60
+# Durata del lease di esecuzione e intervallo di rinnovo (indipendente dalle pagine)
+JOB_LEASE_SECONDS = 5 * 60
+LEASE_RENEW_SECONDS = 60
+
+# Identifica i runner di questo processo come proprietari dei lease
+RUNNER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+# Job in esecuzione in questo processo (le istanze del runner sono per richiesta)
+_RUNNING_JOBS: set[str] = set()
+_RUNNING_JOBS_LOCK = threading.Lock()
+
+
+class LeaseLostError(RuntimeError):
+    """Il lease del job è passato a un altro runner durante l'esecuzione."""
+
+
+class BackfillJobRunner:
+    """Avvia, riprende e descrive i job di backfill di questo processo."""
+
+    def __init__(
+        self,
+        jobs_repository: BackfillJobsRepository,
+        service_factory: Callable[[], GmailBackfillService],
+        firestore_client=None,
+        *,
+        run_in_background: bool = True,
+        clock: Callable[[], datetime] = lambda: datetime.now(timezone.utc),
+        owner: str = RUNNER_ID,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+        renew_seconds: float = LEASE_RENEW_SECONDS,
+    ):
+        self._jobs = jobs_repository
+        self._service_factory = service_factory
+        self._firestore_client = firestore_client
+        self._run_in_background = run_in_background
+        self._clock = clock
+        self._owner = owner
+        self._lease_seconds = lease_seconds
+        self._renew_seconds = renew_seconds
+
+    def start(self, host_id: str, email: str, force: bool = False) -> BackfillJobRecord:
+        """Crea e avvia un job; se la casella ne ha già uno attivo restituisce quello.
+
+        Un job attivo ma orfano viene ripreso qui invece di crearne un secondo.
+        """
+        job, created = self._jobs.create_or_get_active(host_id, email, force)
+        if created:
+            logger.info(f"[BACKFILL_JOB] Creato job {job.job_id} per {email} (force={force})")
+        elif self._is_alive(job):
+            logger.info(f"[BACKFILL_JOB] Job {job.job_id} già attivo per {email}")
+            return job
+        else:
+            logger.info(f"[BACKFILL_JOB] Ripresa job orfano {job.job_id} per {email}")
+        self._launch(job)
+        return job
+
+    def resume_pending(self) -> List[str]:
+        """Riprende i job rimasti attivi senza heartbeat recente. Restituisce gli id ripresi."""
+        resumed: List[str] = []
+        for job in self._jobs.list_active():
+            if self._is_alive(job):
+                continue
+            logger.info(f"[BACKFILL_JOB] Ripresa job {job.job_id} per {job.email} dal checkpoint (pagine salvate: {job.checkpoint.get('pages', 0)})")
+            try:
+                if self._launch(job):
+                    resumed.append(job.job_id)
+            except Exception as e:
+                logger.error(f"[BACKFILL_JOB] Errore ripresa job {job.job_id}: {e}", exc_info=True)
+        return resumed
+
+    def run_job(self, job: BackfillJobRecord) -> bool:
+        """Reclama il job ed eseguilo nel thread corrente. False se è di un altro runner."""
+        claimed = self._claim(job)
+        if claimed is None:
+            return False
+        self._execute(claimed)
+        return True
+
+    def _claim(self, job: BackfillJobRecord) -> Optional[BackfillJobRecord]:
+        seen = BackfillCheckpoint.from_firestore(job.checkpoint).seen
+        claimed = self._jobs.mark_running(job.job_id, self._owner, self._lease_seconds, seen)
+        if claimed is None:
+            logger.info(f"[BACKFILL_JOB] Job {job.job_id} in esecuzione su un altro runner o terminato: non avviato")
+        return claimed
+
+    def _execute(self, job: BackfillJobRecord) -> None:
+        """Esegue un job già reclamato fino al completamento, rinnovandone il lease."""
+        checkpoint = BackfillCheckpoint.from_firestore(job.checkpoint)
+        stop = threading.Event()
+        lease_lost = threading.Event()
+        renewer = threading.Thread(
+            target=self._renew_lease,
+            args=(job.job_id, stop, lease_lost),
+            daemon=True,
+            name=f"BackfillLease-{job.job_id}",
+        )
+        renewer.start()
+
+        def save_checkpoint(state: BackfillCheckpoint) -> None:
+            if lease_lost.is_set():
+                raise LeaseLostError(f"lease del job {job.job_id} perso")
+            self._jobs.save_checkpoint(job.job_id, state.to_firestore())
+
+        try:
+            service = self._service_factory()
+            service.run_backfill(
+                host_id=job.host_id,
+                email=job.email,
+                force=job.force,
+                firestore_client=self._firestore_client,
+                checkpoint=checkpoint,
+                on_checkpoint=save_checkpoint,
+                collect_results=False,
+            )
+            if lease_lost.is_set():
+                raise LeaseLostError(f"lease del job {job.job_id} perso")
+            self._jobs.mark_completed(job.job_id, checkpoint.to_firestore())
+            logger.info(f"[BACKFILL_JOB] ✅ Job {job.job_id} completato: {checkpoint.processed} email processate")
+        except LeaseLostError:
+            # Il job prosegue con il nuovo proprietario: niente stato finale da qui
+            logger.warning(f"[BACKFILL_JOB] ⚠️ Job {job.job_id} passato a un altro runner: esecuzione interrotta")
+        except Exception as e:
+            # Il checkpoint resta quello dell'ultima pagina salvata
+            logger.error(f"[BACKFILL_JOB] ❌ Job {job.job_id} fallito: {e}", exc_info=True)
+            self._jobs.mark_failed(job.job_id, str(e))
+        finally:
+            stop.set()
+
+    def _renew_lease(self, job_id: str, stop: threading.Event, lease_lost: threading.Event) -> None:
+        while not stop.wait(self._renew_seconds):
+            try:
+                if not self._jobs.renew_lease(job_id, self._owner, self._lease_seconds):
+                    lease_lost.set()
+                    return
+            except Exception as e:
+                # Errore transitorio: si riprova al prossimo intervallo, finché il lease non scade
+                logger.warning(f"[BACKFILL_JOB] Rinnovo lease del job {job_id} fallito: {e}")
+
+    def get_status(self, job_id: str) -> Optional[GmailBackfillJobResponse]:
+        job = self._jobs.get_job(job_id)
+        if job is None:
+            return None
+        return self.describe(job)
+
+    def describe(self, job: BackfillJobRecord) -> GmailBackfillJobResponse:
+        """Stato del job con throughput dell'esecuzione corrente ed ETA sul totale stimato da Gmail."""
+        checkpoint = BackfillCheckpoint.from_firestore(job.checkpoint)
+        rate: Optional[float] = None
+        eta: Optional[int] = None
+        if job.run_started_at is not None:
+            until = job.completed_at if job.status in ("completed", "failed") and job.completed_at else self._clock()
+            elapsed = (until - job.run_started_at).total_seconds()
+            if elapsed > 0:
+                rate = round(max(0, checkpoint.seen - job.run_started_seen) / elapsed, 2)
+        if job.status == "completed":
+            eta = 0
+        elif job.status == "running" and rate and checkpoint.estimated_total is not None:
+            eta = int(max(0, checkpoint.estimated_total - checkpoint.seen) / rate)
+
+        return GmailBackfillJobResponse(
+            jobId=job.job_id,
+            status=job.status,
+            hostId=job.host_id,
+            email=job.email,
+            pages=checkpoint.pages,
+            processed=checkpoint.processed,
+            confirmations=checkpoint.confirmations,
+            cancellations=checkpoint.cancellations,
+            skipped=checkpoint.skipped,
+            failed=checkpoint.failed,
+            estimatedTotal=checkpoint.estimated_total,
+            messagesPerSecond=rate,
+            etaSeconds=eta,
+            attempts=job.attempts,
+            error=job.error,
+            createdAt=job.created_at,
+            completedAt=job.completed_at,
+        )
+
+    def _is_alive(self, job: BackfillJobRecord) -> bool:
+        """Vero se il job è in esecuzione qui, ha un lease valido o è in coda da poco (altra istanza)."""
+        with _RUNNING_JOBS_LOCK:
+            if job.job_id in _RUNNING_JOBS:
+                return True
+        now = self._clock()
+        if job.lease_until is not None:
+            return job.lease_until > now
+        if job.heartbeat_at is None:
+            return False
+        return (now - job.heartbeat_at).total_seconds() < STALE_JOB_SECONDS
+
+    def _launch(self, job: BackfillJobRecord) -> bool:
+        """Reclama il job e, solo se il lease è ottenuto, lo esegue."""
+        with _RUNNING_JOBS_LOCK:
+            if job.job_id in _RUNNING_JOBS:
+                return False
+            _RUNNING_JOBS.add(job.job_id)
+
+        claimed: Optional[BackfillJobRecord] = None
+        try:
+            claimed = self._claim(job)
+        finally:
+            if claimed is None:
+                with _RUNNING_JOBS_LOCK:
+                    _RUNNING_JOBS.discard(job.job_id)
+        if claimed is None:
+            return False
+
+        def run() -> None:
+            try:
+                self._execute(claimed)
+            finally:
+                with _RUNNING_JOBS_LOCK:
+                    _RUNNING_JOBS.discard(job.job_id)
+
+        if self._run_in_background:
+            threading.Thread(target=run, daemon=True, name=f"BackfillJob-{job.job_id}").start()
+        else:
+            run()
+        return True
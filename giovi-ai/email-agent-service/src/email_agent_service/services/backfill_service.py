@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import logging
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+from functools import partial
+from typing import Any, Callable, Iterator, List, NamedTuple, Optional
 
 from ..models import (
     GmailBackfillPreviewResponse,
@@ -11,15 +13,107 @@ from ..models import (
     ReservationPreview,
 )
 from ..parsers import EmailParsingEngine
-from ..parsers.engine import decode_gmail_raw
+from ..parsers.engine import RawEmail, decode_gmail_raw
 from ..repositories import HostEmailIntegrationRepository, PropertiesRepository
 from ..repositories.host_email_integrations import HostEmailIntegrationRecord
 from ..repositories.processed_messages import ProcessedMessageRepository
+from .email_relevance import AIRBNB_KINDS, is_relevant_kind
+from .gmail_prefetch import fetch_for_parsing
 from .gmail_service import GmailService
 from .persistence_service import PersistenceService
+from .pipeline import bounded_stage
 
 logger = logging.getLogger(__name__)
 
+# Pagine (fino a 100 email ciascuna) in coda fra uno stadio e il successivo della pipeline
+PIPELINE_QUEUE_PAGES = 2
+
+CONFIRMATION_KINDS = ("scidoo_confirmation", "airbnb_confirmation")
+CANCELLATION_KINDS = ("scidoo_cancellation", "airbnb_cancellation")
+SAVED_KINDS = frozenset(CONFIRMATION_KINDS + CANCELLATION_KINDS)
+
+
+def is_saved_kind(kind: str, airbnb_only: bool) -> bool:
+    """Conferme e cancellazioni salvate da `run_backfill` (solo quelle Airbnb con airbnbOnly)."""
+    return kind in SAVED_KINDS and (not airbnb_only or kind in AIRBNB_KINDS)
+
+
+def is_preview_kind(kind: str, airbnb_only: bool) -> bool:
+    """Email estratte per intero nell'anteprima: quelle salvate dal backfill più quelle gestite dal watch."""
+    return is_saved_kind(kind, airbnb_only) or is_relevant_kind(kind, airbnb_only)
+
+
+class BackfillPage(NamedTuple):
+    """Una pagina della query Gmail mentre attraversa la pipeline.
+
+    `items` contiene gli id dopo l'elenco, `(message_id, payload, classified)` dopo il
+    download (vedi `fetch_for_parsing`) e `(message_id, parsed, history_id)` dopo il parsing.
+    """
+
+    items: List[tuple]
+    next_page_token: Optional[str]
+    skipped: int = 0
+    failed: int = 0
+    result_size_estimate: Optional[int] = None
+
+
+@dataclass
+class BackfillCheckpoint:
+    """Stato ripristinabile di un backfill, aggiornato dopo ogni pagina salvata.
+
+    `page_token` è il token della prima pagina non ancora salvata. Le cancellazioni,
+    rimandate a fine backfill, sono conservate come id e riscaricate alla ripresa.
+    """
+
+    page_token: Optional[str] = None
+    listing_done: bool = False
+    pages: int = 0
+    processed: int = 0
+    confirmations: int = 0
+    cancellations: int = 0
+    unhandled: int = 0
+    skipped: int = 0
+    failed: int = 0
+    estimated_total: Optional[int] = None
+    pending_cancellation_ids: List[str] = field(default_factory=list)
+
+    @property
+    def seen(self) -> int:
+        """Email della query già esaminate (salvate, saltate o non scaricabili)."""
+        return self.processed + len(self.pending_cancellation_ids) + self.skipped + self.failed
+
+    def to_firestore(self) -> dict[str, Any]:
+        return {
+            "pageToken": self.page_token,
+            "listingDone": self.listing_done,
+            "pages": self.pages,
+            "processed": self.processed,
+            "confirmations": self.confirmations,
+            "cancellations": self.cancellations,
+            "unhandled": self.unhandled,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "estimatedTotal": self.estimated_total,
+            "pendingCancellationIds": list(self.pending_cancellation_ids),
+        }
+
+    @classmethod
+    def from_firestore(cls, data: Optional[dict]) -> "BackfillCheckpoint":
+        data = data or {}
+        return cls(
+            page_token=data.get("pageToken"),
+            listing_done=bool(data.get("listingDone", False)),
+            pages=int(data.get("pages", 0)),
+            processed=int(data.get("processed", 0)),
+            confirmations=int(data.get("confirmations", 0)),
+            cancellations=int(data.get("cancellations", 0)),
+            unhandled=int(data.get("unhandled", 0)),
+            skipped=int(data.get("skipped", 0)),
+            failed=int(data.get("failed", 0)),
+            estimated_total=data.get("estimatedTotal"),
+            pending_cancellation_ids=list(data.get("pendingCancellationIds") or []),
+        )
+
 
 class GmailBackfillService:
     def __init__(
@@ -39,122 +133,169 @@ class GmailBackfillService:
         self._persistence_service = persistence_service
         self._lookback_days = lookback_days
 
-    def run_backfill(self, host_id: str, email: str, force: bool = False, firestore_client=None) -> List[ParsedEmail]:
-        all_parsed, skipped_count = self._fetch_parsed_items(
-            host_id=host_id,
-            email=email,
-            force=force,
-            firestore_client=firestore_client,
-        )
-
-        # Separare conferme e cancellazioni
-        confirmations: List[tuple[str, ParsedEmail, dict]] = []
-        cancellations: List[tuple[str, ParsedEmail, dict]] = []
-        other: List[tuple[str, ParsedEmail, dict]] = []
-
-        for message_id, parsed, payload in all_parsed:
-            if parsed.kind in ["scidoo_confirmation", "airbnb_confirmation"]:
-                confirmations.append((message_id, parsed, payload))
-            elif parsed.kind in ["scidoo_cancellation", "airbnb_cancellation"]:
-                cancellations.append((message_id, parsed, payload))
-            else:
-                other.append((message_id, parsed, payload))
-
-        logger.info(f"[BACKFILL] Email separate: {len(confirmations)} conferme, {len(cancellations)} cancellazioni, {len(other)} altre")
-
+    def run_backfill(
+        self,
+        host_id: str,
+        email: str,
+        force: bool = False,
+        firestore_client=None,
+        *,
+        checkpoint: Optional[BackfillCheckpoint] = None,
+        on_checkpoint: Optional[Callable[[BackfillCheckpoint], None]] = None,
+        collect_results: bool = True,
+    ) -> List[ParsedEmail]:
+        """Esegue il backfill salvando le email man mano che le pagine vengono parsate.
+
+        Con `checkpoint` riprende da dove un backfill precedente si era fermato;
+        `on_checkpoint` riceve lo stato aggiornato dopo ogni pagina salvata e alla fine.
+        Con `collect_results=False` (job in background) le email parsate non vengono
+        accumulate e il risultato è una lista vuota.
+        """
+        checkpoint = checkpoint if checkpoint is not None else BackfillCheckpoint()
         parsed_results: List[ParsedEmail] = []
-        scidoo_count = 0
-        unhandled_count = 0
-
-        # FASE 2: Processa PRIMA tutte le conferme
-        logger.info(f"[BACKFILL] FASE 2: Processamento {len(confirmations)} email di CONFERMA...")
-        for message_id, parsed, payload in confirmations:
-            scidoo_count += 1
-            logger.info(f"[BACKFILL] Email conferma trovata! Reservation ID: {parsed.reservation.reservation_id if parsed.reservation else 'N/A'}, Property: {parsed.reservation.property_name if parsed.reservation else 'N/A'}")
-            try:
-                save_result = self._persistence_service.save_parsed_email(
-                    parsed_email=parsed, host_id=host_id
-                )
-                if save_result.get("saved"):
-                    logger.info(f"[BACKFILL] ✅ Salvato: property_id={save_result.get('property_id')}, client_id={save_result.get('client_id')}, reservation_saved={save_result.get('reservation_saved')}")
-                else:
-                    logger.warning(f"[BACKFILL] ❌ Salvataggio fallito: {save_result.get('reason')}, error={save_result.get('error')}")
-                
-                # Se la conferma contiene un messaggio del guest, processalo
-                if parsed.guest_message:
-                    logger.info(f"[BACKFILL] 📧 Conferma contiene messaggio guest, processamento...")
-                    try:
-                        from ..services.guest_message_pipeline import GuestMessagePipelineService
-                        
-                        # Usa il firestore_client passato come parametro
-                        if firestore_client:
-                            pipeline_service = GuestMessagePipelineService(firestore_client)
-                        
-                        # Verifica se deve essere processato (è un messaggio da nuova prenotazione)
-                        should_process, client_id = pipeline_service.should_process_message(parsed, host_id, is_new_reservation=True)
-                        if should_process and client_id:
-                            # Estrai contesto
-                            context = pipeline_service.extract_context(parsed, host_id, client_id)
-                            if context:
-                                # Salva messaggio in conversazione
-                                pipeline_service.save_guest_message(context, parsed, message_id)
-                                logger.info(f"[BACKFILL] ✅ Messaggio guest salvato in conversazione per client_id={client_id}")
-                            else:
-                                logger.warning(f"[BACKFILL] ⚠️ Contesto non trovato per messaggio guest")
-                        else:
-                            logger.info(f"[BACKFILL] ℹ️ Messaggio guest non processato (autoReplyEnabled={should_process}, client_id={client_id})")
-                    except Exception as e:
-                        logger.error(f"[BACKFILL] ❌ Errore processamento messaggio guest: {e}", exc_info=True)
-            except Exception as e:
-                logger.error(f"[BACKFILL] ❌ Errore salvataggio email {message_id}: {e}", exc_info=True)
-            
-            parsed_results.append(parsed)
-            self._processed_repository.mark_processed(
-                email,
-                message_id,
-                history_id=payload.get("historyId"),
+        # Le cancellazioni (poche) vengono processate DOPO tutte le conferme: la prenotazione
+        # da cancellare può arrivare in una pagina successiva (Gmail elenca dalla più recente)
+        cancellations = self._load_pending_cancellations(host_id, email, checkpoint)
+
+        if not checkpoint.listing_done:
+            # Conferme e altre email vengono salvate man mano che le pagine arrivano dalla pipeline
+            logger.info(f"[BACKFILL] Processamento email di CONFERMA in streaming (pagine già salvate: {checkpoint.pages})...")
+            pages = self._iter_parsed_pages(
+                host_id=host_id,
+                email=email,
+                force=force,
+                firestore_client=firestore_client,
+                page_token=checkpoint.page_token,
             )
-
-        # FASE 3: Processa POI tutte le cancellazioni
-        logger.info(f"[BACKFILL] FASE 3: Processamento {len(cancellations)} email di CANCELLAZIONE...")
-        for message_id, parsed, payload in cancellations:
-            scidoo_count += 1
-            voucher_id = parsed.reservation.voucher_id if parsed.reservation else None
-            logger.info(f"[BACKFILL] Email Scidoo cancellazione trovata! Voucher ID: {voucher_id}")
-            try:
-                save_result = self._persistence_service.save_parsed_email(
-                    parsed_email=parsed, host_id=host_id
-                )
-                if save_result.get("saved") and save_result.get("cancelled"):
-                    logger.info(f"[BACKFILL] ✅ Prenotazione cancellata: voucher_id={save_result.get('voucher_id')}")
-                else:
-                    logger.warning(f"[BACKFILL] ⚠️ Cancellazione fallita: {save_result.get('reason')}, voucher_id={save_result.get('voucher_id')}")
-            except Exception as e:
-                logger.error(f"[BACKFILL] ❌ Errore cancellazione email {message_id}: {e}", exc_info=True)
-            
-            parsed_results.append(parsed)
-            self._processed_repository.mark_processed(
+            for page in pages:
+                marks: List[tuple[str, Optional[str]]] = []
+                for message_id, parsed, history_id in page.items:
+                    if parsed.kind in CANCELLATION_KINDS:
+                        cancellations.append((message_id, parsed, history_id))
+                        continue
+
+                    if parsed.kind in CONFIRMATION_KINDS:
+                        checkpoint.confirmations += 1
+                        self._save_confirmation(message_id, parsed, host_id, firestore_client)
+                    elif parsed.kind == "unhandled":
+                        checkpoint.unhandled += 1
+                        logger.debug(f"[BACKFILL] Email non gestita: {message_id}, sender={parsed.metadata.sender}, subject={parsed.metadata.subject}")
+
+                    checkpoint.processed += 1
+                    if collect_results:
+                        parsed_results.append(parsed)
+                    marks.append((message_id, history_id))
+                # Un solo commit per pagina, prima del checkpoint che la dichiara salvata
+                if marks:
+                    self._processed_repository.mark_processed_many(email, marks)
+
+                checkpoint.pages += 1
+                checkpoint.page_token = page.next_page_token
+                checkpoint.listing_done = page.next_page_token is None
+                checkpoint.skipped += page.skipped
+                checkpoint.failed += page.failed
+                if checkpoint.estimated_total is None:
+                    checkpoint.estimated_total = page.result_size_estimate
+                checkpoint.pending_cancellation_ids = [message_id for message_id, _, _ in cancellations]
+                if on_checkpoint:
+                    on_checkpoint(checkpoint)
+            checkpoint.listing_done = True
+
+        logger.info(f"[BACKFILL] Processamento {len(cancellations)} email di CANCELLAZIONE...")
+        for message_id, parsed, history_id in cancellations:
+            self._save_cancellation(message_id, parsed, host_id)
+            checkpoint.cancellations += 1
+            checkpoint.processed += 1
+            if collect_results:
+                parsed_results.append(parsed)
+        if cancellations:
+            self._processed_repository.mark_processed_many(
                 email,
-                message_id,
-                history_id=payload.get("historyId"),
+                [(message_id, history_id) for message_id, _, history_id in cancellations],
             )
+        checkpoint.pending_cancellation_ids = []
+        if on_checkpoint:
+            on_checkpoint(checkpoint)
+
+        logger.info(f"[BACKFILL] ✅ Backfill completato: {checkpoint.processed} email processate, {checkpoint.confirmations} conferme, {checkpoint.cancellations} cancellazioni, {checkpoint.unhandled} unhandled, {checkpoint.skipped} già processate (skip), {checkpoint.failed} non scaricate")
+        return parsed_results
 
-        # FASE 4: Processa altre email (non Scidoo)
-        logger.info(f"[BACKFILL] FASE 4: Processamento {len(other)} altre email...")
-        for message_id, parsed, payload in other:
-            if parsed.kind == "unhandled":
-                unhandled_count += 1
-                logger.debug(f"[BACKFILL] Email non gestita: {message_id}, sender={parsed.metadata.sender}, subject={parsed.metadata.subject}")
+    def _load_pending_cancellations(
+        self,
+        host_id: str,
+        email: str,
+        checkpoint: BackfillCheckpoint,
+    ) -> List[tuple[str, ParsedEmail, Optional[str]]]:
+        """Riscarica e parsa le cancellazioni rimandate da un backfill interrotto."""
+        if not checkpoint.pending_cancellation_ids:
+            return []
+        logger.info(f"[BACKFILL] Ripresa: {len(checkpoint.pending_cancellation_ids)} cancellazioni in sospeso")
+        integration = self._load_integration(host_id, email)
+        payloads = self._gmail_service.get_messages_raw_batch(integration, checkpoint.pending_cancellation_ids)
+        page = BackfillPage(
+            items=[
+                (message_id, payloads[message_id], None)
+                for message_id in checkpoint.pending_cancellation_ids
+                if message_id in payloads
+            ],
+            next_page_token=None,
+        )
+        checkpoint.failed += len(checkpoint.pending_cancellation_ids) - len(page.items)
+        checkpoint.pending_cancellation_ids = []
+        return list(self._parse_page(page, relevant_only=False, airbnb_only=False).items)
+
+    def _save_confirmation(self, message_id: str, parsed: ParsedEmail, host_id: str, firestore_client=None) -> None:
+        logger.info(f"[BACKFILL] Email conferma trovata! Reservation ID: {parsed.reservation.reservation_id if parsed.reservation else 'N/A'}, Property: {parsed.reservation.property_name if parsed.reservation else 'N/A'}")
+        try:
+            save_result = self._persistence_service.save_parsed_email(
+                parsed_email=parsed, host_id=host_id
+            )
+            if save_result.get("saved"):
+                logger.info(f"[BACKFILL] ✅ Salvato: property_id={save_result.get('property_id')}, client_id={save_result.get('client_id')}, reservation_saved={save_result.get('reservation_saved')}")
+            else:
+                logger.warning(f"[BACKFILL] ❌ Salvataggio fallito: {save_result.get('reason')}, error={save_result.get('error')}")
             
-            parsed_results.append(parsed)
-            self._processed_repository.mark_processed(
-                email,
-                message_id,
-                history_id=payload.get("historyId"),
+            # Se la conferma contiene un messaggio del guest, processalo
+            if parsed.guest_message:
+                logger.info(f"[BACKFILL] 📧 Conferma contiene messaggio guest, processamento...")
+                try:
+                    from ..services.guest_message_pipeline import GuestMessagePipelineService
+                    
+                    # Usa il firestore_client passato come parametro
+                    if firestore_client:
+                        pipeline_service = GuestMessagePipelineService(firestore_client)
+                    
+                    # Verifica se deve essere processato (è un messaggio da nuova prenotazione)
+                    should_process, client_id = pipeline_service.should_process_message(parsed, host_id, is_new_reservation=True)
+                    if should_process and client_id:
+                        # Estrai contesto
+                        context = pipeline_service.extract_context(parsed, host_id, client_id)
+                        if context:
+                            # Salva messaggio in conversazione
+                            pipeline_service.save_guest_message(context, parsed, message_id)
+                            logger.info(f"[BACKFILL] ✅ Messaggio guest salvato in conversazione per client_id={client_id}")
+                        else:
+                            logger.warning(f"[BACKFILL] ⚠️ Contesto non trovato per messaggio guest")
+                    else:
+                        logger.info(f"[BACKFILL] ℹ️ Messaggio guest non processato (autoReplyEnabled={should_process}, client_id={client_id})")
+                except Exception as e:
+                    logger.error(f"[BACKFILL] ❌ Errore processamento messaggio guest: {e}", exc_info=True)
+        except Exception as e:
+            logger.error(f"[BACKFILL] ❌ Errore salvataggio email {message_id}: {e}", exc_info=True)
+
+    def _save_cancellation(self, message_id: str, parsed: ParsedEmail, host_id: str) -> None:
+        voucher_id = parsed.reservation.voucher_id if parsed.reservation else None
+        logger.info(f"[BACKFILL] Email Scidoo cancellazione trovata! Voucher ID: {voucher_id}")
+        try:
+            save_result = self._persistence_service.save_parsed_email(
+                parsed_email=parsed, host_id=host_id
             )
-
-        logger.info(f"[BACKFILL] ✅ Backfill completato: {len(parsed_results)} email processate, {len(confirmations)} conferme, {len(cancellations)} cancellazioni, {unhandled_count} unhandled, {skipped_count} già processate (skip)")
-        return parsed_results
+            if save_result.get("saved") and save_result.get("cancelled"):
+                logger.info(f"[BACKFILL] ✅ Prenotazione cancellata: voucher_id={save_result.get('voucher_id')}")
+            else:
+                logger.warning(f"[BACKFILL] ⚠️ Cancellazione fallita: {save_result.get('reason')}, voucher_id={save_result.get('voucher_id')}")
+        except Exception as e:
+            logger.error(f"[BACKFILL] ❌ Errore cancellazione email {message_id}: {e}", exc_info=True)
 
     def run_preview(
         self,
@@ -163,11 +304,13 @@ class GmailBackfillService:
         force: bool = False,
         firestore_client=None,
     ) -> GmailBackfillPreviewResponse:
+        # L'anteprima estrae i campi solo delle email che il backfill salva o il watch gestisce
         all_parsed, _ = self._fetch_parsed_items(
             host_id=host_id,
             email=email,
             force=force,
             firestore_client=firestore_client,
+            relevant_only=True,
         )
 
         properties_summary: dict[str, dict] = {}
@@ -229,28 +372,89 @@ class GmailBackfillService:
         email: str,
         force: bool = False,
         firestore_client=None,
-    ) -> tuple[List[tuple[str, ParsedEmail, dict]], int]:
-        integration = self._load_integration(host_id, email)
-
-        airbnb_only = False
-        if firestore_client:
-            try:
-                host_doc = firestore_client.collection("hosts").document(host_id).get()
-                if host_doc.exists:
-                    data = host_doc.to_dict()
-                    airbnb_only = data.get("airbnbOnly", False)
-            except Exception as e:
-                logger.warning(f"[BACKFILL] Errore recupero airbnbOnly per host {host_id}: {e}")
+        relevant_only: bool = False,
+    ) -> tuple[List[tuple[str, ParsedEmail, Optional[str]]], int]:
+        """Tutte le email della query di backfill parsate, più il numero di email saltate."""
+        items: List[tuple[str, ParsedEmail, Optional[str]]] = []
+        skipped_count = 0
+        pages = self._iter_parsed_pages(
+            host_id=host_id,
+            email=email,
+            force=force,
+            firestore_client=firestore_client,
+            relevant_only=relevant_only,
+        )
+        for page in pages:
+            items.extend(page.items)
+            skipped_count += page.skipped
+        return items, skipped_count
 
+    def _iter_parsed_pages(
+        self,
+        host_id: str,
+        email: str,
+        force: bool = False,
+        firestore_client=None,
+        relevant_only: bool = False,
+        page_token: Optional[str] = None,
+    ) -> Iterator[BackfillPage]:
+        """Scarica e parsa le pagine della query di backfill in streaming.
+
+        Pipeline a stadi collegati da code bounded (elenco, download batch, parsing, ognuno
+        nel proprio thread): il chiamante salva una pagina mentre le successive vengono
+        ancora elencate e scaricate. In memoria restano al più poche pagine e il payload raw
+        viene scartato subito dopo il parsing. `page_token` riprende l'elenco da una pagina
+        intermedia (checkpoint di un backfill interrotto).
+
+        Con `relevant_only=True` (anteprima) le email che non passano `is_preview_kind`
+        restano solo classificate (kind + metadata dagli header), senza estrazione dei
+        campi; senza, vengono estratti i campi delle conferme e cancellazioni salvate dal
+        backfill.
+        """
+        integration = self._load_integration(host_id, email)
+        airbnb_only = self._get_airbnb_only(host_id, firestore_client)
         query = self._build_query(airbnb_only)
+        # La query airbnbOnly filtra solo per mittente (include pagamenti, recensioni, ...):
+        # prima gli header e il raw solo per le email da parsare. La query normale filtra
+        # già per oggetto e un passaggio metadata costerebbe quota senza scartare nulla.
+        needs_body = (
+            partial(is_preview_kind if relevant_only else is_saved_kind, airbnb_only=airbnb_only)
+            if airbnb_only
+            else None
+        )
 
         logger.info(f"[BACKFILL] Inizio parsing email: host_id={host_id}, email={email}, airbnbOnly={airbnb_only}, force={force}")
         logger.info(f"[BACKFILL] Query Gmail: {query}")
 
-        all_parsed: List[tuple[str, ParsedEmail, dict]] = []
-        next_token: Optional[str] = None
-        skipped_count = 0
+        # Elenco pagine, download e parsing in tre stadi: la lista della pagina successiva,
+        # il download batch (concorrente, sul budget di quota della casella) e il parsing si
+        # sovrappongono
+        listed_pages = bounded_stage(
+            self._iter_listed_pages(integration, email, query, force, page_token),
+            maxsize=PIPELINE_QUEUE_PAGES,
+            name="backfill-list",
+        )
+        fetched_pages = bounded_stage(
+            (self._fetch_page(integration, page, needs_body) for page in listed_pages),
+            maxsize=PIPELINE_QUEUE_PAGES,
+            name="backfill-fetch",
+        )
+        yield from bounded_stage(
+            (self._parse_page(page, relevant_only, airbnb_only) for page in fetched_pages),
+            maxsize=PIPELINE_QUEUE_PAGES,
+            name="backfill-parse",
+        )
 
+    def _iter_listed_pages(
+        self,
+        integration: HostEmailIntegrationRecord,
+        email: str,
+        query: str,
+        force: bool,
+        page_token: Optional[str] = None,
+    ) -> Iterator[BackfillPage]:
+        """Stadio 1: pagine della query Gmail con gli id non ancora processati."""
+        next_token = page_token
         while True:
             response = self._gmail_service.list_messages(
                 integration,
@@ -260,33 +464,92 @@ class GmailBackfillService:
             messages = response.get("messages", [])
             logger.info(f"[BACKFILL] Trovate {len(messages)} email in questa pagina")
 
-            for message in messages:
-                message_id = message["id"]
-                if not force and self._processed_repository.was_processed(email, message_id):
-                    skipped_count += 1
-                    if skipped_count <= 5:
-                        logger.debug(f"[BACKFILL] Email {message_id} già processata, skip")
-                    continue
-
-                payload = self._gmail_service.get_message_raw(integration, message_id)
-                raw_data = decode_gmail_raw(payload["raw"])
-                snippet = payload.get("snippet")
-
-                parsed = self._engine.parse(
-                    message_id=message_id,
-                    raw_payload=raw_data,
-                    snippet=snippet,
-                )
-
-                logger.info(f"[BACKFILL] Email {message_id} parsata come: kind={parsed.kind}, subject={parsed.metadata.subject}")
-
-                all_parsed.append((message_id, parsed, payload))
+            message_ids = [message["id"] for message in messages]
+            # Una sola lettura Firestore (get_all) per l'intera pagina
+            page_ids = message_ids if force else self._processed_repository.filter_unprocessed(email, message_ids)
+            if len(page_ids) < len(message_ids):
+                logger.debug(f"[BACKFILL] {len(message_ids) - len(page_ids)} email già processate in questa pagina, skip")
 
             next_token = response.get("nextPageToken")
+            yield BackfillPage(
+                items=page_ids,
+                next_page_token=next_token,
+                skipped=len(messages) - len(page_ids),
+                result_size_estimate=response.get("resultSizeEstimate"),
+            )
             if not next_token:
                 break
 
-        return all_parsed, skipped_count
+    def _fetch_page(
+        self,
+        integration: HostEmailIntegrationRecord,
+        page: BackfillPage,
+        needs_body: Optional[Callable[[str], bool]] = None,
+    ) -> BackfillPage:
+        """Stadio 2: download degli id della pagina con richieste batch.
+
+        Con `needs_body` prima i soli header e il raw solo delle email il cui tipo lo
+        richiede; altrimenti il raw di tutte.
+        """
+        page_ids = page.items
+        if not page_ids:
+            downloads = {}
+        elif needs_body is None:
+            payloads = self._gmail_service.get_messages_raw_batch(integration, page_ids)
+            downloads = {message_id: (payload, None) for message_id, payload in payloads.items()}
+        else:
+            downloads = fetch_for_parsing(self._gmail_service, self._engine, integration, page_ids, needs_body)
+        page_payloads: List[tuple[str, dict, Optional[ParsedEmail]]] = [
+            (message_id, *downloads[message_id]) for message_id in page_ids if message_id in downloads
+        ]
+        if len(page_payloads) < len(page_ids):
+            # Non marcate come processate: verranno riprese dal prossimo backfill
+            logger.warning(f"[BACKFILL] {len(page_ids) - len(page_payloads)} email non scaricate in questa pagina")
+        return page._replace(items=page_payloads, failed=len(page_ids) - len(page_payloads))
+
+    def _parse_page(self, page: BackfillPage, relevant_only: bool, airbnb_only: bool) -> BackfillPage:
+        """Stadio 3: parsing di una pagina; del payload Gmail resta solo l'historyId.
+
+        Le email già classificate dagli header (body non scaricato) passano così come sono.
+        """
+        parsed_page: List[Optional[ParsedEmail]] = [classified for _, _, classified in page.items]
+        raw_indexes = [i for i, parsed in enumerate(parsed_page) if parsed is None]
+        raw_page = [
+            RawEmail(message_id, decode_gmail_raw(payload["raw"]), payload.get("snippet"))
+            for message_id, payload, _ in (page.items[i] for i in raw_indexes)
+        ]
+        if relevant_only:
+            parsed_raw = [
+                self._engine.classify(message_id=item.message_id, raw_payload=item.raw_payload, snippet=item.snippet)
+                for item in raw_page
+            ]
+            relevant = [i for i, parsed in enumerate(parsed_raw) if is_preview_kind(parsed.kind, airbnb_only)]
+            # Parsing delle sole email rilevanti in un colpo solo (eventualmente su più processi)
+            for i, parsed in zip(relevant, self._engine.parse_many(raw_page[i] for i in relevant)):
+                parsed_raw[i] = parsed
+        else:
+            # Parsing dell'intera pagina in un colpo solo (eventualmente su più processi)
+            parsed_raw = self._engine.parse_many(raw_page)
+        for i, parsed in zip(raw_indexes, parsed_raw):
+            parsed_page[i] = parsed
+
+        results: List[tuple[str, ParsedEmail, Optional[str]]] = []
+        for (message_id, payload, _), parsed in zip(page.items, parsed_page):
+            logger.info(f"[BACKFILL] Email {message_id} parsata come: kind={parsed.kind}, subject={parsed.metadata.subject}")
+            results.append((message_id, parsed, payload.get("historyId")))
+        return page._replace(items=results)
+
+    def _get_airbnb_only(self, host_id: str, firestore_client=None) -> bool:
+        if not firestore_client:
+            return False
+        try:
+            host_doc = firestore_client.collection("hosts").document(host_id).get()
+            if host_doc.exists:
+                data = host_doc.to_dict()
+                return data.get("airbnbOnly", False)
+        except Exception as e:
+            logger.warning(f"[BACKFILL] Errore recupero airbnbOnly per host {host_id}: {e}")
+        return False
 
     def _build_query(self, airbnb_only: bool = False) -> str:
         """
@@ -11,7 +11,7 @@ from firebase_admin import firestore
 
 from ..config.settings import get_settings
 from ..models.booking_reservation import BookingReservation
-from ..parsers.booking_reservation_parser import parse_ota_modify_xml, parse_ota_xml
+from ..parsers.booking_reservation_parser import iter_ota_modify_xml, iter_ota_xml
 from ..repositories.booking_property_mappings import BookingPropertyMappingsRepository
 from ..services.persistence_service import PersistenceService
 from ..services.integrations.booking_reservation_client import BookingReservationClient
@@ -154,20 +154,15 @@ class BookingReservationPollingService:
                 # Nessuna prenotazione nuova
                 return
             
-            # Parse XML
-            reservations = parse_ota_xml(xml_response)
-            
-            if not reservations:
-                logger.debug("[BookingReservationPolling] Nessuna prenotazione valida nell'XML")
-                return
-            
-            logger.info(f"[BookingReservationPolling] Trovate {len(reservations)} nuove prenotazioni")
-            
-            # Processa ogni prenotazione (ogni prenotazione può appartenere a host diversi)
+            # Parse XML in streaming: ogni prenotazione viene salvata appena estratta,
+            # senza costruire prima la lista completa (memoria limitata anche dopo un disservizio)
             reservation_ids_to_ack = []
             skipped_count = 0
+            found_count = 0
             
-            for reservation in reservations:
+            # Processa ogni prenotazione (ogni prenotazione può appartenere a host diversi)
+            for reservation in iter_ota_xml(xml_response):
+                found_count += 1
                 try:
                     # Trova host_id usando mapping
                     host_id = self._find_host_id_for_property(reservation.property_id)
@@ -213,6 +208,12 @@ class BookingReservationPollingService:
                     )
                     # Continua con le altre prenotazioni
             
+            if not found_count:
+                logger.debug("[BookingReservationPolling] Nessuna prenotazione valida nell'XML")
+                return
+            
+            logger.info(f"[BookingReservationPolling] Trovate {found_count} nuove prenotazioni")
+            
             if skipped_count > 0:
                 logger.warning(
                     f"[BookingReservationPolling] ⚠️ {skipped_count} prenotazioni saltate per mancanza di mapping"
@@ -248,22 +249,16 @@ class BookingReservationPollingService:
                 # Nessuna modifica
                 return
             
-            # Parse XML (formato HotelResModifyNotif)
-            reservations = parse_ota_modify_xml(xml_response)
-            
-            if not reservations:
-                logger.debug("[BookingReservationPolling] Nessuna prenotazione modificata valida nell'XML")
-                return
-            
-            logger.info(f"[BookingReservationPolling] Trovate {len(reservations)} prenotazioni modificate/cancellate")
-            
-            # Processa ogni prenotazione modificata
+            # Processa ogni prenotazione modificata mentre l'XML (formato HotelResModifyNotif)
+            # viene letto in streaming
             reservation_ids_to_ack = []
+            found_count = 0
             skipped_count = 0
             updated_count = 0
             cancelled_count = 0
             
-            for reservation in reservations:
+            for reservation in iter_ota_modify_xml(xml_response):
+                found_count += 1
                 try:
                     # Trova host_id usando mapping
                     host_id = self._find_host_id_for_property(reservation.property_id)
@@ -392,6 +387,12 @@ class BookingReservationPollingService:
                     )
                     # Continua con le altre prenotazioni
             
+            if not found_count:
+                logger.debug("[BookingReservationPolling] Nessuna prenotazione modificata valida nell'XML")
+                return
+            
+            logger.info(f"[BookingReservationPolling] Trovate {found_count} prenotazioni modificate/cancellate")
+            
             if skipped_count > 0:
                 logger.warning(
                     f"[BookingReservationPolling] ⚠️ {skipped_count} prenotazioni modificate saltate "
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+AIRBNB_KINDS = frozenset({"airbnb_confirmation", "airbnb_cancellation", "airbnb_message"})
+
+# Scidoo non è più supportato come sorgente di prenotazioni; le email non gestite
+# non vengono processate.
+RELEVANT_KINDS = frozenset({"booking_confirmation", "booking_message"}) | AIRBNB_KINDS
+
+
+def is_relevant_kind(kind: str, airbnb_only: bool) -> bool:
+    """
+    Verifica se un'email è rilevante in base al tipo e a airbnbOnly.
+
+    Regole:
+    - Se airbnb_only=True: solo email Airbnb (conferme, cancellazioni, messaggi)
+    - Se airbnb_only=False: email Booking e Airbnb (conferme, cancellazioni, messaggi)
+
+    Dipende solo da `kind`, quindi basta il risultato di `EmailParsingEngine.classify`:
+    l'estrazione completa va fatta solo sulle email rilevanti.
+    """
+    if airbnb_only:
+        return kind in AIRBNB_KINDS
+    return kind in RELEVANT_KINDS
@@ -0,0 +1,142 @@
+"""Pool dei client Gmail per casella: Resource, credenziali e trasporto HTTP riusati fra le chiamate."""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import google_auth_httplib2
+import httplib2
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import Resource, build
+from googleapiclient.http import HttpRequest
+
+from ..repositories.host_email_integrations import HostEmailIntegrationRecord
+
+# Un client inutilizzato da più di così viene ricostruito (rilegge i token da Firestore)
+DEFAULT_CLIENT_TTL_SECONDS = 30 * 60
+DEFAULT_MAX_CLIENTS = 256
+HTTP_TIMEOUT_SECONDS = 60
+
+
+def token_fingerprint(encrypted_access_token: str, encrypted_refresh_token: Optional[str]) -> str:
+    """Impronta dei token cifrati di un'integrazione, senza decifrarli."""
+    payload = f"{encrypted_access_token}\0{encrypted_refresh_token or ''}".encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def integration_fingerprint(integration: HostEmailIntegrationRecord) -> str:
+    return token_fingerprint(integration.encrypted_access_token, integration.encrypted_refresh_token)
+
+
+class GmailClient:
+    """Client Gmail di una casella: Resource, credenziali decifrate e trasporto HTTP.
+
+    Il Resource e le credenziali sono condivisi; il trasporto httplib2 (non thread-safe)
+    è uno per thread e mantiene la connessione keep-alive verso googleapis.com fra le
+    chiamate dello stesso thread.
+    """
+
+    def __init__(self, credentials: Credentials, fingerprint: str, created_at: float):
+        self.credentials = credentials
+        # Token con cui il client è valido: quello di origine più quelli scritti dopo un refresh
+        self.fingerprints = {fingerprint}
+        self.created_at = created_at
+        self.refresh_lock = threading.Lock()
+        self._local = threading.local()
+        self.resource: Resource = build(
+            "gmail",
+            "v1",
+            credentials=credentials,
+            cache_discovery=False,
+            requestBuilder=self._build_request,
+        )
+
+    @property
+    def http(self) -> google_auth_httplib2.AuthorizedHttp:
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = google_auth_httplib2.AuthorizedHttp(
+                self.credentials,
+                http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS),
+            )
+            self._local.http = http
+        return http
+
+    def _build_request(self, http, *args, **kwargs) -> HttpRequest:
+        # Ogni richiesta del Resource usa il trasporto del thread corrente
+        return HttpRequest(self.http, *args, **kwargs)
+
+
+class GmailClientPool:
+    """Client Gmail per casella con scadenza TTL ed eviction LRU.
+
+    Un client viene restituito solo se i token del record richiesto sono quelli con cui
+    è stato costruito (o scritti da lui dopo un refresh): una riconnessione OAuth o un
+    refresh fatto da un'altra istanza cambiano i token in Firestore e forzano la ricostruzione.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_CLIENT_TTL_SECONDS,
+        max_clients: int = DEFAULT_MAX_CLIENTS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._ttl_seconds = ttl_seconds
+        self._max_clients = max_clients
+        self._clock = clock
+        self._clients: OrderedDict[str, GmailClient] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def get(self, integration: HostEmailIntegrationRecord) -> Optional[GmailClient]:
+        fingerprint = integration_fingerprint(integration)
+        with self._lock:
+            client = self._clients.get(integration.email)
+            if client is None:
+                return None
+            if self._clock() - client.created_at > self._ttl_seconds:
+                del self._clients[integration.email]
+                return None
+            if fingerprint not in client.fingerprints:
+                return None
+            self._clients.move_to_end(integration.email)
+            return client
+
+    def create(self, integration: HostEmailIntegrationRecord, credentials: Credentials) -> GmailClient:
+        """Costruisce il client della casella e lo registra al posto di quello precedente."""
+        client = GmailClient(credentials, integration_fingerprint(integration), self._clock())
+        with self._lock:
+            self._clients[integration.email] = client
+            self._clients.move_to_end(integration.email)
+            while len(self._clients) > self._max_clients:
+                self._clients.popitem(last=False)
+        return client
+
+    def token_updated(self, email: str, fingerprint: str) -> None:
+        """Registra il token appena scritto in Firestore dal client della casella dopo un refresh.
+
+        Il client resta valido anche per i record letti prima del refresh, che hanno ancora
+        il vecchio token: le credenziali in memoria sono già quelle nuove.
+        """
+        with self._lock:
+            client = self._clients.get(email)
+            if client is not None:
+                client.fingerprints.add(fingerprint)
+
+    def invalidate(self, email: str) -> None:
+        with self._lock:
+            self._clients.pop(email, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+
+
+# Pool condiviso dal processo: GmailService viene istanziato a ogni richiesta
+GMAIL_CLIENTS = GmailClientPool()
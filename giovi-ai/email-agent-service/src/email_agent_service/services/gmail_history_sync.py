@@ -0,0 +1,108 @@
+"""Sincronizzazione incrementale della casella dalla history Gmail.
+
+`GmailHistorySync` segue tutte le pagine di `history.list` dallo startHistoryId e
+restituisce gli id dei nuovi messaggi in INBOX una pagina alla volta, così il chiamante
+può scaricarli e processarli mentre le pagine successive vengono richieste. Se Gmail
+non conserva più la history da quel punto (404, tipicamente dopo circa una settimana
+di inattività) ripiega su una ricerca `in:inbox` limitata agli ultimi
+`gmail_history_fallback_days` giorni: i messaggi già processati vengono poi scartati
+dal chiamante con `filter_unprocessed`.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterator, List, Optional
+
+from ..config.settings import get_settings
+from ..repositories.host_email_integrations import HostEmailIntegrationRecord
+from .gmail_service import GmailService, HistoryExpiredError
+from .watch_coalescer import max_history_id
+
+logger = logging.getLogger(__name__)
+
+# Messaggi per pagina della ricerca di ripiego (massimo di messages.list)
+FALLBACK_PAGE_SIZE = 500
+
+
+class GmailHistorySync:
+    def __init__(
+        self,
+        gmail_service: GmailService,
+        *,
+        fallback_days: Optional[int] = None,
+        clock: Callable[[], datetime] = lambda: datetime.now(timezone.utc),
+    ):
+        self._gmail_service = gmail_service
+        self._fallback_days = fallback_days if fallback_days is not None else get_settings().gmail_history_fallback_days
+        self._clock = clock
+        # Stato dell'ultima sincronizzazione, valido a iterazione completata
+        self.latest_history_id: Optional[str] = None
+        self.full_sync = False
+        self.pages = 0
+
+    def iter_message_id_pages(
+        self,
+        integration: HostEmailIntegrationRecord,
+        start_history_id: str,
+        label_id: Optional[str] = None,
+    ) -> Iterator[List[str]]:
+        """Id dei nuovi messaggi in INBOX, una lista per pagina Gmail (senza duplicati).
+
+        Con `label_id` la history comprende solo i messaggi con quella label (filtri OTA).
+        """
+        self.latest_history_id = None
+        self.full_sync = False
+        self.pages = 0
+        seen: set[str] = set()
+        try:
+            for page in self._gmail_service.iter_history(integration, start_history_id, label_id):
+                self.pages += 1
+                if page.get("historyId"):
+                    self.latest_history_id = max_history_id(self.latest_history_id, str(page["historyId"]))
+                message_ids = _added_inbox_ids(page, seen)
+                if message_ids:
+                    yield message_ids
+        except HistoryExpiredError:
+            if self.pages:
+                raise
+            logger.warning(
+                f"[WATCH] History scaduta per {integration.email} da historyId {start_history_id}: "
+                f"ricerca INBOX degli ultimi {self._fallback_days} giorni"
+            )
+            self.full_sync = True
+            yield from self._iter_window_pages(integration, seen)
+
+    def _iter_window_pages(self, integration: HostEmailIntegrationRecord, seen: set[str]) -> Iterator[List[str]]:
+        since = self._clock() - timedelta(days=self._fallback_days)
+        query = f"in:inbox after:{since.strftime('%Y/%m/%d')}"
+        page_token: Optional[str] = None
+        while True:
+            response = self._gmail_service.list_messages(
+                integration, query, page_token=page_token, max_results=FALLBACK_PAGE_SIZE
+            )
+            self.pages += 1
+            message_ids = []
+            for message in response.get("messages", []):
+                message_id = message.get("id")
+                if message_id and message_id not in seen:
+                    seen.add(message_id)
+                    message_ids.append(message_id)
+            if message_ids:
+                yield message_ids
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return
+
+
+def _added_inbox_ids(page: dict, seen: set[str]) -> List[str]:
+    message_ids = []
+    for record in page.get("history", []):
+        for added in record.get("messagesAdded", []):
+            message = added.get("message") or {}
+            message_id = message.get("id")
+            if not message_id or "INBOX" not in message.get("labelIds", []) or message_id in seen:
+                continue
+            seen.add(message_id)
+            message_ids.append(message_id)
+    return message_ids
@@ -0,0 +1,124 @@
+"""Label e filtri Gmail che separano le email OTA dal resto della casella.
+
+Il watch su tutta la INBOX fa arrivare una notifica Pub/Sub (e quindi lettura
+integrazione, history.list, controlli processed) per ogni newsletter. Con il
+provisioning la casella riceve una label dedicata (`INGEST_LABEL_NAME`) e un filtro
+Gmail per ogni dominio mittente gestito dai parser che la applica all'arrivo; il watch
+osserva solo quella label, così il carico segue il traffico OTA e non quello totale.
+
+I filtri vengono riconciliati con quelli effettivamente presenti in Gmail a ogni setup
+del watch: quelli di domini non più gestiti vengono rimossi e quelli mancanti creati,
+quindi un cambio dei SENDER_DOMAINS dei parser si applica al rinnovo successivo (o
+subito con `rebuild=True`). Senza lo scope gmail.settings.basic (integrazioni create
+prima del provisioning) o se il provisioning fallisce si resta sul watch della INBOX.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Iterable, List, Optional
+
+from googleapiclient.errors import HttpError
+
+from ..repositories import HostEmailIntegrationRepository
+from ..repositories.host_email_integrations import HostEmailIntegrationRecord
+from .gmail_service import GmailService
+
+logger = logging.getLogger(__name__)
+
+INGEST_LABEL_NAME = "Giovi AI/OTA"
+
+
+def filter_domains(sender_domains: Iterable[str]) -> List[str]:
+    """Domini per cui serve un filtro: un filtro `from:airbnb.com` copre già reply.airbnb.com."""
+    domains = sorted({domain.lower().strip(".") for domain in sender_domains if domain})
+    return [
+        domain
+        for domain in domains
+        if not any(domain.endswith(f".{parent}") for parent in domains if parent != domain)
+    ]
+
+
+class GmailIngestFilterProvisioner:
+    def __init__(
+        self,
+        gmail_service: GmailService,
+        integration_repository: HostEmailIntegrationRepository,
+    ):
+        self._gmail_service = gmail_service
+        self._integration_repository = integration_repository
+
+    def ensure(
+        self,
+        integration: HostEmailIntegrationRecord,
+        sender_domains: Iterable[str],
+        *,
+        rebuild: bool = False,
+    ) -> Optional[str]:
+        """Allinea label e filtri ai domini dei parser. Restituisce l'id della label da osservare.
+
+        None se la casella non consente di gestire i filtri o il provisioning fallisce per
+        qualsiasi motivo: il chiamante osserva la INBOX.
+        Con `rebuild=True` tutti i filtri della label vengono ricreati.
+        """
+        domains = filter_domains(sender_domains)
+        try:
+            label_id = self._gmail_service.get_or_create_label(integration, INGEST_LABEL_NAME)
+            filters = self._reconcile_filters(integration, label_id, domains, rebuild)
+        except Exception as e:
+            # Qualsiasi errore (scope mancante, filtro rifiutato, 5xx, rete) lascia il watch
+            # sulla INBOX: meglio notifiche in più che nessun watch
+            if isinstance(e, HttpError) and e.resp.status == 403:
+                logger.warning(
+                    f"[WATCH] ⚠️ Filtri Gmail non configurabili per {integration.email} (403): "
+                    f"watch sulla INBOX. Riconnettere l'integrazione per concedere gmail.settings.basic"
+                )
+            else:
+                logger.warning(
+                    f"[WATCH] ⚠️ Provisioning filtri Gmail fallito per {integration.email}: {e}. Watch sulla INBOX",
+                    exc_info=True,
+                )
+            if integration.ingest_filter:
+                self._integration_repository.update_ingest_filter(integration.email, None)
+                integration.ingest_filter = None
+            return None
+
+        state = {
+            "labelId": label_id,
+            "labelName": INGEST_LABEL_NAME,
+            "senderDomains": domains,
+            "filters": filters,
+        }
+        self._integration_repository.update_ingest_filter(integration.email, state)
+        integration.ingest_filter = state
+        logger.info(f"[WATCH] Label {INGEST_LABEL_NAME} ({label_id}) con {len(filters)} filtri per {integration.email}")
+        return label_id
+
+    def _reconcile_filters(
+        self,
+        integration: HostEmailIntegrationRecord,
+        label_id: str,
+        domains: List[str],
+        rebuild: bool,
+    ) -> dict:
+        """Dominio -> id del filtro Gmail che applica la label, dopo aver creato/rimosso il necessario."""
+        kept: dict = {}
+        for existing in self._gmail_service.list_filters(integration):
+            if label_id not in (existing.get("action") or {}).get("addLabelIds", []):
+                continue
+            domain = (existing.get("criteria") or {}).get("from", "").lower()
+            if rebuild or domain not in domains or domain in kept:
+                logger.info(f"[WATCH] Rimozione filtro Gmail {existing['id']} (from:{domain}) per {integration.email}")
+                self._gmail_service.delete_filter(integration, existing["id"])
+                continue
+            kept[domain] = existing["id"]
+
+        for domain in domains:
+            if domain in kept:
+                continue
+            kept[domain] = self._gmail_service.create_filter(
+                integration,
+                criteria={"from": domain},
+                action={"addLabelIds": [label_id]},
+            )
+            logger.info(f"[WATCH] Creato filtro Gmail from:{domain} per {integration.email}")
+        return kept
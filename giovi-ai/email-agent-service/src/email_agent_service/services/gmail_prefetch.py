@@ -0,0 +1,76 @@
+"""Download a due livelli: header prima, messaggio completo solo se un parser lo userà.
+
+`fetch_for_parsing` scarica in batch i soli header (`format=metadata`) degli id
+richiesti, li classifica con l'indice dei parser e scarica il raw solo per le email il
+cui tipo interessa al chiamante (`needs_body`). Per caselle in cui la maggior parte
+della posta non arriva dalle OTA si evita di trasferire il MIME completo (allegati
+compresi) di email che verrebbero comunque scartate.
+
+Un download metadata costa in quota quanto uno raw (5 unit): conviene quando la
+selezione a monte (es. history di tutta la INBOX) include molte email non gestite.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from ..models import ParsedEmail
+from ..parsers import EmailParsingEngine
+from ..repositories.host_email_integrations import HostEmailIntegrationRecord
+from .gmail_service import GmailService, metadata_headers
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_for_parsing(
+    gmail_service: GmailService,
+    engine: EmailParsingEngine,
+    integration: HostEmailIntegrationRecord,
+    message_ids: Iterable[str],
+    needs_body: Callable[[str], bool],
+    *,
+    strict: bool = False,
+) -> Dict[str, Tuple[dict, Optional[ParsedEmail]]]:
+    """Scarica gli id in due livelli.
+
+    Con `strict=True` gli errori temporanei rimasti dopo i retry sollevano
+    `GmailBatchIncompleteError` (vedi `GmailService.get_messages_raw_batch`).
+
+    Returns:
+        dict message_id -> (payload, classified). Con `classified` None il payload è il
+        messaggio raw da parsare; altrimenti è il payload metadata (historyId, snippet)
+        e `classified` contiene tipo e metadata ricavati dagli header. Gli id non
+        scaricabili (es. cancellati nel frattempo) non compaiono nel risultato.
+    """
+    message_ids = list(dict.fromkeys(message_ids))
+    if not message_ids:
+        return {}
+
+    metadata = gmail_service.get_messages_metadata_batch(integration, message_ids, strict=strict)
+    fetched: Dict[str, Tuple[dict, Optional[ParsedEmail]]] = {}
+    body_ids = []
+    for message_id in message_ids:
+        payload = metadata.get(message_id)
+        if payload is None:
+            continue
+        classified = engine.classify_headers(
+            message_id=message_id,
+            headers=metadata_headers(payload),
+            snippet=payload.get("snippet"),
+        )
+        if classified is None or needs_body(classified.kind):
+            body_ids.append(message_id)
+        else:
+            fetched[message_id] = (payload, classified)
+
+    if body_ids:
+        raw_payloads = gmail_service.get_messages_raw_batch(integration, body_ids, strict=strict)
+        for message_id in body_ids:
+            if message_id in raw_payloads:
+                fetched[message_id] = (raw_payloads[message_id], None)
+
+    logger.info(
+        f"[GMAIL_SERVICE] Prefetch header di {len(message_ids)} email per {integration.email}: "
+        f"{len(body_ids)} scaricate per intero"
+    )
+    return fetched
@@ -0,0 +1,130 @@
+"""Budget di quota unit Gmail per casella, condiviso da backfill e watch.
+
+Gmail limita ogni utente a un numero di quota unit al secondo (250 di default) e ogni
+metodo ne costa un numero diverso (`QUOTA_UNITS`). `QuotaBucket` è un token bucket a
+prenotazione: chi chiama `acquire` prenota subito le unit e attende il tempo necessario
+perché il bucket le rigeneri, quindi le richieste vengono servite in ordine di arrivo e
+un backfill con più worker non può affamare il watch della stessa casella.
+
+Sulle risposte di rate limit (429, 403 rateLimitExceeded) il ritmo viene dimezzato e poi
+recuperato linearmente in `RECOVERY_SECONDS` (AIMD).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict
+
+from googleapiclient.errors import HttpError
+
+# Costo in quota unit dei metodi Gmail usati dal servizio
+QUOTA_UNITS: Dict[str, int] = {
+    "messages.get": 5,
+    "messages.list": 5,
+    "messages.send": 100,
+    "history.list": 2,
+    "watch": 100,
+    "labels.list": 1,
+    "labels.create": 5,
+    "settings.filters.list": 1,
+    "settings.filters.create": 5,
+    "settings.filters.delete": 5,
+}
+
+DEFAULT_UNITS_PER_SECOND = 250
+# Dopo un rate limit il ritmo si riduce di questo fattore, senza scendere sotto il minimo
+RATE_LIMIT_BACKOFF = 0.5
+MIN_RATE_FRACTION = 0.1
+# Tempo per tornare dal ritmo minimo al budget pieno senza nuovi rate limit
+RECOVERY_SECONDS = 30.0
+
+_RATE_LIMIT_REASONS = (b"rateLimitExceeded", b"userRateLimitExceeded")
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """429, oppure 403 con reason di rate limit (Gmail usa entrambi)."""
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status == 429:
+        return True
+    content = error.content or b""
+    return error.resp.status == 403 and any(reason in content for reason in _RATE_LIMIT_REASONS)
+
+
+class QuotaBucket:
+    def __init__(
+        self,
+        units_per_second: float = DEFAULT_UNITS_PER_SECOND,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.max_rate = float(units_per_second)
+        self.rate = self.max_rate
+        # Burst massimo: un secondo di budget
+        self.capacity = self.max_rate
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, units: float) -> float:
+        """Prenota `units` e attende che siano disponibili. Restituisce i secondi di attesa.
+
+        Il saldo può andare in negativo (es. un batch da 500 unit): le prenotazioni
+        successive attendono anche il debito di quelle precedenti.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= units
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def penalize(self) -> None:
+        """Rate limit ricevuto da Gmail: dimezza il ritmo e azzera il credito accumulato."""
+        with self._lock:
+            self._refill()
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate * RATE_LIMIT_BACKOFF)
+            self._tokens = min(self._tokens, 0.0)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = max(0.0, now - self._updated)
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * elapsed / RECOVERY_SECONDS)
+
+
+class GmailQuotaRegistry:
+    """Un bucket per casella, creato al primo uso."""
+
+    def __init__(
+        self,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self._clock = clock
+        self._sleep = sleep
+        self._buckets: Dict[str, QuotaBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, email: str, units_per_second: float = DEFAULT_UNITS_PER_SECOND) -> QuotaBucket:
+        with self._lock:
+            bucket = self._buckets.get(email)
+            if bucket is None:
+                bucket = QuotaBucket(units_per_second, clock=self._clock, sleep=self._sleep)
+                self._buckets[email] = bucket
+            return bucket
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+# Budget condiviso dal processo: GmailService viene istanziato a ogni richiesta
+GMAIL_QUOTAS = GmailQuotaRegistry()
@@ -2,27 +2,79 @@ from __future__ import annotations
 
 import base64
 import logging
+import math
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timezone
-from typing import Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 
+import httplib2
+from google.auth.exceptions import TransportError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import Resource, build
+from googleapiclient.discovery import Resource
 from googleapiclient.errors import HttpError
 
 from ..config.settings import get_settings
 from ..repositories import HostEmailIntegrationRepository
 from ..repositories.host_email_integrations import HostEmailIntegrationRecord
-from ..utils.crypto import decrypt_optional_text, decrypt_text
+from ..utils.crypto import decrypt_optional_text, decrypt_text, encrypt_text
+from .gmail_client_pool import GMAIL_CLIENTS, GmailClient, GmailClientPool, token_fingerprint
+from .gmail_quota import GMAIL_QUOTAS, QUOTA_UNITS, GmailQuotaRegistry, is_rate_limit_error
 
 logger = logging.getLogger(__name__)
 
+# Worker dei batch condivisi dal processo: i thread restano vivi e riusano il proprio
+# trasporto HTTP keep-alive (vedi GmailClient.http)
+_BATCH_POOLS: dict[int, ThreadPoolExecutor] = {}
+_BATCH_POOLS_LOCK = threading.Lock()
+
+# Richieste per chiamata batch della Gmail API: oltre 50 Gmail risponde con 429 a raffica
+GMAIL_BATCH_LIMIT = 50
+# Sotto questa dimensione non conviene spezzare ulteriormente i batch fra i worker
+MIN_CONCURRENT_BATCH_SIZE = 10
+# Errori per singolo messaggio che vale la pena riprovare nel batch successivo (oltre ai rate limit 403)
+RETRYABLE_BATCH_STATUSES = {401, 429, 500, 503}
+# Errori di rete (timeout, connessione interrotta, refresh del token fallito): sempre riprovati
+TRANSPORT_ERRORS = (OSError, httplib2.HttpLib2Error, TransportError)
+# Header scaricati dal fetch `format=metadata`: bastano all'indice dei parser per classificare
+CLASSIFY_HEADERS = ["From", "Subject", "Date"]
+# Record history per pagina (massimo consentito da history.list)
+HISTORY_PAGE_SIZE = 500
+
+
+class HistoryExpiredError(Exception):
+    """Gmail non conserva più la history dallo startHistoryId richiesto (404 di history.list)."""
+
+    def __init__(self, start_history_id: str):
+        super().__init__(f"startHistoryId {start_history_id} non più disponibile")
+        self.start_history_id = start_history_id
+
+
+class GmailBatchIncompleteError(Exception):
+    """Messaggi di un batch ancora in errore temporaneo (5xx, rate limit, rete) dopo tutti i retry."""
+
+    def __init__(self, message_ids: List[str], results: Dict[str, dict]):
+        super().__init__(f"{len(message_ids)} messaggi non scaricati per errori temporanei")
+        self.message_ids = message_ids
+        # Messaggi scaricati comunque, per chi vuole usare il risultato parziale
+        self.results = results
+
 
 class GmailService:
-    def __init__(self, integration_repo: HostEmailIntegrationRepository):
+    def __init__(
+        self,
+        integration_repo: HostEmailIntegrationRepository,
+        client_pool: Optional[GmailClientPool] = None,
+        quotas: Optional[GmailQuotaRegistry] = None,
+    ):
         self._settings = get_settings()
         self._integration_repo = integration_repo
+        # Client (Resource + credenziali decifrate + trasporto HTTP) riusati fra le richieste
+        self._clients = client_pool if client_pool is not None else GMAIL_CLIENTS
+        # Budget di quota per casella condiviso da tutte le istanze (backfill e watch)
+        self._quotas = quotas if quotas is not None else GMAIL_QUOTAS
 
     def _build_credentials(self, integration: HostEmailIntegrationRecord) -> Credentials:
         access_token = decrypt_text(integration.encrypted_access_token)
@@ -44,9 +96,19 @@ class GmailService:
         
         return credentials
 
-    def _refresh_credentials_if_needed(self, integration: HostEmailIntegrationRecord, credentials: Credentials) -> None:
-        """Refresh delle credenziali se necessario, con retry e timeout più lunghi."""
-        if credentials.valid:
+    def _refresh_credentials_if_needed(
+        self,
+        integration: HostEmailIntegrationRecord,
+        credentials: Credentials,
+        *,
+        force: bool = False,
+    ) -> None:
+        """Refresh delle credenziali se necessario, con retry e timeout più lunghi.
+
+        Con un expiry noto (dopo il primo refresh) `credentials.valid` diventa falso pochi
+        minuti prima della scadenza: il refresh avviene solo a ridosso di essa.
+        """
+        if credentials.valid and not force:
             return
         
         if not credentials.refresh_token:
@@ -66,9 +128,13 @@ class GmailService:
                 
                 # Salva il nuovo token in Firestore
                 if credentials.token:
-                    from ..utils.crypto import encrypt_text
                     encrypted_token = encrypt_text(credentials.token)
                     self._integration_repo.update_access_token(integration.email, encrypted_token)
+                    # Il client in pool ha già le credenziali nuove: resta valido anche per il nuovo token
+                    self._clients.token_updated(
+                        integration.email,
+                        token_fingerprint(encrypted_token, integration.encrypted_refresh_token),
+                    )
                     logger.info("[GMAIL_SERVICE] Nuovo access token salvato in Firestore")
                 
                 return
@@ -81,12 +147,37 @@ class GmailService:
                     logger.error(f"[GMAIL_SERVICE] ❌ Refresh fallito dopo {max_retries} tentativi: {e}")
                     raise
 
+    def _client(self, integration: HostEmailIntegrationRecord) -> GmailClient:
+        client = self._clients.get(integration)
+        if client is None:
+            # Token decifrati e Resource costruito una volta per casella (fino al TTL del pool)
+            client = self._clients.create(integration, self._build_credentials(integration))
+        if not client.credentials.valid:
+            with client.refresh_lock:
+                # Un altro thread può aver già fatto il refresh mentre si attendeva il lock
+                self._refresh_credentials_if_needed(integration, client.credentials)
+        return client
+
     def _gmail(self, integration: HostEmailIntegrationRecord) -> Resource:
-        credentials = self._build_credentials(integration)
-        # Refresh delle credenziali se necessario prima di creare il service
-        self._refresh_credentials_if_needed(integration, credentials)
-        service = build("gmail", "v1", credentials=credentials, cache_discovery=False)
-        return service
+        return self._client(integration).resource
+
+    def _reset_client(self, integration: HostEmailIntegrationRecord) -> None:
+        """Dopo un 401: scarta il client in pool e ne crea uno con token appena rinnovato."""
+        self._clients.invalidate(integration.email)
+        client = self._clients.create(integration, self._build_credentials(integration))
+        with client.refresh_lock:
+            self._refresh_credentials_if_needed(integration, client.credentials, force=True)
+
+    def _consume_quota(self, integration: HostEmailIntegrationRecord, method: str, count: int = 1) -> None:
+        """Attende il budget di quota della casella per `count` chiamate a `method`."""
+        bucket = self._quotas.bucket(integration.email, self._settings.gmail_quota_units_per_second)
+        waited = bucket.acquire(QUOTA_UNITS[method] * count)
+        if waited > 1:
+            logger.info(f"[GMAIL_SERVICE] Quota {integration.email}: attesa {waited:.1f}s per {count}x {method}")
+
+    def _rate_limited(self, integration: HostEmailIntegrationRecord) -> None:
+        logger.warning(f"[GMAIL_SERVICE] ⚠️ Rate limit Gmail per {integration.email}, riduzione del ritmo")
+        self._quotas.bucket(integration.email, self._settings.gmail_quota_units_per_second).penalize()
 
     def list_messages(
         self,
@@ -105,13 +196,17 @@ class GmailService:
                     .messages()
                     .list(userId="me", q=query, pageToken=page_token, maxResults=max_results)
                 )
+                self._consume_quota(integration, "messages.list")
                 return request.execute()
             except HttpError as e:
+                if is_rate_limit_error(e) and attempt < max_retries - 1:
+                    self._rate_limited(integration)
+                    time.sleep(2 ** attempt)
+                    continue
                 if e.resp.status == 401 and attempt < max_retries - 1:
                     # Token scaduto, prova a refreshare e riprova
                     logger.warning(f"[GMAIL_SERVICE] 401 Unauthorized (tentativo {attempt + 1}), refresh token e retry...")
-                    credentials = self._build_credentials(integration)
-                    self._refresh_credentials_if_needed(integration, credentials)
+                    self._reset_client(integration)
                     time.sleep(1)
                     continue
                 raise
@@ -127,18 +222,20 @@ class GmailService:
         for attempt in range(max_retries):
             try:
                 gmail = self._gmail(integration)
-                return (
-                    gmail.users()
-                    .messages()
-                    .get(userId="me", id=message_id, format="raw", metadataHeaders=["Subject"])
-                    .execute()
+                request = gmail.users().messages().get(
+                    userId="me", id=message_id, format="raw", metadataHeaders=["Subject"]
                 )
+                self._consume_quota(integration, "messages.get")
+                return request.execute()
             except HttpError as e:
+                if is_rate_limit_error(e) and attempt < max_retries - 1:
+                    self._rate_limited(integration)
+                    time.sleep(2 ** attempt)
+                    continue
                 if e.resp.status == 401 and attempt < max_retries - 1:
                     # Token scaduto, prova a refreshare e riprova
                     logger.warning(f"[GMAIL_SERVICE] 401 Unauthorized per message {message_id} (tentativo {attempt + 1}), refresh token e retry...")
-                    credentials = self._build_credentials(integration)
-                    self._refresh_credentials_if_needed(integration, credentials)
+                    self._reset_client(integration)
                     time.sleep(1)
                     continue
                 raise
@@ -149,6 +246,162 @@ class GmailService:
                     continue
                 raise
 
+    def get_messages_raw_batch(
+        self,
+        integration: HostEmailIntegrationRecord,
+        message_ids: Iterable[str],
+        *,
+        batch_size: int = GMAIL_BATCH_LIMIT,
+        workers: Optional[int] = None,
+        strict: bool = False,
+    ) -> Dict[str, dict]:
+        """Scarica in formato raw più messaggi con il batch endpoint di Gmail.
+
+        Una richiesta HTTP ogni `batch_size` messaggi (al massimo GMAIL_BATCH_LIMIT) invece
+        di una per messaggio; fino a `workers` batch (default GMAIL_FETCH_WORKERS) sono in
+        volo insieme, ciascuno dopo aver prenotato le proprie quota unit sul budget della
+        casella. I messaggi falliti con 401/429/403 rate limit/5xx vengono riprovati in un
+        nuovo giro (dopo il rinnovo del token o con ritmo ridotto e backoff); quelli che
+        falliscono in modo definitivo (es. 404 se cancellati nel frattempo) non compaiono
+        nel risultato. Con `strict=True` i messaggi ancora in errore temporaneo dopo
+        l'ultimo giro sollevano `GmailBatchIncompleteError` invece di essere omessi.
+
+        Returns:
+            dict message_id -> payload, come restituito da `get_message_raw`
+        """
+        return self._get_messages_batch(
+            integration,
+            message_ids,
+            {"format": "raw", "metadataHeaders": ["Subject"]},
+            batch_size=batch_size,
+            workers=workers,
+            strict=strict,
+        )
+
+    def get_messages_metadata_batch(
+        self,
+        integration: HostEmailIntegrationRecord,
+        message_ids: Iterable[str],
+        *,
+        headers: Optional[List[str]] = None,
+        batch_size: int = GMAIL_BATCH_LIMIT,
+        workers: Optional[int] = None,
+        strict: bool = False,
+    ) -> Dict[str, dict]:
+        """Come `get_messages_raw_batch` ma in `format=metadata`: solo header richiesti, snippet e label.
+
+        Poche centinaia di byte per messaggio invece dell'intero MIME: serve a classificare
+        le email prima di decidere quali scaricare per intero (vedi `metadata_headers`).
+        """
+        return self._get_messages_batch(
+            integration,
+            message_ids,
+            {"format": "metadata", "metadataHeaders": headers or CLASSIFY_HEADERS},
+            batch_size=batch_size,
+            workers=workers,
+            strict=strict,
+        )
+
+    def _get_messages_batch(
+        self,
+        integration: HostEmailIntegrationRecord,
+        message_ids: Iterable[str],
+        request_args: dict,
+        *,
+        batch_size: int,
+        workers: Optional[int],
+        strict: bool = False,
+    ) -> Dict[str, dict]:
+        workers = max(1, workers if workers is not None else self._settings.gmail_fetch_workers)
+        pending: List[str] = list(dict.fromkeys(message_ids))
+        results: Dict[str, dict] = {}
+        max_retries = 3
+        retry_delay = 1  # secondi
+
+        for attempt in range(max_retries):
+            chunks = self._split_batches(pending, batch_size, workers)
+            errors: Dict[str, Exception] = {}
+            if len(chunks) <= 1 or workers == 1:
+                outcomes = [self._execute_batch(integration, chunk, request_args) for chunk in chunks]
+            else:
+                pool = _get_batch_pool(workers)
+                outcomes = list(pool.map(lambda chunk: self._execute_batch(integration, chunk, request_args), chunks))
+            for chunk_results, chunk_errors in outcomes:
+                results.update(chunk_results)
+                errors.update(chunk_errors)
+
+            retryable = [message_id for message_id, error in errors.items() if _is_retryable(error)]
+            for message_id, error in errors.items():
+                if not _is_retryable(error):
+                    logger.warning(f"[GMAIL_SERVICE] ⚠️ Message {message_id} non scaricato: {error}")
+            if not retryable:
+                break
+            if attempt == max_retries - 1:
+                logger.error(f"[GMAIL_SERVICE] ❌ {len(retryable)} messaggi non scaricati dopo {max_retries} tentativi batch")
+                if strict:
+                    raise GmailBatchIncompleteError(retryable, results)
+                break
+
+            if any(_error_status(errors[message_id]) == 401 for message_id in retryable):
+                logger.warning(f"[GMAIL_SERVICE] 401 Unauthorized nel batch (tentativo {attempt + 1}), refresh token e retry...")
+                self._reset_client(integration)
+            if any(is_rate_limit_error(errors[message_id]) for message_id in retryable):
+                self._rate_limited(integration)
+            logger.warning(f"[GMAIL_SERVICE] Retry batch di {len(retryable)} messaggi tra {retry_delay}s (tentativo {attempt + 1})")
+            time.sleep(retry_delay)
+            retry_delay *= 2  # Exponential backoff
+            pending = retryable
+
+        return results
+
+    @staticmethod
+    def _split_batches(message_ids: List[str], batch_size: int, workers: int) -> List[List[str]]:
+        """Chunk per il batch endpoint: abbastanza piccoli da occupare tutti i worker."""
+        if not message_ids:
+            return []
+        size = max(1, min(batch_size, GMAIL_BATCH_LIMIT))
+        if workers > 1:
+            size = min(size, max(MIN_CONCURRENT_BATCH_SIZE, math.ceil(len(message_ids) / workers)))
+        return [message_ids[start:start + size] for start in range(0, len(message_ids), size)]
+
+    def _execute_batch(
+        self,
+        integration: HostEmailIntegrationRecord,
+        message_ids: List[str],
+        request_args: dict,
+    ) -> tuple[Dict[str, dict], Dict[str, Exception]]:
+        """Esegue un singolo batch: successi ed errori per messaggio."""
+        results: Dict[str, dict] = {}
+        errors: Dict[str, Exception] = {}
+        gmail = self._gmail(integration)
+
+        def on_response(request_id: str, response: Optional[dict], exception: Optional[Exception]) -> None:
+            if exception is not None:
+                errors[request_id] = exception
+            else:
+                results[request_id] = response
+
+        batch = gmail.new_batch_http_request(callback=on_response)
+        for message_id in message_ids:
+            batch.add(
+                gmail.users().messages().get(userId="me", id=message_id, **request_args),
+                request_id=message_id,
+            )
+        # Ogni richiesta del batch consuma quota come una chiamata singola
+        self._consume_quota(integration, "messages.get", len(message_ids))
+        try:
+            batch.execute()
+        except HttpError as e:
+            # Errore dell'intera richiesta batch: vale per tutti i messaggi del chunk
+            for message_id in message_ids:
+                errors.setdefault(message_id, e)
+        except TRANSPORT_ERRORS as e:
+            logger.warning(f"[GMAIL_SERVICE] Errore di rete nel batch di {len(message_ids)} messaggi ({e}), retry...")
+            for message_id in message_ids:
+                if message_id not in results:
+                    errors.setdefault(message_id, e)
+        return results, errors
+
     def get_integration(self, email: str) -> Optional[HostEmailIntegrationRecord]:
         return self._integration_repo.get_by_email(email)
 
@@ -156,6 +409,7 @@ class GmailService:
         self,
         integration: HostEmailIntegrationRecord,
         topic_name: str,
+        label_ids: Optional[List[str]] = None,
     ) -> dict:
         """
         Configura Gmail watch per ricevere notifiche via Pub/Sub.
@@ -163,15 +417,17 @@ class GmailService:
         Args:
             integration: Record integrazione Gmail
             topic_name: Nome completo del topic Pub/Sub (es: projects/PROJECT_ID/topics/TOPIC_NAME)
+            label_ids: Label da osservare (default INBOX)
         
         Returns:
             dict con historyId e expiration (millisecondi)
         """
         gmail = self._gmail(integration)
+        self._consume_quota(integration, "watch")
         request = gmail.users().watch(
             userId="me",
             body={
-                "labelIds": ["INBOX"],
+                "labelIds": label_ids or ["INBOX"],
                 "topicName": topic_name,
             },
         )
@@ -181,28 +437,120 @@ class GmailService:
             "expiration": response.get("expiration"),  # Millisecondi da epoch
         }
 
+    def get_or_create_label(self, integration: HostEmailIntegrationRecord, name: str) -> str:
+        """Id della label utente `name`, creata se non esiste."""
+        gmail = self._gmail(integration)
+        self._consume_quota(integration, "labels.list")
+        labels = gmail.users().labels().list(userId="me").execute().get("labels", [])
+        for label in labels:
+            if label.get("name") == name:
+                return label["id"]
+        self._consume_quota(integration, "labels.create")
+        created = gmail.users().labels().create(
+            userId="me",
+            body={"name": name, "labelListVisibility": "labelShow", "messageListVisibility": "show"},
+        ).execute()
+        logger.info(f"[GMAIL_SERVICE] Creata label {name} ({created['id']}) per {integration.email}")
+        return created["id"]
+
+    def list_filters(self, integration: HostEmailIntegrationRecord) -> List[dict]:
+        gmail = self._gmail(integration)
+        self._consume_quota(integration, "settings.filters.list")
+        return gmail.users().settings().filters().list(userId="me").execute().get("filter", [])
+
+    def create_filter(self, integration: HostEmailIntegrationRecord, criteria: dict, action: dict) -> str:
+        gmail = self._gmail(integration)
+        self._consume_quota(integration, "settings.filters.create")
+        created = gmail.users().settings().filters().create(
+            userId="me",
+            body={"criteria": criteria, "action": action},
+        ).execute()
+        return created["id"]
+
+    def delete_filter(self, integration: HostEmailIntegrationRecord, filter_id: str) -> None:
+        gmail = self._gmail(integration)
+        self._consume_quota(integration, "settings.filters.delete")
+        try:
+            gmail.users().settings().filters().delete(userId="me", id=filter_id).execute()
+        except HttpError as e:
+            # Già rimosso (es. dall'utente dalle impostazioni di Gmail)
+            if e.resp.status != 404:
+                raise
+
     def get_history(
         self,
         integration: HostEmailIntegrationRecord,
         start_history_id: str,
+        *,
+        page_token: Optional[str] = None,
+        label_id: Optional[str] = None,
     ) -> dict:
         """
-        Recupera history Gmail da un historyId specifico.
+        Recupera una pagina di history Gmail da un historyId specifico.
         
         Args:
             integration: Record integrazione Gmail
             start_history_id: History ID da cui iniziare
+            page_token: nextPageToken della pagina precedente
+            label_id: Solo i messaggi con questa label (es. la label dei filtri OTA)
         
         Returns:
-            dict con history records
+            dict con history records, nextPageToken e historyId corrente della casella
+
+        Raises:
+            HistoryExpiredError: se start_history_id è troppo vecchio (Gmail risponde 404)
         """
-        gmail = self._gmail(integration)
-        request = gmail.users().history().list(
-            userId="me",
-            startHistoryId=start_history_id,
-            historyTypes=["messageAdded"],
-        )
-        return request.execute()
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                gmail = self._gmail(integration)
+                request = gmail.users().history().list(
+                    userId="me",
+                    startHistoryId=start_history_id,
+                    historyTypes=["messageAdded"],
+                    labelId=label_id,
+                    pageToken=page_token,
+                    maxResults=HISTORY_PAGE_SIZE,
+                )
+                self._consume_quota(integration, "history.list")
+                return request.execute()
+            except HttpError as e:
+                if e.resp.status == 404:
+                    raise HistoryExpiredError(start_history_id) from e
+                if is_rate_limit_error(e) and attempt < max_retries - 1:
+                    self._rate_limited(integration)
+                    time.sleep(2 ** attempt)
+                    continue
+                if e.resp.status == 401 and attempt < max_retries - 1:
+                    logger.warning(f"[GMAIL_SERVICE] 401 Unauthorized su history (tentativo {attempt + 1}), refresh token e retry...")
+                    self._reset_client(integration)
+                    time.sleep(1)
+                    continue
+                raise
+            except Exception as e:
+                if "timeout" in str(e).lower() and attempt < max_retries - 1:
+                    logger.warning(f"[GMAIL_SERVICE] Timeout su history (tentativo {attempt + 1}), retry...")
+                    time.sleep(2)
+                    continue
+                raise
+
+    def iter_history(
+        self,
+        integration: HostEmailIntegrationRecord,
+        start_history_id: str,
+        label_id: Optional[str] = None,
+    ) -> Iterator[dict]:
+        """Tutte le pagine di history da start_history_id, seguendo nextPageToken.
+
+        Le pagine vengono richieste una alla volta mentre il chiamante le consuma.
+        """
+        page_token: Optional[str] = None
+        while True:
+            page = self.get_history(integration, start_history_id, page_token=page_token, label_id=label_id)
+            yield page
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                return
 
     def send_reply(
         self,
@@ -260,6 +608,7 @@ class GmailService:
         
         # Invia tramite Gmail API
         gmail = self._gmail(integration)
+        self._consume_quota(integration, "messages.send")
         request = gmail.users().messages().send(
             userId="me",
             body={"raw": base64_encoded},
@@ -271,3 +620,31 @@ class GmailService:
             "threadId": response.get("threadId"),
         }
 
+
+def metadata_headers(payload: dict) -> List[tuple[str, str]]:
+    """Coppie (nome, valore) degli header di un messaggio scaricato in `format=metadata`."""
+    return [
+        (header.get("name", ""), header.get("value", ""))
+        for header in (payload.get("payload") or {}).get("headers", [])
+    ]
+
+
+def _get_batch_pool(workers: int) -> ThreadPoolExecutor:
+    with _BATCH_POOLS_LOCK:
+        pool = _BATCH_POOLS.get(workers)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gmail-batch")
+            _BATCH_POOLS[workers] = pool
+        return pool
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, TRANSPORT_ERRORS):
+        return True
+    return _error_status(error) in RETRYABLE_BATCH_STATUSES or is_rate_limit_error(error)
+
+
+def _error_status(error: Exception) -> Optional[int]:
+    if isinstance(error, HttpError):
+        return error.resp.status
+    return None
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import logging
-from typing import Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 from firebase_admin import firestore
 
@@ -9,13 +9,22 @@ from ..models import ParsedEmail
 from ..parsers import EmailParsingEngine
 from ..parsers.engine import decode_gmail_raw
 from ..repositories import HostEmailIntegrationRepository, ProcessedMessageRepository
+from ..repositories.host_email_integrations import HostEmailIntegrationRecord
 from ..services.gmail_service import GmailService
 from ..services.persistence_service import PersistenceService
 from ..services.guest_message_pipeline import GuestMessageContext, GuestMessagePipelineService
 from ..services.gemini_service import GeminiService
+from .email_relevance import is_relevant_kind
+from .gmail_prefetch import fetch_for_parsing
+from .gmail_history_sync import GmailHistorySync
+from .pipeline import bounded_stage
+from .watch_coalescer import max_history_id
 
 logger = logging.getLogger(__name__)
 
+# Pagine di nuovi messaggi scaricate in anticipo rispetto a quella in elaborazione
+WATCH_PIPELINE_PAGES = 2
+
 
 class GmailWatchService:
     """Service per processare notifiche Gmail Watch e nuove email."""
@@ -97,222 +106,231 @@ class GmailWatchService:
         except (ValueError, TypeError):
             logger.warning(f"[WATCH] History ID non numerici, procedo comunque")
 
-        # Recupera history da Gmail
+        # Sincronizza tutte le pagine di history (o la ricerca di ripiego se la history è
+        # scaduta): ogni pagina di nuovi messaggi viene scaricata mentre la precedente è
+        # ancora in elaborazione
+        sync = GmailHistorySync(self._gmail_service)
+        # Con i filtri OTA attivi basta la history della loro label
+        label_id = (integration.ingest_filter or {}).get("labelId")
+        processed_count = 0
+        skipped_count = 0
         try:
-            history_response = self._gmail_service.get_history(integration, start_history_id)
+            fetched = bounded_stage(
+                self._fetch_new_messages(
+                    integration,
+                    email,
+                    airbnb_only,
+                    sync.iter_message_id_pages(integration, start_history_id, label_id),
+                ),
+                maxsize=WATCH_PIPELINE_PAGES,
+                name=f"watch-fetch-{email}",
+            )
+            for message_ids, downloads, already_processed in fetched:
+                skipped_count += already_processed
+                for message_id in message_ids:
+                    download = downloads.get(message_id)
+                    if download is not None:
+                        # Marca come processata subito prima di elaborarla, per evitare
+                        # duplicazioni in caso di notifiche multiple/race: vale anche per
+                        # quelle poi scartate o fallite. Un errore successivo perde al più
+                        # questa email, non le pagine già scaricate in anticipo. Quelle non
+                        # scaricate in modo definitivo (es. cancellate) non vengono marcate.
+                        self._processed_repository.mark_processed(email, message_id, history_id=notified_history_id)
+                    status = self._process_message(
+                        integration,
+                        host_id,
+                        airbnb_only,
+                        message_id,
+                        download,
+                    )
+                    if status == "processed":
+                        processed_count += 1
+                    elif status == "skipped":
+                        skipped_count += 1
         except Exception as e:
-            logger.error(f"[WATCH] Errore recupero history per {email}: {e}", exc_info=True)
+            # lastHistoryIdProcessed resta invariato: il prossimo passaggio riparte dallo
+            # stesso punto e i messaggi già visti vengono scartati come processati
+            logger.error(f"[WATCH] Errore sincronizzazione history per {email}: {e}", exc_info=True)
             return
 
-        history_records = history_response.get("history", [])
-        if not history_records:
-            logger.info(f"[WATCH] Nessuna nuova email trovata per {email}")
-            return
+        logger.info(
+            f"[WATCH] History sincronizzata per {email}: {sync.pages} pagine"
+            + (" (ricerca di ripiego, history scaduta)" if sync.full_sync else "")
+        )
 
-        logger.info(f"[WATCH] Trovate {len(history_records)} record history per {email}")
+        # Aggiorna lastHistoryIdProcessed solo a sincronizzazione completa, fino al più
+        # recente fra l'historyId notificato e quello riportato da Gmail nelle pagine lette
+        self._update_last_history_id(email, max_history_id(sync.latest_history_id, notified_history_id))
 
-        # Processa ogni nuova email
-        processed_count = 0
-        skipped_count = 0
+        logger.info(
+            f"[WATCH] ✅ Processamento completato per {email}: "
+            f"{processed_count} processate, {skipped_count} saltate"
+        )
 
-        for record in history_records:
-            messages_added = record.get("messagesAdded", [])
-            for msg_added in messages_added:
-                message = msg_added.get("message")
-                if not message:
-                    continue
-
-                message_id = message.get("id")
-                label_ids = message.get("labelIds", [])
-
-                # Processa solo email in INBOX
-                if "INBOX" not in label_ids:
-                    continue
-
-                # Verifica se già processata
-                if self._processed_repository.was_processed(email, message_id):
-                    skipped_count += 1
-                    continue
-
-                # Marca SUBITO come processata per evitare duplicazioni in caso di notifiche multiple/race
-                # Nota: preferiamo evitare risposte duplicate anche se un eventuale errore successivo
-                # impedisse il completamento del flusso.
-                self._processed_repository.mark_processed(
-                    email,
-                    message_id,
-                    history_id=notified_history_id,
+    def _fetch_new_messages(
+        self,
+        integration: HostEmailIntegrationRecord,
+        email: str,
+        airbnb_only: bool,
+        message_id_pages: Iterable[List[str]],
+    ) -> Iterator[Tuple[List[str], Dict[str, Tuple[dict, Optional[ParsedEmail]]], int]]:
+        """Per ogni pagina di id: scarta i già processati e scarica in batch i nuovi.
+
+        Prima gli header di tutti, poi il raw solo delle email rilevanti per airbnbOnly.
+        Le email vengono marcate come processate dal consumatore, una alla volta: questo
+        stadio scarica fino a WATCH_PIPELINE_PAGES pagine in anticipo. Un download fallito
+        per errori temporanei interrompe la sincronizzazione: lastHistoryIdProcessed non
+        avanza e il passaggio successivo riprende le stesse email.
+        """
+        for page_ids in message_id_pages:
+            # Un solo get_all per la pagina (più la cache del processo)
+            new_message_ids = self._processed_repository.filter_unprocessed(email, page_ids)
+
+            # Scarica le nuove email con richieste batch invece di una richiesta per messaggio
+            downloads: Dict[str, Tuple[dict, Optional[ParsedEmail]]] = {}
+            if new_message_ids:
+                downloads = fetch_for_parsing(
+                    self._gmail_service,
+                    self._parsing_engine,
+                    integration,
+                    new_message_ids,
+                    lambda kind: is_relevant_kind(kind, airbnb_only),
+                    strict=True,
                 )
+            yield new_message_ids, downloads, len(page_ids) - len(new_message_ids)
 
-                # Estrai e processa email
-                try:
-                    payload = self._gmail_service.get_message_raw(integration, message_id)
-                    raw_data = decode_gmail_raw(payload["raw"])
-                    snippet = payload.get("snippet")
-
-                    # Parsa email
-                    parsed = self._parsing_engine.parse(
-                        message_id=message_id,
-                        raw_payload=raw_data,
-                        snippet=snippet,
-                    )
+    def _process_message(
+        self,
+        integration: HostEmailIntegrationRecord,
+        host_id: str,
+        airbnb_only: bool,
+        message_id: str,
+        download: Optional[Tuple[dict, Optional[ParsedEmail]]],
+    ) -> str:
+        """Classifica, salva ed eventualmente risponde a una nuova email. Restituisce processed, skipped o failed."""
+        try:
+            if download is None:
+                raise ValueError(f"Email {message_id} non scaricata da Gmail")
+            payload, header_classified = download
+            if header_classified is not None:
+                # Già scartata dagli header (già marcata come processata): il body non è stato scaricato
+                logger.debug(f"[WATCH] Email {message_id} ({header_classified.kind}) non rilevante per airbnbOnly={airbnb_only}, skip")
+                return "skipped"
+            raw_data = decode_gmail_raw(payload["raw"])
+            snippet = payload.get("snippet")
+
+            # Classifica dai soli header: l'estrazione completa solo se l'email è rilevante
+            classified = self._parsing_engine.classify(
+                message_id=message_id,
+                raw_payload=raw_data,
+                snippet=snippet,
+            )
 
-                    logger.info(f"[WATCH] Email {message_id} parsata: kind={parsed.kind}, sender={parsed.metadata.sender}")
+            # Verifica se email è rilevante (filtro in base a airbnbOnly)
+            if not is_relevant_kind(classified.kind, airbnb_only):
+                logger.debug(f"[WATCH] Email {message_id} ({classified.kind}) non rilevante per airbnbOnly={airbnb_only}, skip")
+                return "skipped"
 
-                    # Verifica se email è rilevante (filtro in base a airbnbOnly)
-                    if not self._is_email_relevant(parsed, airbnb_only):
-                        logger.debug(f"[WATCH] Email {message_id} non rilevante per airbnbOnly={airbnb_only}, skip")
-                        # Marca come processata comunque per evitare riprocessamento
-                        self._processed_repository.mark_processed(
-                            email,
-                            message_id,
-                            history_id=notified_history_id,
-                        )
-                        skipped_count += 1
-                        continue
+            parsed = self._parsing_engine.parse(
+                message_id=message_id,
+                raw_payload=raw_data,
+                snippet=snippet,
+            )
 
-                    # Salva in Firestore (solo se è rilevante)
-                    if parsed.kind != "unhandled":
-                        save_result = self._persistence_service.save_parsed_email(
+            logger.info(f"[WATCH] Email {message_id} parsata: kind={parsed.kind}, sender={parsed.metadata.sender}")
+
+            # Salva in Firestore (solo se è rilevante)
+            if parsed.kind != "unhandled":
+                save_result = self._persistence_service.save_parsed_email(
+                    parsed_email=parsed,
+                    host_id=host_id,
+                )
+                if save_result.get("saved"):
+                    logger.info(f"[WATCH] ✅ Email salvata: {message_id}")
+                else:
+                    logger.warning(f"[WATCH] ⚠️ Salvataggio fallito: {save_result.get('reason')}")
+
+            # Step 6: Processa messaggi guest per AI reply (se auto-reply abilitato)
+            if parsed.kind in ["booking_message", "airbnb_message"]:
+                should_process, client_id = self._guest_pipeline.should_process_message(
+                    parsed_email=parsed,
+                    host_id=host_id,
+                )
+                if should_process and client_id:
+                    context = self._guest_pipeline.extract_context(
+                        parsed_email=parsed,
+                        host_id=host_id,
+                        client_id=client_id,
+                    )
+                    if context:
+                        # Salva il messaggio nella conversazione
+                        self._guest_pipeline.save_guest_message(
+                            context=context,
                             parsed_email=parsed,
-                            host_id=host_id,
+                            gmail_message_id=message_id,
                         )
-                        if save_result.get("saved"):
-                            logger.info(f"[WATCH] ✅ Email salvata: {message_id}")
-                        else:
-                            logger.warning(f"[WATCH] ⚠️ Salvataggio fallito: {save_result.get('reason')}")
-
-                    # Step 6: Processa messaggi guest per AI reply (se auto-reply abilitato)
-                    if parsed.kind in ["booking_message", "airbnb_message"]:
-                        should_process, client_id = self._guest_pipeline.should_process_message(
-                            parsed_email=parsed,
-                            host_id=host_id,
+                        
+                        logger.info(
+                            f"[WATCH] 📧 Messaggio guest pronto per AI reply: "
+                            f"clientId={context.client_id}, reservationId={context.reservation_id}"
                         )
-                        if should_process and client_id:
-                            context = self._guest_pipeline.extract_context(
-                                parsed_email=parsed,
-                                host_id=host_id,
-                                client_id=client_id,
+                        
+                        # Step 7: Chiamare Gemini AI con questo contesto
+                        if parsed.guest_message:
+                            ai_reply = self._gemini_service.generate_reply(
+                                context=context,
+                                guest_message=parsed.guest_message.message,
                             )
-                            if context:
-                                # Salva il messaggio nella conversazione
-                                self._guest_pipeline.save_guest_message(
-                                    context=context,
-                                    parsed_email=parsed,
-                                    gmail_message_id=message_id,
-                                )
+                            
+                            if ai_reply:
+                                logger.info(f"[WATCH] ✅ Risposta AI generata ({len(ai_reply)} caratteri)")
                                 
-                                logger.info(
-                                    f"[WATCH] 📧 Messaggio guest pronto per AI reply: "
-                                    f"clientId={context.client_id}, reservationId={context.reservation_id}"
-                                )
-                                
-                                # Step 7: Chiamare Gemini AI con questo contesto
-                                if parsed.guest_message:
-                                    ai_reply = self._gemini_service.generate_reply(
+                                # Step 8: Inviare risposta email
+                                try:
+                                    # Estrai informazioni per threading
+                                    reply_to = parsed.guest_message.reply_to
+                                    original_subject = parsed.metadata.subject or "Messaggio"
+                                    
+                                    # Estrai Message-ID originale se disponibile
+                                    original_message_id = parsed.metadata.gmail_message_id
+                                    
+                                    # Invia risposta
+                                    send_result = self._gmail_service.send_reply(
+                                        integration=integration,
+                                        to_email=reply_to or parsed.metadata.sender or "",
+                                        subject=original_subject,
+                                        body=ai_reply,
+                                        reply_to=reply_to,
+                                        in_reply_to=original_message_id,
+                                        references=original_message_id,
+                                    )
+                                    
+                                    logger.info(
+                                        f"[WATCH] ✅ Email risposta inviata: "
+                                        f"messageId={send_result.get('messageId')}, "
+                                        f"threadId={send_result.get('threadId')}"
+                                    )
+                                    
+                                    # Salva risposta AI in Firestore
+                                    self._save_ai_response(
                                         context=context,
                                         guest_message=parsed.guest_message.message,
+                                        ai_reply=ai_reply,
+                                        gmail_message_id=message_id,
+                                        reply_message_id=send_result.get("messageId"),
                                     )
                                     
-                                    if ai_reply:
-                                        logger.info(f"[WATCH] ✅ Risposta AI generata ({len(ai_reply)} caratteri)")
-                                        
-                                        # Step 8: Inviare risposta email
-                                        try:
-                                            # Estrai informazioni per threading
-                                            reply_to = parsed.guest_message.reply_to
-                                            original_subject = parsed.metadata.subject or "Messaggio"
-                                            
-                                            # Estrai Message-ID originale se disponibile
-                                            original_message_id = parsed.metadata.gmail_message_id
-                                            
-                                            # Invia risposta
-                                            send_result = self._gmail_service.send_reply(
-                                                integration=integration,
-                                                to_email=reply_to or parsed.metadata.sender or "",
-                                                subject=original_subject,
-                                                body=ai_reply,
-                                                reply_to=reply_to,
-                                                in_reply_to=original_message_id,
-                                                references=original_message_id,
-                                            )
-                                            
-                                            logger.info(
-                                                f"[WATCH] ✅ Email risposta inviata: "
-                                                f"messageId={send_result.get('messageId')}, "
-                                                f"threadId={send_result.get('threadId')}"
-                                            )
-                                            
-                                            # Salva risposta AI in Firestore
-                                            self._save_ai_response(
-                                                context=context,
-                                                guest_message=parsed.guest_message.message,
-                                                ai_reply=ai_reply,
-                                                gmail_message_id=message_id,
-                                                reply_message_id=send_result.get("messageId"),
-                                            )
-                                            
-                                        except Exception as e:
-                                            logger.error(f"[WATCH] ❌ Errore invio email risposta: {e}", exc_info=True)
-                                    else:
-                                        logger.warning("[WATCH] ⚠️ Impossibile generare risposta AI")
-
-                    processed_count += 1
-
-                except Exception as e:
-                    logger.error(f"[WATCH] Errore processamento email {message_id}: {e}", exc_info=True)
-                    # Marca come processata anche in caso di errore per evitare loop
-                    self._processed_repository.mark_processed(
-                        email,
-                        message_id,
-                        history_id=notified_history_id,
-                    )
+                                except Exception as e:
+                                    logger.error(f"[WATCH] ❌ Errore invio email risposta: {e}", exc_info=True)
+                            else:
+                                logger.warning("[WATCH] ⚠️ Impossibile generare risposta AI")
 
-        # Aggiorna lastHistoryIdProcessed
-        self._update_last_history_id(email, notified_history_id)
-
-        logger.info(
-            f"[WATCH] ✅ Processamento completato per {email}: "
-            f"{processed_count} processate, {skipped_count} saltate"
-        )
+            return "processed"
 
-    def _is_email_relevant(self, parsed: ParsedEmail, airbnb_only: bool) -> bool:
-        """
-        Verifica se un'email è rilevante in base a airbnbOnly.
-        
-        Regole:
-        - Se airbnb_only=True: processa solo email Airbnb (conferme, cancellazioni, messaggi)
-        - Se airbnb_only=False: processa email Booking e Airbnb (comportamento normale)
-        """
-        kind = parsed.kind
-
-        if airbnb_only:
-            # Solo Airbnb: processa solo email Airbnb
-            if kind in ["airbnb_confirmation", "airbnb_cancellation", "airbnb_message"]:
-                return True
-            # Ignora tutto il resto (Booking, Scidoo, unhandled)
-            logger.debug(f"[WATCH] Email {kind} ignorata: airbnbOnly=True, solo Airbnb processate")
-            return False
-        else:
-            # Comportamento normale: processa Booking e Airbnb
-            # Email messaggi guest: sempre rilevanti
-            if kind in ["booking_message", "airbnb_message"]:
-                return True
-
-            # Email conferme/cancellazioni Scidoo: ignorate (non più usate)
-            if kind in ["scidoo_confirmation", "scidoo_cancellation"]:
-                logger.debug(f"[WATCH] Email Scidoo ignorata: airbnbOnly=False ma Scidoo non più supportato")
-                return False
-
-            # Email conferme/cancellazioni Booking/Airbnb: sempre rilevanti
-            if kind in ["booking_confirmation", "airbnb_confirmation", "airbnb_cancellation"]:
-                return True
-
-            # Email non gestite: non processate
-            if kind == "unhandled":
-                return False
-
-            # Default: non processare
-            return False
+        except Exception as e:
+            # Già marcata come processata prima dell'elaborazione: nessun loop sulla stessa email
+            logger.error(f"[WATCH] Errore processamento email {message_id}: {e}", exc_info=True)
+            return "failed"
 
     def _get_airbnb_only_from_host(self, host_id: str) -> bool:
         """Recupera airbnbOnly dalla collezione hosts."""
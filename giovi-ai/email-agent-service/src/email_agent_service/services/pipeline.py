@@ -0,0 +1,78 @@
+"""Stadi di pipeline a memoria limitata collegati da code bounded.
+
+`bounded_stage` consuma un iterabile in un thread dedicato e ne passa gli elementi al
+chiamante attraverso una coda di al massimo `maxsize` elementi: lo stadio a monte
+(es. download da Gmail) lavora in anticipo su quello a valle (parsing, salvataggio) ma
+non accumula più di `maxsize` elementi in memoria. Gli stadi si concatenano:
+
+    fetched = bounded_stage(iter_pages(), maxsize=2, name="fetch")
+    parsed = bounded_stage((parse(page) for page in fetched), maxsize=2, name="parse")
+    for page in parsed:
+        persist(page)
+"""
+from __future__ import annotations
+
+import queue
+import threading
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+# Ogni quanto un produttore bloccato su coda piena controlla se il consumatore ha smesso
+PUT_POLL_SECONDS = 0.5
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def bounded_stage(items: Iterable[T], maxsize: int, name: str = "pipeline-stage") -> Iterator[T]:
+    """Itera `items` in un thread separato con al massimo `maxsize` elementi in coda.
+
+    Un'eccezione del produttore viene rilanciata al consumatore nel punto in cui avrebbe
+    ricevuto l'elemento successivo; se il consumatore smette di iterare (break, eccezione,
+    close) il produttore si ferma al primo elemento successivo.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def put(item: object) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=PUT_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        iterator = iter(items)
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+        except BaseException as error:
+            put(_StageError(error))
+            return
+        finally:
+            # Chiude lo stadio a monte (e a cascata i suoi thread) nel thread che lo possiede
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+        put(_DONE)
+
+    thread = threading.Thread(target=produce, daemon=True, name=name)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
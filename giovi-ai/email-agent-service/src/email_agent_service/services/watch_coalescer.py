@@ -0,0 +1,82 @@
+"""Elaborazione single-flight delle notifiche Gmail Watch, una casella alla volta.
+
+Gmail invia spesso raffiche di notifiche Pub/Sub per la stessa casella. Con il
+coalescer solo la prima avvia un'elaborazione; quelle che arrivano mentre è in corso
+alzano soltanto l'historyId obiettivo, e a fine elaborazione parte un solo passaggio
+aggiuntivo fino al valore più alto ricevuto. Una raffica costa quindi al massimo due
+passaggi (lettura integrazione, history.list, controlli processed) invece di uno per
+notifica.
+
+La coalescenza vale all'interno del processo: istanze diverse restano protette dai
+controlli `filter_unprocessed`/`mark_processed` del watch service.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def max_history_id(current: Optional[str], candidate: str) -> str:
+    """Il più recente di due historyId (numerici per Gmail, confronto testuale come ripiego)."""
+    if current is None:
+        return candidate
+    try:
+        return candidate if int(candidate) > int(current) else current
+    except (TypeError, ValueError):
+        return max(current, candidate)
+
+
+class NotificationCoalescer:
+    def __init__(self) -> None:
+        # Caselle con un'elaborazione in corso -> historyId obiettivo del prossimo
+        # passaggio (None: nessuna notifica arrivata durante quello attuale)
+        self._pending: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, email: str, history_id: str) -> bool:
+        """Registra una notifica. True se il chiamante deve avviare `drain` per la casella."""
+        with self._lock:
+            if email in self._pending:
+                self._pending[email] = max_history_id(self._pending[email], history_id)
+                return False
+            self._pending[email] = history_id
+            return True
+
+    def drain(self, email: str, process: Callable[[str, str], None]) -> int:
+        """Esegue `process(email, history_id)` finché arrivano nuovi obiettivi. Restituisce i passaggi."""
+        passes = 0
+        try:
+            while True:
+                with self._lock:
+                    target = self._pending.get(email)
+                    if target is None:
+                        self._pending.pop(email, None)
+                        return passes
+                    self._pending[email] = None
+                if passes:
+                    logger.info(f"[WATCH] Passaggio aggiuntivo per {email} fino a historyId {target} (notifiche coalescenti)")
+                try:
+                    process(email, target)
+                except Exception as e:
+                    logger.error(f"[WATCH] Errore elaborazione notifiche per {email}: {e}", exc_info=True)
+                passes += 1
+        except BaseException:
+            # Uscita anomala: la casella non deve restare bloccata come "in corso"
+            self.release(email)
+            raise
+
+    def release(self, email: str) -> None:
+        """Abbandona un'elaborazione registrata con `submit` ma mai avviata."""
+        with self._lock:
+            self._pending.pop(email, None)
+
+    def in_flight(self, email: str) -> bool:
+        with self._lock:
+            return email in self._pending
+
+
+# Condiviso dal processo: ogni notifica arriva in una richiesta diversa
+WATCH_NOTIFICATIONS = NotificationCoalescer()
@@ -0,0 +1,228 @@
+"""Benchmark dei parser email sul corpus anonimizzato in tests/fixtures/emails.
+
+Uso (dalla cartella email-agent-service):
+
+    python -m tests.benchmarks.parser_bench                    # report + confronto con la baseline
+    python -m tests.benchmarks.parser_bench --update-baseline  # registra una nuova baseline
+
+Per ogni target (engine complessivo, engine per tipo di email, singolo EmailParser) misura
+throughput, latenza p50/p95 e picco di memoria (tracemalloc). I tempi vengono confrontati
+con la baseline dopo averli scalati sul target "reference" (parsing MIME della stdlib sullo
+stesso corpus), così il confronto regge anche su macchine più lente o più veloci di quella
+che ha registrato la baseline.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import logging
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from email.parser import BytesParser
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from email_agent_service.parsers import (
+    AirbnbCancellationParser,
+    AirbnbConfirmationParser,
+    AirbnbMessageParser,
+    BookingConfirmationParser,
+    BookingMessageParser,
+    EmailParsingEngine,
+    ScidooCancellationParser,
+    ScidooConfirmationParser,
+)
+from email_agent_service.parsers.base import EmailContent, EmailParser
+from email_agent_service.parsers.mime import parse_message_lean
+
+CORPUS_DIR = Path(__file__).resolve().parents[1] / "fixtures" / "emails"
+BASELINE_PATH = Path(__file__).resolve().with_name("baseline.json")
+
+REFERENCE = "reference"
+DEFAULT_ITERATIONS = 20
+DEFAULT_TOLERANCE = 1.5
+
+
+@dataclass
+class BenchmarkResult:
+    samples: int
+    ops_per_sec: float
+    min_ms: float
+    p50_ms: float
+    p95_ms: float
+    peak_kib: float
+
+
+def build_parsers() -> List[EmailParser]:
+    # Stesso ordine dei parser usato dalle route
+    return [
+        ScidooCancellationParser(),
+        ScidooConfirmationParser(),
+        AirbnbCancellationParser(),
+        AirbnbConfirmationParser(),
+        BookingConfirmationParser(),
+        BookingMessageParser(),
+        AirbnbMessageParser(),
+    ]
+
+
+def load_corpus(directory: Path = CORPUS_DIR) -> Dict[str, List[tuple[str, bytes]]]:
+    """Email del corpus raggruppate per tipo atteso (= nome della sottocartella)."""
+    corpus: Dict[str, List[tuple[str, bytes]]] = {}
+    for path in sorted(directory.glob("*/*.eml")):
+        corpus.setdefault(path.parent.name, []).append((path.stem, path.read_bytes()))
+    return corpus
+
+
+def _measure(fn: Callable[[bytes], object], inputs: Sequence[bytes], iterations: int) -> BenchmarkResult:
+    for raw in inputs:  # warm-up: regex compilate, cache di import
+        fn(raw)
+
+    timings: List[float] = []
+    # Come timeit: il GC disattivato evita pause casuali nelle misure
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            for raw in inputs:
+                start = time.perf_counter()
+                fn(raw)
+                timings.append(time.perf_counter() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        for raw in inputs:
+            fn(raw)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    total = sum(timings)
+    return BenchmarkResult(
+        samples=len(timings),
+        ops_per_sec=round(len(timings) / total, 1) if total else 0.0,
+        min_ms=round(timings[0] * 1000, 4),
+        p50_ms=round(statistics.median(timings) * 1000, 4),
+        p95_ms=round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 4),
+        peak_kib=round(peak / 1024, 1),
+    )
+
+
+def run_benchmarks(
+    iterations: int = DEFAULT_ITERATIONS,
+    corpus: Optional[Dict[str, List[tuple[str, bytes]]]] = None,
+) -> Dict[str, BenchmarkResult]:
+    corpus = corpus or load_corpus()
+    all_raw = [raw for items in corpus.values() for _, raw in items]
+    parsers = build_parsers()
+    engine = EmailParsingEngine(parsers)
+
+    def engine_parse(raw: bytes) -> object:
+        return engine.parse(message_id="bench", raw_payload=raw)
+
+    results: Dict[str, BenchmarkResult] = {}
+    # I log INFO/WARNING dell'engine falserebbero le misure
+    logging.disable(logging.CRITICAL)
+    try:
+        results[REFERENCE] = _measure(BytesParser().parsebytes, all_raw, iterations)
+        results["engine"] = _measure(engine_parse, all_raw, iterations)
+        for kind, items in sorted(corpus.items()):
+            results[f"engine/{kind}"] = _measure(engine_parse, [raw for _, raw in items], iterations)
+
+        for parser in parsers:
+            handled = [
+                raw for raw in all_raw if parser.matches(EmailContent(message=parse_message_lean(raw)))
+            ]
+            if not handled:
+                continue
+
+            def parser_parse(raw: bytes, parser: EmailParser = parser) -> object:
+                return parser.parse(EmailContent(message=parse_message_lean(raw)))
+
+            results[f"parser/{type(parser).__name__}"] = _measure(parser_parse, handled, iterations)
+    finally:
+        logging.disable(logging.NOTSET)
+    return results
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> Dict[str, dict]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_baseline(results: Dict[str, BenchmarkResult], path: Path = BASELINE_PATH) -> None:
+    payload = {name: asdict(result) for name, result in sorted(results.items())}
+    path.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+
+
+def find_regressions(
+    results: Dict[str, BenchmarkResult],
+    baseline: Dict[str, dict],
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> List[str]:
+    """Target il cui tempo minimo (scalato sulla velocità della macchina) supera baseline × tolleranza.
+
+    Come per timeit si confronta il minimo, l'unica misura stabile su macchine condivise
+    (CI, container): p50 e p95 restano nel report ma risentono del rumore degli altri processi.
+    Ogni target somma più email, quindi il minimo è quello dell'email più economica del gruppo.
+    """
+    if REFERENCE not in baseline or REFERENCE not in results:
+        return []
+    scale = results[REFERENCE].min_ms / baseline[REFERENCE]["min_ms"]
+
+    regressions: List[str] = []
+    for name, expected in baseline.items():
+        if name == REFERENCE or name not in results:
+            continue
+        budget = expected["min_ms"] * scale * tolerance
+        actual = results[name].min_ms
+        if actual > budget:
+            regressions.append(
+                f"{name}: min {actual:.3f} ms > budget {budget:.3f} ms "
+                f"(baseline {expected['min_ms']:.3f} ms, scala macchina {scale:.2f}, tolleranza {tolerance})"
+            )
+    return regressions
+
+
+def format_report(results: Dict[str, BenchmarkResult]) -> str:
+    lines = [f"{'target':<42} {'ops/s':>10} {'min ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'peak KiB':>10}"]
+    for name, result in results.items():
+        lines.append(
+            f"{name:<42} {result.ops_per_sec:>10.1f} {result.min_ms:>10.3f} {result.p50_ms:>10.3f} "
+            f"{result.p95_ms:>10.3f} {result.peak_kib:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark dei parser email")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(iterations=args.iterations)
+    print(format_report(results))
+
+    if args.update_baseline:
+        save_baseline(results)
+        print(f"\nBaseline aggiornata: {BASELINE_PATH}")
+        return 0
+
+    regressions = find_regressions(results, load_baseline(), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSIONE {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""Micro-benchmark delle strategie regex di `parsers/patterns.py` sul corpus anonimizzato.
+
+Uso (dalla cartella email-agent-service):
+
+    python -m tests.benchmarks.pattern_bench
+
+Per ogni caso confronta, sugli stessi testi del corpus, l'implementazione precedente
+(regex inline, una per label/pattern) con le alternative: label precompilate una per una,
+un'unica alternanza di label (una sola scansione), pattern di esclusione fusi con
+`compile_any`, sostituzioni quoted-printable con `MultiReplace`. Il tempo riportato è il
+minimo su più ripetizioni di un passaggio completo sul corpus.
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import timeit
+from typing import Callable, Dict, List, Optional, Sequence
+
+from email_agent_service.parsers import booking_confirm
+from email_agent_service.parsers.airbnb_confirm import (
+    PROPERTY_EXCLUDE_PATTERNS,
+    normalize_airbnb_text,
+    should_exclude_property,
+)
+from email_agent_service.parsers.base import EmailContent
+from email_agent_service.parsers.mime import parse_message_lean
+from email_agent_service.parsers.patterns import LABEL_SEPARATOR, LabelPattern
+from tests.benchmarks.parser_bench import load_corpus
+
+DEFAULT_REPEAT = 5
+DEFAULT_NUMBER = 50
+
+# Label cercate da BookingConfirmationParser, con il formato del valore
+LABEL_CASES: List[LabelPattern] = [
+    booking_confirm.PROPERTY_NAME_LABELS,
+    booking_confirm.GUEST_NAME_LABELS,
+    booking_confirm.CHECK_IN_LABELS,
+    booking_confirm.CHECK_OUT_LABELS,
+    booking_confirm.ADULTS_LABELS,
+    booking_confirm.TOTAL_LABELS,
+]
+LABEL_VALUES = [
+    booking_confirm.FIELD_VALUE,
+    booking_confirm.FIELD_VALUE,
+    booking_confirm.DATE_VALUE,
+    booking_confirm.DATE_VALUE,
+    booking_confirm.INT_VALUE,
+    booking_confirm.AMOUNT_VALUE,
+]
+
+# Implementazione precedente di normalize_airbnb_text: una replace per artefatto
+_LEGACY_QP_ARTIFACTS = {
+    "=C3=8C": "Ì", "=C3=AC": "ì", "=C3=A0": "à", "=C3=A8": "è", "=C3=B9": "ù", "=C3=B2": "ò", "=C3=A9": "é",
+    "=20": " ", "=C2=A0": " ", "=E2=80=AF": " ",
+}
+
+
+def load_texts() -> Dict[str, List[str]]:
+    """Testi del corpus per caso: testo normalizzato, righe candidate a nome property, payload grezzi."""
+    texts: List[str] = []
+    lines: List[str] = []
+    raw_texts: List[str] = []
+    for items in load_corpus().values():
+        for _, raw in items:
+            content = EmailContent(message=parse_message_lean(raw))
+            texts.append(content.normalized_text)
+            lines.extend(line.strip() for line in content.normalized_text.splitlines() if len(line.strip()) >= 10)
+            raw_texts.append(raw.decode("utf-8", errors="replace"))
+    return {"texts": texts, "lines": lines, "raw": raw_texts}
+
+
+def labels_inline(text: str) -> List[Optional[str]]:
+    """Prima delle modifiche: una regex per label, ricostruita (cache di `re`) a ogni chiamata."""
+    results: List[Optional[str]] = []
+    for labels, value in zip(LABEL_CASES, LABEL_VALUES):
+        found = None
+        for label in labels.labels:
+            match = re.compile(rf"{re.escape(label)}{LABEL_SEPARATOR}{value}", re.IGNORECASE).search(text)
+            if match:
+                found = match.group(1)
+                break
+        results.append(found)
+    return results
+
+
+def labels_precompiled(text: str) -> List[Optional[str]]:
+    results: List[Optional[str]] = []
+    for labels in LABEL_CASES:
+        match = labels.search(text)
+        results.append(match.group(1) if match else None)
+    return results
+
+
+def _build_alternations() -> List[tuple[re.Pattern[str], Dict[str, int]]]:
+    alternations = []
+    for labels, value in zip(LABEL_CASES, LABEL_VALUES):
+        # Label più lunghe per prime: a parità di posizione vince la più specifica
+        ordered = sorted(labels.labels, key=len, reverse=True)
+        regex = re.compile(
+            rf"({'|'.join(re.escape(label) for label in ordered)}){LABEL_SEPARATOR}{value}",
+            re.IGNORECASE,
+        )
+        alternations.append((regex, {label.casefold(): index for index, label in enumerate(labels.labels)}))
+    return alternations
+
+
+_ALTERNATIONS = _build_alternations()
+
+
+def labels_alternation(text: str) -> List[Optional[str]]:
+    """Un'unica alternanza per campo: tutte le label trovate in una sola scansione del testo."""
+    results: List[Optional[str]] = []
+    for regex, priorities in _ALTERNATIONS:
+        best: Optional[tuple[int, str]] = None
+        for match in regex.finditer(text):
+            priority = priorities[match.group(1).casefold()]
+            if best is None or priority < best[0]:
+                best = (priority, match.group(2))
+            if priority == 0:
+                break
+        results.append(best[1] if best else None)
+    return results
+
+
+_LEGACY_KEYWORD = r"(?:SUITE|CASA|APPARTAMENTO|ROOM)"
+
+
+def exclude_per_pattern(line: str) -> bool:
+    """Prima delle modifiche: una re.search per ogni pattern di esclusione."""
+    if len(line) > 100 and not re.search(_LEGACY_KEYWORD, line, re.IGNORECASE):
+        return True
+    if len(line.split()) > 3 and not re.search(_LEGACY_KEYWORD, line, re.IGNORECASE):
+        return True
+    lower = line.lower()
+    return any(re.search(pattern, lower, re.IGNORECASE) for pattern in PROPERTY_EXCLUDE_PATTERNS)
+
+
+def normalize_replace_chain(value: str) -> str:
+    cleaned = value.replace("=\n", "")
+    for encoded, decoded in _LEGACY_QP_ARTIFACTS.items():
+        cleaned = cleaned.replace(encoded, decoded)
+    return re.sub(r"[ \t]{2,}", " ", cleaned)
+
+
+CASES: Dict[str, tuple[str, Dict[str, Callable[[str], object]]]] = {
+    "labels": ("texts", {
+        "inline": labels_inline,
+        "precompiled": labels_precompiled,
+        "alternation": labels_alternation,
+    }),
+    "property_exclude": ("lines", {
+        "per_pattern": exclude_per_pattern,
+        "compile_any": should_exclude_property,
+    }),
+    "qp_normalize": ("raw", {
+        "replace_chain": normalize_replace_chain,
+        "multi_replace": normalize_airbnb_text,
+    }),
+}
+
+
+def check_equivalence(inputs: Optional[Dict[str, List[str]]] = None) -> List[str]:
+    """Casi in cui una variante restituisce un risultato diverso dalla prima (riferimento)."""
+    inputs = inputs or load_texts()
+    mismatches: List[str] = []
+    for case, (source, variants) in CASES.items():
+        (reference_name, reference), *others = variants.items()
+        for index, item in enumerate(inputs[source]):
+            expected = reference(item)
+            for name, variant in others:
+                if variant(item) != expected:
+                    mismatches.append(f"{case}/{name} #{index}: {variant(item)!r} != {reference_name} {expected!r}")
+    return mismatches
+
+
+def run(repeat: int = DEFAULT_REPEAT, number: int = DEFAULT_NUMBER) -> Dict[str, float]:
+    """Millisecondi (minimo fra le ripetizioni) per un passaggio sul corpus di ogni variante."""
+    inputs = load_texts()
+    results: Dict[str, float] = {}
+    for case, (source, variants) in CASES.items():
+        items = inputs[source]
+        for name, variant in variants.items():
+            timings = timeit.repeat(lambda variant=variant, items=items: [variant(item) for item in items], repeat=repeat, number=number)
+            results[f"{case}/{name}"] = round(min(timings) / number * 1000, 4)
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmark delle strategie regex dei parser")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--number", type=int, default=DEFAULT_NUMBER)
+    args = parser.parse_args(argv)
+
+    mismatches = check_equivalence()
+    for line in mismatches:
+        print(f"DIVERSO {line}", file=sys.stderr)
+
+    results = run(repeat=args.repeat, number=args.number)
+    print(f"{'caso/variante':<32} {'ms/corpus':>10} {'vs primo':>9}")
+    for case, (_, variants) in CASES.items():
+        first = results[f"{case}/{next(iter(variants))}"]
+        for name in variants:
+            value = results[f"{case}/{name}"]
+            print(f"{case + '/' + name:<32} {value:>10.4f} {first / value if value else 0:>8.2f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from email_agent_service.parsers import EmailParsingEngine
+from tests.benchmarks.parser_bench import (
+    DEFAULT_TOLERANCE,
+    REFERENCE,
+    BenchmarkResult,
+    build_parsers,
+    find_regressions,
+    load_baseline,
+    load_corpus,
+    run_benchmarks,
+)
+from tests.benchmarks.pattern_bench import check_equivalence
+
+
+def test_corpus_fixtures_parse_to_their_kind():
+    engine = EmailParsingEngine(build_parsers())
+    corpus = load_corpus()
+
+    assert set(corpus) == {
+        "airbnb_cancellation",
+        "airbnb_confirmation",
+        "airbnb_message",
+        "booking_confirmation",
+        "booking_message",
+        "scidoo_cancellation",
+        "scidoo_confirmation",
+        "unhandled",
+    }
+    for kind, items in corpus.items():
+        for name, raw in items:
+            assert engine.parse(message_id=name, raw_payload=raw).kind == kind, f"{kind}/{name}"
+
+
+# Date di soggiorno reali delle conferme del corpus
+CORPUS_STAYS = {
+    "airbnb_confirmation/confirmation_01": ("2026-09-03", "2026-09-05"),
+    "airbnb_confirmation/confirmation_02": ("2025-09-10", "2025-10-10"),
+    "airbnb_confirmation/confirmation_03": ("2026-10-19", "2026-10-21"),
+    "booking_confirmation/confirmation_01": ("2026-01-15", "2026-01-18"),
+    "booking_confirmation/confirmation_02": ("2026-01-15", "2026-01-18"),
+    "scidoo_confirmation/confirmation_01": ("2026-01-15", "2026-01-18"),
+    "scidoo_confirmation/confirmation_02": ("2026-02-02", "2026-02-06"),
+}
+
+
+def test_corpus_confirmations_extract_their_stay_dates():
+    engine = EmailParsingEngine(build_parsers())
+    corpus = load_corpus()
+
+    stays = {}
+    for kind, items in corpus.items():
+        if not kind.endswith("_confirmation"):
+            continue
+        for name, raw in items:
+            reservation = engine.parse(message_id=name, raw_payload=raw).reservation
+            stays[f"{kind}/{name}"] = (reservation.check_in.date().isoformat(), reservation.check_out.date().isoformat())
+
+    assert stays == CORPUS_STAYS
+
+
+def result(min_ms: float) -> BenchmarkResult:
+    return BenchmarkResult(samples=1, ops_per_sec=1.0, min_ms=min_ms, p50_ms=min_ms, p95_ms=min_ms, peak_kib=0.0)
+
+
+def test_find_regressions_scales_budget_by_machine_speed():
+    baseline = {REFERENCE: {"min_ms": 1.0}, "parser/X": {"min_ms": 2.0}}
+
+    # Macchina due volte più lenta: 5 ms rientra nel budget 2 × 2 × 1.5
+    slow_machine = {REFERENCE: result(2.0), "parser/X": result(5.0)}
+    # Stessa macchina: 3.5 ms supera il budget 2 × 1.5
+    regressed = {REFERENCE: result(1.0), "parser/X": result(3.5)}
+
+    assert find_regressions(slow_machine, baseline, tolerance=1.5) == []
+    assert len(find_regressions(regressed, baseline, tolerance=1.5)) == 1
+
+
+@pytest.mark.skipif(
+    os.environ.get("PARSER_BENCHMARKS") != "1",
+    reason="benchmark dei parser: abilitare con PARSER_BENCHMARKS=1",
+)
+def test_parsers_stay_within_baseline_budget():
+    tolerance = float(os.environ.get("PARSER_BENCHMARK_TOLERANCE", DEFAULT_TOLERANCE))
+    baseline = load_baseline()
+    assert baseline, "baseline mancante: eseguire python -m tests.benchmarks.parser_bench --update-baseline"
+
+    results = run_benchmarks()
+
+    assert find_regressions(results, baseline, tolerance) == []
+
+
+def test_pattern_strategies_agree_on_corpus():
+    assert check_equivalence() == []
@@ -0,0 +1,281 @@
+import base64
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from typing import Dict, List, Optional
+
+import pytest
+
+from email_agent_service.parsers import AirbnbCancellationParser, EmailParsingEngine, ScidooConfirmationParser
+from email_agent_service.repositories.backfill_jobs import BackfillJobRecord
+from email_agent_service.repositories.host_email_integrations import HostEmailIntegrationRecord
+from email_agent_service.services.backfill_jobs import STALE_JOB_SECONDS, BackfillJobRunner
+from email_agent_service.services.backfill_service import GmailBackfillService
+
+NOW = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def build_email_bytes(subject: str, sender: str) -> bytes:
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = sender
+    message["To"] = "host@example.com"
+    message.set_content("Nome Ospite=09Mario Rossi")
+    return message.as_bytes()
+
+
+CONFIRMATION = build_email_bytes("Confermata - Prenotazione ID 5958915259 - Booking", "reservation@scidoo.com")
+CANCELLATION = build_email_bytes("Cancellazione effettuata", "automated@airbnb.com")
+
+
+class FakeGmailService:
+    """Tre pagine; la lista fallisce una volta sulla pagina indicata (crash simulato)."""
+
+    def __init__(self, pages, fail_on_page: Optional[int] = None):
+        self.pages = pages
+        self.fail_on_page = fail_on_page
+        self.listed_tokens: List[Optional[str]] = []
+        self.fetched: List[str] = []
+
+    def list_messages(self, integration, query: str, page_token: Optional[str] = None, max_results: int = 100):
+        index = int(page_token or 0)
+        if index == self.fail_on_page:
+            self.fail_on_page = None
+            raise RuntimeError("connessione interrotta")
+        self.listed_tokens.append(page_token)
+        response = {"messages": [{"id": message_id} for message_id, _ in self.pages[index]], "resultSizeEstimate": 3}
+        if index + 1 < len(self.pages):
+            response["nextPageToken"] = str(index + 1)
+        return response
+
+    def get_messages_raw_batch(self, integration, message_ids):
+        raw = {message_id: raw_bytes for page in self.pages for message_id, raw_bytes in page}
+        self.fetched.extend(message_ids)
+        return {
+            message_id: {"id": message_id, "raw": base64.urlsafe_b64encode(raw[message_id]).decode("utf-8")}
+            for message_id in message_ids
+        }
+
+
+class FakeIntegrationRepo:
+    def get_by_email(self, email: str) -> HostEmailIntegrationRecord:
+        return HostEmailIntegrationRecord(
+            email=email,
+            host_id="host-123",
+            provider="gmail",
+            encrypted_access_token="token",
+            encrypted_refresh_token=None,
+            scopes=[],
+            token_expiry=None,
+        )
+
+
+class FakeProcessedRepo:
+    def __init__(self):
+        self.items: List[str] = []
+
+    def was_processed(self, integration_email: str, message_id: str) -> bool:
+        return message_id in self.items
+
+    def filter_unprocessed(self, integration_email: str, message_ids):
+        return [message_id for message_id in message_ids if message_id not in self.items]
+
+    def mark_processed(self, integration_email: str, message_id: str, history_id: Optional[str] = None):
+        self.items.append(message_id)
+
+    def mark_processed_many(self, integration_email: str, entries):
+        self.items.extend(message_id for message_id, _ in entries)
+
+
+class FakePersistenceService:
+    def __init__(self):
+        self.saved: List[str] = []
+
+    def save_parsed_email(self, parsed_email, host_id: str):
+        self.saved.append(parsed_email.kind)
+        return {"saved": True, "cancelled": True}
+
+
+class FakeJobsRepository:
+    def __init__(self):
+        self.jobs: Dict[str, BackfillJobRecord] = {}
+        self.checkpoints: List[dict] = []
+        self.now = NOW
+
+    def _new_job(self, host_id: str, email: str, force: bool) -> BackfillJobRecord:
+        job = BackfillJobRecord(
+            job_id=f"job-{len(self.jobs) + 1}", host_id=host_id, email=email, force=force, created_at=NOW, heartbeat_at=NOW
+        )
+        self.jobs[job.job_id] = job
+        return replace(job)
+
+    def create_or_get_active(self, host_id: str, email: str, force: bool = False):
+        active = self.list_active(email=email)
+        if active:
+            return active[-1], False
+        return self._new_job(host_id, email, force), True
+
+    def get_job(self, job_id: str) -> Optional[BackfillJobRecord]:
+        job = self.jobs.get(job_id)
+        return replace(job) if job else None
+
+    def list_active(self, email: Optional[str] = None) -> List[BackfillJobRecord]:
+        return [
+            replace(job) for job in self.jobs.values()
+            if job.status in ("queued", "running") and (email is None or job.email == email)
+        ]
+
+    def mark_running(self, job_id: str, owner: str, lease_seconds: float, run_started_seen: int):
+        job = self.jobs[job_id]
+        if job.status not in ("queued", "running"):
+            return None
+        if job.lease_owner not in (None, owner) and job.lease_until is not None and job.lease_until > self.now:
+            return None
+        job.status, job.run_started_at, job.run_started_seen, job.heartbeat_at = "running", NOW, run_started_seen, NOW
+        job.lease_owner, job.lease_until = owner, self.now + timedelta(seconds=lease_seconds)
+        job.attempts += 1
+        return replace(job)
+
+    def renew_lease(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        job = self.jobs[job_id]
+        if job.lease_owner != owner:
+            return False
+        job.lease_until = self.now + timedelta(seconds=lease_seconds)
+        return True
+
+    def save_checkpoint(self, job_id: str, checkpoint: dict) -> None:
+        self.jobs[job_id].checkpoint = checkpoint
+        self.checkpoints.append(checkpoint)
+
+    def mark_completed(self, job_id: str, checkpoint: dict) -> None:
+        job = self.jobs[job_id]
+        job.status, job.checkpoint, job.completed_at = "completed", checkpoint, NOW + timedelta(seconds=10)
+        job.lease_until = None
+
+    def mark_failed(self, job_id: str, error: str) -> None:
+        job = self.jobs[job_id]
+        job.status, job.error, job.completed_at = "failed", error, NOW
+        job.lease_until = None
+
+
+@pytest.fixture
+def setup():
+    gmail = FakeGmailService(
+        [
+            [("cancel-1", CANCELLATION)],
+            [("confirm-1", CONFIRMATION)],
+            [("confirm-2", CONFIRMATION)],
+        ],
+        fail_on_page=2,
+    )
+    processed = FakeProcessedRepo()
+    persistence = FakePersistenceService()
+
+    def service_factory() -> GmailBackfillService:
+        return GmailBackfillService(
+            gmail_service=gmail,
+            integration_repository=FakeIntegrationRepo(),
+            processed_repository=processed,
+            parsing_engine=EmailParsingEngine([ScidooConfirmationParser(), AirbnbCancellationParser()]),
+            persistence_service=persistence,
+        )
+
+    jobs = FakeJobsRepository()
+    clock = {"now": NOW}
+    runner = BackfillJobRunner(jobs, service_factory, run_in_background=False, clock=lambda: clock["now"], owner="runner-a")
+    return runner, jobs, gmail, processed, persistence, clock
+
+
+def test_job_checkpoints_each_page_and_resumes_after_crash(setup):
+    runner, jobs, gmail, processed, persistence, clock = setup
+
+    job = runner.start(host_id="host-123", email="host@example.com")
+
+    # Pagine 0 e 1 salvate, crash durante la lista della pagina 2
+    assert jobs.jobs[job.job_id].status == "failed"
+    checkpoint = jobs.jobs[job.job_id].checkpoint
+    assert checkpoint["pageToken"] == "2"
+    assert checkpoint["pages"] == 2
+    assert checkpoint["pendingCancellationIds"] == ["cancel-1"]
+    assert persistence.saved == ["scidoo_confirmation"]
+
+    # Istanza terminata a metà job: resta "running" con heartbeat scaduto
+    jobs.jobs[job.job_id].status = "running"
+    jobs.jobs[job.job_id].heartbeat_at = NOW
+    clock["now"] = NOW + timedelta(seconds=STALE_JOB_SECONDS + 1)
+    assert runner.resume_pending() == [job.job_id]
+
+    assert gmail.listed_tokens == [None, "1", "2"]
+    assert gmail.fetched == ["cancel-1", "confirm-1", "cancel-1", "confirm-2"]
+    assert persistence.saved == ["scidoo_confirmation", "scidoo_confirmation", "airbnb_cancellation"]
+    assert processed.items == ["confirm-1", "confirm-2", "cancel-1"]
+    final = jobs.jobs[job.job_id]
+    assert final.status == "completed"
+    assert final.attempts == 2
+    assert final.checkpoint["processed"] == 3
+    assert final.checkpoint["pendingCancellationIds"] == []
+
+
+def test_start_returns_live_job_and_status_reports_progress(setup):
+    runner, jobs, _, _, _, clock = setup
+    job, _ = jobs.create_or_get_active("host-123", "host@example.com")
+    jobs.mark_running(job.job_id, "runner-b", 300, run_started_seen=1)
+    jobs.save_checkpoint(job.job_id, {"pages": 2, "processed": 40, "skipped": 11, "estimatedTotal": 251})
+    clock["now"] = NOW + timedelta(seconds=10)
+
+    assert runner.start(host_id="host-123", email="host@example.com").job_id == job.job_id
+    status = runner.get_status(job.job_id)
+
+    assert status.status == "running"
+    assert status.messages_per_second == 5.0
+    assert status.eta_seconds == 40
+    assert runner.get_status("missing") is None
+
+
+def test_job_leased_by_another_runner_is_not_run_twice(setup):
+    runner, jobs, gmail, _, persistence, clock = setup
+    job, _ = jobs.create_or_get_active("host-123", "host@example.com")
+
+    # Job appena creato da un'altra istanza: heartbeat recente, non ancora reclamato
+    assert runner.resume_pending() == []
+
+    # L'altra istanza lo reclama; dopo il timeout dell'heartbeat il lease è ancora valido
+    assert jobs.mark_running(job.job_id, "runner-b", 900, run_started_seen=0) is not None
+    clock["now"] = NOW + timedelta(seconds=STALE_JOB_SECONDS + 1)
+    assert runner.resume_pending() == []
+    assert runner.run_job(jobs.get_job(job.job_id)) is False
+    assert runner.start(host_id="host-123", email="host@example.com").job_id == job.job_id
+
+    assert gmail.listed_tokens == []
+    assert persistence.saved == []
+    assert jobs.jobs[job.job_id].attempts == 1
+    assert len(jobs.jobs) == 1
+
+
+def test_runner_stops_without_final_state_when_lease_is_lost(setup):
+    runner, jobs, gmail, _, _, _ = setup
+    gmail.fail_on_page = None
+    job, _ = jobs.create_or_get_active("host-123", "host@example.com")
+    runner = BackfillJobRunner(
+        jobs,
+        runner._service_factory,
+        run_in_background=False,
+        owner="runner-a",
+        renew_seconds=0.01,
+    )
+    original = jobs.save_checkpoint
+
+    def slow_checkpoint(job_id: str, checkpoint: dict) -> None:
+        original(job_id, checkpoint)
+        # Un'altra istanza prende il lease mentre questa salva la prima pagina
+        jobs.jobs[job_id].lease_owner = "runner-b"
+        time.sleep(0.1)
+
+    jobs.save_checkpoint = slow_checkpoint
+
+    assert runner.run_job(job) is True
+
+    assert len(jobs.checkpoints) == 1
+    assert jobs.jobs[job.job_id].status == "running"
+    assert jobs.jobs[job.job_id].lease_owner == "runner-b"
@@ -8,11 +8,13 @@ from cryptography.fernet import Fernet
 from email_agent_service.config.settings import get_settings
 from email_agent_service.models import ParsedEmail
 from email_agent_service.parsers import (
+    AirbnbCancellationParser,
     AirbnbConfirmationParser,
     AirbnbMessageParser,
     BookingConfirmationParser,
     BookingMessageParser,
     EmailParsingEngine,
+    ScidooConfirmationParser,
 )
 from email_agent_service.repositories.host_email_integrations import HostEmailIntegrationRecord
 from email_agent_service.services.backfill_service import GmailBackfillService
@@ -53,6 +55,9 @@ class FakeGmailService:
         encoded = base64.urlsafe_b64encode(self.raw_bytes).decode("utf-8")
         return {"id": message_id, "raw": encoded, "snippet": "Snippet"}
 
+    def get_messages_raw_batch(self, integration, message_ids):
+        return {message_id: self.get_message_raw(integration, message_id) for message_id in message_ids}
+
 
 class FakeIntegrationRepo:
     def __init__(self, record: HostEmailIntegrationRecord):
@@ -69,9 +74,16 @@ class FakeProcessedRepo:
     def was_processed(self, integration_email: str, message_id: str) -> bool:
         return (integration_email, message_id) in self.items
 
+    def filter_unprocessed(self, integration_email: str, message_ids):
+        return [message_id for message_id in message_ids if (integration_email, message_id) not in self.items]
+
     def mark_processed(self, integration_email: str, message_id: str, history_id: Optional[str] = None):
         self.items.add((integration_email, message_id))
 
+    def mark_processed_many(self, integration_email: str, entries):
+        for message_id, _ in entries:
+            self.items.add((integration_email, message_id))
+
 
 class FakePersistenceService:
     def __init__(self):
@@ -188,3 +200,110 @@ def test_backfill_service_preview(monkeypatch):
     assert preview.processed == 1
     assert preview.reservations[0].reservation_id == "5958915259"
     assert preview.reservations[0].property_name in (None, "Piazza Danti Perugia Centro")
+
+
+def test_backfill_preview_extracts_scidoo_reservations_saved_by_import():
+    message = EmailMessage()
+    message["Subject"] = "Confermata - Prenotazione ID 5958915259 - Booking"
+    message["From"] = "reservation@scidoo.com"
+    message["To"] = "host@example.com"
+    message.add_alternative(
+        "<html><body><table>"
+        "<tr><th>Camera/Alloggio</th><td>1 Suite Scacco</td></tr>"
+        "<tr><th>Nome Ospite</th><td>Brufani Francesco</td></tr>"
+        "<tr><th>Data di Check-in</th><td>15/01/2026</td></tr>"
+        "<tr><th>Data di Check-out</th><td>18/01/2026</td></tr>"
+        "</table></body></html>",
+        subtype="html",
+    )
+    email_bytes = message.as_bytes()
+    record = HostEmailIntegrationRecord(
+        email="host@example.com",
+        host_id="host-123",
+        provider="gmail",
+        encrypted_access_token="token",
+        encrypted_refresh_token=None,
+        scopes=[],
+        token_expiry=None,
+    )
+    service = GmailBackfillService(
+        gmail_service=FakeGmailService(email_bytes),
+        integration_repository=FakeIntegrationRepo(record),
+        processed_repository=FakeProcessedRepo(),
+        parsing_engine=EmailParsingEngine([ScidooConfirmationParser(), AirbnbConfirmationParser()]),
+        persistence_service=FakePersistenceService(),
+    )
+
+    preview = service.run_preview(host_id="host-123", email="host@example.com")
+
+    reservation = preview.reservations[0]
+    assert reservation.kind == "scidoo_confirmation"
+    assert reservation.guest_name == "Brufani Francesco"
+    assert reservation.property_name == "1 Suite Scacco"
+    assert reservation.check_in is not None
+
+
+class PagedGmailService:
+    """Due pagine: la cancellazione (più recente) arriva prima della sua conferma."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.list_calls = 0
+
+    def list_messages(self, integration, query: str, page_token: Optional[str] = None, max_results: int = 100):
+        index = int(page_token or 0)
+        self.list_calls += 1
+        response = {"messages": [{"id": message_id} for message_id, _ in self.pages[index]]}
+        if index + 1 < len(self.pages):
+            response["nextPageToken"] = str(index + 1)
+        return response
+
+    def get_messages_raw_batch(self, integration, message_ids):
+        raw = {message_id: raw_bytes for page in self.pages for message_id, raw_bytes in page}
+        return {
+            message_id: {"id": message_id, "raw": base64.urlsafe_b64encode(raw[message_id]).decode("utf-8")}
+            for message_id in message_ids
+        }
+
+
+def test_backfill_streams_pages_and_defers_cancellations():
+    confirmation = build_email_bytes(
+        "Confermata - Prenotazione ID 5958915259 - Booking",
+        "reservation@scidoo.com",
+        "host@example.com",
+        "Nome Ospite=09Brufani Francesco",
+    )
+    cancellation = build_email_bytes(
+        "Cancellazione effettuata",
+        "automated@airbnb.com",
+        "host@example.com",
+        "Prenotazione HMABC12345 cancellata",
+    )
+    gmail_service = PagedGmailService([[("cancel-1", cancellation)], [("confirm-1", confirmation)]])
+    engine = EmailParsingEngine([ScidooConfirmationParser(), AirbnbCancellationParser()])
+    record = HostEmailIntegrationRecord(
+        email="host@example.com",
+        host_id="host-123",
+        provider="gmail",
+        encrypted_access_token="token",
+        encrypted_refresh_token=None,
+        scopes=[],
+        token_expiry=None,
+    )
+    persistence = FakePersistenceService()
+    processed = FakeProcessedRepo()
+    service = GmailBackfillService(
+        gmail_service=gmail_service,
+        integration_repository=FakeIntegrationRepo(record),
+        processed_repository=processed,
+        parsing_engine=engine,
+        persistence_service=persistence,
+    )
+
+    results = service.run_backfill(host_id="host-123", email="host@example.com")
+
+    assert [parsed.kind for parsed in results] == ["scidoo_confirmation", "airbnb_cancellation"]
+    assert [kind for _, kind in persistence.saved] == ["scidoo_confirmation", "airbnb_cancellation"]
+    assert processed.items == {("host@example.com", "cancel-1"), ("host@example.com", "confirm-1")}
+    assert gmail_service.list_calls == 2
+
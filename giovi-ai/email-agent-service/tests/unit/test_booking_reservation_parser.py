@@ -4,8 +4,12 @@ import pytest
 from datetime import datetime
 
 from email_agent_service.models.booking_reservation import BookingReservation
+from email_agent_service.parsers import booking_reservation_parser
 from email_agent_service.parsers.booking_reservation_parser import (
     BookingReservationParserError,
+    iter_ota_modify_xml,
+    iter_ota_xml,
+    parse_ota_modify_xml,
     parse_ota_xml,
 )
 from tests.fixtures.booking_api_responses import MOCK_OTA_XML_RESPONSE
@@ -153,3 +157,54 @@ def test_parse_ota_xml_commission():
     # Nel mock XML c'è commission Amount="50" = 50.00 EUR (Amount è valore finale)
     assert reservation.commission_amount == 50.0
 
+
+
+def _build_ota_xml(count: int, container: str = "HotelReservations", item: str = "HotelReservation") -> str:
+    """Replica la prenotazione del fixture `count` volte con reservation_id diversi."""
+    start = MOCK_OTA_XML_RESPONSE.index("<HotelReservation>")
+    end = MOCK_OTA_XML_RESPONSE.index("</HotelReservation>") + len("</HotelReservation>")
+    block = MOCK_OTA_XML_RESPONSE[start:end]
+    blocks = [block.replace("4705950059", f"47059500{index:02d}") for index in range(count)]
+    xml = MOCK_OTA_XML_RESPONSE[:start] + "\n".join(blocks) + MOCK_OTA_XML_RESPONSE[end:]
+    return (
+        xml.replace("HotelReservations>", f"{container}>")
+        .replace("<HotelReservation>", f"<{item}>")
+        .replace("</HotelReservation>", f"</{item}>")
+    )
+
+
+def test_iter_ota_xml_yields_reservations_incrementally(monkeypatch):
+    """Test streaming: le prenotazioni arrivano prima della fine dell'XML."""
+    monkeypatch.setattr(booking_reservation_parser, "STREAM_CHUNK_SIZE", 256)
+    xml = _build_ota_xml(20)
+    
+    iterator = iter_ota_xml(xml)
+    first = next(iterator)
+    rest = list(iterator)
+    
+    assert first.reservation_id == "4705950000"
+    assert [r.reservation_id for r in rest] == [f"47059500{index:02d}" for index in range(1, 20)]
+    assert parse_ota_xml(xml) == [first, *rest]
+
+
+def test_iter_ota_xml_raises_on_truncated_xml_after_valid_reservations(monkeypatch):
+    """Test streaming: XML troncato solleva errore dopo le prenotazioni già lette."""
+    monkeypatch.setattr(booking_reservation_parser, "STREAM_CHUNK_SIZE", 256)
+    xml = _build_ota_xml(3)
+    truncated = xml[: xml.rindex("<HotelReservation>") + 40]
+    
+    iterator = iter_ota_xml(truncated)
+    assert [r.reservation_id for r in (next(iterator), next(iterator))] == ["4705950000", "4705950001"]
+    with pytest.raises(BookingReservationParserError):
+        next(iterator)
+
+
+def test_iter_ota_modify_xml_reads_modify_containers():
+    """Test HotelResModifyNotif: stessi dati con contenitori HotelResModifies/HotelResModify."""
+    xml = _build_ota_xml(2, container="HotelResModifies", item="HotelResModify")
+    
+    reservations = list(iter_ota_modify_xml(xml))
+    
+    assert [r.reservation_id for r in reservations] == ["4705950000", "4705950001"]
+    assert parse_ota_modify_xml(xml) == reservations
+    assert parse_ota_xml(xml) == []
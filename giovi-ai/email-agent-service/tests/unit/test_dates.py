@@ -0,0 +1,61 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from email_agent_service.parsers import dates
+from email_agent_service.parsers.dates import parse_date, parse_date_header
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("15/01/2026", datetime(2026, 1, 15)),
+        ("15.01.26", datetime(2026, 1, 15)),
+        ("15 gen 2026", datetime(2026, 1, 15)),
+        ("gio 3 set 2026", datetime(2026, 9, 3)),
+        ("LUNEDÌ 19 ottobre 2026", datetime(2026, 10, 19)),
+        ("Thursday, 3 September 2026", datetime(2026, 9, 3)),
+        ("September 3, 2026", datetime(2026, 9, 3)),
+        ("2026-01-15", datetime(2026, 1, 15)),
+    ],
+)
+def test_parse_date_known_formats(value, expected):
+    assert parse_date(value) == expected
+
+
+def test_parse_date_without_year_uses_current_year():
+    assert parse_date("lun 15 gennaio").replace(year=2000) == datetime(2000, 1, 15)
+    assert parse_date("lun 15 gennaio").year == datetime.now().year
+
+
+def test_parse_date_falls_back_to_dateutil_and_memoizes(monkeypatch):
+    calls = []
+    original = dates.date_parser.parse
+
+    def counting_parse(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(dates.date_parser, "parse", counting_parse)
+    dates._parse_date_cached.cache_clear()
+
+    assert parse_date("gio 3 set 2026") == datetime(2026, 9, 3)
+    assert calls == []  # fast path: dateutil non viene chiamato
+
+    assert parse_date("3rd of March 2026", fuzzy=True) == datetime(2026, 3, 3)
+    assert parse_date("3rd of March 2026", fuzzy=True) == datetime(2026, 3, 3)
+    assert len(calls) == 1  # il secondo parsing arriva dalla cache
+
+
+def test_parse_date_raises_on_unknown_value():
+    with pytest.raises(ValueError):
+        parse_date("nessuna data qui")
+    with pytest.raises(ValueError):
+        parse_date("31/02/2026")
+
+
+def test_parse_date_header():
+    assert parse_date_header("Thu, 03 Sep 2026 10:00:00 +0000") == datetime(2026, 9, 3, 10, tzinfo=timezone.utc)
+    assert parse_date_header("Thu, 03 Sep 2026 10:00:00 -0000").tzinfo is not None
+    assert parse_date_header(None) is None
+    assert parse_date_header("non una data") is None
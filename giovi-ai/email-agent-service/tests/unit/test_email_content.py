@@ -0,0 +1,44 @@
+from email.message import EmailMessage
+
+from email_agent_service.parsers.base import EmailContent
+
+HTML = "<html><body><h1>MAGGIORE SUITE - DUOMO DI PERUGIA</h1></body></html>"
+
+
+def build_message() -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = "Prenotazione confermata - Carlo arriverà il 3 set"
+    message["From"] = "Airbnb <automated@airbnb.com>"
+    message.set_content("Check-in=20gio 3 set 2026\r\nTotale")
+    message.add_alternative(HTML, subtype="html")
+    return message
+
+
+def test_email_content_decodes_lazily_from_message():
+    content = EmailContent(message=build_message())
+
+    assert "Check-in" in content.text
+    assert "MAGGIORE SUITE" in content.html
+    assert content.normalized_text.startswith("Check-in gio 3 set 2026\nTotale")
+
+
+def test_email_content_builds_soup_once():
+    content = EmailContent(message=build_message())
+
+    assert content.soup is content.soup
+    assert content.soup.find("h1").get_text() == "MAGGIORE SUITE - DUOMO DI PERUGIA"
+
+
+def test_email_content_memoizes_normalizers():
+    calls = []
+
+    def normalizer(value: str) -> str:
+        calls.append(value)
+        return value.upper()
+
+    content = EmailContent(message=build_message(), text="abc", html=None)
+
+    assert content.normalized(normalizer) == "ABC"
+    assert content.normalized(normalizer) == "ABC"
+    assert calls == ["abc"]
+    assert content.soup is None
@@ -0,0 +1,89 @@
+from email.message import EmailMessage
+
+from email_agent_service.parsers import (
+    AirbnbConfirmationParser,
+    AirbnbMessageParser,
+    BookingConfirmationParser,
+    EmailParsingEngine,
+)
+from email_agent_service.services.email_relevance import is_relevant_kind
+
+
+def build_email_bytes(subject: str, sender: str, body: str) -> bytes:
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = sender
+    message["To"] = "host@example.com"
+    message.set_content(body)
+    return message.as_bytes()
+
+
+def build_engine() -> EmailParsingEngine:
+    return EmailParsingEngine(
+        [AirbnbConfirmationParser(), BookingConfirmationParser(), AirbnbMessageParser()]
+    )
+
+
+def test_classify_returns_kind_and_headers_without_decoding_body(monkeypatch):
+    raw = build_email_bytes(
+        "Prenotazione confermata - Carlo Verdi arriverà il 3 set",
+        "Airbnb <automated@airbnb.com>",
+        "CODICE DI CONFERMA HMM5AE9MXB",
+    )
+
+    def fail(*args, **kwargs):
+        raise AssertionError("classify non deve decodificare il body")
+
+    monkeypatch.setattr("email_agent_service.parsers.engine.parse_message_lean", fail)
+    classified = build_engine().classify(message_id="msg-1", raw_payload=raw, snippet="anteprima")
+
+    assert classified.kind == "airbnb_confirmation"
+    assert classified.reservation is None
+    assert classified.metadata.sender == "Airbnb <automated@airbnb.com>"
+    assert classified.metadata.gmail_message_id == "msg-1"
+    assert classified.metadata.snippet == "anteprima"
+
+
+def test_classify_matches_full_parse_kind():
+    engine = build_engine()
+    payloads = [
+        build_email_bytes(
+            "Prenotazione confermata - Carlo Verdi arriverà il 3 set",
+            "Airbnb <automated@airbnb.com>",
+            "CODICE DI CONFERMA HMM5AE9MXB",
+        ),
+        build_email_bytes("Newsletter", "news@example.com", "Offerte"),
+    ]
+
+    for raw in payloads:
+        assert (
+            engine.classify(message_id="m", raw_payload=raw).kind
+            == engine.parse(message_id="m", raw_payload=raw).kind
+        )
+
+
+def test_classify_headers_matches_classify_from_raw():
+    engine = build_engine()
+    cases = [
+        ("Prenotazione confermata - Carlo Verdi arriverà il 3 set", "Airbnb <automated@airbnb.com>"),
+        ("Newsletter", "news@example.com"),
+    ]
+
+    for subject, sender in cases:
+        raw = build_email_bytes(subject, sender, "body")
+        from_headers = engine.classify_headers(
+            message_id="m",
+            headers=[("From", sender), ("Subject", subject), ("Date", "Tue, 3 Sep 2024 10:00:00 +0200")],
+            snippet="anteprima",
+        )
+        assert from_headers.kind == engine.classify(message_id="m", raw_payload=raw).kind
+        assert from_headers.metadata.subject == subject
+        assert from_headers.metadata.snippet == "anteprima"
+
+
+def test_is_relevant_kind_honours_airbnb_only():
+    assert is_relevant_kind("airbnb_message", airbnb_only=True)
+    assert not is_relevant_kind("booking_confirmation", airbnb_only=True)
+    assert is_relevant_kind("booking_confirmation", airbnb_only=False)
+    assert not is_relevant_kind("scidoo_confirmation", airbnb_only=False)
+    assert not is_relevant_kind("unhandled", airbnb_only=False)
@@ -0,0 +1,93 @@
+from datetime import datetime
+from email.message import EmailMessage
+
+from bs4 import BeautifulSoup
+
+from email_agent_service.parsers.airbnb_confirm import AirbnbConfirmationParser
+from email_agent_service.parsers.base import EmailContent
+from email_agent_service.parsers.field_index import FieldIndex
+from email_agent_service.parsers.scidoo_confirm import ScidooConfirmationParser
+
+SCIDOO_HTML = """
+<html><body>
+<table>
+<tr><th>ID Voucher</th><td>5150895143</td></tr>
+<tr><th>Camera/Alloggio</th><td>1 Suite Scacco</td></tr>
+<tr><th>Nome Ospite</th><td>Tommaso Torte</td></tr>
+<tr><th>Data di Check-in</th><td>15/01/2026</td></tr>
+<tr><th>Data di Check-out</th><td>18/01/2026</td></tr>
+<tr><th>Ospiti</th><td>2 Adulti</td></tr>
+</table>
+<p>Dati Ospite</p>
+<p>Email:ttorte.471243@guest.booking.com</p>
+<p>Totale Prenotazione: 979,76 €</p>
+</body></html>
+"""
+
+AIRBNB_HTML = """
+<html><body>
+<p>Carlo Verdi arriverà il 3 set</p>
+<div><div>Check-in</div><div>gio 3 set 2026</div></div>
+<div><div>Check-out</div><div>sab 5 set 2026</div></div>
+<table><tr><td>Ospiti</td><td>3 adulti</td></tr></table>
+<p>TOTALE (EUR) 318,00 €</p>
+<a href="https://www.airbnb.it/hosting/thread/2245312345">Messaggio</a>
+</body></html>
+"""
+
+
+def build_content(subject: str, sender: str, html: str) -> EmailContent:
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = sender
+    message["To"] = "host@example.com"
+    message.add_alternative(html, subtype="html")
+    return EmailContent(message=message, text=None, html=html)
+
+
+def test_field_index_collects_table_adjacent_and_line_pairs():
+    index = FieldIndex.from_soup(BeautifulSoup(SCIDOO_HTML + AIRBNB_HTML, "html.parser"))
+
+    assert index.find("ID Voucher") == "5150895143"
+    assert index.find("nome ospite:") == "Tommaso Torte"
+    assert index.find("Check-in") == "15/01/2026"  # la label "Data di Check-in" viene prima
+    assert index.find("Email") == "ttorte.471243@guest.booking.com"
+    assert list(index.find_all("Check-out")) == ["18/01/2026", "sab 5 set 2026"]
+    assert index.find("Inesistente") is None
+    assert next(index.lines_with("ARRIVERÀ")) == "Carlo Verdi arriverà il 3 set"
+    assert index.hrefs == ["https://www.airbnb.it/hosting/thread/2245312345"]
+
+
+def test_scidoo_parser_reads_html_fields_from_index():
+    content = build_content(
+        "Confermata - Prenotazione ID 5150895143 - Booking",
+        "Scidoo Booking Manager <reservation@scidoo.com>",
+        SCIDOO_HTML,
+    )
+
+    reservation = ScidooConfirmationParser().parse(content).reservation
+
+    assert reservation.reservation_id == "5150895143"
+    assert reservation.property_name == "1 Suite Scacco"
+    assert reservation.guest_name == "Tommaso Torte"
+    assert reservation.guest_email == "ttorte.471243@guest.booking.com"
+    assert reservation.check_in.day == 15 and reservation.check_out.day == 18
+    assert reservation.adults == 2
+    assert reservation.total_amount == 979.76
+
+
+def test_airbnb_parser_reads_html_fields_from_index():
+    content = build_content(
+        "Prenotazione confermata",
+        "Airbnb <automated@airbnb.com>",
+        AIRBNB_HTML,
+    )
+
+    reservation = AirbnbConfirmationParser().parse(content).reservation
+
+    assert reservation.thread_id == "2245312345"
+    assert reservation.guest_name == "Carlo Verdi"
+    assert reservation.check_in == datetime(2026, 9, 3)
+    assert reservation.check_out == datetime(2026, 9, 5)
+    assert reservation.adults == 3
+    assert reservation.total_amount == 318.0
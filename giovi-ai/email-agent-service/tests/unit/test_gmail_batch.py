@@ -0,0 +1,253 @@
+from typing import Dict, List, Optional
+
+import httplib2
+import pytest
+from cryptography.fernet import Fernet
+from googleapiclient.errors import HttpError
+
+from email_agent_service.config.settings import get_settings
+from email_agent_service.repositories.host_email_integrations import HostEmailIntegrationRecord
+from email_agent_service.services import gmail_service as gmail_service_module
+from email_agent_service.services.gmail_client_pool import GmailClientPool
+from email_agent_service.services.gmail_quota import GmailQuotaRegistry
+from email_agent_service.services.gmail_service import GmailBatchIncompleteError, GmailService, HistoryExpiredError
+from email_agent_service.utils import crypto
+
+
+@pytest.fixture(autouse=True)
+def env_setup(monkeypatch):
+    monkeypatch.setenv("TOKEN_ENCRYPTION_KEY", Fernet.generate_key().decode())
+    monkeypatch.setenv("GOOGLE_OAUTH_CLIENT_ID", "client-id")
+    monkeypatch.setenv("GOOGLE_OAUTH_CLIENT_SECRET", "client-secret")
+    monkeypatch.setenv("GOOGLE_OAUTH_REDIRECT_URI", "https://example.com/callback")
+    monkeypatch.setattr(gmail_service_module.time, "sleep", lambda seconds: None)
+    get_settings.cache_clear()
+    crypto._get_fernet.cache_clear()
+    yield
+    get_settings.cache_clear()
+    crypto._get_fernet.cache_clear()
+
+
+RATE_LIMIT_403 = b'{"error": {"errors": [{"reason": "rateLimitExceeded"}]}}'
+
+
+def http_error(status: int) -> HttpError:
+    content = RATE_LIMIT_403 if status == 403 else b"{}"
+    return HttpError(httplib2.Response({"status": status}), content)
+
+
+class FakeBatch:
+    def __init__(self, gmail: "FakeGmail", callback):
+        self._gmail = gmail
+        self._callback = callback
+        self._ids: List[str] = []
+
+    def add(self, request, request_id: str) -> None:
+        self._ids.append(request_id)
+
+    def execute(self) -> None:
+        self._gmail.batches.append(list(self._ids))
+        for message_id in self._ids:
+            failures = self._gmail.failures.get(message_id, [])
+            if failures:
+                failure = failures.pop(0)
+                self._callback(message_id, None, failure if isinstance(failure, Exception) else http_error(failure))
+            else:
+                self._callback(message_id, {"id": message_id, "raw": "cmF3"}, None)
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self._response = response
+
+    def execute(self):
+        if isinstance(self._response, Exception):
+            raise self._response
+        return self._response
+
+
+class FakeGmail:
+    """Resource Gmail minimale: messages().get, il batch e history().list."""
+
+    def __init__(self, failures: Dict[str, list], history_pages: Optional[dict] = None):
+        self.failures = failures
+        self.batches: List[List[str]] = []
+        # pageToken -> risposta (o eccezione) di history().list
+        self.history_pages = history_pages or {}
+        self.history_requests: List[dict] = []
+        self.get_requests: List[dict] = []
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def get(self, **kwargs):
+        self.get_requests.append(kwargs)
+        return kwargs
+
+    def history(self):
+        return self
+
+    def list(self, **kwargs):
+        self.history_requests.append(kwargs)
+        return FakeRequest(self.history_pages[kwargs.get("pageToken")])
+
+
+class CountingQuotas(GmailQuotaRegistry):
+    def __init__(self):
+        super().__init__(sleep=lambda seconds: None)
+        self.penalties = 0
+
+    def bucket(self, email, units_per_second=250):
+        bucket = super().bucket(email, units_per_second)
+        if not hasattr(bucket, "counted"):
+            original = bucket.penalize
+
+            def penalize():
+                self.penalties += 1
+                original()
+
+            bucket.penalize, bucket.counted = penalize, True
+        return bucket
+
+
+def build_service(monkeypatch, failures: Dict[str, list], history_pages: Optional[dict] = None):
+    gmail = FakeGmail(failures, history_pages)
+    service = GmailService(integration_repo=None, client_pool=GmailClientPool(), quotas=CountingQuotas())
+    resets = []
+    monkeypatch.setattr(service, "_gmail", lambda integration: gmail)
+    monkeypatch.setattr(service, "_reset_client", lambda integration: resets.append(integration.email))
+    return service, gmail, resets
+
+
+def build_record() -> HostEmailIntegrationRecord:
+    return HostEmailIntegrationRecord(
+        email="host@example.com",
+        host_id="host-123",
+        provider="gmail",
+        encrypted_access_token="access",
+        encrypted_refresh_token="refresh",
+        scopes=[],
+        token_expiry=None,
+    )
+
+
+def test_batch_chunks_requests_and_keys_results_by_id(monkeypatch):
+    service, gmail, _ = build_service(monkeypatch, {})
+    ids = [f"msg-{index}" for index in range(5)]
+
+    results = service.get_messages_raw_batch(build_record(), ids + ["msg-0"], batch_size=2, workers=1)
+
+    assert gmail.batches == [["msg-0", "msg-1"], ["msg-2", "msg-3"], ["msg-4"]]
+    assert set(results) == set(ids)
+    assert results["msg-3"]["id"] == "msg-3"
+
+
+def test_batch_retries_only_failed_items(monkeypatch):
+    service, gmail, resets = build_service(monkeypatch, {"msg-1": [429], "msg-2": [401, 429]})
+
+    results = service.get_messages_raw_batch(build_record(), ["msg-0", "msg-1", "msg-2"], workers=1)
+
+    assert gmail.batches == [["msg-0", "msg-1", "msg-2"], ["msg-1", "msg-2"], ["msg-2"]]
+    assert set(results) == {"msg-0", "msg-1", "msg-2"}
+    assert resets == ["host@example.com"]  # token rinnovato solo dopo il 401
+
+
+def test_batch_drops_permanent_failures_and_gives_up_after_retries(monkeypatch):
+    service, gmail, _ = build_service(monkeypatch, {"gone": [404], "busy": [429, 429, 429, 429]})
+
+    results = service.get_messages_raw_batch(build_record(), ["ok", "gone", "busy"], workers=1)
+
+    assert set(results) == {"ok"}
+    assert len(gmail.batches) == 3
+    assert all("gone" not in batch for batch in gmail.batches[1:])
+
+
+def test_strict_batch_raises_on_transient_failures_but_not_on_permanent_ones(monkeypatch):
+    service, _, _ = build_service(monkeypatch, {"gone": [404], "busy": [503, 503, 503]})
+
+    with pytest.raises(GmailBatchIncompleteError) as excinfo:
+        service.get_messages_raw_batch(build_record(), ["ok", "gone", "busy"], workers=1, strict=True)
+
+    assert excinfo.value.message_ids == ["busy"]
+    assert set(excinfo.value.results) == {"ok"}
+
+    service, _, _ = build_service(monkeypatch, {"gone": [404]})
+    assert set(service.get_messages_raw_batch(build_record(), ["ok", "gone"], workers=1, strict=True)) == {"ok"}
+
+
+def test_batch_retries_only_http_and_transport_errors(monkeypatch):
+    service, gmail, _ = build_service(
+        monkeypatch,
+        {"slow": [TimeoutError("timed out")], "reset": [httplib2.ServerNotFoundError("dns")], "bug": [ValueError("bad payload")]},
+    )
+
+    results = service.get_messages_raw_batch(build_record(), ["ok", "slow", "reset", "bug"], workers=1)
+
+    assert set(results) == {"ok", "slow", "reset"}
+    assert sorted(gmail.batches[1]) == ["reset", "slow"]
+    assert len(gmail.batches) == 2
+
+
+def test_batch_chunks_stay_within_gmail_batch_limit(monkeypatch):
+    ids = [f"msg-{index}" for index in range(120)]
+    service, gmail, _ = build_service(monkeypatch, {})
+
+    service.get_messages_raw_batch(build_record(), ids, batch_size=500, workers=1)
+
+    assert [len(batch) for batch in gmail.batches] == [50, 50, 20]
+
+
+def test_batch_runs_chunks_concurrently_and_adapts_to_rate_limits(monkeypatch):
+    ids = [f"msg-{index}" for index in range(100)]
+    service, gmail, _ = build_service(monkeypatch, {"msg-7": [403], "msg-55": [429]})
+
+    results = service.get_messages_raw_batch(build_record(), ids, workers=4)
+
+    assert set(results) == set(ids)
+    first_round = gmail.batches[:4]
+    assert sorted(len(batch) for batch in first_round) == [25, 25, 25, 25]
+    assert sorted(gmail.batches[4]) == ["msg-55", "msg-7"]
+    assert service._quotas.penalties == 1
+    # 100 + 2 messages.get da 5 unit prenotati sul budget della casella
+    bucket = service._quotas.bucket("host@example.com")
+    assert bucket.rate < bucket.max_rate
+
+
+
+def test_metadata_batch_requests_only_classification_headers(monkeypatch):
+    service, gmail, _ = build_service(monkeypatch, {})
+
+    results = service.get_messages_metadata_batch(build_record(), ["msg-0", "msg-1"], workers=1)
+
+    assert set(results) == {"msg-0", "msg-1"}
+    assert {request["format"] for request in gmail.get_requests} == {"metadata"}
+    assert gmail.get_requests[0]["metadataHeaders"] == ["From", "Subject", "Date"]
+
+
+def test_iter_history_follows_next_page_token(monkeypatch):
+    pages = {
+        None: {"history": [{"id": "101"}], "nextPageToken": "p2", "historyId": "120"},
+        "p2": {"history": [{"id": "110"}], "historyId": "120"},
+    }
+    service, gmail, _ = build_service(monkeypatch, {}, history_pages=pages)
+
+    result = list(service.iter_history(build_record(), "100"))
+
+    assert result == [pages[None], pages["p2"]]
+    assert [request["pageToken"] for request in gmail.history_requests] == [None, "p2"]
+    assert all(request["startHistoryId"] == "100" for request in gmail.history_requests)
+
+
+def test_get_history_reports_expired_start_history_id(monkeypatch):
+    service, _, _ = build_service(monkeypatch, {}, history_pages={None: http_error(404)})
+
+    with pytest.raises(HistoryExpiredError) as error:
+        service.get_history(build_record(), "100")
+
+    assert error.value.start_history_id == "100"
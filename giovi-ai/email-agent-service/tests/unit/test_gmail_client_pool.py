@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import pytest
+from cryptography.fernet import Fernet
+
+from email_agent_service.config.settings import get_settings
+from email_agent_service.repositories.host_email_integrations import HostEmailIntegrationRecord
+from email_agent_service.services import gmail_client_pool
+from email_agent_service.services.gmail_client_pool import GmailClientPool
+from email_agent_service.services.gmail_service import GmailService
+from email_agent_service.utils import crypto
+
+
+@pytest.fixture(autouse=True)
+def env_setup(monkeypatch):
+    monkeypatch.setenv("TOKEN_ENCRYPTION_KEY", Fernet.generate_key().decode())
+    monkeypatch.setenv("GOOGLE_OAUTH_CLIENT_ID", "client-id")
+    monkeypatch.setenv("GOOGLE_OAUTH_CLIENT_SECRET", "client-secret")
+    monkeypatch.setenv("GOOGLE_OAUTH_REDIRECT_URI", "https://example.com/callback")
+    get_settings.cache_clear()
+    crypto._get_fernet.cache_clear()
+    yield
+    get_settings.cache_clear()
+    crypto._get_fernet.cache_clear()
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+
+    def fake_build(*args, **kwargs):
+        calls.append(kwargs["credentials"])
+        return object()
+
+    monkeypatch.setattr(gmail_client_pool, "build", fake_build)
+    return calls
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeIntegrationRepo:
+    def __init__(self):
+        self.updated_tokens = []
+
+    def update_access_token(self, email: str, encrypted_token: str) -> None:
+        self.updated_tokens.append((email, encrypted_token))
+
+
+def build_record(access_token: str = "access", refresh_token: Optional[str] = "refresh") -> HostEmailIntegrationRecord:
+    return HostEmailIntegrationRecord(
+        email="host@example.com",
+        host_id="host-123",
+        provider="gmail",
+        encrypted_access_token=crypto.encrypt_text(access_token),
+        encrypted_refresh_token=crypto.encrypt_text(refresh_token) if refresh_token else None,
+        scopes=["https://www.googleapis.com/auth/gmail.readonly"],
+        token_expiry=None,
+    )
+
+
+def test_service_reuses_client_and_decrypts_tokens_once(monkeypatch, builds):
+    decrypted = []
+    original_decrypt = crypto.decrypt_text
+
+    def counting_decrypt(token: str) -> str:
+        decrypted.append(token)
+        return original_decrypt(token)
+
+    monkeypatch.setattr("email_agent_service.services.gmail_service.decrypt_text", counting_decrypt)
+    pool = GmailClientPool()
+    service = GmailService(FakeIntegrationRepo(), client_pool=pool)
+    record = build_record()
+
+    first = service._gmail(record)
+    second = GmailService(FakeIntegrationRepo(), client_pool=pool)._gmail(record)
+
+    assert first is second
+    assert len(builds) == 1
+    assert len(decrypted) == 1
+
+
+def test_pool_expires_clients_after_ttl(builds):
+    clock = FakeClock()
+    pool = GmailClientPool(ttl_seconds=60, clock=clock)
+    service = GmailService(FakeIntegrationRepo(), client_pool=pool)
+    record = build_record()
+
+    client = service._client(record)
+    clock.now = 30
+    assert service._client(record) is client
+    clock.now = 61
+    assert service._client(record) is not client
+    assert len(builds) == 2
+
+
+def test_pool_misses_when_stored_tokens_change(builds):
+    pool = GmailClientPool()
+    service = GmailService(FakeIntegrationRepo(), client_pool=pool)
+
+    client = service._client(build_record())
+    # Riconnessione OAuth: nuovi token in Firestore
+    assert service._client(build_record(access_token="new-access")) is not client
+    assert len(pool) == 1
+
+
+def utc_now() -> datetime:
+    # google-auth confronta `expiry` con un datetime UTC naive
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def test_refresh_near_expiry_updates_token_and_keeps_client(monkeypatch, builds):
+    def fake_refresh(credentials, request):
+        credentials.token = "refreshed"
+        credentials.expiry = utc_now() + timedelta(hours=1)
+
+    monkeypatch.setattr("google.oauth2.credentials.Credentials.refresh", fake_refresh)
+    repo = FakeIntegrationRepo()
+    pool = GmailClientPool()
+    service = GmailService(repo, client_pool=pool)
+    record = build_record()
+
+    client = service._client(record)
+    assert repo.updated_tokens == []  # token senza expiry noto: nessun refresh
+
+    client.credentials.expiry = utc_now() + timedelta(seconds=30)
+    assert service._client(record) is client
+    assert client.credentials.token == "refreshed"
+    assert len(repo.updated_tokens) == 1
+
+    # Record riletto da Firestore dopo il refresh: stesso client, nessuna nuova build
+    _, encrypted_token = repo.updated_tokens[0]
+    refreshed_record = build_record()
+    refreshed_record.encrypted_access_token = encrypted_token
+    refreshed_record.encrypted_refresh_token = record.encrypted_refresh_token
+    assert service._client(refreshed_record) is client
+    assert len(builds) == 1
+
+
+def test_invalidate_and_lru_eviction(builds):
+    pool = GmailClientPool(max_clients=1)
+    service = GmailService(FakeIntegrationRepo(), client_pool=pool)
+    record = build_record()
+    other = build_record()
+    other.email = "other@example.com"
+
+    service._client(record)
+    service._client(other)
+    assert len(pool) == 1
+    assert pool.get(record) is None
+
+    pool.invalidate(other.email)
+    assert pool.get(other) is None
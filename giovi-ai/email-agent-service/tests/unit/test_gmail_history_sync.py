@@ -0,0 +1,103 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import pytest
+
+from email_agent_service.repositories.host_email_integrations import HostEmailIntegrationRecord
+from email_agent_service.services.gmail_history_sync import GmailHistorySync
+from email_agent_service.services.gmail_service import HistoryExpiredError
+
+
+def added(message_id: str, labels=("INBOX",)) -> dict:
+    return {"messagesAdded": [{"message": {"id": message_id, "labelIds": list(labels)}}]}
+
+
+class FakeGmailService:
+    def __init__(self, history_pages: Optional[List[dict]] = None, list_pages: Optional[List[dict]] = None):
+        self.history_pages = history_pages
+        self.list_pages = list_pages or []
+        self.history_calls = 0
+        self.queries: List[tuple] = []
+
+    def iter_history(self, integration, start_history_id, label_id=None):
+        if self.history_pages is None:
+            raise HistoryExpiredError(start_history_id)
+        for page in self.history_pages:
+            self.history_calls += 1
+            yield page
+
+    def list_messages(self, integration, query, *, page_token=None, max_results=100):
+        self.queries.append((query, page_token))
+        index = int(page_token or 0)
+        return self.list_pages[index]
+
+
+def build_record() -> HostEmailIntegrationRecord:
+    return HostEmailIntegrationRecord(
+        email="host@example.com",
+        host_id="host-123",
+        provider="gmail",
+        encrypted_access_token="access",
+        encrypted_refresh_token="refresh",
+        scopes=[],
+        token_expiry=None,
+    )
+
+
+def build_sync(service: FakeGmailService) -> GmailHistorySync:
+    return GmailHistorySync(
+        service,
+        fallback_days=7,
+        clock=lambda: datetime(2026, 3, 10, tzinfo=timezone.utc),
+    )
+
+
+def test_sync_follows_all_history_pages():
+    service = FakeGmailService(
+        history_pages=[
+            {"history": [added("m1"), added("sent", labels=("SENT",))], "nextPageToken": "p2", "historyId": "150"},
+            {"history": [added("m2"), added("m1")], "nextPageToken": "p3", "historyId": "150"},
+            {"history": [], "historyId": "160"},
+            {"history": [added("m3")], "historyId": "170"},
+        ]
+    )
+    sync = build_sync(service)
+
+    pages = list(sync.iter_message_id_pages(build_record(), "100"))
+
+    assert pages == [["m1"], ["m2"], ["m3"]]
+    assert service.history_calls == 4
+    assert sync.pages == 4
+    assert sync.latest_history_id == "170"
+    assert sync.full_sync is False
+
+
+def test_sync_falls_back_to_bounded_inbox_search_when_history_expired():
+    service = FakeGmailService(
+        list_pages=[
+            {"messages": [{"id": "m1"}, {"id": "m2"}], "nextPageToken": "1"},
+            {"messages": [{"id": "m2"}, {"id": "m3"}]},
+        ]
+    )
+    sync = build_sync(service)
+
+    pages = list(sync.iter_message_id_pages(build_record(), "100"))
+
+    assert pages == [["m1", "m2"], ["m3"]]
+    assert sync.full_sync is True
+    assert sync.latest_history_id is None
+    assert service.queries == [("in:inbox after:2026/03/03", None), ("in:inbox after:2026/03/03", "1")]
+
+
+def test_sync_does_not_hide_expiry_after_partial_history():
+    class ExpiringService(FakeGmailService):
+        def iter_history(self, integration, start_history_id, label_id=None):
+            yield {"history": [added("m1")], "nextPageToken": "p2"}
+            raise HistoryExpiredError(start_history_id)
+
+    sync = build_sync(ExpiringService())
+    pages = sync.iter_message_id_pages(build_record(), "100")
+
+    assert next(pages) == ["m1"]
+    with pytest.raises(HistoryExpiredError):
+        next(pages)
@@ -0,0 +1,139 @@
+from typing import List, Optional
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from email_agent_service.repositories.host_email_integrations import HostEmailIntegrationRecord
+from email_agent_service.services.gmail_ingest_filters import (
+    INGEST_LABEL_NAME,
+    GmailIngestFilterProvisioner,
+    filter_domains,
+)
+
+
+class FakeGmailService:
+    def __init__(
+        self,
+        filters: Optional[List[dict]] = None,
+        status: Optional[int] = None,
+        filter_status: Optional[int] = None,
+    ):
+        self.filters = list(filters or [])
+        self.status = status
+        self.filter_status = filter_status
+        self.created: List[str] = []
+        self.deleted: List[str] = []
+
+    def get_or_create_label(self, integration, name):
+        if self.status:
+            raise HttpError(httplib2.Response({"status": self.status}), b"{}")
+        assert name == INGEST_LABEL_NAME
+        return "Label_1"
+
+    def list_filters(self, integration):
+        return list(self.filters)
+
+    def create_filter(self, integration, criteria, action):
+        if self.filter_status:
+            raise HttpError(httplib2.Response({"status": self.filter_status}), b"{}")
+        filter_id = f"new-{criteria['from']}"
+        self.created.append(criteria["from"])
+        self.filters.append({"id": filter_id, "criteria": criteria, "action": action})
+        return filter_id
+
+    def delete_filter(self, integration, filter_id):
+        self.deleted.append(filter_id)
+        self.filters = [item for item in self.filters if item["id"] != filter_id]
+
+
+class FakeIntegrationRepository:
+    def __init__(self):
+        self.saved: List[Optional[dict]] = []
+
+    def update_ingest_filter(self, email, ingest_filter):
+        self.saved.append(ingest_filter)
+
+
+def label_filter(filter_id: str, domain: str, label_id: str = "Label_1") -> dict:
+    return {"id": filter_id, "criteria": {"from": domain}, "action": {"addLabelIds": [label_id]}}
+
+
+def build_record(ingest_filter: Optional[dict] = None) -> HostEmailIntegrationRecord:
+    return HostEmailIntegrationRecord(
+        email="host@example.com",
+        host_id="host-123",
+        provider="gmail",
+        encrypted_access_token="access",
+        encrypted_refresh_token="refresh",
+        scopes=[],
+        token_expiry=None,
+        ingest_filter=ingest_filter,
+    )
+
+
+DOMAINS = ["airbnb.com", "reply.airbnb.com", "guest.booking.com", "scidoo.com"]
+
+
+def test_filter_domains_collapses_subdomains():
+    assert filter_domains(["reply.airbnb.com", "Airbnb.com", "guest.booking.com", "reply.booking.com"]) == [
+        "airbnb.com",
+        "guest.booking.com",
+        "reply.booking.com",
+    ]
+
+
+def test_ensure_creates_label_and_one_filter_per_domain():
+    gmail, repo = FakeGmailService(), FakeIntegrationRepository()
+    integration = build_record()
+
+    label_id = GmailIngestFilterProvisioner(gmail, repo).ensure(integration, DOMAINS)
+
+    assert label_id == "Label_1"
+    assert gmail.created == ["airbnb.com", "guest.booking.com", "scidoo.com"]
+    assert repo.saved[-1]["senderDomains"] == ["airbnb.com", "guest.booking.com", "scidoo.com"]
+    assert integration.ingest_filter["labelId"] == "Label_1"
+
+
+def test_ensure_reconciles_existing_filters_with_parser_domains():
+    gmail = FakeGmailService(
+        filters=[
+            label_filter("keep", "airbnb.com"),
+            label_filter("stale", "old-ota.com"),
+            label_filter("dup", "airbnb.com"),
+            label_filter("user", "newsletter.com", label_id="Label_user"),
+        ]
+    )
+
+    GmailIngestFilterProvisioner(gmail, FakeIntegrationRepository()).ensure(build_record(), DOMAINS)
+
+    assert sorted(gmail.deleted) == ["dup", "stale"]
+    assert gmail.created == ["guest.booking.com", "scidoo.com"]
+    assert {item["id"] for item in gmail.filters} >= {"keep", "user"}
+
+
+def test_ensure_rebuild_recreates_all_label_filters():
+    gmail = FakeGmailService(filters=[label_filter("keep", "airbnb.com")])
+
+    GmailIngestFilterProvisioner(gmail, FakeIntegrationRepository()).ensure(build_record(), DOMAINS, rebuild=True)
+
+    assert gmail.deleted == ["keep"]
+    assert gmail.created == ["airbnb.com", "guest.booking.com", "scidoo.com"]
+
+
+def test_ensure_falls_back_to_inbox_without_settings_scope():
+    gmail, repo = FakeGmailService(status=403), FakeIntegrationRepository()
+    integration = build_record(ingest_filter={"labelId": "Label_1"})
+
+    assert GmailIngestFilterProvisioner(gmail, repo).ensure(integration, DOMAINS) is None
+    assert repo.saved == [None]
+    assert integration.ingest_filter is None
+
+
+def test_ensure_falls_back_to_inbox_on_any_provisioning_failure():
+    for gmail in (FakeGmailService(status=409), FakeGmailService(status=503), FakeGmailService(filter_status=400)):
+        repo = FakeIntegrationRepository()
+        integration = build_record(ingest_filter={"labelId": "Label_1"})
+
+        assert GmailIngestFilterProvisioner(gmail, repo).ensure(integration, DOMAINS) is None
+        assert repo.saved == [None]
+        assert integration.ingest_filter is None
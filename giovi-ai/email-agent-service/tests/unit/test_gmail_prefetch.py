@@ -0,0 +1,58 @@
+from typing import Dict, List
+
+from email_agent_service.parsers import AirbnbConfirmationParser, BookingConfirmationParser, EmailParsingEngine
+from email_agent_service.services.email_relevance import is_relevant_kind
+from email_agent_service.services.gmail_prefetch import fetch_for_parsing
+
+
+def metadata_payload(message_id: str, sender: str, subject: str) -> dict:
+    return {
+        "id": message_id,
+        "historyId": "42",
+        "snippet": f"snippet {message_id}",
+        "payload": {"headers": [{"name": "From", "value": sender}, {"name": "Subject", "value": subject}]},
+    }
+
+
+class FakeGmailService:
+    def __init__(self, metadata: Dict[str, dict]):
+        self.metadata = metadata
+        self.raw_requests: List[List[str]] = []
+
+    def get_messages_metadata_batch(self, integration, message_ids, strict=False):
+        return {message_id: self.metadata[message_id] for message_id in message_ids if message_id in self.metadata}
+
+    def get_messages_raw_batch(self, integration, message_ids, strict=False):
+        self.raw_requests.append(list(message_ids))
+        return {message_id: {"id": message_id, "raw": "cmF3"} for message_id in message_ids}
+
+
+class FakeIntegration:
+    email = "host@example.com"
+
+
+def test_fetch_for_parsing_downloads_raw_only_for_relevant_messages():
+    gmail = FakeGmailService(
+        {
+            "airbnb": metadata_payload("airbnb", "Airbnb <automated@airbnb.com>", "Prenotazione confermata - Carlo"),
+            "booking": metadata_payload("booking", "Booking.com <noreply@booking.com>", "Nuova prenotazione"),
+            "news": metadata_payload("news", "news@example.com", "Offerte"),
+        }
+    )
+    engine = EmailParsingEngine([AirbnbConfirmationParser(), BookingConfirmationParser()])
+
+    fetched = fetch_for_parsing(
+        gmail,
+        engine,
+        FakeIntegration(),
+        ["airbnb", "booking", "news", "gone"],
+        lambda kind: is_relevant_kind(kind, airbnb_only=True),
+    )
+
+    assert gmail.raw_requests == [["airbnb"]]
+    assert fetched["airbnb"] == ({"id": "airbnb", "raw": "cmF3"}, None)
+    payload, classified = fetched["news"]
+    assert payload["historyId"] == "42"
+    assert classified.kind == "unhandled"
+    assert classified.metadata.snippet == "snippet news"
+    assert "gone" not in fetched
@@ -0,0 +1,71 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from email_agent_service.services.gmail_quota import (
+    RECOVERY_SECONDS,
+    GmailQuotaRegistry,
+    QuotaBucket,
+    is_rate_limit_error,
+)
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+
+
+def test_bucket_reserves_in_arrival_order_and_allows_debt():
+    fake = FakeTime()
+    bucket = QuotaBucket(250, clock=fake.clock, sleep=fake.sleep)
+
+    assert bucket.acquire(200) == 0  # entro il burst di un secondo
+    # Batch da 100 messages.get: 500 unit, oltre la capacità del bucket
+    assert bucket.acquire(500) == pytest.approx(450 / 250)
+    # Chi arriva dopo attende anche il debito del batch precedente
+    assert bucket.acquire(5) == pytest.approx(455 / 250)
+
+    fake.now = 10.0
+    assert bucket.acquire(5) == 0
+
+
+def test_rate_limit_halves_rate_and_recovers_linearly():
+    fake = FakeTime()
+    bucket = QuotaBucket(250, clock=fake.clock, sleep=fake.sleep)
+
+    bucket.penalize()
+    bucket.penalize()
+    assert bucket.rate == pytest.approx(62.5)
+    assert bucket.acquire(125) == pytest.approx(2.0)
+
+    fake.now = RECOVERY_SECONDS
+    bucket.acquire(0)
+    assert bucket.rate == 250
+
+    for _ in range(10):
+        bucket.penalize()
+    assert bucket.rate == pytest.approx(25.0)  # minimo: 10% del budget
+
+
+def test_registry_shares_one_bucket_per_mailbox():
+    registry = GmailQuotaRegistry()
+
+    assert registry.bucket("a@example.com") is registry.bucket("a@example.com")
+    assert registry.bucket("a@example.com") is not registry.bucket("b@example.com")
+
+
+def test_is_rate_limit_error():
+    def error(status: int, content: bytes = b"{}") -> HttpError:
+        return HttpError(httplib2.Response({"status": status}), content)
+
+    assert is_rate_limit_error(error(429))
+    assert is_rate_limit_error(error(403, b'{"error": {"errors": [{"reason": "userRateLimitExceeded"}]}}'))
+    assert not is_rate_limit_error(error(403, b'{"error": {"errors": [{"reason": "insufficientPermissions"}]}}'))
+    assert not is_rate_limit_error(ValueError("boom"))
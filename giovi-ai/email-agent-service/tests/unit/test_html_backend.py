@@ -0,0 +1,133 @@
+from email.message import EmailMessage
+from html import escape
+
+import pytest
+
+import tests.unit.test_airbnb_parsers as airbnb_cases
+import tests.unit.test_booking_parsers as booking_cases
+from email_agent_service.parsers.airbnb_confirm import AirbnbConfirmationParser
+from email_agent_service.parsers.airbnb_message import AirbnbMessageParser
+from email_agent_service.parsers.base import EmailContent
+from email_agent_service.parsers.booking_confirm import BookingConfirmationParser
+from email_agent_service.parsers.booking_message import BookingMessageParser
+from email_agent_service.parsers.html_backend import (
+    HTML_PARSER_BACKEND,
+    LXML_BACKEND,
+    resolve_html_backend,
+)
+
+# Email Airbnb in HTML con markup "sporco" tipico dei template (tag non chiusi, entity, br)
+AIRBNB_CONFIRM_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Airbnb</title></head>
+<body>
+<h1>MAGGIORE SUITE - DUOMO DI PERUGIA</h1>
+<p>Nuova prenotazione confermata! Carlo Verdi arriverà il 3 set.
+<table>
+<tr><td>Check-in<td>Check-out
+<tr><td>gio 3 set 2026<br>16:00<td>sab 5 set 2026<br>11:00
+<tr><td>Ospiti</td><td>2 adulti</td></tr>
+<tr><td>CODICE DI CONFERMA</td><td>HMM5AE9MXB</td></tr>
+<tr><td>TOTALE (EUR)</td><td>318,00&nbsp;&euro;</td></tr>
+</table>
+<a href="https://www.airbnb.it/hosting/reservations/details/HMM5AE9MXB">Dettagli</a>
+<a href="https://www.airbnb.it/hosting/thread/2245312345?c=1">Invia un messaggio</a>
+</body></html>
+"""
+
+CASES = [
+    (
+        AirbnbConfirmationParser,
+        "Prenotazione confermata - Edward Cadagin arriverà il 10 set",
+        "Airbnb <automated@airbnb.com>",
+        airbnb_cases.AIRBNB_CONFIRM_TEXT,
+    ),
+    (
+        AirbnbConfirmationParser,
+        "Prenotazione confermata - Carlo Verdi arriverà il 3 set",
+        "Airbnb <automated@airbnb.com>",
+        airbnb_cases.AIRBNB_CONFIRM_NO_LABEL_TEXT,
+    ),
+    (
+        AirbnbConfirmationParser,
+        "Prenotazione confermata - Francesco arriverà il 3 set",
+        "Airbnb <automated@airbnb.com>",
+        airbnb_cases.AIRBNB_CONFIRM_TEMPLATE_TEXT,
+    ),
+    (
+        AirbnbMessageParser,
+        "RE: Prenotazione per Imperial Suite Luxury Perugia pieno Centro Storico",
+        "Airbnb <express@airbnb.com>",
+        airbnb_cases.AIRBNB_MESSAGE_TEXT,
+    ),
+    (
+        BookingConfirmationParser,
+        "Confermata - Prenotazione ID 5958915259 - Booking",
+        "Scidoo Booking Manager <reservation@scidoo.com>",
+        booking_cases.BOOKING_CONFIRM_TEXT,
+    ),
+    (
+        BookingMessageParser,
+        "Abbiamo ricevuto questo messaggio da Francesco Brufani",
+        "5958915259-XYZ@mchat.booking.com",
+        booking_cases.BOOKING_MESSAGE_TEXT,
+    ),
+]
+
+
+def to_html(text: str) -> str:
+    rows = "".join(f"<tr><td>{escape(line)}</td></tr>" for line in text.strip().splitlines())
+    return f"<html><body><table>{rows}</table></body></html>"
+
+
+def build_content(subject: str, sender: str, text, html: str, backend: str) -> EmailContent:
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = sender
+    message["To"] = "host@example.com"
+    message["Date"] = "Fri, 07 Mar 2025 20:27:17 +0000"
+    message.set_content(text or "")
+    return EmailContent(message=message, text=text, html=html, html_backend=backend)
+
+
+def parse_with(backend: str, parser_cls, subject: str, sender: str, text, html: str) -> dict:
+    content = build_content(subject, sender, text, html, backend)
+    parser = parser_cls()
+    assert parser.matches(content)
+    return parser.parse(content).model_dump()
+
+
+@pytest.mark.parametrize("parser_cls, subject, sender, text", CASES)
+@pytest.mark.parametrize("with_text", [True, False], ids=["text+html", "html-only"])
+def test_backends_produce_identical_results(parser_cls, subject, sender, text, with_text):
+    pytest.importorskip("lxml")
+    html = to_html(text)
+    body = text if with_text else None
+
+    expected = parse_with(HTML_PARSER_BACKEND, parser_cls, subject, sender, body, html)
+    actual = parse_with(LXML_BACKEND, parser_cls, subject, sender, body, html)
+
+    assert actual == expected
+
+
+def test_backends_agree_on_airbnb_html_template():
+    pytest.importorskip("lxml")
+    subject = "Prenotazione confermata - Carlo Verdi arriverà il 3 set"
+    sender = "Airbnb <automated@airbnb.com>"
+
+    expected = parse_with(
+        HTML_PARSER_BACKEND, AirbnbConfirmationParser, subject, sender, None, AIRBNB_CONFIRM_HTML
+    )
+    actual = parse_with(
+        LXML_BACKEND, AirbnbConfirmationParser, subject, sender, None, AIRBNB_CONFIRM_HTML
+    )
+
+    assert actual == expected
+    assert actual["reservation"]["reservation_id"] == "HMM5AE9MXB"
+    assert actual["reservation"]["thread_id"] == "2245312345"
+
+
+def test_resolve_html_backend():
+    assert resolve_html_backend("html.parser") == HTML_PARSER_BACKEND
+    assert resolve_html_backend("auto") in (LXML_BACKEND, HTML_PARSER_BACKEND)
+    with pytest.raises(ValueError):
+        resolve_html_backend("selectolax")
@@ -1,3 +1,5 @@
+import base64
+import json
 from datetime import datetime, timezone
 
 import pytest
@@ -5,10 +7,17 @@ from cryptography.fernet import Fernet
 from fastapi.testclient import TestClient
 
 from email_agent_service.app import create_app
+from email_agent_service.dependencies.firebase import get_firestore_client
+from email_agent_service.services.watch_coalescer import NotificationCoalescer
 from email_agent_service.config.settings import get_settings
 from email_agent_service.repositories.host_email_integrations import HostEmailIntegrationRecord
-from email_agent_service.api.routes.integrations import get_oauth_service, get_backfill_service
+from email_agent_service.api.routes.integrations import (
+    get_backfill_job_runner,
+    get_backfill_service,
+    get_oauth_service,
+)
 from email_agent_service.models import (
+    GmailBackfillJobResponse,
     GmailBackfillPreviewResponse,
     GmailIntegrationStartResponse,
     PropertyPreview,
@@ -159,18 +168,62 @@ def test_callback_returns_errors(client, exception_cls, expected_status):
     client.app.dependency_overrides.clear()
 
 
+class FakeBackfillJobRunner:
+    def __init__(self):
+        self.started_with = None
+
+    def start(self, host_id: str, email: str, force: bool = False):
+        self.started_with = (host_id, email, force)
+        return "job-1"
+
+    def describe(self, job):
+        return self.get_status(job)
+
+    def get_status(self, job_id: str):
+        if job_id != "job-1":
+            return None
+        return GmailBackfillJobResponse(
+            jobId="job-1",
+            status="running",
+            hostId="host-xyz",
+            email="host@example.com",
+            pages=3,
+            processed=250,
+            estimatedTotal=1000,
+            messagesPerSecond=25.0,
+            etaSeconds=30,
+        )
+
+
 def test_backfill_endpoint(client):
-    fake_service = FakeBackfillService()
-    client.app.dependency_overrides[get_backfill_service] = lambda: fake_service
+    fake_runner = FakeBackfillJobRunner()
+    client.app.dependency_overrides[get_backfill_job_runner] = lambda: fake_runner
 
     response = client.post(
         "/integrations/gmail/host@example.com/backfill",
         params={"host_id": "host-xyz"},
     )
 
+    assert response.status_code == 202
+    assert response.json()["jobId"] == "job-1"
+    assert response.json()["status"] == "running"
+    assert fake_runner.started_with == ("host-xyz", "host@example.com", False)
+
+    client.app.dependency_overrides.clear()
+
+
+def test_backfill_job_status_endpoint(client):
+    client.app.dependency_overrides[get_backfill_job_runner] = lambda: FakeBackfillJobRunner()
+
+    response = client.get("/integrations/gmail/host@example.com/backfill/jobs/job-1")
+    missing = client.get("/integrations/gmail/host@example.com/backfill/jobs/job-2")
+    other_mailbox = client.get("/integrations/gmail/other@example.com/backfill/jobs/job-1")
+
     assert response.status_code == 200
-    assert response.json() == {"processed": 0, "items": []}
-    assert fake_service.called_with == ("host-xyz", "host@example.com", False)
+    assert response.json()["processed"] == 250
+    assert response.json()["etaSeconds"] == 30
+    assert missing.status_code == 404
+    assert other_mailbox.status_code == 404
 
     client.app.dependency_overrides.clear()
 
@@ -210,3 +263,19 @@ def test_backfill_preview_endpoint(client):
 
     client.app.dependency_overrides.clear()
 
+
+def test_gmail_notification_is_coalesced_while_mailbox_in_flight(client, monkeypatch):
+    coalescer = NotificationCoalescer()
+    monkeypatch.setattr("email_agent_service.api.routes.integrations.WATCH_NOTIFICATIONS", coalescer)
+    client.app.dependency_overrides[get_firestore_client] = lambda: None
+    assert coalescer.submit("host@example.com", "100")
+    data = base64.b64encode(json.dumps({"emailAddress": "host@example.com", "historyId": "150"}).encode()).decode()
+
+    response = client.post("/integrations/gmail/notifications", json={"message": {"data": data}})
+
+    assert response.status_code == 204
+    processed = []
+    assert coalescer.drain("host@example.com", lambda email, history_id: processed.append(history_id)) == 1
+    assert processed == ["150"]
+
+    client.app.dependency_overrides.clear()
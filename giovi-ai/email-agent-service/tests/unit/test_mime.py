@@ -0,0 +1,78 @@
+from email import message_from_bytes
+from email.message import EmailMessage
+
+from email_agent_service.parsers.mime import decode_part, extract_bodies, parse_message_lean
+
+
+def build_multipart() -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = "Prenotazione confermata"
+    message["From"] = "automated@airbnb.com"
+    message.set_content("Testo della prenotazione")
+    message.add_alternative("<p>HTML della prenotazione</p>", subtype="html")
+    message.add_attachment(b"\x89PNG" + b"\x00" * 4096, maintype="image", subtype="png", filename="logo.png")
+    message.add_attachment("allegato di testo", filename="note.txt")
+    return message
+
+
+def test_extract_bodies_collects_text_and_html_in_one_walk():
+    message = message_from_bytes(build_multipart().as_bytes())
+
+    bodies = extract_bodies(message)
+
+    assert bodies.text.strip() == "Testo della prenotazione"
+    assert bodies.html.strip() == "<p>HTML della prenotazione</p>"
+
+
+def test_extract_bodies_skips_attachments_without_decoding(monkeypatch):
+    message = message_from_bytes(build_multipart().as_bytes())
+    decoded_types = []
+    original = type(message).get_payload
+
+    def tracking_get_payload(self, *args, **kwargs):
+        if kwargs.get("decode"):
+            decoded_types.append(self.get_content_type())
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(type(message), "get_payload", tracking_get_payload)
+
+    extract_bodies(message)
+
+    assert "image/png" not in decoded_types
+    assert decoded_types.count("text/plain") == 1
+
+
+def test_text_attachment_is_not_used_as_body():
+    message = EmailMessage()
+    message["Subject"] = "Solo allegato"
+    message.add_attachment("allegato di testo", filename="note.txt")
+
+    bodies = extract_bodies(message_from_bytes(message.as_bytes()))
+
+    assert bodies.text is None
+
+
+def test_decode_part_caps_base64_and_quoted_printable_parts():
+    for cte in ("base64", "quoted-printable"):
+        message = EmailMessage()
+        message.set_content("àbc " * 5000, cte=cte)
+        part = message_from_bytes(message.as_bytes())
+
+        decoded = decode_part(part, max_bytes=1000)
+
+        assert decoded is not None
+        assert len(decoded.encode("utf-8")) <= 1000
+        assert decoded.startswith("àbc àbc")
+
+
+def test_parse_message_lean_drops_large_non_text_parts():
+    raw = build_multipart().as_bytes()
+
+    message = parse_message_lean(raw, max_attachment_bytes=1024)
+
+    image = next(part for part in message.walk() if part.get_content_type() == "image/png")
+    assert image.get_payload() == ""
+    assert image.dropped_bytes > 1024
+    bodies = extract_bodies(message)
+    assert bodies.text.strip() == "Testo della prenotazione"
+    assert bodies.html.strip() == "<p>HTML della prenotazione</p>"
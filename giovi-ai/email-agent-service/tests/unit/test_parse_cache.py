@@ -0,0 +1,72 @@
+from email.message import EmailMessage
+
+from email_agent_service.models import ParsedEmail, ParsedEmailMetadata
+from email_agent_service.parsers import AirbnbConfirmationParser, EmailParsingEngine, RawEmail
+from email_agent_service.parsers.cache import (
+    DiskParseCache,
+    InMemoryParseCache,
+    make_cache_key,
+)
+
+
+def build_parsed(subject: str) -> ParsedEmail:
+    return ParsedEmail(kind="unhandled", metadata=ParsedEmailMetadata(subject=subject, gmailMessageId="m"))
+
+
+def build_airbnb_bytes() -> bytes:
+    message = EmailMessage()
+    message["Subject"] = "Prenotazione confermata - Carlo Verdi arriverà il 3 set"
+    message["From"] = "Airbnb <automated@airbnb.com>"
+    message.set_content("CODICE DI CONFERMA HMM5AE9MXB\nTOTALE (EUR) 318,00 €")
+    return message.as_bytes()
+
+
+def test_cache_key_depends_on_payload_and_parser_version():
+    key = make_cache_key("msg-1", b"raw", version="v1")
+
+    assert key == make_cache_key("msg-1", b"raw", version="v1")
+    assert key != make_cache_key("msg-1", b"raw2", version="v1")
+    assert key != make_cache_key("msg-1", b"raw", version="v2")
+
+
+def test_memory_cache_evicts_least_recently_used_by_size():
+    entry_size = len(build_parsed("a").model_dump_json(by_alias=True))
+    cache = InMemoryParseCache(max_bytes=entry_size * 2)
+
+    cache.put("a", build_parsed("a"))
+    cache.put("b", build_parsed("b"))
+    assert cache.get("a").metadata.subject == "a"  # "a" diventa il più recente
+    cache.put("c", build_parsed("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size_bytes <= entry_size * 2
+
+
+def test_disk_cache_persists_and_drops_stale_versions(tmp_path):
+    DiskParseCache(tmp_path, version="old").put("k", build_parsed("vecchio"))
+    cache = DiskParseCache(tmp_path, version="new")
+    cache.put("k", build_parsed("nuovo"))
+
+    reopened = DiskParseCache(tmp_path, version="new")
+
+    assert reopened.get("k").metadata.subject == "nuovo"
+    assert not (tmp_path / "old").exists()
+
+
+def test_engine_cache_hit_skips_mime_decoding(monkeypatch):
+    engine = EmailParsingEngine([AirbnbConfirmationParser()], parse_cache=InMemoryParseCache())
+    raw = build_airbnb_bytes()
+
+    first = engine.parse(message_id="msg-1", raw_payload=raw)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("un hit non deve ridecodificare il messaggio")
+
+    monkeypatch.setattr("email_agent_service.parsers.engine.parse_message_lean", fail)
+    second = engine.parse(message_id="msg-1", raw_payload=raw, snippet="anteprima")
+    batch = engine.parse_many([RawEmail("msg-1", raw)])
+
+    assert second.reservation.reservation_id == first.reservation.reservation_id == "HMM5AE9MXB"
+    assert second.metadata.snippet == "anteprima"
+    assert batch[0].model_dump() == first.model_dump()
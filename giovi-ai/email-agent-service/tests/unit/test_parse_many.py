@@ -0,0 +1,65 @@
+from email.message import EmailMessage
+
+from email_agent_service.parsers import (
+    AirbnbConfirmationParser,
+    BookingConfirmationParser,
+    EmailParsingEngine,
+    RawEmail,
+    ScidooConfirmationParser,
+)
+
+
+def build_email_bytes(subject: str, sender: str, body: str) -> bytes:
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = sender
+    message["To"] = "host@example.com"
+    message.set_content(body)
+    return message.as_bytes()
+
+
+def build_items(count: int) -> list[RawEmail]:
+    items = []
+    for i in range(count):
+        if i % 3 == 0:
+            raw = build_email_bytes(
+                f"Prenotazione confermata - Ospite {i} arriverà il 3 set",
+                "Airbnb <automated@airbnb.com>",
+                f"CODICE DI CONFERMA HM{i:08d}\nTOTALE (EUR) 318,00 €",
+            )
+        elif i % 3 == 1:
+            raw = build_email_bytes(
+                f"Confermata - Prenotazione ID {5958915000 + i} - Booking",
+                "reservation@scidoo.com",
+                "Nome Ospite: Mario Rossi",
+            )
+        else:
+            raw = build_email_bytes("Newsletter", "news@shop.example", "Offerte")
+        items.append(RawEmail(f"msg-{i}", raw, f"snippet-{i}"))
+    return items
+
+
+def build_engine(max_workers: int = 1) -> EmailParsingEngine:
+    return EmailParsingEngine(
+        [ScidooConfirmationParser(), AirbnbConfirmationParser(), BookingConfirmationParser()],
+        max_workers=max_workers,
+    )
+
+
+def test_parse_many_serial_preserves_order():
+    items = build_items(6)
+
+    results = build_engine().parse_many(items)
+
+    assert [r.metadata.gmail_message_id for r in results] == [item.message_id for item in items]
+    assert [r.kind for r in results[:3]] == ["airbnb_confirmation", "scidoo_confirmation", "unhandled"]
+
+
+def test_parse_many_process_pool_matches_serial_results():
+    items = build_items(24)
+    engine = build_engine(max_workers=2)
+
+    pooled = engine.parse_many(items, chunk_size=4)
+    serial = engine.parse_many(items, max_workers=1)
+
+    assert [r.model_dump() for r in pooled] == [r.model_dump() for r in serial]
@@ -0,0 +1,101 @@
+from email.message import EmailMessage
+
+from email_agent_service.models import ParsedEmail, ParsedEmailMetadata
+from email_agent_service.parsers import (
+    AirbnbCancellationParser,
+    AirbnbConfirmationParser,
+    AirbnbMessageParser,
+    BookingConfirmationParser,
+    BookingMessageParser,
+    EmailParsingEngine,
+    ScidooCancellationParser,
+    ScidooConfirmationParser,
+)
+from email_agent_service.parsers.base import EmailParser
+
+
+def build_email_bytes(subject: str, sender: str, body: str) -> bytes:
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = sender
+    message["To"] = "host@example.com"
+    message.set_content(body)
+    return message.as_bytes()
+
+
+def build_engine(*extra_parsers) -> EmailParsingEngine:
+    return EmailParsingEngine(
+        [
+            ScidooCancellationParser(),
+            ScidooConfirmationParser(),
+            AirbnbCancellationParser(),
+            AirbnbConfirmationParser(),
+            BookingConfirmationParser(),
+            BookingMessageParser(),
+            AirbnbMessageParser(),
+            *extra_parsers,
+        ]
+    )
+
+
+def test_dispatch_index_selects_candidates_by_sender_domain():
+    index = build_engine().dispatch_index
+
+    airbnb = [type(p).__name__ for p in index.candidates("Airbnb <automated@airbnb.com>")]
+    scidoo = [type(p).__name__ for p in index.candidates("reservation@scidoo.com")]
+
+    assert airbnb == ["AirbnbCancellationParser", "AirbnbConfirmationParser", "AirbnbMessageParser"]
+    # L'ordine di registrazione è preservato: Scidoo prima di Booking
+    assert scidoo[:2] == ["ScidooCancellationParser", "ScidooConfirmationParser"]
+    assert index.candidates("newsletter@shop.example") == []
+
+
+def test_unhandled_email_is_not_body_decoded(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("il body non deve essere decodificato")
+
+    monkeypatch.setattr("email_agent_service.parsers.base.extract_bodies", fail)
+    engine = build_engine()
+
+    parsed = engine.parse(
+        message_id="msg-1",
+        raw_payload=build_email_bytes("Offerte della settimana", "news@shop.example", "Sconti!"),
+    )
+
+    assert parsed.kind == "unhandled"
+    assert parsed.metadata.sender == "news@shop.example"
+    assert parsed.metadata.gmail_message_id == "msg-1"
+
+
+def test_scidoo_subject_prefix_routes_to_scidoo_parser():
+    engine = build_engine()
+
+    parsed = engine.parse(
+        message_id="msg-2",
+        raw_payload=build_email_bytes(
+            "Cancellata - Prenotazione ID 5958915259 - Booking",
+            "Scidoo Booking Manager <reservation@scidoo.com>",
+            "ID Voucher=5958915259",
+        ),
+    )
+
+    assert parsed.kind == "scidoo_cancellation"
+
+
+class CatchAllParser(EmailParser):
+    def matches(self, content) -> bool:
+        return True
+
+    def parse(self, content) -> ParsedEmail:
+        return ParsedEmail(kind="unhandled", metadata=ParsedEmailMetadata(subject="catch-all"))
+
+
+def test_parsers_without_sender_domains_are_always_candidates():
+    engine = build_engine(CatchAllParser())
+
+    parsed = engine.parse(
+        message_id="msg-3",
+        raw_payload=build_email_bytes("Ciao", "friend@example.org", "Body"),
+    )
+
+    assert parsed.metadata.subject == "catch-all"
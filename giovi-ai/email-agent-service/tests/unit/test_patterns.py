@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from email_agent_service.parsers.booking_confirm import CHECK_IN_LABELS, TOTAL_LABELS, extract_amount, extract_date
+from email_agent_service.parsers.patterns import LabelPattern, MultiReplace, compile_any
+
+
+def test_label_pattern_follows_label_priority_not_position():
+    labels = LabelPattern(["Nome Ospite", "Ospite"], r"([^\n\r]+)")
+    text = "Ospite: Anna Neri\nNome Ospite: Carlo Verdi"
+
+    assert labels.search(text).group(1) == "Carlo Verdi"
+    assert [match.group(1) for match in labels.matches(text)] == ["Carlo Verdi", "Anna Neri"]
+    assert labels.search("nessun campo") is None
+
+
+def test_label_pattern_falls_back_to_next_label():
+    text = "Data di Check-in: da definire\nCheck-in: 15/01/2026"
+
+    assert extract_date(text, CHECK_IN_LABELS) == datetime(2026, 1, 15)
+    assert extract_amount("TU GUADAGNI: 1.020,50 €", TOTAL_LABELS) == (1020.5, "EUR")
+
+
+def test_compile_any_matches_each_pattern_in_one_regex():
+    regex = compile_any([r"^siamo\s+", r"ciao\s+\w+"], flags=0)
+
+    assert regex.search("siamo in tre")
+    assert regex.search("e poi ciao marco")
+    assert not regex.search("noi siamo")
+
+
+def test_multi_replace_single_pass():
+    replace = MultiReplace({"=C3=AC": "ì", "=20": " "})
+
+    assert replace("LUNED=C3=AC=2019") == "LUNEDì 19"
+    assert replace("nessun artefatto") == "nessun artefatto"
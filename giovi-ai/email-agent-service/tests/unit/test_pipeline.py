@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+from email_agent_service.services.pipeline import bounded_stage
+
+
+def test_bounded_stage_preserves_order_and_chains():
+    doubled = bounded_stage((item * 2 for item in bounded_stage(range(10), maxsize=2)), maxsize=3)
+
+    assert list(doubled) == [item * 2 for item in range(10)]
+
+
+def test_bounded_stage_limits_lookahead():
+    produced = []
+
+    def producer():
+        for item in range(10):
+            produced.append(item)
+            yield item
+
+    stage = bounded_stage(producer(), maxsize=2)
+    assert next(stage) == 0
+    time.sleep(0.2)
+    # Elemento consegnato + coda piena + elemento in attesa di entrare in coda
+    assert len(produced) <= 4
+    assert list(stage) == list(range(1, 10))
+
+
+def test_bounded_stage_reraises_producer_errors_after_previous_items():
+    def producer():
+        yield 1
+        raise RuntimeError("gmail down")
+
+    stage = bounded_stage(producer(), maxsize=1)
+    assert next(stage) == 1
+    with pytest.raises(RuntimeError, match="gmail down"):
+        next(stage)
+
+
+def test_bounded_stage_stops_producer_when_consumer_closes():
+    closed = threading.Event()
+
+    def producer():
+        try:
+            for item in range(1000):
+                yield item
+        finally:
+            closed.set()
+
+    stage = bounded_stage(producer(), maxsize=1)
+    assert next(stage) == 0
+    stage.close()
+
+    assert closed.wait(5)
@@ -0,0 +1,235 @@
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from google.cloud.firestore_v1.transforms import ArrayUnion
+
+from email_agent_service.repositories import processed_messages
+from email_agent_service.repositories.processed_messages import (
+    ProcessedIdCache,
+    ProcessedMessageRepository,
+    ShardCache,
+)
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id: str, data):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return self._data
+
+
+class FakeRef:
+    def __init__(self, client: "FakeClient", path: str):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str) -> "FakeRef":
+        return FakeRef(self._client, f"{self.path}/{name}")
+
+    def document(self, name: str) -> "FakeRef":
+        return FakeRef(self._client, f"{self.path}/{name}")
+
+    def get(self, transaction=None) -> FakeSnapshot:
+        self._client.reads += 1
+        return FakeSnapshot(self.id, self._client.docs.get(self.path))
+
+
+class FakeBatch:
+    """WriteBatch e Transaction: scritture applicate al commit (ArrayUnion compreso)."""
+
+    _read_only = False
+    _max_attempts = 1
+    _id = b"fake-transaction"
+
+    def __init__(self, client: "FakeClient"):
+        self._client = client
+        self._writes: List[tuple] = []
+
+    def _clean_up(self) -> None:
+        self._writes = []
+
+    def _begin(self, retry_id=None) -> None:
+        pass
+
+    def _commit(self) -> None:
+        self.commit()
+
+    def _rollback(self) -> None:
+        self._writes = []
+
+    def set(self, ref: FakeRef, data: dict, merge: bool = False) -> None:
+        self._writes.append((ref.path, data, merge))
+
+    def commit(self) -> None:
+        self._client.commits.append(len(self._writes))
+        for path, data, merge in self._writes:
+            if not merge:
+                self._client.docs[path] = {}
+            stored = self._client.docs.setdefault(path, {})
+            for key, value in data.items():
+                if isinstance(value, ArrayUnion):
+                    stored[key] = list(dict.fromkeys(list(stored.get(key, [])) + list(value.values)))
+                else:
+                    stored[key] = value
+
+
+class FakeClient:
+    def __init__(self):
+        self.docs: Dict[str, dict] = {}
+        self.reads = 0
+        self.round_trips = 0
+        self.commits: List[int] = []
+
+    def collection(self, name: str) -> FakeRef:
+        return FakeRef(self, name)
+
+    def get_all(self, refs):
+        self.round_trips += 1
+        refs = list(refs)
+        self.reads += len(refs)
+        return [FakeSnapshot(ref.id, self.docs.get(ref.path)) for ref in refs]
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def transaction(self) -> FakeBatch:
+        return FakeBatch(self)
+
+
+MAILBOX = "host@example.com"
+LEGACY = f"hostEmailIntegrations/{MAILBOX}/processedMessageIds"
+SHARDS = f"hostEmailIntegrations/{MAILBOX}/processedMessageShards"
+NOW = datetime(2026, 3, 10, 9, 0, tzinfo=timezone.utc)
+
+
+def build_repo(client, *, legacy_lookup: bool = True, shard_cache: ShardCache = None, retention_days: int = 30):
+    return ProcessedMessageRepository(
+        client,
+        cache=ProcessedIdCache(),
+        retention_days=retention_days,
+        legacy_lookup=legacy_lookup,
+        clock=lambda: NOW,
+        shard_cache=shard_cache if shard_cache is not None else ShardCache(),
+    )
+
+
+def test_filter_unprocessed_reads_index_once_then_only_the_current_part():
+    client = FakeClient()
+    client.docs[f"{SHARDS}/index"] = {
+        "current": 1,
+        "currentCount": 1,
+        "parts": {"0": "2026-03-01", "1": "2026-03-10"},
+        "createdDay": "2026-03-01",
+    }
+    client.docs[f"{SHARDS}/part-0"] = {"ids": ["m2", "m5"], "full": True, "lastDay": "2026-03-01"}
+    client.docs[f"{SHARDS}/part-1"] = {"ids": ["m6"], "full": False, "lastDay": "2026-03-10"}
+    client.docs[f"{LEGACY}/m4"] = {}
+    shard_cache = ShardCache()
+
+    repo = build_repo(client, shard_cache=shard_cache)
+    assert repo.filter_unprocessed(MAILBOX, ["m1", "m2", "m3", "m4", "m5", "m6", "m1"]) == ["m1", "m3"]
+    # Indice, sotto-shard vivi (2), vecchi documenti degli id non trovati (3)
+    assert client.reads == 1 + 2 + 3
+
+    # Nuova richiesta (cache LRU vuota): indice e sotto-shard pieno restano in cache
+    client.reads = 0
+    assert build_repo(client, shard_cache=shard_cache).filter_unprocessed(MAILBOX, ["m2", "m5", "m6", "m7"]) == ["m7"]
+    assert client.reads == 1 + 1
+
+
+def test_cold_lookup_on_a_mailbox_without_shards_costs_one_read():
+    client = FakeClient()
+
+    assert build_repo(client, legacy_lookup=False).filter_unprocessed(MAILBOX, ["m1"]) == ["m1"]
+    assert client.reads == 1
+
+
+def test_mark_processed_many_fills_parts_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(processed_messages, "SHARD_MAX_IDS", 3)
+    client = FakeClient()
+    repo = build_repo(client, legacy_lookup=False)
+
+    repo.mark_processed_many(MAILBOX, [(f"m{index}", "42") for index in range(5)])
+    repo.mark_processed(MAILBOX, "m5", history_id="43")
+    repo.mark_processed_many(MAILBOX, [("m6", "44"), ("m7", "44")])
+
+    assert client.docs[f"{SHARDS}/part-0"]["ids"] == ["m0", "m1", "m2"]
+    assert client.docs[f"{SHARDS}/part-1"]["ids"] == ["m3", "m4", "m5"]
+    assert client.docs[f"{SHARDS}/part-2"]["ids"] == ["m6", "m7"]
+    assert [client.docs[f"{SHARDS}/part-{part}"]["full"] for part in range(3)] == [True, True, False]
+    index = client.docs[f"{SHARDS}/index"]
+    assert (index["current"], index["currentCount"]) == (2, 2)
+    assert index["parts"] == {"0": "2026-03-10", "1": "2026-03-10", "2": "2026-03-10"}
+    assert index["expireAt"] == client.docs[f"{SHARDS}/part-2"]["expireAt"] == datetime(2026, 4, 10, tzinfo=timezone.utc)
+    # Una scrittura per sotto-shard toccato più l'indice, un commit per chiamata
+    assert client.commits == [3, 2, 2]
+    assert not any(path.startswith(LEGACY) for path in client.docs)
+
+    fresh = build_repo(client, legacy_lookup=False)
+    assert fresh.filter_unprocessed(MAILBOX, ["m0", "m4", "m7", "new"]) == ["new"]
+
+
+def test_lookup_rereads_index_when_another_instance_filled_the_current_part(monkeypatch):
+    monkeypatch.setattr(processed_messages, "SHARD_MAX_IDS", 2)
+    client = FakeClient()
+    stale = build_repo(client, legacy_lookup=False)
+    stale.mark_processed(MAILBOX, "m0")
+
+    build_repo(client, legacy_lookup=False).mark_processed_many(MAILBOX, [("m1", None), ("m2", None)])
+
+    assert build_repo(client, legacy_lookup=False, shard_cache=stale._shard_cache).filter_unprocessed(
+        MAILBOX, ["m1", "m2", "m3"]
+    ) == ["m3"]
+
+
+def test_shards_past_retention_are_ignored_and_close_the_legacy_window():
+    client = FakeClient()
+    client.docs[f"{SHARDS}/index"] = {"current": 1, "parts": {"0": "2026-01-01"}, "createdDay": "2026-01-01"}
+    client.docs[f"{SHARDS}/part-0"] = {"ids": ["old"], "full": True, "lastDay": "2026-01-01"}
+    client.docs[f"{LEGACY}/old"] = {}
+
+    assert build_repo(client, retention_days=5).filter_unprocessed(MAILBOX, ["old"]) == ["old"]
+    # Indice e sotto-shard corrente (vuoto): né il sotto-shard scaduto né i vecchi documenti
+    assert client.reads == 2
+
+
+def test_api_messages_use_their_own_shards():
+    client = FakeClient()
+    repo = build_repo(client, legacy_lookup=False)
+
+    repo.mark_processed_api("b1", "host-1", "booking_api")
+
+    assert "processedBookingMessages/host-1/sources/booking_api/processedMessageShards/part-0" in client.docs
+    assert build_repo(client, legacy_lookup=False).is_processed("b1", "host-1", "booking_api")
+    assert build_repo(client, legacy_lookup=False).filter_unprocessed_api(["b1", "b2"], "host-1", "booking_api") == ["b2"]
+    assert build_repo(client, legacy_lookup=False).filter_unprocessed(MAILBOX, ["b1"]) == ["b1"]
+
+
+def test_shard_cache_is_bounded_by_ids_and_scopes():
+    cache = ShardCache(max_ids=5, max_scopes=2)
+    cache.put_part(MAILBOX, 0, frozenset({"a", "b", "c"}))
+    cache.put_part("other@example.com", 0, frozenset({"d", "e", "f"}))
+
+    assert cache.part(MAILBOX, 0) is None
+    assert cache.part("other@example.com", 0) == {"d", "e", "f"}
+
+    layout = processed_messages.ShardLayout(0, {0: ""}, "2026-03-10")
+    for scope in ("a", "b", "c"):
+        cache.put_layout(scope, layout)
+    assert cache.layout("a") is None
+    assert cache.layout("c") == layout
+
+
+def test_processed_id_cache_evicts_least_recently_used_per_mailbox():
+    cache = ProcessedIdCache(per_mailbox=2)
+    cache.add_many(MAILBOX, ["a", "b"])
+    assert cache.contains(MAILBOX, "a")
+    cache.add_many(MAILBOX, ["c"])
+
+    assert cache.contains(MAILBOX, "a")
+    assert not cache.contains(MAILBOX, "b")
+    assert not cache.contains("other@example.com", "a")
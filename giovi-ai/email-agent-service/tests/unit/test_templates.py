@@ -0,0 +1,70 @@
+from datetime import datetime
+from email.message import EmailMessage
+
+from email_agent_service.parsers.airbnb_confirm import AirbnbConfirmationParser
+from email_agent_service.parsers.base import EmailContent
+from email_agent_service.parsers.templates import run_strategies
+
+AIRBNB_TEMPLATE = """
+<html><body>
+<h1>IMPERIAL SUITE - PALAZZO DELLA STAFFA</h1>
+<p>{guest} arriverà il {day} set</p>
+<div><div>Check-in</div><div>gio {day} set 2026</div></div>
+<div><div>Check-out</div><div>sab {checkout} set 2026</div></div>
+<p>TOTALE (EUR) {amount} €</p>
+</body></html>
+"""
+
+
+def build_content(html: str) -> EmailContent:
+    message = EmailMessage()
+    message["Subject"] = "Prenotazione confermata"
+    message["From"] = "Airbnb <automated@airbnb.com>"
+    message.add_alternative(html, subtype="html")
+    return EmailContent(message=message, text=None, html=html)
+
+
+def test_run_strategies_follows_priority_order_and_stops_at_first_value():
+    calls = []
+
+    def strategy(name, value):
+        def run():
+            calls.append(name)
+            return value
+        return run
+
+    assert run_strategies([strategy("a", None), strategy("b", "x"), strategy("c", "y")]) == "x"
+    assert calls == ["a", "b"]
+
+    calls.clear()
+    assert run_strategies([strategy("a", "z"), strategy("b", "x")]) == "z"
+    assert calls == ["a"]
+    assert run_strategies([strategy("a", None)]) is None
+
+
+def test_airbnb_property_name_does_not_depend_on_previous_emails():
+    # Stesso scheletro DOM: nella seconda email l'h1 è escluso e vince html_strings
+    header = build_content("<html><body><h1>VILLA ROSA</h1><p>VILLA ROSA SUITE - CENTRO STORICO</p></body></html>")
+    excluded = build_content(
+        "<html><body><h1>Prenotazione confermata</h1><p>VILLA ROSA SUITE - CENTRO STORICO</p></body></html>"
+    )
+    parser = AirbnbConfirmationParser()
+
+    first = parser.parse(header).reservation.property_name
+    assert parser.parse(excluded).reservation.property_name == "VILLA ROSA SUITE - CENTRO STORICO"
+    again = parser.parse(build_content(header.html)).reservation.property_name
+
+    assert first == again == "VILLA ROSA"
+
+
+def test_airbnb_parser_extracts_fields_from_same_template():
+    parser = AirbnbConfirmationParser()
+
+    first = parser.parse(build_content(AIRBNB_TEMPLATE.format(guest="Carlo Verdi", day=3, checkout=5, amount="318,00"))).reservation
+    second = parser.parse(build_content(AIRBNB_TEMPLATE.format(guest="Anna Neri", day=10, checkout=12, amount="1.020,50"))).reservation
+
+    assert second.property_name == "IMPERIAL SUITE - PALAZZO DELLA STAFFA"
+    assert second.guest_name == "Anna Neri"
+    assert (second.check_in, second.check_out) == (datetime(2026, 9, 10), datetime(2026, 9, 12))
+    assert second.total_amount == 1020.5
+    assert first.check_in == datetime(2026, 9, 3)
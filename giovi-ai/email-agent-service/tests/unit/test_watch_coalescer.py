@@ -0,0 +1,76 @@
+import threading
+
+from email_agent_service.services.watch_coalescer import NotificationCoalescer, max_history_id
+
+
+def test_max_history_id_compares_numerically():
+    assert max_history_id(None, "5") == "5"
+    assert max_history_id("900", "1000") == "1000"
+    assert max_history_id("1000", "900") == "1000"
+
+
+def test_burst_during_run_coalesces_into_one_follow_up_pass():
+    coalescer = NotificationCoalescer()
+    calls = []
+
+    def process(email: str, history_id: str) -> None:
+        calls.append(history_id)
+        if len(calls) == 1:
+            # Raffica di notifiche mentre il primo passaggio è in corso
+            for later in ("105", "120", "110"):
+                assert coalescer.submit(email, later) is False
+
+    assert coalescer.submit("host@example.com", "100") is True
+    assert coalescer.drain("host@example.com", process) == 2
+
+    assert calls == ["100", "120"]
+    assert not coalescer.in_flight("host@example.com")
+    assert coalescer.submit("host@example.com", "130") is True
+
+
+def test_errors_do_not_leave_mailbox_in_flight():
+    coalescer = NotificationCoalescer()
+
+    def failing(email: str, history_id: str) -> None:
+        raise RuntimeError("history.list fallita")
+
+    coalescer.submit("host@example.com", "100")
+    assert coalescer.drain("host@example.com", failing) == 1
+    assert not coalescer.in_flight("host@example.com")
+
+    coalescer.submit("other@example.com", "1")
+    coalescer.release("other@example.com")
+    assert not coalescer.in_flight("other@example.com")
+
+
+def test_concurrent_notifications_run_single_flight():
+    coalescer = NotificationCoalescer()
+    started = threading.Event()
+    release = threading.Event()
+    active = []
+    calls = []
+
+    def process(email: str, history_id: str) -> None:
+        active.append(history_id)
+        assert len(active) == 1
+        calls.append(history_id)
+        started.set()
+        release.wait(5)
+        active.pop()
+
+    def notify(history_id: str) -> None:
+        if coalescer.submit("host@example.com", history_id):
+            coalescer.drain("host@example.com", process)
+
+    first = threading.Thread(target=notify, args=("1",))
+    first.start()
+    assert started.wait(5)
+    others = [threading.Thread(target=notify, args=(str(value),)) for value in range(2, 12)]
+    for thread in others:
+        thread.start()
+    for thread in others:
+        thread.join(5)
+    release.set()
+    first.join(5)
+
+    assert calls == ["1", "11"]